@@ -40,6 +40,152 @@ class ArchiveFlags(object):
     EVERY_SEQUENCE_STEP  = 2
     UNDEFINED            =-1
 #
+class XMFAppendWriter(object):
+    """
+    Write the global XMF file one time step at a time.
+
+    The file holds a single temporal collection whose children are
+    spatial collections, one per step, each with the Time of the step
+    followed by the grids of every temporal collection in the archive.
+    The closing tags are kept at the end of the file and each step is
+    written over them, so the cost of a step does not grow with the
+    number of steps already archived and the file is a complete XMF
+    document after every sync.
+    """
+    marker = b"<!-- XMFAppendWriter -->\n"
+    tail = b"    </Grid>\n  </Domain>\n</Xdmf>\n"
+    stepEnd = b"\n      </Grid>\n"
+    def __init__(self, xmlFile, xmlHeader):
+        self.xmlFile = xmlFile
+        self.xmlHeader = xmlHeader
+        self.opened = False
+        self.tailOffset = 0
+        self.stepOffsets = []
+    def open(self, name):
+        """
+        Write the header and an empty temporal collection
+        """
+        self.xmlFile.seek(0)
+        self.xmlFile.truncate()
+        self.xmlFile.write(bytes(self.xmlHeader,"utf-8"))
+        self.xmlFile.write(self.marker)
+        self.xmlFile.write(bytes('<Xdmf Version="2.0" xmlns:xi="http://www.w3.org/2001/XInclude">\n'
+                                 '  <Domain>\n'
+                                 '    <Grid CollectionType="Temporal" GridType="Collection" Name="%s">\n' % (name,),
+                                 "utf-8"))
+        self.tailOffset = self.xmlFile.tell()
+        self.stepOffsets = []
+        self.xmlFile.write(self.tail)
+        self.xmlFile.flush()
+        self.opened = True
+    def isIncremental(self):
+        """
+        Check if the existing file was written by this class
+        """
+        self.xmlFile.seek(0)
+        prolog = self.xmlFile.read(len(self.xmlHeader)+len(self.marker)+256)
+        root = prolog.find(b"<Xdmf")
+        return self.marker in prolog[:root if root >= 0 else len(prolog)]
+    def readSteps(self):
+        """
+        Parse the steps of an existing file written by this class
+
+        Returns the steps as [Time, Grid, Grid, ...] lists, or None if the
+        file was not written by this class. A step left incomplete by an
+        interrupted write is ignored. The offsets of the complete steps
+        are kept for reopen.
+        """
+        if not self.isIncremental():
+            return None
+        self.xmlFile.seek(0)
+        data = self.xmlFile.read()
+        start = data.find(b'<Grid CollectionType="Temporal"')
+        if start < 0:
+            return None
+        start = data.find(b"\n", start) + 1
+        steps = []
+        self.stepOffsets = []
+        end = data.find(self.stepEnd, start)
+        while end >= 0:
+            end += len(self.stepEnd)
+            try:
+                SpatialCollection = fromstring(data[start:end])
+            except ParseError:
+                break
+            steps.append(list(SpatialCollection))
+            self.stepOffsets.append(start)
+            start = end
+            end = data.find(self.stepEnd, start)
+        self.tailOffset = start
+        return steps
+    def reopen(self):
+        """
+        Continue an existing file written by this class after its last
+        complete step, returns the steps as readSteps
+        """
+        steps = self.readSteps()
+        if steps is None:
+            return None
+        self.xmlFile.seek(self.tailOffset)
+        self.xmlFile.write(self.tail)
+        self.xmlFile.truncate()
+        self.xmlFile.flush()
+        self.opened = True
+        return steps
+    def truncate(self, nSteps):
+        """
+        Drop the steps after the first nSteps
+        """
+        if nSteps >= len(self.stepOffsets):
+            return
+        self.tailOffset = self.stepOffsets[nSteps]
+        del self.stepOffsets[nSteps:]
+        self.xmlFile.seek(self.tailOffset)
+        self.xmlFile.write(self.tail)
+        self.xmlFile.truncate()
+        self.xmlFile.flush()
+    def append(self, grids):
+        """
+        Append a step given as [Time, Grid, Grid, ...]
+        """
+        SpatialCollection = Element("Grid",{"GridType":"Collection",
+                                            "CollectionType":"Spatial"})
+        SpatialCollection.extend(grids)
+        indentXML(SpatialCollection, level=3)
+        SpatialCollection.tail = "\n"
+        self.stepOffsets.append(self.tailOffset)
+        self.xmlFile.seek(self.tailOffset)
+        self.xmlFile.write(bytes("      "+tostring(SpatialCollection, encoding="unicode"),"utf-8"))
+        self.tailOffset = self.xmlFile.tell()
+        self.xmlFile.write(self.tail)
+        self.xmlFile.flush()
+    @staticmethod
+    def temporalTree(steps):
+        """
+        Rebuild the temporal collections of the archive from the steps
+
+        Each collection holds a spatial collection per step with the Time
+        of the step and the grids named after the collection.
+        """
+        XDMF = Element("Xdmf",{"Version":"2.0",
+                               "xmlns:xi":"http://www.w3.org/2001/XInclude"})
+        Domain = SubElement(XDMF,"Domain")
+        collections = {}
+        for step in steps:
+            SpatialCollections = {}
+            for Grid in step[1:]:
+                name = Grid.attrib.get('Name')
+                if name not in collections:
+                    collections[name] = SubElement(Domain,"Grid",{"Name":name,
+                                                                  "GridType":"Collection",
+                                                                  "CollectionType":"Temporal"})
+                if name not in SpatialCollections:
+                    SpatialCollections[name] = SubElement(collections[name],"Grid",{"GridType":"Collection",
+                                                                                      "CollectionType":"Spatial"})
+                    SpatialCollections[name].append(step[0])#Time
+                SpatialCollections[name].append(Grid)
+        return ElementTree(XDMF)
+
 class AR_base(object):
     def __init__(self,dataDir,filename,
                  useTextArchive=False,
@@ -47,10 +193,22 @@ class AR_base(object):
                  useGlobalXMF=True,
                  hotStart=False,
                  readOnly=False,
-                 global_sync=True):
+                 global_sync=True,
+                 incrementalXMF=False,
+                 storeXMLinHDF5=True):
+        """
+        incrementalXMF -- write the global XMF file append-only, one
+                          spatial collection per step (see XMFAppendWriter)
+        storeXMLinHDF5 -- store the XML of every step in the HDF5 file for
+                          gathering at close (only optional with incrementalXMF)
+        """
         import os.path
         import copy
         self.useGlobalXMF=useGlobalXMF
+        self.incrementalXMF = incrementalXMF and useGlobalXMF
+        self.storeXMLinHDF5 = storeXMLinHDF5 or not self.incrementalXMF
+        self.xmfWriter = None
+        self.stepGrids = []
         comm=Comm.get()
         self.comm=comm
         self.dataDir=dataDir
@@ -60,6 +218,7 @@ class AR_base(object):
         self.rank = comm.rank()
         self.size = comm.size()
         self.readOnly = readOnly
+        self.hotStart = hotStart
         self.n_datasets = 0
         import datetime
         #filename += datetime.datetime.now().isoformat()
@@ -86,12 +245,37 @@ class AR_base(object):
                 xmlFile_old=open(os.path.join(self.dataDir,
                                               filename+str(self.rank)()+".xmf"),
                                  "rb")
-            self.tree=ElementTree(file=xmlFile_old)
+            steps = XMFAppendWriter(xmlFile_old, self.xmlHeader).readSteps()
+            if steps is not None:
+                #written with incrementalXMF, rebuild the temporal collections
+                self.tree = XMFAppendWriter.temporalTree(steps)
+            else:
+                if self.incrementalXMF:
+                    logEvent("Archive %s.xmf was not written incrementally, appending with full rewrites" % (filename,))
+                    self.incrementalXMF = False
+                    self.storeXMLinHDF5 = True
+                xmlFile_old.seek(0)
+                self.tree=ElementTree(file=xmlFile_old)
+            xmlFile_old.close()
             if self.comm.isMaster():
-                self.xmlFileGlobal = open(os.path.join(self.dataDir,
-                                                       filename+".xmf"),
-                                          "ab")
-                self.treeGlobal=copy.deepcopy(self.tree)
+                if self.incrementalXMF:
+                    #steps after the hot start step are dropped at the next sync
+                    self.xmlFileGlobal = open(os.path.join(self.dataDir,
+                                                           filename+".xmf"),
+                                              "r+b")
+                    self.xmfWriter = XMFAppendWriter(self.xmlFileGlobal,
+                                                     self.xmlHeader)
+                    self.xmfWriter.reopen()
+                    self.treeGlobal=ElementTree(
+                        Element("Xdmf",
+                                {"Version":"2.0",
+                                 "xmlns:xi":"http://www.w3.org/2001/XInclude"})
+                    )
+                else:
+                    self.xmlFileGlobal = open(os.path.join(self.dataDir,
+                                                           filename+".xmf"),
+                                              "ab")
+                    self.treeGlobal=copy.deepcopy(self.tree)
             if not useGlobalXMF:
                 self.xmlFile=open(os.path.join(self.dataDir,
                                                filename+str(self.rank)()+".xmf"),
@@ -182,6 +366,9 @@ class AR_base(object):
                     os.path.join(self.dataDir,
                                  filename+".xmf"),
                     "wb")
+                if self.incrementalXMF:
+                    self.xmfWriter = XMFAppendWriter(self.xmlFileGlobal,
+                                                     self.xmlHeader)
                 self.treeGlobal=ElementTree(
                     Element("Xdmf",
                             {"Version":"2.0",
@@ -251,7 +438,8 @@ class AR_base(object):
         if not self.useGlobalXMF:
             self.xmlFile.close()
         if self.comm.isMaster() and self.useGlobalXMF:
-            self.gatherAndWriteTimes()
+            if not self.incrementalXMF:
+                self.gatherAndWriteTimes()
             self.xmlFileGlobal.close()
         if self.hdfFile is not None:
             self.hdfFile.close()
@@ -321,16 +509,28 @@ class AR_base(object):
                 Grids = comm_world.gather(GridLocal)
                 max_grid_string_len = 0
                 if self.comm.isMaster():
-                    TemporalGridCollectionGlobal = DomainGlobal[i]
-                    SpatialCollection=SubElement(TemporalGridCollectionGlobal,"Grid",{"GridType":"Collection",
-                                                                                      "CollectionType":"Spatial"})
-                    SpatialCollection.append(GridLocal[0])#append Time in Spatial Collection
-                    for Grid in Grids:
-                        del Grid[0]#Time
-                        SpatialCollection.append(Grid) #append Grid without Time
-                        element_string = tostring(Grid, encoding="utf-8")
-                        max_grid_string_len = max(len(element_string),
-                                                  max_grid_string_len)
+                    if self.incrementalXMF:
+                        if i == 0:
+                            self.stepGrids.append(GridLocal[0])#Time
+                        for Grid in Grids:
+                            del Grid[0]#Time
+                            Grid.attrib['Name'] = TemporalGridCollection.attrib['Name']
+                            self.stepGrids.append(Grid)
+                    else:
+                        TemporalGridCollectionGlobal = DomainGlobal[i]
+                        SpatialCollection=SubElement(TemporalGridCollectionGlobal,"Grid",{"GridType":"Collection",
+                                                                                          "CollectionType":"Spatial"})
+                        SpatialCollection.append(GridLocal[0])#append Time in Spatial Collection
+                        for Grid in Grids:
+                            del Grid[0]#Time
+                            SpatialCollection.append(Grid) #append Grid without Time
+                    if self.storeXMLinHDF5:
+                        for Grid in Grids:
+                            element_string = tostring(Grid, encoding="utf-8")
+                            max_grid_string_len = max(len(element_string),
+                                                      max_grid_string_len)
+                if not self.storeXMLinHDF5:
+                    continue
                 max_grid_string_len_array = numpy.array(max_grid_string_len,'i')
                 comm_world.Bcast([max_grid_string_len_array,MPI.INT], root=0)
                 max_grid_string_len = int(max_grid_string_len_array)
@@ -351,10 +551,22 @@ class AR_base(object):
                 GridLocal = TemporalGridCollection[-1]
                 max_grid_string_len = 0
                 if self.comm.isMaster():
-                    TemporalGridCollectionGlobal = DomainGlobal[i]
-                    TemporalGridCollectionGlobal.append(GridLocal) #append Grid without Time
-                    element_string = tostring(GridLocal, encoding="utf-8")
-                    max_grid_string_len = len(element_string)
+                    if self.incrementalXMF:
+                        if i == 0:
+                            self.stepGrids.append(GridLocal[0])#Time
+                        #share the children instead of deleting Time in the local tree
+                        Grid = Element("Grid",GridLocal.attrib)
+                        Grid.attrib['Name'] = TemporalGridCollection.attrib['Name']
+                        Grid.extend(list(GridLocal)[1:])
+                        self.stepGrids.append(Grid)
+                    else:
+                        TemporalGridCollectionGlobal = DomainGlobal[i]
+                        TemporalGridCollectionGlobal.append(GridLocal) #append Grid without Time
+                    if self.storeXMLinHDF5:
+                        element_string = tostring(GridLocal, encoding="utf-8")
+                        max_grid_string_len = len(element_string)
+                if not self.storeXMLinHDF5:
+                    continue
                 max_grid_string_len_array = numpy.array(max_grid_string_len,'i')
                 comm_world.Bcast([max_grid_string_len_array,MPI.INT], root=0)
                 max_grid_string_len = int(max_grid_string_len_array)
@@ -370,13 +582,16 @@ class AR_base(object):
                         xml_data = self.hdfFile[dataset_name]
                     if self.comm.isMaster():
                         xml_data[0] = tostring(GridLocal, encoding="utf-8")
+        if self.has_h5py and self.hdfFile is not None and len(Domain) > 0:
+            self.writeTimeIndex(float(Domain[0][-1][0].attrib['Value']))
         self.n_datasets += 1
         logEvent("Done Gathering Archive Time Step")
     def sync(self):
         logEvent("Syncing Archive",level=3)
         memory()
         self.allGatherIncremental()
-        self.clear_xml()
+        if not self.incrementalXMF:
+            self.clear_xml()
         if not self.useGlobalXMF:
             self.xmlFile.write(self.xmlHeader)
             indentXML(self.tree.getroot())
@@ -388,7 +603,14 @@ class AR_base(object):
         for TemporalGridCollection in Domain:
             if self.has_h5py: #only writing xml metadata to hdf5 using h5py right now
                 del TemporalGridCollection[:]
-        if self.comm.isMaster():
+        if self.comm.isMaster() and self.incrementalXMF:
+            if not self.xmfWriter.opened:
+                self.xmfWriter.open(Domain[0].attrib['Name'])
+            #drop the steps archived after the hot start step
+            self.xmfWriter.truncate(self.n_datasets-1)
+            self.xmfWriter.append(self.stepGrids)
+            self.stepGrids = []
+        elif self.comm.isMaster():
             self.xmlFileGlobal.write(bytes(self.xmlHeader,"utf-8"))
             indentXML(self.treeGlobal.getroot())
             self.treeGlobal.write(self.xmlFileGlobal, encoding="utf-8")
@@ -429,6 +651,112 @@ class AR_base(object):
                 raise e
         dataset[offsets[self.comm.rank()]:offsets[self.comm.rank()+1]] = data
 
+    def writeTimeIndex(self,t):
+        """
+        Record the time of the current step in the time_index dataset
+
+        Entry i of time_index is the time of the datasets with suffix
+        _t{i}. Steps past the current one, left over from before a hot
+        start, are dropped.
+        """
+        if "time_index" in self.hdfFile:
+            time_index = self.hdfFile["time_index"]
+            time_index.resize((self.n_datasets+1,))
+        elif self.n_datasets == 0:
+            time_index = self.hdfFile.create_dataset(name  = "time_index",
+                                                     shape = (1,),
+                                                     maxshape = (None,),
+                                                     dtype = 'd')
+        else:
+            #hot started from an archive written without a time index
+            return
+        if self.comm.isMaster():
+            time_index[self.n_datasets] = t
+    def hotStartStep(self,hotStartTime):
+        """
+        Find the last archived step at or before hotStartTime
+
+        Returns (tCount, time, dt) from the time_index dataset, with dt
+        None if there is no earlier step, or None if the archive has no
+        time index
+        """
+        if not (self.has_h5py and
+                self.hdfFile is not None and
+                "time_index" in self.hdfFile):
+            return None
+        times = self.hdfFile["time_index"][:]
+        if len(times) == 0:
+            return None
+        tCount = max(int(numpy.searchsorted(times,hotStartTime,side='right')) - 1, 0)
+        if tCount > 0:
+            dt = times[tCount] - times[tCount-1]
+        else:
+            dt = None
+        return tCount, times[tCount], dt
+    def readDataset(self,name,globalIndices):
+        """
+        Read the entries globalIndices of a global dataset
+
+        See readDatasets. This must be called by all ranks in the same
+        order.
+        """
+        return self.readDatasets([name],globalIndices)[0]
+    def readDatasets(self,names,globalIndices):
+        """
+        Read the entries globalIndices of several global datasets
+
+        The sorted, unique entries of each rank are grouped into blocks of
+        consecutive rows (see hyperslabBlocks), and each dataset is read
+        with one collective read of the union of the blocks, so the
+        memory used does not grow with the size of the global datasets.
+        The blocks are computed once for all the datasets, e.g. the
+        components of a field. This must be called by all ranks in the
+        same order.
+        """
+        import h5py
+        rows, inverse = numpy.unique(numpy.asarray(globalIndices), return_inverse=True)
+        starts, stops = hyperslabBlocks(rows)
+        offsets = numpy.concatenate(([0],numpy.cumsum(stops-starts)))
+        #position of the rows in the concatenated blocks
+        block = numpy.searchsorted(starts,rows,side='right')-1
+        positions = (rows - starts[block] + offsets[block])[inverse]
+        valuesList = []
+        for name in names:
+            dataset = self.hdfFile[name]
+            shape = (int(offsets[-1]),)+dataset.shape[1:]
+            values = numpy.empty(shape,dataset.dtype)
+            fileSpace = dataset.id.get_space()
+            fileSpace.select_none()
+            for start, stop in zip(starts, stops):
+                fileSpace.select_hyperslab((int(start),)+(0,)*(len(shape)-1),
+                                           (int(stop-start),)+shape[1:],
+                                           op=h5py.h5s.SELECT_OR)
+            memorySpace = h5py.h5s.create_simple(shape)
+            if len(starts) == 0:
+                memorySpace.select_none()
+            dxpl = h5py.h5p.create(h5py.h5p.DATASET_XFER)
+            if dataset.file.driver == 'mpio':
+                dxpl.set_dxpl_mpio(h5py.h5fd.MPIO_COLLECTIVE)
+            dataset.id.read(memorySpace, fileSpace, values, dxpl=dxpl)
+            valuesList.append(values[positions])
+        return valuesList
+
+def hyperslabBlocks(rows, maxGap=64):
+    """
+    Group sorted, unique rows into blocks of consecutive rows
+
+    Rows at most maxGap apart are read in the same block, so fewer than
+    maxGap unneeded rows are read per needed row. Returns the starts and
+    stops of the blocks.
+    """
+    rows = numpy.asarray(rows)
+    if len(rows) == 0:
+        return numpy.zeros(0,'i'), numpy.zeros(0,'i')
+    breaks = numpy.nonzero(numpy.diff(rows) > maxGap)[0] + 1
+    starts = rows[numpy.concatenate(([0],breaks))]
+    stops = rows[numpy.concatenate((breaks-1,[len(rows)-1]))] + 1
+    return starts, stops
+
 XdmfArchive=AR_base
 
 ########################################################################
@@ -61,6 +61,117 @@ class AV_base(object):
     def calculate(self):
         pass
 
+class TimeSeriesRecorder(object):
+    """
+    Buffered recorder of rows of values against time
+
+    Rows are stored in a preallocated array and appended to the file every
+    bufferSize rows or when flush is called, so the file is not opened at
+    every time step. CSV files start with a header line, HDF5 files store
+    the times in the dataset 'time' and the rows in the dataset 'values',
+    with the column names in its 'columns' attribute. Only the process
+    writing the file should record rows.
+
+    Parameters
+    ----------
+    fileName: string
+        Name of the file.
+    columns: list
+        Names of the recorded values, not including the time.
+    bufferSize: int
+        Number of rows kept in memory before they are written.
+    fileFormat: string
+        'csv' or 'hdf5'.
+    fmt: string or list
+        Format of the columns of csv files, time first (see numpy.savetxt).
+    header: Optional[string]
+        Header line of csv files, the default joins 't' and the column
+        names with commas.
+    """
+    def __init__(self,fileName,columns,bufferSize=100,fileFormat='csv',fmt='%.17g',header=None):
+        if fileFormat not in ('csv','hdf5'):
+            raise ValueError("fileFormat must be 'csv' or 'hdf5'")
+        if bufferSize < 1:
+            raise ValueError("bufferSize must be at least 1")
+        self.fileName = fileName
+        self.columns = list(columns)
+        self.fileFormat = fileFormat
+        self.fmt = fmt
+        if header is None:
+            header = ','.join(['t']+self.columns)
+        self.header = header
+        self.buffer = numpy.zeros((bufferSize,len(self.columns)+1),'d')
+        self.nRows = 0
+        self.started = False
+    def start(self,t=None):
+        """
+        Create the file, or, if t is given and the file exists, remove the
+        rows recorded at or after t so that a hot started run continues it.
+        """
+        if self.fileFormat == 'hdf5':
+            import h5py
+            with h5py.File(self.fileName,'a') as f:
+                if t is None or 'time' not in f:
+                    for name in ('time','values'):
+                        if name in f:
+                            del f[name]
+                    f.create_dataset('time',shape=(0,),maxshape=(None,),dtype='d')
+                    values = f.create_dataset('values',shape=(0,len(self.columns)),
+                                              maxshape=(None,len(self.columns)),dtype='d')
+                    values.attrs['columns'] = numpy.array(self.columns,dtype='S')
+                else:
+                    nKeep = int(numpy.searchsorted(f['time'][:],t,side='left'))
+                    f['time'].resize((nKeep,))
+                    f['values'].resize((nKeep,f['values'].shape[1]))
+                    logEvent("Keeping %d rows of %s recorded before t=%g" % (nKeep,self.fileName,t))
+        else:
+            lines = []
+            if t is not None and os.path.exists(self.fileName):
+                with open(self.fileName,'r') as f:
+                    lines = f.readlines()
+                nKeep = 1
+                while nKeep < len(lines) and float(lines[nKeep].split(',')[0]) < t:
+                    nKeep += 1
+                lines = lines[:nKeep]
+                logEvent("Keeping %d rows of %s recorded before t=%g" % (max(nKeep-1,0),self.fileName,t))
+            if not lines:
+                lines = [self.header+'\n']
+            with open(self.fileName,'w') as f:
+                f.writelines(lines)
+        self.started = True
+    def record(self,t,values):
+        """
+        Add a row, writing the buffered rows if the buffer is full.
+        """
+        self.buffer[self.nRows,0] = t
+        self.buffer[self.nRows,1:] = values
+        self.nRows += 1
+        if self.nRows == self.buffer.shape[0]:
+            self.flush()
+    def flush(self):
+        """
+        Append the buffered rows to the file.
+        """
+        if self.nRows == 0:
+            return
+        if not self.started:
+            self.start()
+        rows = self.buffer[:self.nRows]
+        if self.fileFormat == 'hdf5':
+            import h5py
+            with h5py.File(self.fileName,'a') as f:
+                times = f['time']
+                values = f['values']
+                n = times.shape[0]
+                times.resize((n+self.nRows,))
+                values.resize((n+self.nRows,values.shape[1]))
+                times[n:] = rows[:,0]
+                values[n:] = rows[:,1:]
+        else:
+            with open(self.fileName,'a') as f:
+                numpy.savetxt(f,rows,fmt=self.fmt,delimiter=',')
+        self.nRows = 0
+
 class GatherDOF(AV_base):
     def __init__(self,filename):
         self.filename=filename
@@ -95,6 +95,8 @@ class BoundaryCondition:
 
         """
         self.uOfXT = lambda x, t, n=np.zeros(3,): value
+        self.uOfXT.uOfXT_array = lambda X, t, materialFlags=None: np.full(len(X), value)
+        self.uOfXT.constantInTime = True
 
 
     def setLinearBC(self, a0, a):
@@ -111,6 +113,7 @@ class BoundaryCondition:
         """
         
         self.uOfXT = lambda x, t, n=np.zeros(3,): a0+sum(a[:]*x[:])
+        self.uOfXT.uOfXT_array = lambda X, t, materialFlags=None: a0+np.dot(X[:, :len(a)], a[:])
 
     def setLinearRamp(self,t1,value):
         """
@@ -3509,6 +3509,116 @@ class AffineMaps(ParametricMaps):
 #                  self.map.getInverseJacobianTranspose(),
 #                  self.referenceSpace.gradientList[i])
 
+class ElementGeometryCache(object):
+    """
+    Quadrature point geometry shared by the models on one mesh.
+
+    The physical points and, on request, the map jacobians at a set of
+    element (or exterior element boundary) quadrature points are computed
+    once per quadrature rule and element map type, and every model asking
+    for them gets the same arrays, which must be treated as read only.
+    When the mesh nodes have moved the arrays are recomputed in place the
+    first time they are asked for, so models holding them keep valid
+    references.
+
+    Use getElementGeometryCache(mesh) to get the cache of a mesh.
+    """
+    def __init__(self,mesh):
+        self.mesh = mesh
+        self.nodeArray = None
+        self.elementQuadrature = {}
+        self.exteriorElementBoundaryQuadrature = {}
+    def checkNodes(self):
+        """
+        Mark all the geometry out of date if the nodes have moved
+        """
+        if (self.nodeArray is None or
+            self.nodeArray.shape != self.mesh.nodeArray.shape or
+            not numpy.array_equal(self.nodeArray,self.mesh.nodeArray)):
+            self.nodeArray = self.mesh.nodeArray.copy()
+            for arrays,current in list(self.elementQuadrature.values())+list(self.exteriorElementBoundaryQuadrature.values()):
+                current.clear()
+    def getKey(self,elementMaps,xiArray):
+        localFunctionSpace = getattr(elementMaps,'localFunctionSpace',None)
+        return (elementMaps.__class__.__name__,
+                getattr(localFunctionSpace,'dim',None),
+                xiArray.shape,
+                xiArray.tobytes())
+    def getElementQuadrature(self,elementMaps,xiArray,jacobians=False):
+        """
+        Return a dictionary with the shared arrays 'x' and, if jacobians is
+        True, 'J', 'inverse(J)', 'det(J)', and 'abs(det(J))' at the element
+        quadrature points xiArray
+        """
+        self.checkNodes()
+        xiArray = numpy.asarray(xiArray,'d')
+        key = self.getKey(elementMaps,xiArray)
+        if key not in self.elementQuadrature:
+            self.elementQuadrature[key] = ({},set())
+        arrays,current = self.elementQuadrature[key]
+        nElements = self.mesh.nElements_global
+        nPoints = xiArray.shape[0]
+        nd = elementMaps.referenceElement.dim
+        if 'x' not in current:
+            if 'x' not in arrays:
+                arrays['x'] = numpy.zeros((nElements,nPoints,3),'d')
+            elementMaps.getValues(xiArray,arrays['x'])
+            current.add('x')
+        if jacobians and 'J' not in current:
+            if 'J' not in arrays:
+                arrays['J'] = numpy.zeros((nElements,nPoints,nd,nd),'d')
+                arrays['inverse(J)'] = numpy.zeros((nElements,nPoints,nd,nd),'d')
+                arrays['det(J)'] = numpy.zeros((nElements,nPoints),'d')
+                arrays['abs(det(J))'] = numpy.zeros((nElements,nPoints),'d')
+            elementMaps.getJacobianValues(xiArray,
+                                          arrays['J'],
+                                          arrays['inverse(J)'],
+                                          arrays['det(J)'])
+            numpy.absolute(arrays['det(J)'],out=arrays['abs(det(J))'])
+            current.add('J')
+        return arrays
+    def getExteriorElementBoundaryQuadrature(self,elementMaps,xiArray,jacobians=False):
+        """
+        Return a dictionary with the shared arrays 'x' and, if jacobians is
+        True, 'inverse(J)', 'g', 'sqrt(det(g))', and 'n' at the quadrature
+        points xiArray of the exterior element boundaries
+        """
+        self.checkNodes()
+        xiArray = numpy.asarray(xiArray,'d')
+        key = self.getKey(elementMaps,xiArray)
+        if key not in self.exteriorElementBoundaryQuadrature:
+            self.exteriorElementBoundaryQuadrature[key] = ({},set())
+        arrays,current = self.exteriorElementBoundaryQuadrature[key]
+        nExteriorElementBoundaries = self.mesh.nExteriorElementBoundaries_global
+        nPoints = xiArray.shape[0]
+        nd = elementMaps.referenceElement.dim
+        if 'x' not in current:
+            if 'x' not in arrays:
+                arrays['x'] = numpy.zeros((nExteriorElementBoundaries,nPoints,3),'d')
+            elementMaps.getValuesGlobalExteriorTrace(xiArray,arrays['x'])
+            current.add('x')
+        if jacobians and 'n' not in current:
+            if 'n' not in arrays:
+                arrays['inverse(J)'] = numpy.zeros((nExteriorElementBoundaries,nPoints,nd,nd),'d')
+                arrays['g'] = numpy.zeros((nExteriorElementBoundaries,nPoints,max(1,nd-1),max(1,nd-1)),'d')
+                arrays['sqrt(det(g))'] = numpy.zeros((nExteriorElementBoundaries,nPoints),'d')
+                arrays['n'] = numpy.zeros((nExteriorElementBoundaries,nPoints,nd),'d')
+            elementMaps.getJacobianValuesGlobalExteriorTrace(xiArray,
+                                                             arrays['inverse(J)'],
+                                                             arrays['g'],
+                                                             arrays['sqrt(det(g))'],
+                                                             arrays['n'])
+            current.add('n')
+        return arrays
+
+def getElementGeometryCache(mesh):
+    """
+    Return the ElementGeometryCache of mesh, creating it on the first call
+    """
+    if getattr(mesh,'elementGeometryCache',None) is None:
+        mesh.elementGeometryCache = ElementGeometryCache(mesh)
+    return mesh.elementGeometryCache
+
 """
 Finite Element Spaces
 """
@@ -3914,6 +4024,12 @@ class ParametricFiniteElementSpace(object):
        # pdb.set_trace()
         self.elementMaps.getValues(self.referenceFiniteElement.interpolationConditions.quadraturePointArray,self.interpolationPoints)
         return self.interpolationPoints
+    def readFunctionsXdmf(self,ar,uList,tCount=0):
+        """
+        Read the functions in uList, all in this space, from the archive
+        """
+        for u in uList:
+            self.readFunctionXdmf(ar,u,tCount)
     def endTimeSeriesEnsight(self,timeValues,filename,description,ts=1):
         #cek this could break something, but it should be true:
         self.nOutput = len(timeValues)
@@ -4045,13 +4161,8 @@ class C0_AffineLinearOnSimplexWithNodalBasis(ParametricFiniteElementSpace):
             else:
                 if ar.has_h5py:
                     if ar.global_sync:
-                        #this is known to be slow but it scales with
-                        #respect to memory (as opposed to the faster
-                        #approach of pulling in the entire array)
-                        permute = np.argsort(self.mesh.globalMesh.nodeNumbering_subdomain2global)
-                        u.dof[permute] = ar.hdfFile["/"+u.name+"_t{0:d}".format(tCount)][self.mesh.globalMesh.nodeNumbering_subdomain2global[permute].tolist()]
-                        #faster way
-                        #u.dof[:] = ar.hdfFile["/"+u.name+"_t{0:d}".format(tCount)].value[self.mesh.globalMesh.nodeNumbering_subdomain2global]                        
+                        u.dof[:] = ar.readDataset("/"+u.name+"_t{0:d}".format(tCount),
+                                                  self.mesh.globalMesh.nodeNumbering_subdomain2global)
                     else:
                         u.dof[:]=ar.hdfFile["/"+u.name+"_p"+repr(ar.comm.rank())+"_t{0:d}".format(tCount)]
                 else:
@@ -4060,6 +4171,16 @@ class C0_AffineLinearOnSimplexWithNodalBasis(ParametricFiniteElementSpace):
             assert(False)
             #numpy.savetxt(ar.textDataDir+"/"+"{0:s}{0:d}".format(u.name, tCount)+".txt",u.dof)
             #SubElement(values,"xi:include",{"parse":"text","href":"./"+ar.textDataDir+"/"+"{0:s}{0:d}".format(u.name, tCount)+".txt"})
+    def readFunctionsXdmf(self,ar,uList,tCount=0):
+        if (ar.hdfFile is not None and ar.hdfFileGlb is None and
+            ar.has_h5py and ar.global_sync):
+            #read the subdomain nodes of all the components together
+            valuesList = ar.readDatasets(["/"+u.name+"_t{0:d}".format(tCount) for u in uList],
+                                         self.mesh.globalMesh.nodeNumbering_subdomain2global)
+            for u,values in zip(uList,valuesList):
+                u.dof[:] = values
+        else:
+            ParametricFiniteElementSpace.readFunctionsXdmf(self,ar,uList,tCount)
     def writeVectorFunctionXdmf(self,ar,uList,components,vectorName,tCount=0,init=True):
         concatNow=True
         if concatNow:
@@ -5429,12 +5550,20 @@ class C0_AffineQuadraticOnSimplexWithNodalBasis(ParametricFiniteElementSpace):
     def readFunctionXdmf(self,ar,u,tCount=0):
         if ar.has_h5py:
             if ar.global_sync:
-                permute = np.argsort(u.femSpace.dofMap.subdomain2global)
-                u.dof[permute] = ar.hdfFile["/"+u.name+"_t{0:d}".format(tCount)][u.femSpace.dofMap.subdomain2global[permute].tolist()]
+                u.dof[:] = ar.readDataset("/"+u.name+"_t{0:d}".format(tCount),
+                                          u.femSpace.dofMap.subdomain2global)
             else:
                 u.dof[:]=ar.hdfFile["/"+u.name+"_p"+repr(ar.comm.rank())+"_t{0:d}".format(tCount)].value
         else:
             assert False,"to read data on P2-FE use h5 file"
+    def readFunctionsXdmf(self,ar,uList,tCount=0):
+        if ar.has_h5py and ar.global_sync:
+            valuesList = ar.readDatasets(["/"+u.name+"_t{0:d}".format(tCount) for u in uList],
+                                         self.dofMap.subdomain2global)
+            for u,values in zip(uList,valuesList):
+                u.dof[:] = values
+        else:
+            ParametricFiniteElementSpace.readFunctionsXdmf(self,ar,uList,tCount)
 
     def writeVectorFunctionXdmf(self,ar,uList,components,vectorName,tCount=0,init=True):
         self.XdmfWriter.writeVectorFunctionXdmf_nodal(ar,uList,components,vectorName,"c0p2_Lagrange",tCount=tCount,init=init)
@@ -6810,6 +6939,13 @@ class DOFBoundaryConditions(object):
     freeDOFSet -- the DOF not specified by boundary conditions
     global2freeGlobal -- an integer mapping from global DOF numbers
     to the free DOF numbers.
+    DOFBoundaryDOFs, DOFBoundaryPoints, DOFBoundaryMaterialFlags -- arrays
+    of the Dirichlet DOF, sorted, with their points and material flags
+
+    The points are those of femSpace.interpolationPoints: the values of
+    DOFBoundaryPointDict are views of its rows and DOFBoundaryPoints is
+    gathered from it, so both follow femSpace.updateInterpolationPoints
+    when the mesh moves.
 
     The constructor requires a function that takes a point as input
     and, if the point is on a part of the boundary where values are
@@ -6840,128 +6976,15 @@ class DOFBoundaryConditions(object):
             def __eq__(self,other):
                 return  enorm(self.p - other.p) <= self.h
         if getPointwiseBoundaryConditions is not None and femSpace.strongDirichletConditions and not weakDirichletConditions:
-            for eN in range(femSpace.elementMaps.mesh.nElements_global):
-            # mesh = femSpace.elementMaps.mesh
-            # for ebNE in range(mesh.nExteriorElementBoundaries_global):
-            #     ebN = mesh.exteriorElementBoundariesArray[ebNE]
-            #     eN = mesh.elementBoundaryElementsArray[ebN,0]
-                for k in range(femSpace.referenceFiniteElement.interpolationConditions.nQuadraturePoints):
-                    i = femSpace.referenceFiniteElement.interpolationConditions.quadrature2DOF_element(k)
-                    dofN = femSpace.dofMap.l2g[eN,i]
-                    x = femSpace.interpolationPoints[eN,k]
-                    try:
-                        #in case interpolation is wholly in element interior
-                        interiorInterpolationPoint = True
-                        for ebN_element in range(femSpace.elementMaps.mesh.nElementBoundaries_element):
-                            if femSpace.referenceFiniteElement.interpolationConditions.definedOnLocalElementBoundary(k,ebN_element) == True:
-                                interiorInterpolationPoint = False
-                                ebN = femSpace.elementMaps.mesh.elementBoundariesArray[eN,ebN_element]
-                                materialFlag = femSpace.elementMaps.mesh.elementBoundaryMaterialTypes[ebN]
-                                #mwf now allow for flag to specify type of dirichlet condition to allow
-                                #say nonlinear function of solution to be specified
-                                #initially, only weak bc's will allow this functionality though
-                                gReturn = getPointwiseBoundaryConditions(x,materialFlag)
-                                try:
-                                    g = gReturn[0]
-                                    gFlag = gReturn[1]
-                                except TypeError:
-                                    g = gReturn
-                                    gFlag = 1
-                                if gFlag != 1:
-                                    logEvent("WARNING strong Dirichlet conditions do not enforce nonlinear bcs")
-                                p = None
-                                if getPeriodicBoundaryConditions is not None:
-                                    p = getPeriodicBoundaryConditions(x,materialFlag)
-                                if p is not None:
-                                    if ptuple(p) in self.periodicDOFDict:
-                                        self.periodicDOFDict[ptuple(p)].add(dofN)
-                                    else:
-                                        self.periodicDOFDict[ptuple(p)] = set([dofN])
-                                elif g is not None:
-                                    self.DOFBoundaryConditionsDict[dofN] = g
-                                    self.DOFBoundaryPointDict[dofN]=x
-                                    self.DOFBoundaryMaterialFlag[dofN] = materialFlag
-                                    self.freeDOFSet.discard(dofN)
-                                else:
-                                    if dofN not in list(self.DOFBoundaryConditionsDict.keys()):
-                                        self.freeDOFSet.add(dofN)
-                                #has Dirichlet bc set or not
-                            #on ebN_element
-                        #local faces
-                        if interiorInterpolationPoint and dofN not in list(self.DOFBoundaryConditionsDict.keys()):
-                            self.freeDOFSet.add(dofN)
-                    except TypeError:
-                        logEvent("""WARNING DOFBoundaryCondition Pointwise conditions should take arguments (x,flag) now trying without flag""")
-                        #mwf now allow for flag to specify type of dirichlet condition to allow
-                        #say nonlinear function of solution to be specified
-                        #initially, only weak bc's will allow this functionality though
-                        gReturn = getPointwiseBoundaryConditions(x)
-                        try:
-                            g = gReturn[0]
-                            gFlag = gReturn[1]
-                        except TypeError:
-                            g = gReturn
-                            gFlag = 1
-                        if gFlag != 1:
-                            logEvent("WARNING strong Dirichlet conditions do not enforce nonlinear bcs")
-                        p = None
-                        if getPeriodicBoundaryConditions is not None:
-                            p = getPeriodicBoundaryConditions(x)
-                        if p is not None:
-                            #print "periodic DOF bc ",tuple(p)
-                            if ptuple(p) in self.periodicDOFDict:
-                                self.periodicDOFDict[ptuple(p)].add(dofN)
-                                self.freeDOFSet.discard(dofN)
-                            else:
-                                #print "inserting dof in periodic and free",dofN
-                                self.periodicDOFDict[ptuple(p)] = set([dofN])
-                                self.freeDOFSet.discard(dofN)
-                        elif g:
-                            self.DOFBoundaryConditionsDict[dofN] = g
-                            self.DOFBoundaryPointDict[dofN]=x
-                            self.freeDOFSet.discard(dofN)
-                        else:
-                            if dofN not in list(self.DOFBoundaryConditionsDict.keys()):
-                                self.freeDOFSet.add(dofN)
-                    #exception on argument list for getPointWiseBoundaryConditions
-                    #now also try setting Dirichlet boundary conditions using nodal id tags
-                    nN_element = femSpace.referenceFiniteElement.interpolationConditions.quadrature2Node_element(k)
-                    ##todo work out use cases where this matters
-                    if allowNodalMaterialBoundaryTypes and (nN_element is not None and nN_element < femSpace.elementMaps.mesh.nNodes_element):
-                        try:
-                            nN_global = femSpace.elementMaps.mesh.elementNodesArray[eN,nN_element]
-                            materialFlag = femSpace.elementMaps.mesh.nodeMaterialTypes[nN_global]
-                            gReturn = getPointwiseBoundaryConditions(x,materialFlag)
-                            try:
-                                g = gReturn[0]
-                                gFlag = gReturn[1]
-                            except TypeError:
-                                g = gReturn
-                                gFlag = 1
-                            if gFlag != 1:
-                                logEvent("WARNING strong Dirichlet conditions do not enforce nonlinear bcs")
-                            p = None
-                            if getPeriodicBoundaryConditions is not None:
-                                p = getPeriodicBoundaryConditions(x,materialFlag)
-                            if p is not None: #skip dof setting here
-                                pass#cek changed from break to pass/elif
-                            elif g: #override elementBoundary condition
-                                self.DOFBoundaryConditionsDict[dofN] = g
-                                self.DOFBoundaryPointDict[dofN]=x
-                                self.DOFBoundaryMaterialFlag[dofN] = materialFlag
-                                self.freeDOFSet.discard(dofN)
-                            else:
-                                if dofN not in list(self.DOFBoundaryConditionsDict.keys()):
-                                    self.freeDOFSet.add(dofN)
-                            #has Dirichlet bc set or not
-                        except TypeError:
-                            logEvent("""WARNING DOFBoundaryCondition Pointwise conditions should take arguments (x,flag) skipping nodal flag test""")
-                        #
-                    #has correspondence between interpolation conditions and mesh nodes
-                #k
-            #eN
+            self.setPointwiseBoundaryConditions(femSpace,getPointwiseBoundaryConditions,getPeriodicBoundaryConditions,
+                                                allowNodalMaterialBoundaryTypes,ptuple)
         else:
             self.freeDOFSet = set(range(femSpace.dim))
+            self.DOFBoundaryDOFs = numpy.zeros((0,),'i')
+            self.DOFBoundaryPointIndices = numpy.zeros((0,),'i')
+            self.DOFBoundaryMaterialFlags = numpy.zeros((0,),'i')
+        self.interpolationPoints = femSpace.interpolationPoints
+        self.groupBoundaryConditions()
         #
         for nodeSet in list(self.periodicDOFDict.values()):
             nodeList = list(nodeSet)
@@ -6970,11 +6993,9 @@ class DOFBoundaryConditions(object):
             for dofN in nodeList[1:]:
                 self.freeDOFSet.discard(dofN)
         self.nFreeDOF_global = len(self.freeDOFSet)
-        self.global2freeGlobal={}
-        self.myFreeDOF={}
-        for free_dofN, dofN in enumerate(self.freeDOFSet):
-            self.global2freeGlobal[dofN] = free_dofN
-            self.myFreeDOF[dofN] = dofN
+        freeDOFList = list(self.freeDOFSet)
+        self.global2freeGlobal=dict(zip(freeDOFList,range(self.nFreeDOF_global)))
+        self.myFreeDOF=dict(zip(freeDOFList,freeDOFList))
         for nodeSet in list(self.periodicDOFDict.values()):
             nodeList = list(nodeSet)
             nodeList.sort()
@@ -6987,12 +7008,186 @@ class DOFBoundaryConditions(object):
         #not necessarily a 1-1 correspondence between free_dofN and dofN because of
         #periodic bcs, so have to have 2 arrays
         nfree = len(self.global2freeGlobal)
-        self.global2freeGlobal_global_dofs = numpy.zeros((nfree,),'i')
-        self.global2freeGlobal_free_dofs = numpy.zeros((nfree,),'i')
-        test = numpy.array(list(range(nfree)),dtype='i')
-        for i,dofN in enumerate(self.global2freeGlobal.keys()):
-            self.global2freeGlobal_global_dofs[i] = dofN#map each of the unknown DOF's to the original node number
-            self.global2freeGlobal_free_dofs[i] = self.global2freeGlobal[dofN]#map each of the unknown DOF's to the free unknown number
+        self.global2freeGlobal_global_dofs = numpy.fromiter(self.global2freeGlobal.keys(),'i',nfree)#map each of the unknown DOF's to the original node number
+        self.global2freeGlobal_free_dofs = numpy.fromiter(self.global2freeGlobal.values(),'i',nfree)#map each of the unknown DOF's to the free unknown number
+
+    def groupBoundaryConditions(self):
+        """
+        Group the Dirichlet DOF by boundary condition function
+
+        The conditions of a boundary flag are usually one function, so
+        each group holds the positions in DOFBoundaryDOFs of the DOF of
+        one flag.
+        """
+        groups = {}
+        for i,dofN in enumerate(self.DOFBoundaryDOFs.tolist()):
+            g = self.DOFBoundaryConditionsDict[dofN]
+            if g in groups:
+                groups[g].append(i)
+            else:
+                groups[g] = [i]
+        self.DOFBoundaryGroups = [[g,numpy.array(indices,'i'),None] for g,indices in groups.items()]
+        self.DOFBoundaryValues = numpy.zeros((len(self.DOFBoundaryDOFs),),'d')
+
+    @property
+    def DOFBoundaryPoints(self):
+        """
+        The current points of DOFBoundaryDOFs, an (nDOF,3) array
+        """
+        return self.interpolationPoints.reshape(-1,3)[self.DOFBoundaryPointIndices]
+
+    def getValues(self,t):
+        """
+        Evaluate the Dirichlet conditions at time t, returns the values at
+        DOFBoundaryDOFs
+
+        A function with a uOfXT_array(X,t,materialFlags=None) attribute is
+        called once with the (nDOF,3) array of the current points of its
+        group and their material flags, otherwise it is called point by
+        point. The values of functions with a true
+        constantInTime attribute are only computed on the first call. The
+        returned array is reused by the next call.
+        """
+        X = self.DOFBoundaryPoints
+        for group in self.DOFBoundaryGroups:
+            g,indices,cachedValues = group
+            if cachedValues is not None:
+                self.DOFBoundaryValues[indices] = cachedValues
+                continue
+            if hasattr(g,'uOfXT_array'):
+                self.DOFBoundaryValues[indices] = g.uOfXT_array(X[indices],t,
+                                                                materialFlags=self.DOFBoundaryMaterialFlags[indices])
+            else:
+                for i in indices:
+                    self.DOFBoundaryValues[i] = g(X[i],t)
+            if getattr(g,'constantInTime',False):
+                group[2] = self.DOFBoundaryValues[indices].copy()
+        return self.DOFBoundaryValues
+
+    def setPointwiseBoundaryConditions(self,femSpace,getPointwiseBoundaryConditions,getPeriodicBoundaryConditions,
+                                       allowNodalMaterialBoundaryTypes,ptuple):
+        """
+        Find the Dirichlet, periodic, and free DOF from the pointwise conditions
+
+        Every interpolation point on an element boundary is tested with the
+        material flag of that boundary and, if allowed, with the material
+        flag of its mesh node, which overrides the boundary flag. The
+        (DOF, flag) pairs are collected with array operations and the
+        conditions are called once per distinct pair. When several
+        conditions are set on a DOF the last one in element order is kept,
+        as when the elements are traversed one by one.
+
+        Besides the dictionaries, the Dirichlet DOF are stored in the
+        arrays DOFBoundaryDOFs (sorted), DOFBoundaryMaterialFlags, and
+        DOFBoundaryPointIndices, the index of each point in
+        femSpace.interpolationPoints.reshape(-1,3).
+        """
+        mesh = femSpace.elementMaps.mesh
+        interpolationConditions = femSpace.referenceFiniteElement.interpolationConditions
+        nElements = mesh.nElements_global
+        nPoints = interpolationConditions.nQuadraturePoints
+        nFaces = mesh.nElementBoundaries_element
+        elements = numpy.arange(nElements)
+        l2g = femSpace.dofMap.l2g
+        #records of the conditions to test: DOF, material flag, point, position in element order, and node flag
+        dofList,flagList,pointList,orderList,nodalList = [],[],[],[],[]
+        interiorDOFList = []
+        for k in range(nPoints):
+            dofs = l2g[:nElements,interpolationConditions.quadrature2DOF_element(k)]
+            points = elements*nPoints + k
+            interiorInterpolationPoint = True
+            for ebN_element in range(nFaces):
+                if interpolationConditions.definedOnLocalElementBoundary(k,ebN_element) == True:
+                    interiorInterpolationPoint = False
+                    dofList.append(dofs)
+                    flagList.append(mesh.elementBoundaryMaterialTypes[mesh.elementBoundariesArray[:nElements,ebN_element]])
+                    pointList.append(points)
+                    orderList.append(points*(nFaces+1) + ebN_element)
+                    nodalList.append(numpy.zeros((nElements,),bool))
+            if interiorInterpolationPoint:
+                interiorDOFList.append(dofs)
+            nN_element = interpolationConditions.quadrature2Node_element(k)
+            if allowNodalMaterialBoundaryTypes and (nN_element is not None and nN_element < mesh.nNodes_element):
+                dofList.append(dofs)
+                flagList.append(mesh.nodeMaterialTypes[mesh.elementNodesArray[:nElements,nN_element]])
+                pointList.append(points)
+                orderList.append(points*(nFaces+1) + nFaces)
+                nodalList.append(numpy.ones((nElements,),bool))
+        if dofList:
+            dof = numpy.concatenate(dofList)
+            flag = numpy.concatenate(flagList)
+            point = numpy.concatenate(pointList)
+            order = numpy.concatenate(orderList)
+            nodal = numpy.concatenate(nodalList)
+        else:
+            dof = flag = point = order = numpy.zeros((0,),'i')
+            nodal = numpy.zeros((0,),bool)
+        pairs,first,inverse = numpy.unique(numpy.column_stack((dof,flag)),axis=0,return_index=True,return_inverse=True)
+        inverse = inverse.reshape(-1)
+        X = femSpace.interpolationPoints.reshape(-1,3)
+        #evaluate the conditions once per (DOF, flag)
+        gValues = []
+        pValues = []
+        withFlag = True
+        for i,(dofN,materialFlag) in enumerate(pairs.tolist()):
+            x = X[point[first[i]]]
+            if withFlag:
+                try:
+                    gReturn = getPointwiseBoundaryConditions(x,materialFlag)
+                except TypeError:
+                    logEvent("""WARNING DOFBoundaryCondition Pointwise conditions should take arguments (x,flag) now trying without flag""")
+                    withFlag = False
+            if not withFlag:
+                gReturn = getPointwiseBoundaryConditions(x)
+            #mwf now allow for flag to specify type of dirichlet condition to allow
+            #say nonlinear function of solution to be specified
+            #initially, only weak bc's will allow this functionality though
+            try:
+                g = gReturn[0]
+                gFlag = gReturn[1]
+            except TypeError:
+                g = gReturn
+                gFlag = 1
+            if gFlag != 1:
+                logEvent("WARNING strong Dirichlet conditions do not enforce nonlinear bcs")
+            p = None
+            if getPeriodicBoundaryConditions is not None:
+                if withFlag:
+                    p = getPeriodicBoundaryConditions(x,materialFlag)
+                else:
+                    p = getPeriodicBoundaryConditions(x)
+            gValues.append(g)
+            pValues.append(p)
+        if not withFlag:
+            logEvent("""WARNING DOFBoundaryCondition Pointwise conditions should take arguments (x,flag) skipping nodal flag test""")
+            keep = numpy.logical_not(nodal)
+            dof,flag,point,order,nodal,inverse = dof[keep],flag[keep],point[keep],order[keep],nodal[keep],inverse[keep]
+        hasG = numpy.array([g is not None for g in gValues],bool)[inverse]
+        hasP = numpy.array([p is not None for p in pValues],bool)[inverse]
+        isDirichlet = numpy.logical_and(hasG,numpy.logical_not(hasP))
+        isFree = numpy.logical_not(numpy.logical_or(hasG,hasP))
+        #periodic conditions only come from element boundary flags
+        for r in numpy.nonzero(numpy.logical_and(hasP,numpy.logical_not(nodal)))[0]:
+            p = pValues[inverse[r]]
+            if ptuple(p) in self.periodicDOFDict:
+                self.periodicDOFDict[ptuple(p)].add(dof[r])
+            else:
+                self.periodicDOFDict[ptuple(p)] = set([dof[r]])
+        #the last condition set on a DOF wins
+        records = numpy.nonzero(isDirichlet)[0]
+        records = records[numpy.argsort(order[records])][::-1]
+        self.DOFBoundaryDOFs,last = numpy.unique(dof[records],return_index=True)
+        records = records[last]
+        self.DOFBoundaryDOFs = self.DOFBoundaryDOFs.astype('i')
+        self.DOFBoundaryPointIndices = point[records].astype('i')
+        self.DOFBoundaryMaterialFlags = flag[records].astype('i')
+        dofs = self.DOFBoundaryDOFs.tolist()
+        self.DOFBoundaryConditionsDict = dict(zip(dofs,[gValues[i] for i in inverse[records]]))
+        self.DOFBoundaryPointDict = dict(zip(dofs,[X[j] for j in self.DOFBoundaryPointIndices.tolist()]))
+        if withFlag:
+            self.DOFBoundaryMaterialFlag = dict(zip(dofs,flag[records].tolist()))
+        freeDOFs = numpy.concatenate([dof[isFree]] + interiorDOFList)
+        self.freeDOFSet = set(numpy.setdiff1d(freeDOFs,self.DOFBoundaryDOFs).tolist())
 
 
 class DOFBoundaryConditions_alt(object):
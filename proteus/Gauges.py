@@ -21,13 +21,15 @@ import numpy as np
 from numpy.linalg import norm
 
 from . import Comm
-from .AuxiliaryVariables import AV_base
+from .AuxiliaryVariables import AV_base, TimeSeriesRecorder
 from .Profiling import logEvent
+from .FemTools import AffineMaps, ReferenceSimplex
 from proteus.MeshTools import triangleVerticesToNormals, tetrahedronVerticesToNormals, getMeshIntersections
 from proteus import Profiling
 
 
-def PointGauges(gauges, activeTime=None, sampleRate=0, fileName='point_gauges.csv'):
+def PointGauges(gauges, activeTime=None, sampleRate=0, fileName='point_gauges.csv', bufferSize=1,
+                fileFormat='csv'):
     """Create a set of point gauges that will automatically be serialized 
     as CSV data to the requested file.
 
@@ -74,9 +76,11 @@ def PointGauges(gauges, activeTime=None, sampleRate=0, fileName='point_gauges.cs
                 points[point] = l_d
             # add any currently unmonitored fields
             points[point]['fields'].update(gauge_fields)
-    return Gauges(fields, activeTime, sampleRate, fileName, points=points)
+    return Gauges(fields, activeTime, sampleRate, fileName, points=points, bufferSize=bufferSize,
+                  fileFormat=fileFormat)
 
-def LineGauges(gauges, activeTime=None, sampleRate=0, fileName='line_gauges.csv'):
+def LineGauges(gauges, activeTime=None, sampleRate=0, fileName='line_gauges.csv', bufferSize=1,
+               fileFormat='csv'):
     """Create a set of line gauges that will automatically be serialized
     as CSV data to the requested file.  The line gauges will gather
     data at every element on the mesh between the two endpoints on
@@ -102,9 +106,11 @@ def LineGauges(gauges, activeTime=None, sampleRate=0, fileName='line_gauges.csv'
                 fields.append(field)
         lines.extend(product(gauge_fields, gauge_lines))
 
-    return Gauges(fields, activeTime, sampleRate, fileName, lines=lines)
+    return Gauges(fields, activeTime, sampleRate, fileName, lines=lines, bufferSize=bufferSize,
+                  fileFormat=fileFormat)
 
-def LineIntegralGauges(gauges, activeTime=None, sampleRate=0, fileName='line_integral_gauges.csv'):
+def LineIntegralGauges(gauges, activeTime=None, sampleRate=0, fileName='line_integral_gauges.csv', bufferSize=1,
+                       fileFormat='csv'):
     """Create a set of line integral gauges that will automatically be
     serialized as CSV data to the requested file.
 
@@ -128,7 +134,8 @@ def LineIntegralGauges(gauges, activeTime=None, sampleRate=0, fileName='line_int
                 fields.append(field)
         lines.extend(product(gauge_fields, gauge_lines))
 
-    return Gauges(fields, activeTime, sampleRate, fileName, lines=lines, integrate=True)
+    return Gauges(fields, activeTime, sampleRate, fileName, lines=lines, integrate=True,
+                  bufferSize=bufferSize, fileFormat=fileFormat)
 
 
 class Gauges(AV_base):
@@ -149,13 +156,14 @@ class Gauges(AV_base):
     Owners.  The calculate method is a "no-op" for non-Owners.  For
     Gauge Owners, all values are computed individually, then
     collectively transmitted to the "root" process, which is the only
-    process responsible for serializing gauge results to disk.  This
-    code has not been aggressively vetted for parallel correctness or
-    scalability.
+    process responsible for serializing gauge results to disk.  Gauge
+    locations are found for all points at once, with a single
+    collective to assign each point to its owning process, and each
+    field is sampled through one sparse operator.
 
     """
     def __init__(self, fields, activeTime=None, sampleRate=0, fileName='gauges.csv', points=None, lines=None,
-                 integrate=False):
+                 integrate=False, bufferSize=1, fileFormat='csv'):
         """Create a set of gauges that will automatically be serialized as
         CSV data to the requested file.
 
@@ -171,6 +179,14 @@ class Gauges(AV_base):
                            computes the gauge values at every time
                            step.
         :param fileName: The name of the file to serialize results to.
+        :param bufferSize: The number of samples kept in memory by the
+                           root process before they are written to
+                           the file.  The default value of one writes
+                           and flushes every sample.
+        :param fileFormat: 'csv' or 'hdf5'.  HDF5 output stores the
+                           times in the dataset 'time' and the samples
+                           in the dataset 'values', with the column
+                           names in its 'columns' attribute.
 
         Data is currently column-formatted, with 10 characters
         allotted to the time field, and 45 characters allotted to each
@@ -184,9 +200,11 @@ class Gauges(AV_base):
         self.activeTime = activeTime
         self.sampleRate = sampleRate
         self.fileName = fileName
+        self.bufferSize = bufferSize
+        self.fileFormat = fileFormat
         self.points = points if points else OrderedDict()
         self.lines = lines if lines else []
-        self.file = None  # only the root process should have a file open
+        self.recorder = None  # only the root process records samples
         self.flags = {}
         self.files = {}
         self.outputWriterReady = False
@@ -197,6 +215,7 @@ class Gauges(AV_base):
         self.pointGaugeVecs = []
         self.segments = []
         self.adapted = False
+        self.hotStart = False
 
         self.isPointGauge = bool(points)
         self.isLineGauge = bool(lines) and not integrate
@@ -206,6 +225,15 @@ class Gauges(AV_base):
             raise ValueError("Need to provide points or lines")
         if sum((self.isPointGauge, self.isLineGauge, self.isLineIntegralGauge)) > 1:
             raise ValueError("Must be one of point or line gauge but not both")
+        if fileFormat not in ('csv', 'hdf5'):
+            raise ValueError("fileFormat must be 'csv' or 'hdf5'")
+        if bufferSize < 1:
+            raise ValueError("bufferSize must be at least 1")
+
+    @property
+    def nodes_kdtree(self):
+        # shared with the other point queries on the mesh, rebuilt when the mesh moves
+        return self.model.levelModelList[-1].mesh.getNodeTree()
 
     def getLocalNearestNode(self, location):
         # determine local nearest node distance
@@ -247,6 +275,37 @@ class Gauges(AV_base):
         # no elements found
         return None
 
+    def getLocalElements(self, femSpace, locations, nodes):
+        """Given an array of locations and their nearest nodes, determine
+        which of them are on local elements.
+
+        Returns an array with the local element of each location, -1
+        if the location is not on any element owned by this process,
+        and an array with the reference coordinates of each location
+        on its element.
+
+        On affine simplicial meshes all locations are searched at once
+        with the spatial index of the mesh (see MeshTools.Mesh.locatePoints),
+        otherwise each location is searched with getLocalElement.
+
+        """
+
+        nLocations = len(locations)
+        dim = femSpace.elementMaps.referenceElement.dim
+        elements = -np.ones(nLocations, dtype='i')
+        xi = np.zeros((nLocations, dim), dtype='d')
+        if nLocations == 0:
+            return elements, xi
+        if isinstance(femSpace.elementMaps, AffineMaps) and isinstance(femSpace.elementMaps.referenceElement,
+                                                                       ReferenceSimplex):
+            return femSpace.mesh.locatePoints(locations)
+        for i in range(nLocations):
+            eN = self.getLocalElement(femSpace, locations[i], nodes[i])
+            if eN is not None:
+                elements[i] = eN
+                xi[i] = femSpace.elementMaps.getInverseValue(eN, locations[i])
+        return elements, xi
+
     def findNearestNode(self, femSpace, location):
         """Given a gauge location, attempts to locate the most suitable
         process for monitoring information about this location, as
@@ -279,6 +338,43 @@ class Gauges(AV_base):
         assert owning_proc is not None
         return owning_proc, nearest_node
 
+    def findNearestNodes(self, femSpace, locations):
+        """Given an array of gauge locations, determine the owning process
+        and nearest node of every location as findNearestNode does, with
+        a single collective for all locations.
+
+        Returns an array of owning processes and a list of the local
+        nearest nodes, None where this process is not the owner.
+
+        """
+        comm = Comm.get().comm.tompi4py()
+        locations = np.asarray(locations, dtype='d').reshape(-1, 3)
+        nearest_node_distances, nearest_nodes = self.nodes_kdtree.query(locations)
+        local_elements, xi = self.getLocalElements(femSpace, locations, nearest_nodes)
+
+        # processes with the location on an element win, the highest rank among them as in
+        # findNearestNode, otherwise the lowest rank with the nearest node; MINLOC breaks ties
+        # by the lowest location, so the rank is negated for processes with an element
+        distance_rank = np.dtype({'names': ['distance', 'rank'], 'formats': ['f8', 'i4']}, align=True)
+        local_owner = np.zeros(len(locations), dtype=distance_rank)
+        local_owner['distance'] = np.where(local_elements >= 0, -1.0, nearest_node_distances)
+        local_owner['rank'] = np.where(local_elements >= 0, -comm.rank, comm.rank)
+        global_owner = np.zeros(len(locations), dtype=distance_rank)
+        comm.Allreduce([local_owner, MPI.DOUBLE_INT], [global_owner, MPI.DOUBLE_INT], op=MPI.MINLOC)
+
+        owning_procs = np.abs(global_owner['rank'])
+        nodes = []
+        for location, distance, owning_proc, nearest_node in zip(locations, global_owner['distance'],
+                                                                 owning_procs, nearest_nodes):
+            if distance < 0:
+                logEvent("Gauges on element at location: [%g %g %g] assigned to %d" % (location[0], location[1],
+                                                                                       location[2], owning_proc), 3)
+            else:
+                logEvent("Off-element gauge location: [%g %g %g] assigned to %d" % (location[0], location[1],
+                                                                                    location[2], owning_proc), 3)
+            nodes.append(int(nearest_node) if owning_proc == comm.rank else None)
+        return owning_procs, nodes
+
     def buildQuantityRow(self, m, femFun, quantity_id, quantity):
         """Builds up contributions to gauge operator from the underlying
         element space
@@ -301,6 +397,43 @@ class Gauges(AV_base):
             m[quantity_id, node] = 1
 
 
+    def buildQuantityRows(self, femFun, quantities):
+        """Builds the gauge operator rows of all quantities at once,
+        equivalent to calling buildQuantityRow for each of them.
+
+        Returns the operator in CSR format.
+
+        """
+
+        if len(quantities) == 0:
+            return (np.zeros(1, dtype=PETSc.IntType), np.zeros(0, dtype=PETSc.IntType),
+                    np.zeros(0, dtype=PETSc.ScalarType))
+        locations = np.array([location for location, node in quantities], dtype='d')
+        nodes = np.array([node for location, node in quantities], dtype='i')
+        femSpace = femFun.femSpace
+        localElements, xi = self.getLocalElements(femSpace, locations, nodes)
+        basis = femSpace.referenceFiniteElement.localFunctionSpace.basis
+        onElement = localElements >= 0
+        nDOF = len(basis)
+        rowLengths = np.where(onElement, nDOF, 1)
+        indptr = np.zeros(len(quantities) + 1, dtype=PETSc.IntType)
+        indptr[1:] = np.cumsum(rowLengths)
+        indices = np.zeros(indptr[-1], dtype=PETSc.IntType)
+        values = np.ones(indptr[-1], dtype=PETSc.ScalarType)
+        for quantity_id in range(len(quantities)):
+            start = indptr[quantity_id]
+            if onElement[quantity_id]:
+                eN = localElements[quantity_id]
+                dofs = femSpace.dofMap.l2g[eN]
+                weights = np.array([psi(xi[quantity_id]) for psi in basis])
+                order = np.argsort(dofs)
+                indices[start:start + nDOF] = dofs[order]
+                values[start:start + nDOF] = weights[order]
+            else:
+                # just use nearest node for now if we're given a point outside the domain.
+                indices[start] = nodes[quantity_id]
+        return indptr, indices, values
+
     def initOutputWriter(self):
         """Initialize communication strategy for collective output of gauge
         data.
@@ -323,11 +456,9 @@ class Gauges(AV_base):
         else:
             if self.adapted:
               if(Profiling.logDir not in self.fileName):
-                self.fileName = os.path.join(Profiling.logDir, self.fileName)                
-              self.file = open(self.fileName, 'a')
+                self.fileName = os.path.join(Profiling.logDir, self.fileName)
             else:
               self.fileName = os.path.join(Profiling.logDir, self.fileName)
-              self.file = open(self.fileName, 'w')
 
             if self.isLineIntegralGauge:
                 #Only need to set up mapping for point gauges
@@ -460,13 +591,23 @@ class Gauges(AV_base):
 
         points = self.points
 
+        # locate all new points of each element space at once
+        # TODO: Clarify assumption here about all fields sharing the same element mesh
+        unlocated = defaultdict(list)
         for point, l_d in points.items():
             if 'nearest_node' not in l_d:
-                # TODO: Clarify assumption here about all fields sharing the same element mesh
-                field_id = self.fieldNames.index(list(l_d['fields'])[0])
-                femSpace = self.u[field_id].femSpace
-                owningProc, nearestNode = self.findNearestNode(femSpace, point)
-                l_d['nearest_node'] = nearestNode
+                unlocated[self.fieldNames.index(sorted(l_d['fields'])[0])].append(point)
+        owningProcs = {}
+        for field_id in sorted(unlocated):
+            procs, nodes = self.findNearestNodes(self.u[field_id].femSpace, unlocated[field_id])
+            for point, owningProc, nearestNode in zip(unlocated[field_id], procs, nodes):
+                points[point]['nearest_node'] = nearestNode
+                owningProcs[point] = owningProc
+
+        for point, l_d in points.items():
+            if point in owningProcs:
+                owningProc = owningProcs[point]
+                nearestNode = l_d['nearest_node']
             else:
                 owningProc = l_d['owning_proc']
                 # nearestNode only makes sense on owning process
@@ -491,26 +632,21 @@ class Gauges(AV_base):
         """
 
         for field, field_id in zip(self.fields, self.field_ids):
-            m = PETSc.Mat().create(PETSc.COMM_SELF)
-            m.setSizes([len(self.measuredQuantities[field]),
-                        self.u[field_id].femSpace.dim])
-            m.setType('aij')
-            m.setUp()
-            # matrices are a list in same order as fields
-            self.pointGaugeMats.append(m)
-            # dofs are a list in same order as fields as well
-            dofs = self.u[field_id].dof
-            dofsVec = PETSc.Vec().createWithArray(dofs, comm=PETSc.COMM_SELF)
-            self.dofsVecs.append(dofsVec)
-
-        for field, field_id, m in zip(self.fields, self.field_ids, self.pointGaugeMats):
             # get the FiniteElementFunction object for this quantity
             femFun = self.u[field_id]
             for quantity_id, quantity in enumerate(self.measuredQuantities[field]):
                 location, node = quantity
                 logEvent("Gauge for: %s at %e %e %e is on local operator row %d" % (field, location[0], location[1],
                                                                       location[2], quantity_id), 3)
-                self.buildQuantityRow(m, femFun, quantity_id, quantity)
+            m = PETSc.Mat().createAIJ([len(self.measuredQuantities[field]), femFun.femSpace.dim],
+                                      csr=self.buildQuantityRows(femFun, self.measuredQuantities[field]),
+                                      comm=PETSc.COMM_SELF)
+            # matrices are a list in same order as fields
+            self.pointGaugeMats.append(m)
+            # dofs are a list in same order as fields as well
+            dofs = self.u[field_id].dof
+            dofsVec = PETSc.Vec().createWithArray(dofs, comm=PETSc.COMM_SELF)
+            self.dofsVecs.append(dofsVec)
             pointGaugesVec = PETSc.Vec().create(comm=PETSc.COMM_SELF)
             pointGaugesVec.setSizes(len(self.measuredQuantities[field]))
             pointGaugesVec.setUp()
@@ -657,7 +793,6 @@ class Gauges(AV_base):
     def attachModel(self, model, ar):
         """ Attach this gauge to the given simulation model.
         """
-        from scipy import spatial
         self.model = model
         self.fieldNames = model.levelModelList[-1].coefficients.variableNames
         self.vertexFlags = model.levelModelList[-1].mesh.nodeMaterialTypes
@@ -665,10 +800,11 @@ class Gauges(AV_base):
         self.num_owned_nodes = model.levelModelList[-1].mesh.nNodes_global
         self.u = model.levelModelList[-1].u
         self.timeIntegration = model.levelModelList[-1].timeIntegration
+        # a hot started run samples once the solution has been read, see restartOutput
+        self.hotStart = getattr(ar, 'hotStart', False) and not self.adapted
         for field in self.fields:
             field_id = self.fieldNames.index(field)
             self.field_ids.append(field_id)
-        self.nodes_kdtree = spatial.cKDTree(model.levelModelList[-1].mesh.nodeArray)
         linesSegments = []
         for line in self.lines:
             lineSegments = self.getMeshIntersections(line)
@@ -684,7 +820,7 @@ class Gauges(AV_base):
             self.buildPointGaugeOperators()
             self.buildLineIntegralGaugeOperators(self.lines, linesSegments)
             if self.adapted:
-              pass
+              self.resumeOutput()
             else:
               self.outputHeader()
         return self
@@ -695,25 +831,61 @@ class Gauges(AV_base):
         return self.timeIntegration.tLast
 
     def outputHeader(self):
-        """ Outputs a single header for a CSV style file to self.file"""
+        """ Creates the recorder of the gauge samples and writes the header of its file"""
 
         assert self.isGaugeOwner
         if self.gaugeComm.rank == 0:
-            self.file.write("%10s" % ('time',))
-            if self.isPointGauge or self.isLineGauge:
-                for field in self.fields:
-                    for quantity in self.globalMeasuredQuantities[field]:
-                        location, gaugeProc, quantityID = quantity
-                        self.file.write(",%12s [%9.5g %9.5g %9.5g]" % (field, location[0], location[1], location[2]))
-            elif self.isLineIntegralGauge:
-                for line in self.lines:
-                    self.file.write(",%12s [%9.5g %9.5g %9.5g] - [%9.5g %9.5g %9.5g]" % (
-                        line[0], line[1][0][0], line[1][0][1], line[1][0][2],
-                                 line[1][1][0], line[1][1][1], line[1][1][2]))
-            self.file.write('\n')
+            self.createRecorder()
+            # the file of a hot started run is continued by restartOutput
+            if not self.hotStart:
+                self.recorder.start()
+
+    def restartOutput(self, time):
+        """ Continues the file of a hot started run, replacing the samples at and after the hot start time"""
+
+        if not self.isGaugeOwner:
+            return
+        if self.gaugeComm.rank == 0:
+            self.recorder.start(None if time == 0 else time)
+        self.hotStart = False
+        self.last_output = None
+        self.calculate()
+
+    def resumeOutput(self):
+        """ Appends to the file written before adaptation, which may have been written by another process"""
+
+        assert self.isGaugeOwner
+        if self.gaugeComm.rank == 0 and self.recorder is None:
+            self.createRecorder()
+            self.recorder.started = True
+
+    def createRecorder(self):
+        """ Creates the recorder of the gauge samples without touching its file"""
+
+        columns = []
+        header = "%10s" % ('time',)
+        fmt = ['%25.15e']
+        if self.isPointGauge or self.isLineGauge:
+            for field in self.fields:
+                for quantity in self.globalMeasuredQuantities[field]:
+                    location, gaugeProc, quantityID = quantity
+                    columns.append("%s [%g %g %g]" % (field, location[0], location[1], location[2]))
+                    header += ",%12s [%9.5g %9.5g %9.5g]" % (field, location[0], location[1], location[2])
+                    fmt.append(' %43.18e')
+        elif self.isLineIntegralGauge:
+            for line in self.lines:
+                columns.append("%s [%g %g %g] - [%g %g %g]" % (
+                    line[0], line[1][0][0], line[1][0][1], line[1][0][2],
+                             line[1][1][0], line[1][1][1], line[1][1][2]))
+                header += ",%12s [%9.5g %9.5g %9.5g] - [%9.5g %9.5g %9.5g]" % (
+                    line[0], line[1][0][0], line[1][0][1], line[1][0][2],
+                             line[1][1][0], line[1][1][1], line[1][1][2])
+                fmt.append(' %80.18e')
+        self.recorder = TimeSeriesRecorder(self.fileName, columns, bufferSize=self.bufferSize,
+                                           fileFormat=self.fileFormat, fmt=fmt, header=header)
 
     def outputRow(self, time):
-        """ Outputs a single row of currently calculated gauge data to self.file"""
+        """ Outputs a single row of currently calculated gauge data to the recorder"""
 
         assert self.isGaugeOwner
 
@@ -737,23 +909,26 @@ class Gauges(AV_base):
             globalLineIntegralGaugeBuf = []
 
         if self.gaugeComm.rank == 0:
-            self.file.write("%25.15e" % time)
             if self.isPointGauge or self.isLineGauge:
-                for id in self.globalQuantitiesMap:
-                    self.file.write(", %43.18e" % (self.globalQuantitiesBuf[id],))
-            if self.isLineIntegralGauge:
-                for lineIntegralGauge in globalLineIntegralGaugeBuf:
-                    self.file.write(", %80.18e" % (lineIntegralGauge))
-            self.file.write('\n')
-            # disable this for better performance, but risk of data loss on crashes
-            self.file.flush()
+                pointGaugeValues = self.globalQuantitiesBuf[self.globalQuantitiesMap]
+            else:
+                pointGaugeValues = np.zeros(0)
+            self.recorder.record(time, np.concatenate([pointGaugeValues,
+                                                       np.array(globalLineIntegralGaugeBuf, dtype=np.double)]))
         self.last_output = time
 
+    def flush(self):
+        """ Writes the samples buffered on the root process to the file"""
+
+        # a larger bufferSize gives better performance, but risk of data loss on crashes
+        if self.recorder is not None:
+            self.recorder.flush()
+
     def calculate(self):
         """ Computes current gauge values, updates open output files
         """
 
-        if not self.isGaugeOwner:
+        if not self.isGaugeOwner or self.hotStart:
             return
 
         time = self.get_time()
@@ -158,192 +158,101 @@ class Isosurface(AV_base):
     def triangulateIsosurface(self, field, value):
         """
         Build a triangular mesh of the isosurface
+
+        All owned tetrahedra are classified at once by the signs of the
+        field at their vertices. Isosurface vertices are shared between
+        triangles: one per cut mesh edge and one per mesh vertex lying on
+        the isosurface. Triangles are oriented with their normal pointing
+        to the positive side, duplicate triangles on faces lying in the
+        isosurface are removed, and normals are area weighted averages
+        at the vertices.
         """
-        cdef int eN, i, J, I, nMinus, nPlus, nZeros, nN_start
-        cdef double eps, s
-        cdef np.ndarray[np.float64_t, ndim=1] x, normal
-        self.nodes[(field, value)] = nodes = []
-        self.elements[(field, value)] = elements = []
-        self.normals[(field, value)] = normals = []
-        self.normal_indices[(field, value)] = normal_indices = []
+        eps = 1.0e-8
         if value != 0.0:
             raise NotImplementedError("Only zero isocontour extraction")
-        phi = self.u[self.fieldNames.index(field)].dof
-        for eN in range(self.num_owned_elements):
-            plus = []
-            minus = []
-            zeros = []
-            eps = 1.0e-8
-            for i in range(4):
-                I = self.elementNodesArray[eN, i]
-                if phi[I] > eps:
-                    plus.append(I)
-                elif phi[I] < -eps:
-                    minus.append(I)
-                else:
-                    zeros.append(I)
-            nZeros = len(zeros)
-            nMinus = len(minus)
-            nPlus = len(plus)
-            assert(nZeros + nMinus + nPlus == 4)
-            nN_start = len(nodes)
-            if nMinus == 2 and nPlus == 2:  # 4 cut edges
-                for J in minus:
-                    for I in plus:
-                        s = -phi[I] / (phi[J] - phi[I])
-                        x = s * (self.nodeArray[J] - self.nodeArray[I]) \
-                            + self.nodeArray[I]
-                        nodes.append(x)
-                elements.append([nN_start + j for j in range(3)])
-                elements.append([nN_start + j + 1 for j in range(3)])
-                if etriple(self.nodeArray[plus[0]] - nodes[-4],
-                           nodes[-3] - nodes[-4],
-                           nodes[-2] - nodes[-4]) < 0.0:
-                    elements[-2] = [elements[-2][0],
-                                    elements[-2][2],
-                                    elements[-2][1]]
-                if etriple(self.nodeArray[plus[1]] - nodes[-3],
-                           nodes[-2] - nodes[-3],
-                           nodes[-1] - nodes[-3]) < 0.0:
-                    elements[-1] = [elements[-1][0],
-                                    elements[-1][2],
-                                    elements[-1][1]]
-                normal = ecross(
-                    nodes[elements[-2][1]] - nodes[elements[-2][0]],
-                    nodes[elements[-2][2]] - nodes[elements[-2][0]])
-                normal /= enorm(normal)
-                normals.append(normal)
-                normals.append(normal)
-                normals.append(normal)
-                normal_indices.append(elements[-2])
-                normal = ecross(
-                    nodes[elements[-1][1]] - nodes[elements[-1][0]],
-                    nodes[elements[-1][2]] - nodes[elements[-1][0]])
-                normal /= enorm(normal)
-                normals.append(normal)
-                normals.append(normal)
-                normals.append(normal)
-                normal_indices.append(elements[-1])
-            elif nPlus == 3 and nMinus == 1:  # 3 cut edges
-                I = minus[0]
-                for J in plus:
-                    s = -phi[I] / (phi[J] - phi[I])
-                    x = s * (self.nodeArray[J] - self.nodeArray[I]) + \
-                        self.nodeArray[I]
-                    nodes.append(x)
-                elements.append([nN_start + j for j in range(3)])
-                if etriple(self.nodeArray[minus[0]] - nodes[-3],
-                           nodes[-2] - nodes[-3],
-                           nodes[-1] - nodes[-3]) > 0.0:
-                    elements[-1] = [elements[-1][0],
-                                    elements[-1][2],
-                                    elements[-1][1]]
-                normal = ecross(
-                    nodes[elements[-1][1]] - nodes[elements[-1][0]],
-                    nodes[elements[-1][2]] - nodes[elements[-1][0]])
-                normal /= enorm(normal)
-                normals.append(normal)
-                normals.append(normal)
-                normals.append(normal)
-                normal_indices.append(elements[-1])
-            elif nMinus == 3 and nPlus == 1:  # 3 cut edges
-                I = plus[0]
-                for J in minus:
-                    s = -phi[I] / (phi[J] - phi[I])
-                    x = s * (self.nodeArray[J] - self.nodeArray[I]) + \
-                        self.nodeArray[I]
-                    nodes.append(x)
-                elements.append([nN_start + j for j in range(3)])
-                if etriple(self.nodeArray[plus[0]] - nodes[-3],
-                           nodes[-2] - nodes[-3],
-                           nodes[-1] - nodes[-3]) < 0.0:
-                    elements[-1] = [elements[-1][0],
-                                    elements[-1][2],
-                                    elements[-1][1]]
-                normal = ecross(
-                    nodes[elements[-1][1]] - nodes[elements[-1][0]],
-                    nodes[elements[-1][2]] - nodes[elements[-1][0]])
-                normal /= enorm(normal)
-                normals.append(normal)
-                normals.append(normal)
-                normals.append(normal)
-                normal_indices.append(elements[-1])
-            elif nZeros == 1 and ((nPlus == 2 and nMinus == 1) or
-                                  (nPlus == 1 and nMinus == 2)):
-                # 2 cut edges, 1 vertex lies in plane
-                nodes.append(self.nodeArray[zeros[0]])
-                for J in minus:
-                    for I in plus:
-                        s = -phi[I] / (phi[J] - phi[I])
-                        x = s * (self.nodeArray[J] - self.nodeArray[I]) \
-                            + self.nodeArray[I]
-                        nodes.append(x)
-                elements.append([nN_start + j for j in range(3)])
-                if etriple(self.nodeArray[plus[0]] - nodes[-3],
-                           nodes[-2] - nodes[-3],
-                           nodes[-1] - nodes[-3]) < 0.0:
-                    elements[-1] = [elements[-1][0],
-                                    elements[-1][2],
-                                    elements[-1][1]]
-                normal = ecross(
-                    nodes[elements[-1][1]] - nodes[elements[-1][0]],
-                    nodes[elements[-1][2]] - nodes[elements[-1][0]])
-                normal /= enorm(normal)
-                normals.append(normal)
-                normals.append(normal)
-                normals.append(normal)
-                normal_indices.append(elements[-1])
-            elif nZeros == 2 and nPlus == 1 and nMinus == 1:
-                # 1 cut edge, 2 vertices lie in plane
-                for I in zeros:
-                    nodes.append(self.nodeArray[I])
-                I = plus[0]
-                J = minus[0]
-                s = -phi[I] / (phi[J] - phi[I])
-                x = s * (self.nodeArray[J] - self.nodeArray[I]) \
-                    + self.nodeArray[I]
-                nodes.append(x)
-                elements.append([nN_start + j for j in range(3)])
-                if etriple(self.nodeArray[plus[0]] - nodes[-3],
-                           nodes[-2] - nodes[-3],
-                           nodes[-1] - nodes[-3]) < 0.0:
-                    elements[-1] = [elements[-1][0],
-                                    elements[-1][2],
-                                    elements[-1][1]]
-                normal = ecross(
-                    nodes[elements[-1][1]] - nodes[elements[-1][0]],
-                    nodes[elements[-1][2]] - nodes[elements[-1][0]])
-                normal /= enorm(normal)
-                normals.append(normal)
-                normals.append(normal)
-                normals.append(normal)
-                normal_indices.append(elements[-1])
-            elif nZeros == 3:  # 3 vertices lie in plane
-                for I in zeros:
-                    nodes.append(self.nodeArray[I])
-                elements.append([nN_start + j for j in range(3)])
-                if nPlus == 1:
-                    if etriple(self.nodeArray[plus[0]] - nodes[-3],
-                               nodes[-2] - nodes[-3],
-                               nodes[-1] - nodes[-3]) < 0.0:
-                        elements[-1] = [elements[-1][0],
-                                        elements[-1][2],
-                                        elements[-1][1]]
-                else:
-                    if etriple(self.nodeArray[minus[0]] - nodes[-3],
-                               nodes[-2] - nodes[-3],
-                               nodes[-1] - nodes[-3]) > 0.0:
-                        elements[-1] = [elements[-1][0],
-                                        elements[-1][2],
-                                        elements[-1][1]]
-                normal = ecross(
-                    nodes[elements[-1][1]] - nodes[elements[-1][0]],
-                    nodes[elements[-1][2]] - nodes[elements[-1][0]])
-                normal /= enorm(normal)
-                normals.append(normal)
-                normals.append(normal)
-                normals.append(normal)
-                normal_indices.append(elements[-1])
+        phi = np.asarray(self.u[self.fieldNames.index(field)].dof)
+        nNodes_global = self.nodeArray.shape[0]
+        elementNodes = np.asarray(self.elementNodesArray[:self.num_owned_elements], dtype=np.int64)
+        # sort the vertices of each element into minus, plus and zero vertices
+        phi_element = phi[elementNodes]
+        category = np.where(phi_element < -eps, 0, np.where(phi_element > eps, 1, 2))
+        order = np.argsort(category, axis=1, kind='stable')
+        v = np.take_along_axis(elementNodes, order, axis=1)
+        nMinus = np.count_nonzero(category == 0, axis=1)
+        nPlus = np.count_nonzero(category == 1, axis=1)
+        nZeros = 4 - nMinus - nPlus
+        # isosurface vertices are keys, I*nNodes_global+J for the cut edge
+        # I<J and I*nNodes_global+I for a mesh vertex on the isosurface
+        def edge(I, J):
+            return np.minimum(I, J)*nNodes_global + np.maximum(I, J)
+        def vertex(I):
+            return I*nNodes_global + I
+        triangles = []
+        references = []
+        referenceSigns = []
+        def addTriangles(mask, keys, reference, referenceSign):
+            triangles.append(np.column_stack([k[mask] for k in keys]))
+            references.append(reference[mask])
+            referenceSigns.append(np.full(np.count_nonzero(mask), referenceSign))
+        # 4 cut edges
+        mask = np.logical_and(nMinus == 2, nPlus == 2)
+        m0, m1, p0, p1 = v[:, 0], v[:, 1], v[:, 2], v[:, 3]
+        addTriangles(mask, (edge(m0, p0), edge(m0, p1), edge(m1, p0)), p0, 1.0)
+        addTriangles(mask, (edge(m0, p1), edge(m1, p0), edge(m1, p1)), p1, 1.0)
+        # 3 cut edges
+        mask = np.logical_and(nMinus == 1, nPlus == 3)
+        addTriangles(mask, (edge(v[:, 0], v[:, 1]), edge(v[:, 0], v[:, 2]), edge(v[:, 0], v[:, 3])),
+                     v[:, 0], -1.0)
+        mask = np.logical_and(nMinus == 3, nPlus == 1)
+        addTriangles(mask, (edge(v[:, 3], v[:, 0]), edge(v[:, 3], v[:, 1]), edge(v[:, 3], v[:, 2])),
+                     v[:, 3], 1.0)
+        # 2 cut edges, 1 vertex lies in plane
+        mask = np.logical_and(nZeros == 1, np.logical_and(nMinus == 1, nPlus == 2))
+        addTriangles(mask, (vertex(v[:, 3]), edge(v[:, 0], v[:, 1]), edge(v[:, 0], v[:, 2])),
+                     v[:, 1], 1.0)
+        mask = np.logical_and(nZeros == 1, np.logical_and(nMinus == 2, nPlus == 1))
+        addTriangles(mask, (vertex(v[:, 3]), edge(v[:, 0], v[:, 2]), edge(v[:, 1], v[:, 2])),
+                     v[:, 2], 1.0)
+        # 1 cut edge, 2 vertices lie in plane
+        mask = np.logical_and(nZeros == 2, np.logical_and(nMinus == 1, nPlus == 1))
+        addTriangles(mask, (vertex(v[:, 2]), vertex(v[:, 3]), edge(v[:, 0], v[:, 1])),
+                     v[:, 1], 1.0)
+        # 3 vertices lie in plane
+        mask = np.logical_and(nZeros == 3, nPlus == 1)
+        addTriangles(mask, (vertex(v[:, 1]), vertex(v[:, 2]), vertex(v[:, 3])), v[:, 0], 1.0)
+        mask = np.logical_and(nZeros == 3, nMinus == 1)
+        addTriangles(mask, (vertex(v[:, 1]), vertex(v[:, 2]), vertex(v[:, 3])), v[:, 0], -1.0)
+        triangles = np.concatenate(triangles)
+        references = np.concatenate(references)
+        referenceSigns = np.concatenate(referenceSigns)
+        # one isosurface vertex per key
+        keys, elements = np.unique(triangles, return_inverse=True)
+        elements = elements.reshape(triangles.shape)
+        I = keys // nNodes_global
+        J = keys % nNodes_global
+        cut = I != J
+        s = np.zeros(keys.shape, 'd')
+        s[cut] = -phi[I[cut]] / (phi[J[cut]] - phi[I[cut]])
+        nodes = self.nodeArray[I] + s[:, None] * (self.nodeArray[J] - self.nodeArray[I])
+        # orient the triangles with the normal pointing to the positive side
+        x0 = nodes[elements[:, 0]]
+        normal = np.cross(nodes[elements[:, 1]] - x0, nodes[elements[:, 2]] - x0)
+        flip = referenceSigns * np.sum((self.nodeArray[references] - x0) * normal, axis=1) < 0.0
+        elements[flip] = elements[flip][:, [0, 2, 1]]
+        normal[flip] *= -1.0
+        # faces lying in the isosurface are found from both elements sharing them
+        unique = np.unique(np.sort(elements, axis=1), axis=0, return_index=True)[1]
+        elements = elements[unique]
+        normal = normal[unique]
+        normals = np.zeros(nodes.shape, 'd')
+        for j in range(3):
+            np.add.at(normals, elements[:, j], normal)
+        length = np.sqrt(np.sum(normals**2, axis=1))
+        np.divide(normals, length[:, None], out=normals, where=length[:, None] > 0.0)
+        self.nodes[(field, value)] = nodes
+        self.elements[(field, value)] = elements
+        self.normals[(field, value)] = normals
+        self.normal_indices[(field, value)] = elements
 
     def writeIsosurfaceMesh(self, field, value, frame):
         if self.format == 'pov':
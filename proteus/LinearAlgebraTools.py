@@ -184,7 +184,7 @@ def petsc4py_get_rank(sparse_matrix):
     A = petsc4py_sparse_2_dense(sparse_matrix)
     return numpy.linalg.matrix_rank(A)
 
-def superlu_has_pressure_null_space(sparse_matrix):
+def superlu_has_pressure_null_space(sparse_matrix,par_info=None):
     """
     Checks whether a superluWrapper sparse matrix has a constant
     pressure null space.
@@ -192,6 +192,9 @@ def superlu_has_pressure_null_space(sparse_matrix):
     Parameters
     ----------
     sparse_matrix : :class:`proteus.superluWrappers.SparseMatrix`
+    par_info : :class:`ParInfo_petsc4py`
+        Parallel data of the model the matrix belongs to, required
+        in parallel.
 
     Returns
     -------
@@ -205,7 +208,7 @@ def superlu_has_pressure_null_space(sparse_matrix):
     This function was written mainly for debugging purposes and may be
     slow for large matrices.
     """
-    A = superlu_2_petsc4py(sparse_matrix)
+    A = superlu_2_petsc4py(sparse_matrix,par_info)
     return petsc4py_mat_has_pressure_null_space(A)
 
 def petsc4py_mat_has_pressure_null_space(A):
@@ -290,12 +293,15 @@ def petsc4py_sparse_2_dense(sparse_matrix,output=False):
     nc     = sparse_matrix.getSize()[1]
     return _pythonCSR_2_dense(rowptr,colptr,data,nr,nc,output)
 
-def superlu_2_petsc4py(sparse_superlu):
+def superlu_2_petsc4py(sparse_superlu,par_info=None):
     """ Copy a sparse superlu matrix to a sparse petsc4py matrix
 
     Parameters
     ----------
     sparse_superlu : :class:`proteus.superluWrappers.SparseMatrix`
+    par_info : :class:`ParInfo_petsc4py`
+        Parallel data of the model the matrix belongs to, required
+        in parallel.
 
     Returns
     -------
@@ -305,7 +311,8 @@ def superlu_2_petsc4py(sparse_superlu):
 
     if comm.size() > 1:
         rowptr,colind,nzval = sparse_superlu.getCSRrepresentation()
-        A_petsc4py = ParMat_petsc4py.create_ParMat_from_OperatorConstructor(sparse_superlu)
+        assert par_info is not None, "The model's par_info is needed to copy a matrix in parallel"
+        A_petsc4py = ParMat_petsc4py.create_ParMat_from_OperatorConstructor(sparse_superlu,par_info)
 
     else:
         rowptr, colind, nzval = sparse_superlu.getCSRrepresentation()
@@ -438,6 +445,9 @@ class ParVec_petsc4py(p4pyPETSc.Vec):
                        Map from the process unknowns to the global
                        uknowns.
     blockVecType : str
+                   'simple' for a scalar (block size 1) vector or
+                   'block' for a vector with block size bs, in which
+                   case subdomain2global and ghosts are block indices.
     ghosts : numpy array
              A numpy array with the local process uknowns that are
              ghost nodes.
@@ -460,7 +470,7 @@ class ParVec_petsc4py(p4pyPETSc.Vec):
         self.dim_proc = n*blockSize
         self.nghosts = nghosts
         self.blockVecType = blockVecType
-        assert self.blockVecType == "simple", "petsc4py wrappers require self.blockVecType=simple"
+        assert self.blockVecType in ("simple","block"), "petsc4py wrappers require self.blockVecType=simple or block"
         self.proteus_array = array
         if nghosts is None:
             if blockVecType == "simple":
@@ -488,8 +498,9 @@ class ParVec_petsc4py(p4pyPETSc.Vec):
                 else:
                     self.subdomain2global=subdomain2global
             else:
-                #TODO need to debug
-                ghosts = subdomain2global[n:]
+                #ghosts are global block (node) indices
+                if ghosts is None:
+                    ghosts = subdomain2global[n:]
                 self.createGhostWithArray(ghosts,array,size=(blockSize*n,blockSize*N),bsize=blockSize)
                 self.subdomain2global = subdomain2global
             self.setUp()
@@ -538,6 +549,28 @@ class ParInfo_petsc4py(object):
         self.nzval_proteus2petsc = None
         self.dim = None
         self.mixed = False
+        self.petscOrderings = []
+
+    def getPetscOrdering(self, rowptr, colind):
+        """ Return petscNonzeroOrdering of a proteus CSR pattern
+
+        The orderings are cached, so operators sharing the Jacobian
+        sparsity pattern reuse the permutation built for it. The cache
+        holds the CSR arrays of the matrices themselves, which are
+        matched by identity before comparing their entries.
+        """
+        for rowptr_cached, colind_cached, ordering in self.petscOrderings:
+            if rowptr_cached is rowptr and colind_cached is colind:
+                return ordering
+        for rowptr_cached, colind_cached, ordering in self.petscOrderings:
+            if numpy.array_equal(rowptr_cached, rowptr) and numpy.array_equal(colind_cached, colind):
+                return ordering
+        ordering = petscNonzeroOrdering(rowptr,
+                                        colind,
+                                        self.proteus2petsc_subdomain,
+                                        self.petsc2proteus_subdomain)
+        self.petscOrderings.append((rowptr, colind, ordering))
+        return ordering
 
     def print_info(cls):
         from . import Comm
@@ -570,6 +603,10 @@ class ParMat_petsc4py(p4pyPETSc.Mat):
     subdomain2global : :class:`numpy.ndarray`
         A map from the local unknown to the global unknown.
     blockVecType : str
+        'simple' assembles into a scalar AIJ matrix; 'block' assembles
+        an interlaced system with par_bs > 1 components into a BAIJ
+        matrix with block size par_bs, in which case subdomain2global
+        maps local to global blocks (nodes).
     pde : :class:`proteus.Transport.OneLevelTransport`
         The Transport class defining the problem.
     par_nc : int
@@ -605,15 +642,14 @@ class ParMat_petsc4py(p4pyPETSc.Mat):
         self.nzval_proteus2petsc = nzval_proteus2petsc
         self.ghosted_csr_mat=ghosted_csr_mat
         self.blockVecType = blockVecType
-        assert self.blockVecType == "simple", "petsc4py wrappers require self.blockVecType=simple"
+        assert self.blockVecType in ("simple","block"), "petsc4py wrappers require self.blockVecType=simple or block"
+        assert self.blockVecType == "simple" or proteus_jacobian is None, "block storage requires the interlaced proteus ordering"
         self.create(p4pyPETSc.COMM_WORLD)
         self.blockSize = max(1,par_bs)
         if self.blockSize > 1 and blockVecType != "simple":
-            ## \todo fix block aij in ParMat_petsc4py
-            self.setType('mpibaij')
+            self.setType('baij')
             self.setSizes([[self.blockSize*par_n,self.blockSize*par_N],[self.blockSize*par_nc,self.blockSize*par_Nc]],bsize=self.blockSize)
-            self.setBlockSize(self.blockSize)
-            self.subdomain2global = subdomain2global #no need to include extra block dofs?
+            self.subdomain2global = subdomain2global
         else:
             self.setType('aij')
             self.setSizes([[par_n*self.blockSize,par_N*self.blockSize],[par_nc*self.blockSize,par_Nc*self.blockSize]],bsize=1)
@@ -637,18 +673,28 @@ class ParMat_petsc4py(p4pyPETSc.Mat):
         else:
             self.csr_rep_local = ghosted_csr_mat.getSubMatCSRrepresentation(0,par_n)
         self.petsc_l2g = p4pyPETSc.LGMap()
-        self.petsc_l2g.create(self.subdomain2global)
+        if self.getBlockSize() > 1:
+            self.petsc_l2g.create(self.subdomain2global,bsize=self.blockSize)
+        else:
+            self.petsc_l2g.create(self.subdomain2global)
         self.setUp()
         self.setLGMap(self.petsc_l2g)
         #
-        self.colind_global = self.petsc_l2g.apply(self.csr_rep_local[1]) #prealloc needs global indices
-        self.setPreallocationCSR([self.csr_rep_local[0],self.colind_global,self.csr_rep_local[2]])
+        if self.getBlockSize() > 1:
+            #values are still set row by row from the scalar csr, only the preallocation is by block
+            rowptr_block,colind_block = blockSparsityPattern(self.csr_rep_local[0],self.csr_rep_local[1],self.blockSize)
+            self.colind_global = self.petsc_l2g.applyBlock(colind_block) #prealloc needs global indices
+            self.setPreallocationCSR([rowptr_block,self.colind_global])
+        else:
+            self.colind_global = self.petsc_l2g.apply(self.csr_rep_local[1]) #prealloc needs global indices
+            self.setPreallocationCSR([self.csr_rep_local[0],self.colind_global,self.csr_rep_local[2]])
         self.setFromOptions()
 
 
     @classmethod
     def create_ParMat_from_OperatorConstructor(cls,
-                                               operator):
+                                               operator,
+                                               par_info):
         """ Build a ParMat consistent with the problem from an Operator
         constructor matrix.
 
@@ -656,63 +702,25 @@ class ParMat_petsc4py(p4pyPETSc.Mat):
         ---------
         operator : :class:`proteus.superluWrappers.SparseMatrix`
             Matrix to be turned into a parallel petsc matrix.
+        par_info : :class:`ParInfo_petsc4py`
+            Parallel data of the model the operator was built for.
         """
-        par_bs = ParInfo_petsc4py.par_bs
-        par_n = ParInfo_petsc4py.par_n
-        par_N = ParInfo_petsc4py.par_N
-        par_nghost = ParInfo_petsc4py.par_nghost
-        petsc_subdomain2global_petsc = ParInfo_petsc4py.petsc_subdomain2global_petsc
-        subdomain2global = ParInfo_petsc4py.subdomain2global
-        petsc2proteus_subdomain = ParInfo_petsc4py.petsc2proteus_subdomain
-        proteus2petsc_subdomain = ParInfo_petsc4py.proteus2petsc_subdomain
-        dim = ParInfo_petsc4py.dim
-        # ARB - this is largely copied from Transport.py,
-        # a refactor should be done to elimate this duplication
         rowptr, colind, nzval = operator.getCSRrepresentation()
-
-        rowptr_petsc = rowptr.copy()
-        colind_petsc = colind.copy()
-        nzval_petsc = nzval.copy()
-        nzval_proteus2petsc = colind.copy()
-        nzval_petsc2proteus = colind.copy()
-        rowptr_petsc[0] = 0
-
-        for i in range(par_n+par_nghost):
-            start_proteus = rowptr[petsc2proteus_subdomain[i]]
-            end_proteus = rowptr[petsc2proteus_subdomain[i]+1]
-            nzrow = end_proteus - start_proteus
-            rowptr_petsc[i+1] = rowptr_petsc[i] + nzrow
-            start_petsc = rowptr_petsc[i]
-            end_petsc = rowptr_petsc[i+1]
-            petsc_cols_i = proteus2petsc_subdomain[colind[start_proteus:end_proteus]]
-            j_sorted = petsc_cols_i.argsort()
-            colind_petsc[start_petsc:end_petsc] = petsc_cols_i[j_sorted]
-            nzval_petsc[start_petsc:end_petsc] = nzval[start_proteus:end_proteus][j_sorted]
-            for j_petsc, j_proteus in zip(numpy.arange(start_petsc,end_petsc),
-                                          numpy.arange(start_proteus,end_proteus)[j_sorted]):
-                nzval_petsc2proteus[j_petsc] = j_proteus
-                nzval_proteus2petsc[j_proteus] = j_petsc
-
-        proteus_a = {}
-        petsc_a = {}
-
-        for i in range(dim):
-            for j,k in zip(colind[rowptr[i]:rowptr[i+1]],list(range(rowptr[i],rowptr[i+1]))):
-                proteus_a[i,j] = nzval[k]
-                petsc_a[proteus2petsc_subdomain[i],proteus2petsc_subdomain[j]] = nzval[k]
-        for i in range(dim):
-            for j,k in zip(colind_petsc[rowptr_petsc[i]:rowptr_petsc[i+1]],list(range(rowptr_petsc[i],rowptr_petsc[i+1]))):
-                nzval_petsc[k] = petsc_a[i,j]
+        (rowptr_petsc,
+         colind_petsc,
+         nzval_proteus2petsc,
+         nzval_petsc2proteus) = par_info.getPetscOrdering(rowptr,colind)
+        nzval_petsc = nzval[nzval_petsc2proteus]
 
         #additional stuff needed for petsc par mat
 
-        petsc_jacobian = SparseMat(dim,dim,nzval_petsc.shape[0], nzval_petsc, colind_petsc, rowptr_petsc)
+        petsc_jacobian = SparseMat(par_info.dim,par_info.dim,nzval_petsc.shape[0], nzval_petsc, colind_petsc, rowptr_petsc)
         return cls(petsc_jacobian,
-                   par_bs,
-                   par_n,
-                   par_N,
-                   par_nghost,
-                   petsc_subdomain2global_petsc,
+                   par_info.par_bs,
+                   par_info.par_n,
+                   par_info.par_N,
+                   par_info.par_nghost,
+                   par_info.petsc_subdomain2global_petsc,
                    proteus_jacobian = operator,
                    nzval_proteus2petsc=nzval_proteus2petsc)
 
@@ -772,6 +780,139 @@ def SparseMatFromDict(nr,nc,aDict):
     return (SparseMat(nr,nc,nnz,nzval,colind,rowptr),nzval)
 
 
+def blockComponentSparsity(rowptr,colind,blockSize):
+    """ Extract the sparsity pattern of one component from a blocked CSR pattern
+
+    The unknowns of the blocked matrix are interleaved, row and column
+    blockSize*i+k belong to unknown i of component k, and every block is
+    full, so the pattern of a component is that of the rows and columns of
+    component 0.
+
+    Parameters
+    ----------
+    rowptr : numpy array
+        CSR row pointer of the blocked matrix.
+    colind : numpy array
+        CSR column array of the blocked matrix.
+    blockSize : int
+        The number of interleaved components.
+
+    Returns
+    -------
+    (rowptr, colind) : numpy arrays of 32bit integers
+        CSR pattern of the component.
+    """
+    rowStart = numpy.asarray(rowptr[:-1:blockSize])
+    rowLength = (numpy.asarray(rowptr[1::blockSize]) - rowStart)//blockSize
+    rowptr_component = numpy.zeros((rowStart.shape[0]+1,),'i')
+    numpy.cumsum(rowLength,out=rowptr_component[1:])
+    row = numpy.repeat(numpy.arange(rowStart.shape[0]),rowLength)
+    entry = numpy.arange(rowptr_component[-1]) - rowptr_component[row]
+    colind_component = numpy.asarray(colind)[rowStart[row] + blockSize*entry]//blockSize
+    return rowptr_component,colind_component.astype('i')
+
+def sparsitySignature(rowptr,colind,nSamples=1024):
+    """ Cheap key of a CSR pattern for caching what is derived from it
+
+    Parameters
+    ----------
+    rowptr : numpy array
+        CSR row pointer.
+    colind : numpy array
+        CSR column array.
+    nSamples : int
+        The number of evenly spaced entries of each array to hash.
+
+    Returns
+    -------
+    signature : tuple
+        The sizes of the pattern and hashes of the sampled entries, which
+        are computed without touching every nonzero.
+    """
+    rowptr = numpy.asarray(rowptr)
+    colind = numpy.asarray(colind)
+    rowSample = rowptr[::max(1,rowptr.shape[0]//nSamples)]
+    colSample = colind[::max(1,colind.shape[0]//nSamples)]
+    return (rowptr.shape[0],colind.shape[0],
+            hash(rowSample.tobytes()),hash(colSample.tobytes()))
+
+def petscNonzeroOrdering(rowptr,colind,proteus2petsc_subdomain,petsc2proteus_subdomain):
+    """ Build the PETSc ordering of a CSR pattern in proteus subdomain ordering
+
+    Row i of the PETSc pattern is row petsc2proteus_subdomain[i] of the
+    proteus pattern with its columns mapped by proteus2petsc_subdomain
+    and sorted.
+
+    Parameters
+    ----------
+    rowptr : numpy array
+        CSR row pointer in proteus ordering.
+    colind : numpy array
+        CSR column array in proteus ordering.
+    proteus2petsc_subdomain : numpy array
+        Map from proteus to PETSc subdomain unknowns.
+    petsc2proteus_subdomain : numpy array
+        Map from PETSc to proteus subdomain unknowns.
+
+    Returns
+    -------
+    (rowptr_petsc, colind_petsc, nzval_proteus2petsc, nzval_petsc2proteus) : numpy arrays of 32bit integers
+        CSR pattern in PETSc ordering and the permutations of the
+        nonzeros, nzval_petsc = nzval[nzval_petsc2proteus] and
+        nzval = nzval_petsc[nzval_proteus2petsc].
+    """
+    rowptr = numpy.asarray(rowptr)
+    petsc2proteus_subdomain = numpy.asarray(petsc2proteus_subdomain)
+    nRows = petsc2proteus_subdomain.shape[0]
+    rowStart = rowptr[petsc2proteus_subdomain]
+    rowLength = rowptr[petsc2proteus_subdomain+1] - rowStart
+    rowptr_petsc = numpy.zeros((nRows+1,),'i')
+    numpy.cumsum(rowLength,out=rowptr_petsc[1:])
+    row = numpy.repeat(numpy.arange(nRows),rowLength)
+    nzval_petsc2proteus = rowStart[row] + numpy.arange(rowptr_petsc[-1]) - rowptr_petsc[row]
+    colind_petsc = numpy.asarray(proteus2petsc_subdomain)[numpy.asarray(colind)[nzval_petsc2proteus]]
+    #sort the columns of each row
+    order = numpy.lexsort((colind_petsc,row))
+    nzval_petsc2proteus = nzval_petsc2proteus[order].astype('i')
+    colind_petsc = colind_petsc[order].astype('i')
+    nzval_proteus2petsc = numpy.zeros((nzval_petsc2proteus.shape[0],),'i')
+    nzval_proteus2petsc[nzval_petsc2proteus] = numpy.arange(nzval_petsc2proteus.shape[0])
+    return rowptr_petsc,colind_petsc,nzval_proteus2petsc,nzval_petsc2proteus
+
+def blockSparsityPattern(rowptr,colind,blockSize):
+    """ Build the block CSR pattern of an interlaced CSR pattern
+
+    Block (I,J) is present if any entry of rows I*blockSize,...,
+    (I+1)*blockSize-1 has a column in J*blockSize,...,(J+1)*blockSize-1.
+
+    Parameters
+    ----------
+    rowptr : numpy array
+        CSR row pointer, the number of rows must be a multiple of blockSize.
+    colind : numpy array
+        CSR column array.
+    blockSize : int
+        The number of interlaced components.
+
+    Returns
+    -------
+    (rowptr_block, colind_block) : numpy arrays of 32bit integers
+        Block CSR pattern with sorted block columns in each block row.
+    """
+    rowptr = numpy.asarray(rowptr)
+    colind = numpy.asarray(colind)
+    nRows = rowptr.shape[0]-1
+    assert nRows % blockSize == 0, "number of rows %i is not a multiple of the block size %i" % (nRows,blockSize)
+    nBlockRows = nRows//blockSize
+    blockRow = numpy.repeat(numpy.arange(nRows,dtype='int64')//blockSize,numpy.diff(rowptr))
+    blockCol = colind.astype('int64')//blockSize
+    nBlockCols = int(blockCol.max())+1 if blockCol.shape[0] > 0 else 1
+    blocks = numpy.unique(blockRow*nBlockCols + blockCol)
+    rowptr_block = numpy.zeros((nBlockRows+1,),'i')
+    numpy.cumsum(numpy.bincount(blocks//nBlockCols,minlength=nBlockRows),out=rowptr_block[1:])
+    colind_block = (blocks % nBlockCols).astype('i')
+    return rowptr_block,colind_block
+
 def SparseMat(nr,nc,nnz,nzval,colind,rowptr):
     """ Build a nr x nc sparse matrix from the CSR data structures
 
@@ -24,6 +24,7 @@ from petsc4py import PETSc as p4pyPETSc
 from math import *
 import math
 from .Profiling import logEvent
+from .Profiling import timer
 
 class LinearSolver(object):
     """ The base class for linear solvers.
@@ -443,7 +444,7 @@ class KSP_petsc4py(LinearSolver):
         pc_setup_stage = p4pyPETSc.Log.Stage('pc_setup_stage')
         pc_setup_stage.push()
         self.petsc_L.zeroEntries()
-        assert self.petsc_L.getBlockSize() == 1, "petsc4py wrappers currently require 'simple' blockVec (blockSize=1) approach"
+        assert self.petsc_L.getBlockSize() == 1 or self.petsc_L.blockVecType == "block", "petsc4py wrappers require 'simple' blockVec (blockSize=1) unless block storage is used"
         if self.petsc_L.proteus_jacobian is not None:
             self.csr_rep[2][self.petsc_L.nzval_proteus2petsc] = self.petsc_L.proteus_csr_rep[2][:]
         if self.par_fullOverlap == True:
@@ -491,7 +492,8 @@ class KSP_petsc4py(LinearSolver):
 
         self.null_space.apply_ns(par_b)
 
-        self.ksp.solve(par_b,par_u)
+        with timer("KSP.solve"):
+            self.ksp.solve(par_b,par_u)
 
         logEvent("after ksp.rtol= %s ksp.atol= %s ksp.converged= %s ksp.its= %s ksp.norm= %s reason = %s" % (self.ksp.rtol,
                                                                                                              self.ksp.atol,
@@ -748,45 +750,16 @@ class SchurOperatorConstructor(object):
                 pass
 
     def _initializeMat(self,jacobian):
-        from . import Comm
-        comm = Comm.get()
         transport = self.L.pde
         rowptr, colind, nzval = jacobian.getCSRrepresentation()
-        rowptr_petsc = rowptr.copy()
-        colind_petsc = colind.copy()
-        nzval[:] = numpy.arange(nzval.shape[0])
-        nzval_petsc = nzval.copy()
-        nzval_proteus2petsc=colind.copy()
-        nzval_petsc2proteus=colind.copy()
-        rowptr_petsc[0] = 0
-        comm.beginSequential()
-        for i in range(LAT.ParInfo_petsc4py.par_n+LAT.ParInfo_petsc4py.par_nghost):
-            start_proteus = rowptr[LAT.ParInfo_petsc4py.petsc2proteus_subdomain[i]]
-            end_proteus = rowptr[LAT.ParInfo_petsc4py.petsc2proteus_subdomain[i]+1]
-            nzrow =  end_proteus - start_proteus
-            rowptr_petsc[i+1] = rowptr_petsc[i] + nzrow
-            start_petsc = rowptr_petsc[i]
-            end_petsc = rowptr_petsc[i+1]
-            petsc_cols_i = LAT.ParInfo_petsc4py.proteus2petsc_subdomain[colind[start_proteus:end_proteus]]
-            j_sorted = petsc_cols_i.argsort()
-            colind_petsc[start_petsc:end_petsc] = petsc_cols_i[j_sorted]
-            nzval_petsc[start_petsc:end_petsc] = nzval[start_proteus:end_proteus][j_sorted]
-            for j_petsc, j_proteus in zip(numpy.arange(start_petsc,end_petsc),
-                                          numpy.arange(start_proteus,end_proteus)[j_sorted]):
-                nzval_petsc2proteus[j_petsc] = j_proteus
-                nzval_proteus2petsc[j_proteus] = j_petsc
-        comm.endSequential()
-        assert(nzval_petsc.shape[0] == colind_petsc.shape[0] == rowptr_petsc[-1] - rowptr_petsc[0])
-        petsc_a = {}
-        proteus_a = {}
-        for i in range(transport.dim):
-            for j,k in zip(colind[rowptr[i]:rowptr[i+1]],list(range(rowptr[i],rowptr[i+1]))):
-                nzval[k] = i*transport.dim+j
-                proteus_a[i,j] = nzval[k]
-                petsc_a[LAT.ParInfo_petsc4py.proteus2petsc_subdomain[i],LAT.ParInfo_petsc4py.proteus2petsc_subdomain[j]] = nzval[k]
-        for i in range(transport.dim):
-            for j,k in zip(colind_petsc[rowptr_petsc[i]:rowptr_petsc[i+1]],list(range(rowptr_petsc[i],rowptr_petsc[i+1]))):
-                nzval_petsc[k] = petsc_a[i,j]
+        (rowptr_petsc,
+         colind_petsc,
+         nzval_proteus2petsc,
+         nzval_petsc2proteus) = transport.par_info.getPetscOrdering(rowptr,colind)
+        assert(nzval_petsc2proteus.shape[0] == colind_petsc.shape[0] == rowptr_petsc[-1] - rowptr_petsc[0])
+        #tag each nonzero with its proteus (row, column)
+        nzval[:] = numpy.repeat(numpy.arange(rowptr.shape[0]-1),numpy.diff(rowptr))*transport.dim + colind
+        nzval_petsc = nzval[nzval_petsc2proteus]
         return SparseMat(transport.dim,transport.dim,nzval_petsc.shape[0], nzval_petsc, colind_petsc, rowptr_petsc)
 
     def initializeTwoPhaseCp_rho(self):
@@ -1320,6 +1293,11 @@ class DofOrderInfo(object):
         """Virtual function with no implementation"""
         raise NotImplementedError()
 
+    def create_DOF_fields(self,
+                          num_components):
+        """Virtual function with no implementation"""
+        raise NotImplementedError()
+
     def set_model_info(self, model_info):
         self._model_info = model_info
 
@@ -1432,6 +1410,27 @@ class InterlacedDofOrderType(DofOrderInfo):
         velocityDOF = numpy.vstack(velocityDOF).transpose().flatten()
         return [velocityDOF, pressureDOF]
 
+    def create_DOF_fields(self,
+                          num_components):
+        """Build interlaced velocity and pressure component lists.
+
+        These describe the same splitting as create_DOF_lists for
+        operators stored with block size num_components (BAIJ), where
+        PETSc builds the index sets from the block structure.
+
+        Parameters
+        ----------
+        num_components: int
+            Number of pressure and velocity components
+
+        Returns
+        -------
+        DOF_output : lst of lists
+            This function returns a list with the components of each
+            field.  [velocityFields, pressureFields]
+        """
+        return [list(range(1,num_components)), [0]]
+
     def create_vel_DOF_IS(self,
                           ownership_range,
                           num_equations,
@@ -1674,7 +1673,8 @@ class SchurPrecon(KSP_Preconditioner):
         problems as blocked or end-to-end. Blocked systems are used
         for equal order finite element spaces (e.g. P1-P1).  In this
         case, the degrees of freedom are interlaced (e.g. p[0], u[0],
-        v[0], p[1], u[1], v[1], ...).
+        v[0], p[1], u[1], v[1], ...).  If the interlaced system is
+        stored by blocks (BAIJ) the split is set by component.
         """
         L_range = self.L.getOwnershipRange()
         neqns = self.L.getSizes()[0][0]
@@ -1686,7 +1686,14 @@ class SchurPrecon(KSP_Preconditioner):
         self.isp.createGeneral(dof_arrays[1],comm=p4pyPETSc.COMM_WORLD)
         self.isv = p4pyPETSc.IS()
         self.isv.createGeneral(dof_arrays[0],comm=p4pyPETSc.COMM_WORLD)
-        self.pc.setFieldSplitIS(('velocity',self.isv),('pressure',self.isp))
+        if (self.L.getBlockSize() == self.model_info.nc and
+            self.model_info.get_dof_order_type() == 'interlaced'):
+            dof_fields = dof_order_cls.create_DOF_fields(self.model_info.nc)
+            self.pc.setFieldSplitFields(self.model_info.nc,
+                                        ('velocity',dof_fields[0]),
+                                        ('pressure',dof_fields[1]))
+        else:
+            self.pc.setFieldSplitIS(('velocity',self.isv),('pressure',self.isp))
 
     def _converged_trueRes(self,ksp,its,rnorm):
         """ Function handle to feed to ksp's setConvergenceTest  """
@@ -251,8 +251,9 @@ class PUMIAdapt:
                     if(av.isLineGauge or av.isLineIntegralGauge): #if line gauges, need to remove all points
                       av.points = OrderedDict()
                     if(av.isGaugeOwner):
-                      if(self.comm.rank()==0 and not av.file.closed):
-                        av.file.close()
+                      #write the buffered samples, the gauge root after adaptation appends to the file
+                      av.flush()
+                      av.recorder = None
                       for item in av.pointGaugeVecs:
                         item.destroy()
                       for item in av.pointGaugeMats:
@@ -17,6 +17,9 @@ from builtins import object
 from .EGeometry import *
 import numpy as np
 import array
+import os
+import hashlib
+import tempfile
 from .Archiver import *
 from .LinearAlgebraTools import ParVec_petsc4py
 from .Profiling import logEvent,memory
@@ -506,6 +509,8 @@ class Mesh(object):
         This array lists the global edge number associated with every
         edge or face of an element.
     """
+    #number of element size groups in the bounding box search (see getElementBoxTrees)
+    nElementBoxGroups = 8
     #cek adding parallel support
     def __init__(self):
         #array interface
@@ -580,6 +585,12 @@ class Mesh(object):
         self.arGrid=None
         self.nLayersOfOverlap = None
         self.parallelPartitioningType = MeshParallelPartitioningTypes.element
+        #spatial index, built on demand (see getNodeTree and locatePoints)
+        self.nodeTree=None
+        self.elementBoxTrees=None
+        self.elementBoxes=None
+        #quadrature geometry shared by the models (see FemTools.getElementGeometryCache)
+        self.elementGeometryCache=None
     def partitionMesh(self,nLayersOfOverlap=1,parallelPartitioningType=MeshParallelPartitioningTypes.node):
         from . import cmeshTools
         from . import Comm
@@ -736,6 +747,118 @@ class Mesh(object):
         # #cmeshTools.deleteMeshDataStructures(self.cmesh)
         # logEvent(memory("Without global mesh","Mesh"),level=1)
         # comm.endSequential()
+    def invalidateSpatialIndex(self):
+        """
+        Discard the node tree and element boxes, this must be called when the nodes move
+        """
+        self.nodeTree=None
+        self.elementBoxTrees=None
+        self.elementBoxes=None
+    def getNodeTree(self):
+        """
+        Return a k-d tree (scipy.spatial.cKDTree) of the nodes
+
+        The tree is built on the first call and shared by all the
+        point queries on the mesh until invalidateSpatialIndex is
+        called.
+        """
+        nodeTree = getattr(self,'nodeTree',None)
+        if nodeTree is None or nodeTree.n != self.nNodes_global:
+            from scipy.spatial import cKDTree
+            self.nodeTree = nodeTree = cKDTree(self.nodeArray)
+        return nodeTree
+    def getElementBoxTrees(self):
+        """
+        Return k-d trees of the centers of the element bounding boxes
+
+        The boxes of the simplices in the first nd = nNodes_element-1
+        coordinates are stored in elementBoxes (nElements_global,2,nd).
+        The elements are grouped by the distance from their box center
+        to its corners, each group spanning a factor of 2 except the
+        last one, so that a point is only searched for within the
+        radius of the group and not that of the largest element. Returns
+        a list of (tree, elements, radius) for the groups.
+        """
+        elementBoxTrees = getattr(self,'elementBoxTrees',None)
+        if elementBoxTrees is None or sum(len(elements) for tree,elements,radius in elementBoxTrees) != self.nElements_global:
+            from scipy.spatial import cKDTree
+            x = self.nodeArray[self.elementNodesArray][:,:,:self.nNodes_element-1]
+            self.elementBoxes = np.stack((x.min(axis=1),x.max(axis=1)),axis=1)
+            centers = 0.5*(self.elementBoxes[:,0,:] + self.elementBoxes[:,1,:])
+            halfDiagonals = 0.5*(self.elementBoxes[:,1,:] - self.elementBoxes[:,0,:])
+            radii = np.sqrt((halfDiagonals**2).sum(axis=1))
+            maxRadius = radii.max(initial=0.0)
+            group = np.full(radii.shape,self.nElementBoxGroups-1,'i')
+            positive = radii > 0.0
+            group[positive] = np.minimum(np.floor(np.log2(maxRadius/radii[positive])),self.nElementBoxGroups-1)
+            self.elementBoxTrees = elementBoxTrees = []
+            for g in np.unique(group):
+                elements = np.where(group == g)[0].astype('i')
+                elementBoxTrees.append((cKDTree(centers[elements]),elements,radii[elements].max()))
+        return elementBoxTrees
+    def testElements(self,X,pointIndex,candidates,elements,xi):
+        """
+        Test the points X[pointIndex] against the candidate elements
+
+        Points not located yet (elements < 0) are assigned the first
+        candidate containing them, with their reference coordinates.
+        """
+        if len(candidates) == 0:
+            return
+        nd = xi.shape[1]
+        #the affine map is x = x_0 + J xi with columns of J the edges x_j - x_0
+        vertices = self.nodeArray[self.elementNodesArray[candidates]][:,:,:nd]
+        jacobian = np.transpose(vertices[:,1:nd+1,:] - vertices[:,:1,:],(0,2,1))
+        candidateXi = np.einsum('imn,in->im',np.linalg.inv(jacobian),X[pointIndex,:nd] - vertices[:,0,:])
+        onElement = np.logical_and((candidateXi >= 0).all(axis=1),candidateXi.sum(axis=1) <= 1)
+        onElement &= elements[pointIndex] < 0
+        found,first = np.unique(pointIndex[onElement],return_index=True)
+        elements[found] = candidates[onElement][first]
+        xi[found] = candidateXi[onElement][first]
+    def locatePoints(self,X):
+        """
+        Find the elements containing an array of points
+
+        Each point is tested against the elements around its nearest
+        node, the points not found there against the elements whose
+        bounding box contains them.
+
+        Returns an array with the element of each point, -1 if the
+        point is not on this mesh, and an (nPoints,nd) array with the
+        reference coordinates of each point on its element. Only meshes
+        of affine simplices are supported.
+        """
+        assert not isinstance(self,(QuadrilateralMesh,HexahedralMesh)), "locatePoints requires a simplicial mesh"
+        X = np.asarray(X,dtype='d').reshape(-1,3)
+        nPoints = X.shape[0]
+        nd = self.nNodes_element - 1
+        elements = -np.ones((nPoints,),'i')
+        xi = np.zeros((nPoints,nd),'d')
+        if nPoints == 0 or self.nElements_global == 0:
+            return elements,xi
+        #elements around the nearest node
+        distances,nodes = self.getNodeTree().query(X)
+        starts = self.nodeElementOffsets[nodes]
+        counts = self.nodeElementOffsets[nodes+1] - starts
+        pointIndex = np.repeat(np.arange(nPoints),counts)
+        offsets = np.repeat(starts - np.cumsum(counts) + counts,counts) + np.arange(counts.sum())
+        self.testElements(X,pointIndex,self.nodeElementsArray[offsets],elements,xi)
+        #elements whose bounding box contains the point
+        notFound = np.where(elements < 0)[0]
+        if len(notFound) > 0:
+            pointIndex = []
+            candidates = []
+            for elementBoxTree,treeElements,radius in self.getElementBoxTrees():
+                candidateLists = elementBoxTree.query_ball_point(X[notFound,:nd],radius*(1.0+1.0e-8))
+                counts = np.array([len(c) for c in candidateLists],'i')
+                pointIndex.append(np.repeat(notFound,counts))
+                candidates.append(treeElements[np.fromiter((i for c in candidateLists for i in c),'i',counts.sum())])
+            pointIndex = np.concatenate(pointIndex)
+            candidates = np.concatenate(candidates)
+            inBox = np.logical_and((X[pointIndex,:nd] >= self.elementBoxes[candidates,0,:]).all(axis=1),
+                                   (X[pointIndex,:nd] <= self.elementBoxes[candidates,1,:]).all(axis=1))
+            self.testElements(X,pointIndex[inBox],candidates[inBox],elements,xi)
+        return elements,xi
     def writeMeshXdmf(self,ar,name='',t=0.0,init=False,meshChanged=False,Xdmf_ElementTopology="Triangle",tCount=0, EB=False):
         if self.arGridCollection is not None:
             init = False
@@ -5148,8 +5271,197 @@ class MultilevelQuadrilateralMesh(MultilevelMesh):
         self.elementChildren.append(childrenDict)
 
 
+class TriangulatedBathymetry(object):
+    """
+    Linear interpolant of a bathymetry point cloud on its Delaunay triangulation
+
+    The triangulation is built once, on rank 0. With cacheDir it is saved
+    with the point cloud and the point to triangle map as .npy files in
+    cacheDir/bathymetry_<checksum of the point cloud>, and later runs on the
+    same data memory map those files instead of triangulating again. Without
+    cacheDir the arrays are broadcast from rank 0.
+
+    Instances are called like the bathymetry functions of SWFlowProblem,
+    bathymetry([x,y]), so each rank only interpolates the nodes of its own
+    subdomain. Points are located by searching the triangles around their
+    nearest survey points, and the points not found there by walking across
+    the triangulation from the nearest survey point. Points outside the
+    triangulation get the value of the nearest survey point.
+    """
+    #numbers of nearest survey points whose triangles are searched before walking
+    searchNeighbors = (1,4)
+    arrayNames = ('points','values','simplices','neighbors','pointSimplexOffsets','pointSimplexArray')
+    def __init__(self,bathy,cacheDir=None,comm=None):
+        from scipy.spatial import cKDTree
+        if comm is None:
+            from . import Comm
+            comm = Comm.get()
+        bathy = np.ascontiguousarray(bathy,dtype='d')
+        checksum = hashlib.sha1(repr(bathy.shape).encode('utf-8'))
+        checksum.update(bathy.tobytes())
+        self.checksum = checksum.hexdigest()
+        if cacheDir is None:
+            self.cacheFile = None
+            arrays = None
+            if comm.isMaster():
+                arrays = self.triangulate(bathy)
+            arrays = comm.comm.tompi4py().bcast(arrays,root=0)
+        else:
+            self.cacheFile = os.path.join(cacheDir,'bathymetry_'+self.checksum)
+            if comm.isMaster():
+                if os.path.exists(self.cacheFile):
+                    logEvent("TriangulatedBathymetry: using cached triangulation "+self.cacheFile)
+                else:
+                    self.writeCache(self.triangulate(bathy))
+            comm.barrier()
+            arrays = dict((name,np.load(os.path.join(self.cacheFile,name+'.npy'),mmap_mode='r'))
+                          for name in self.arrayNames)
+        for name in self.arrayNames:
+            setattr(self,name,arrays[name])
+        self.tree = cKDTree(self.points)
+
+    @staticmethod
+    def triangulate(bathy):
+        """
+        triangulate the (x,y) coordinates of the points and build the map from points to the triangles around them
+
+        neighbors[eN,j] is the triangle opposite vertex j of triangle eN, -1 on the boundary
+        """
+        from scipy.spatial import Delaunay
+        logEvent("TriangulatedBathymetry: triangulating %i points" % (bathy.shape[0],))
+        tri = Delaunay(bathy[:,:2])
+        simplices = np.ascontiguousarray(tri.simplices,dtype='i')
+        nPoints = bathy.shape[0]
+        pointSimplexOffsets = np.zeros((nPoints+1,),'i')
+        pointSimplexOffsets[1:] = np.cumsum(np.bincount(simplices.flat,minlength=nPoints))
+        pointSimplexArray = (np.argsort(simplices.flat,kind='stable')//3).astype('i')
+        return {'points':np.ascontiguousarray(bathy[:,:2]),
+                'values':bathy[:,2].copy(),
+                'simplices':simplices,
+                'neighbors':np.ascontiguousarray(tri.neighbors,dtype='i'),
+                'pointSimplexOffsets':pointSimplexOffsets,
+                'pointSimplexArray':pointSimplexArray}
+
+    def writeCache(self,arrays):
+        """
+        save the arrays to the cache, they are written to a temporary directory that is then renamed so readers never see a partial cache
+        """
+        cacheDir = os.path.dirname(self.cacheFile)
+        if not os.path.exists(cacheDir):
+            try:
+                os.makedirs(cacheDir)
+            except OSError:
+                pass
+        tmpDir = tempfile.mkdtemp(dir=cacheDir,prefix='.bathymetry')
+        for name in self.arrayNames:
+            np.save(os.path.join(tmpDir,name+'.npy'),arrays[name])
+        try:
+            os.rename(tmpDir,self.cacheFile)
+        except OSError:
+            #another run wrote the same cache first
+            import shutil
+            shutil.rmtree(tmpDir,ignore_errors=True)
+        logEvent("TriangulatedBathymetry: saved triangulation to "+self.cacheFile)
+
+    def locate(self,xy,stars,simplex,weights):
+        """
+        find the triangle containing each point among the triangles around the survey point stars[i]
+
+        only points with simplex < 0 are searched, simplex and the barycentric weights are set for the points found
+        """
+        starSizes = self.pointSimplexOffsets[stars+1] - self.pointSimplexOffsets[stars]
+        for k in range(starSizes.max(initial=0)):
+            pN = np.where((simplex < 0) & (starSizes > k))[0]
+            eN = self.pointSimplexArray[self.pointSimplexOffsets[stars[pN]]+k]
+            w = self.barycentricWeights(eN,xy[pN])
+            inside = np.all(w >= -1.0e-12,axis=1)
+            simplex[pN[inside]] = eN[inside]
+            weights[pN[inside]] = w[inside]
+
+    def barycentricWeights(self,eN,xy):
+        """
+        barycentric coordinates of the points xy[i] in the triangles eN[i]
+        """
+        x = self.points[self.simplices[eN]]
+        x0 = x[:,0,:]
+        jacobian = np.stack((x[:,1,:]-x0,x[:,2,:]-x0),axis=2)
+        xi = np.linalg.solve(jacobian,(xy-x0)[:,:,np.newaxis])[:,:,0]
+        return np.column_stack((1.0 - xi[:,0] - xi[:,1],xi[:,0],xi[:,1]))
+
+    def walk(self,xy,start,simplex,weights):
+        """
+        find the triangle containing each point by walking from the triangle start[i] across the edges facing the point
+
+        the walk ends on a Delaunay triangulation, points that leave the triangulation keep simplex < 0
+        """
+        pN = np.arange(xy.shape[0])
+        eN = start.copy()
+        for step in range(self.simplices.shape[0]):
+            if len(pN) == 0:
+                break
+            w = self.barycentricWeights(eN,xy[pN])
+            inside = np.all(w >= -1.0e-12,axis=1)
+            simplex[pN[inside]] = eN[inside]
+            weights[pN[inside]] = w[inside]
+            outside = ~inside
+            pN = pN[outside]
+            eN = self.neighbors[eN[outside],np.argmin(w[outside],axis=1)]
+            inHull = eN >= 0
+            pN = pN[inHull]
+            eN = eN[inHull]
+
+    def interpolate(self,xy):
+        """
+        interpolate the bathymetry at an (nPoints,2) array of points
+        """
+        nPoints = xy.shape[0]
+        simplex = -np.ones((nPoints,),'i')
+        weights = np.zeros((nPoints,3),'d')
+        distance,nearest = self.tree.query(xy,k=1)
+        nearest = np.asarray(nearest,'i').reshape(nPoints)
+        nSearched = 0
+        for nNeighbors in self.searchNeighbors:
+            nNeighbors = min(nNeighbors,self.points.shape[0])
+            pN = np.where(simplex < 0)[0]
+            if len(pN) == 0 or nNeighbors <= nSearched:
+                break
+            distance,neighbors = self.tree.query(xy[pN],k=nNeighbors)
+            neighbors = neighbors.reshape(len(pN),nNeighbors)
+            found = -np.ones((len(pN),),'i')
+            w = np.zeros((len(pN),3),'d')
+            for j in range(nSearched,nNeighbors):
+                self.locate(xy[pN],neighbors[:,j],found,w)
+            simplex[pN] = found
+            weights[pN] = w
+            nSearched = nNeighbors
+        pN = np.where(simplex < 0)[0]
+        if len(pN) > 0:
+            found = -np.ones((len(pN),),'i')
+            w = np.zeros((len(pN),3),'d')
+            #survey points dropped by the triangulation have no triangles, any start will do for them
+            start = self.pointSimplexArray[np.minimum(self.pointSimplexOffsets[nearest[pN]],len(self.pointSimplexArray)-1)]
+            self.walk(xy[pN],start,found,w)
+            simplex[pN] = found
+            weights[pN] = w
+        z = self.values[nearest]
+        located = simplex >= 0
+        z[located] = np.einsum('pj,pj->p',weights[located],self.values[self.simplices[simplex[located]]])
+        return z
+
+    def __call__(self,X):
+        x = np.asarray(X[0],'d')
+        y = np.asarray(X[1],'d')
+        return self.interpolate(np.column_stack((x.ravel(),y.ravel()))).reshape(x.shape)
+
 class InterpolatedBathymetryMesh(MultilevelTriangularMesh):
-    """A triangular mesh that interpolates bathymetry from a point cloud"""
+    """A triangular mesh that interpolates bathymetry from a point cloud
+
+    With bathyType="points" the data are interpolated with a
+    TriangulatedBathymetry, whose triangulation is kept in bathyCacheDir
+    when it is given.
+    """
+    #number of points tested against candidate elements at once
+    locateChunkSize = 1000000
     def __init__(self,
                  domain,
                  triangleOptions,
@@ -5162,6 +5474,7 @@ class InterpolatedBathymetryMesh(MultilevelTriangularMesh):
                  bathyAssignmentScheme="interpolation",#"localAveraging","L2-projection","H1-projection"
                  errorNormType="L2", #L1,Linfty
                  refineType=0,
+                 bathyCacheDir=None,
                  ):
         from scipy import interpolate as scipy_interpolate
         if maxElementDiameter:
@@ -5197,8 +5510,7 @@ class InterpolatedBathymetryMesh(MultilevelTriangularMesh):
             self.pointElementsArray_old = -np.ones((self.nPoints_global,),'i')
             self.pointElementsArray = -np.ones((self.nPoints_global,),'i')
             self.pointNodeWeightsArray = np.zeros((self.nPoints_global,3),'d')
-            self.bathyInterpolant = scipy_interpolate.LinearNDInterpolator(self.domain.bathy[:,:2],self.domain.bathy[:,2])
-            self.bathyNearestNeighbor = scipy_interpolate.NearestNDInterpolator(self.domain.bathy[:,:2], self.domain.bathy[:,2])
+            self.bathyInterpolant = TriangulatedBathymetry(self.domain.bathy,cacheDir=bathyCacheDir)
         elif bathyType == "grid":
             self.nPoints_global = self.domain.bathy.shape[0]
             self.pointElementsArray_old = -np.ones((self.nPoints_global,),'i')
@@ -5246,289 +5558,144 @@ class InterpolatedBathymetryMesh(MultilevelTriangularMesh):
         if self.bathyType == 'grid':
             mesh.nodeArray[:,2] = self.bathyInterpolant.ev(mesh.nodeArray[:,0],mesh.nodeArray[:,1])
         else:
-            mesh.nodeArray[:,2] = self.bathyInterpolant(mesh.nodeArray[:,0],mesh.nodeArray[:,1])
-            nI = np.isnan(mesh.nodeArray[:,2])
-            mesh.nodeArray[nI,2] = self.bathyNearestNeighbor(mesh.nodeArray[nI,0],mesh.nodeArray[nI,1])
+            mesh.nodeArray[:,2] = self.bathyInterpolant([mesh.nodeArray[:,0],mesh.nodeArray[:,1]])
 
     def setMeshBathymetry_localAveraging(self,mesh):
         """
         calculate the arithmetic mean bathymetry of points inside each triangle and then assign the area-weighted average of the element means to each node
         """
-        from .FemTools import AffineMaps,ReferenceSimplex,LinearOnSimplexWithNodalBasis
-        interpolationSpace = LinearOnSimplexWithNodalBasis(nd=2)
-        #maps = AffineMaps(mesh,interpolationSpace.referenceElement,interpolationSpace)
-        #maps.useC = True
         #calculate mean element height for each element
         #uses arithmetic mean, so it assumes the "patch" associated with each point the same size (weight)
-        mesh.elementMeanZ = np.zeros((mesh.nElements_global,),'d')
-        for pN in range(self.nPoints_global):
-            eN = self.pointElementsArray[pN]
-            if eN >= 0:
-                if mesh.nPoints_element[eN] > 0:
-                    mesh.elementMeanZ[eN] += old_div(self.domain.bathy[pN,2],float(mesh.nPoints_element[eN]))
-                    mesh.nodeArray[mesh.elementNodesArray[eN,0],2] = 0.0
-                    mesh.nodeArray[mesh.elementNodesArray[eN,1],2] = 0.0
-                    mesh.nodeArray[mesh.elementNodesArray[eN,2],2] = 0.0
+        located = self.pointElementsArray >= 0
+        hasPoints = mesh.nPoints_element > 0
+        mesh.elementMeanZ = np.bincount(self.pointElementsArray[located],
+                                        weights=self.domain.bathy[located,2],
+                                        minlength=mesh.nElements_global)
+        mesh.elementMeanZ[hasPoints] /= mesh.nPoints_element[hasPoints]
         #now assign the mesh node bathmetry as an area weighted average of the element mean
-        sumArray = mesh.nodeArray[:,2].copy()
-        sumArray[:]=0.0
-        for eN in range(mesh.nElements_global):
-            if mesh.nPoints_element[eN] > 0:#only calculate a contribution if this element contains a point
-                #calculate triangle area and assign weighted average of element means to node
-                xiArray = np.zeros((2,),'d')
-                #
-                grad_psi = np.zeros((interpolationSpace.dim,
-                                        interpolationSpace.referenceElement.dim),
-                                       'd')
-                dx = np.zeros((interpolationSpace.referenceElement.dim),
-                                 'd')
-                jacobian = np.zeros((interpolationSpace.referenceElement.dim,
-                                        interpolationSpace.referenceElement.dim),
-                                       'd')
-                inverseJacobian = np.zeros((interpolationSpace.referenceElement.dim,
-                                               interpolationSpace.referenceElement.dim),
-                                              'd')
-                for j in interpolationSpace.range_dim:
-                    grad_psi[j,:] = interpolationSpace.basisGradients[j](xiArray)#evaluate at zero because we can (psi is linear)
-                jacobian.flat[:]=0.0
-                inverseJacobian.flat[:]=0.0
-                for j in interpolationSpace.range_dim:
-                    J = mesh.elementNodesArray[eN,j]
-                    for m in interpolationSpace.referenceElement.range_dim:
-                        for n in interpolationSpace.referenceElement.range_dim:
-                            jacobian[m,n] += mesh.nodeArray[J,m]*grad_psi[j,n]
-                J = mesh.elementNodesArray[eN,0]
-                inverseJacobian = inv(jacobian)
-                area = 0.5*det(jacobian)
-                sumArray[mesh.elementNodesArray[eN,0]] += old_div(area,mesh.nodeSupportArray[mesh.elementNodesArray[eN,0]])
-                sumArray[mesh.elementNodesArray[eN,1]] += old_div(area,mesh.nodeSupportArray[mesh.elementNodesArray[eN,1]])
-                sumArray[mesh.elementNodesArray[eN,2]] += old_div(area,mesh.nodeSupportArray[mesh.elementNodesArray[eN,2]])
-                mesh.nodeArray[mesh.elementNodesArray[eN,0],2] += area*mesh.elementMeanZ[eN]/mesh.nodeSupportArray[mesh.elementNodesArray[eN,0]]
-                mesh.nodeArray[mesh.elementNodesArray[eN,1],2] += area*mesh.elementMeanZ[eN]/mesh.nodeSupportArray[mesh.elementNodesArray[eN,1]]
-                mesh.nodeArray[mesh.elementNodesArray[eN,2],2] += area*mesh.elementMeanZ[eN]/mesh.nodeSupportArray[mesh.elementNodesArray[eN,2]]
-        #cek debug
-        #print "sum of a nodes element areas divided by node support shoudl be 1 ",sumArray
+        elementNodes = mesh.elementNodesArray[hasPoints]
+        weightedMeanZ = mesh.area_element[hasPoints]*mesh.elementMeanZ[hasPoints]
+        nodeZ = mesh.nodeArray[:,2].copy()
+        nodeZ[elementNodes.flat] = 0.0
+        for j in range(3):
+            np.add.at(nodeZ,elementNodes[:,j],weightedMeanZ/mesh.nodeSupportArray[elementNodes[:,j]])
+        mesh.nodeArray[:,2] = nodeZ
+    def elementAffineMaps(self,mesh):
+        """
+        calculate the first node, the inverse Jacobian, and the area of each triangle
+        """
+        x = mesh.nodeArray[mesh.elementNodesArray,:2]
+        x0 = x[:,0,:]
+        jacobian = np.stack((x[:,1,:]-x0,x[:,2,:]-x0),axis=2)
+        det = jacobian[:,0,0]*jacobian[:,1,1] - jacobian[:,0,1]*jacobian[:,1,0]
+        inverseJacobian = np.empty_like(jacobian)
+        inverseJacobian[:,0,0] = jacobian[:,1,1]/det
+        inverseJacobian[:,0,1] = -jacobian[:,0,1]/det
+        inverseJacobian[:,1,0] = -jacobian[:,1,0]/det
+        inverseJacobian[:,1,1] = jacobian[:,0,0]/det
+        return x0,inverseJacobian,0.5*det
+    def testPoints(self,pointNumbers,elements,x0,inverseJacobian):
+        """
+        assign points to candidate elements if they lie in them
+
+        pointNumbers and elements are arrays of the same length, the
+        points are processed in chunks of locateChunkSize to bound memory
+        """
+        for start in range(0,len(pointNumbers),self.locateChunkSize):
+            pN = pointNumbers[start:start+self.locateChunkSize]
+            eN = elements[start:start+self.locateChunkSize]
+            dx = self.domain.bathy[pN,:2] - x0[eN]
+            xi = np.einsum('pmn,pn->pm',inverseJacobian[eN],dx)
+            weights = np.column_stack((1.0 - xi[:,0] - xi[:,1],xi[:,0],xi[:,1]))
+            #barycentric coordinates are non-negative so we're in this element
+            inside = np.all(weights >= 0.0,axis=1)
+            self.pointElementsArray[pN[inside]] = eN[inside]
+            self.pointNodeWeightsArray[pN[inside]] = weights[inside]
+    def testPointsInStars(self,pointNumbers,candidateOffsets,candidates,stars,x0,inverseJacobian):
+        """
+        assign points to the element containing them among the candidates of their star
+
+        the candidates of star s are candidates[candidateOffsets[s]:candidateOffsets[s+1]]
+        """
+        starSizes = candidateOffsets[stars+1] - candidateOffsets[stars]
+        for k in range(starSizes.max(initial=0)):
+            hasCandidate = starSizes > k
+            self.testPoints(pointNumbers[hasCandidate],
+                            candidates[candidateOffsets[stars[hasCandidate]]+k],
+                            x0,inverseJacobian)
+    def countPoints(self,mesh,area_element):
+        """
+        count the points in each element and add up the areas of the
+        elements containing points around each node
+        """
+        mesh.area_element = area_element
+        mesh.nodeSupportArray = np.zeros((mesh.nNodes_global,),'d')
+        located = self.pointElementsArray >= 0
+        mesh.nPoints_element = np.bincount(self.pointElementsArray[located],
+                                           minlength=mesh.nElements_global).astype('i')
+        hasPoints = mesh.nPoints_element > 0
+        for j in range(3):
+            np.add.at(mesh.nodeSupportArray,mesh.elementNodesArray[hasPoints,j],mesh.area_element[hasPoints])
     def locatePoints(self,mesh):
         """
         locate the element containing each point
 
         this should only be used on very coarse meshes
         """
-        from .FemTools import AffineMaps,ReferenceSimplex,LinearOnSimplexWithNodalBasis
-        interpolationSpace = LinearOnSimplexWithNodalBasis(nd=2)
-        #maps = AffineMaps(mesh,interpolationSpace.referenceElement,interpolationSpace)
-        #maps.useC = False
         #find the elements that contain bathymetry points and calculate:
         # - for each element, the number of bathmetry points in that element
         # - for each node, the total area of the nodes elements that containing bathmetry points
         # - the area of each element
         # - the total area covered by elements containing bathmetry points
-        mesh.nPoints_element = np.zeros((mesh.nElements_global,),'i')
-        mesh.nodeSupportArray = np.zeros((mesh.nNodes_global,),'d')
-        mesh.area_element =  np.zeros((mesh.nElements_global,),'d')
+        x0,inverseJacobian,area_element = self.elementAffineMaps(mesh)
         self.pointElementsArray[:] = -1
-        self.totalArea = 0.0
-        for eN in range(mesh.nElements_global):
-            #map points to reference space and test if it lies in the reference triangle
-            xiArray = np.zeros((2,),'d')
-            xiArray[:] = 0.0
-            #
-            grad_psi = np.zeros((interpolationSpace.dim,
-                                    interpolationSpace.referenceElement.dim),
-                                   'd')
-            dx = np.zeros((interpolationSpace.referenceElement.dim),
-                             'd')
-            jacobian = np.zeros((interpolationSpace.referenceElement.dim,
-                                    interpolationSpace.referenceElement.dim),
-                                   'd')
-            inverseJacobian = np.zeros((interpolationSpace.referenceElement.dim,
-                                           interpolationSpace.referenceElement.dim),
-                                          'd')
-            for j in interpolationSpace.range_dim:
-                grad_psi[j,:] = interpolationSpace.basisGradients[j](xiArray[0])#evalute at zero because we can (psi is linear)
-            jacobian.flat[:]=0.0
-            inverseJacobian.flat[:]=0.0
-            for j in interpolationSpace.range_dim:
-                J = mesh.elementNodesArray[eN,j]
-                for m in interpolationSpace.referenceElement.range_dim:
-                    for n in interpolationSpace.referenceElement.range_dim:
-                        jacobian[m,n] += mesh.nodeArray[J,m]*grad_psi[j,n]
-            J = mesh.elementNodesArray[eN,0]
-            inverseJacobian = inv(jacobian)
-            area = 0.5*det(jacobian)
-            mesh.area_element[eN] = area
-            self.totalArea += area
-            for pN in range(self.nPoints_global):#can optimize by skipping previously found points
-                xiArray[:] = 0.0
-                dx[:]=self.domain.bathy[pN,:2]
-                for m in interpolationSpace.referenceElement.range_dim:
-                    dx[m]-=mesh.nodeArray[J,m]
-                for m in interpolationSpace.referenceElement.range_dim:
-                    for n in interpolationSpace.referenceElement.range_dim:
-                        xiArray[m] += inverseJacobian[m,n]*dx[n]
-                #barycentric coordinates are non-negative so we're in this element
-                if xiArray[0] >=0.0 and xiArray[1] >= 0.0 and 1.0 - xiArray[0] - xiArray[1] >= 0.0:
-                    self.pointElementsArray[pN] = eN
-                    self.pointNodeWeightsArray[pN,0] = interpolationSpace.basis[0](xiArray)
-                    self.pointNodeWeightsArray[pN,1] = interpolationSpace.basis[1](xiArray)
-                    self.pointNodeWeightsArray[pN,2] = interpolationSpace.basis[2](xiArray)
-        #count the number of points inside each element
-        for pN in range(self.nPoints_global):
-            if self.pointElementsArray[pN] >= 0:
-                mesh.nPoints_element[self.pointElementsArray[pN]] += 1
-        #add up the support area for each node
+        pointNumbers = np.arange(self.nPoints_global)
         for eN in range(mesh.nElements_global):
-            if mesh.nPoints_element[eN] > 0:
-                mesh.nodeSupportArray[mesh.elementNodesArray[eN,0]] += mesh.area_element[eN]
-                mesh.nodeSupportArray[mesh.elementNodesArray[eN,1]] += mesh.area_element[eN]
-                mesh.nodeSupportArray[mesh.elementNodesArray[eN,2]] += mesh.area_element[eN]
+            self.testPoints(pointNumbers,np.full(self.nPoints_global,eN),x0,inverseJacobian)
+        self.countPoints(mesh,area_element)
+        self.totalArea = area_element.sum()
     def locatePoints_refined(self,mesh):
         """
         locate the element containing each point
 
-        this should only be used on very coarse meshes
+        only the children of the element containing the point on the parent mesh are searched
         """
-        from .FemTools import AffineMaps,ReferenceSimplex,LinearOnSimplexWithNodalBasis
-        interpolationSpace = LinearOnSimplexWithNodalBasis(nd=2)
-        #maps = AffineMaps(mesh,interpolationSpace.referenceElement,interpolationSpace)
-        #maps.useC = False
-        #find the elements that contain bathymetry points and calculate:
-        # - for each element, the number of bathmetry points in that element
-        # - for each node, the total area of the nodes elements that containing bathmetry points
-        # - the area of each element
-        # - the total area covered by elements containing bathmetry points
-        mesh.nPoints_element = np.zeros((mesh.nElements_global,),'i')
-        mesh.nodeSupportArray = np.zeros((mesh.nNodes_global,),'d')
-        mesh.area_element =  np.zeros((mesh.nElements_global,),'d')
-        self.totalArea = 0.0
+        x0,inverseJacobian,area_element = self.elementAffineMaps(mesh)
         self.pointElementsArray_old[:] = self.pointElementsArray
         self.pointElementsArray[:] = -1
-        for pN in range(self.nPoints_global):
-            eN_parent = self.pointElementsArray_old[pN]
-            for eN in self.elementChildrenArrayList[-1][self.elementChildrenOffsetsList[-1][eN_parent]:self.elementChildrenOffsetsList[-1][eN_parent+1]]:
-                xiArray = np.zeros((2,),'d')
-                xiArray[:] = 0.0
-                grad_psi = np.zeros((interpolationSpace.dim,
-                                        interpolationSpace.referenceElement.dim),
-                                       'd')
-                dx = np.zeros((interpolationSpace.referenceElement.dim),
-                                 'd')
-                jacobian = np.zeros((interpolationSpace.referenceElement.dim,
-                                        interpolationSpace.referenceElement.dim),
-                                       'd')
-                inverseJacobian = np.zeros((interpolationSpace.referenceElement.dim,
-                                               interpolationSpace.referenceElement.dim),
-                                              'd')
-                for j in interpolationSpace.range_dim:
-                    grad_psi[j,:] = interpolationSpace.basisGradients[j](xiArray[0])#evalute at zero because we can (psi is linear)
-                jacobian.flat[:]=0.0
-                inverseJacobian.flat[:]=0.0
-                for j in interpolationSpace.range_dim:
-                    J = mesh.elementNodesArray[eN,j]
-                    for m in interpolationSpace.referenceElement.range_dim:
-                        for n in interpolationSpace.referenceElement.range_dim:
-                            jacobian[m,n] += mesh.nodeArray[J,m]*grad_psi[j,n]
-                J = mesh.elementNodesArray[eN,0]
-                inverseJacobian = inv(jacobian)
-                area = 0.5*det(jacobian)
-                mesh.area_element[eN] = area
-                self.totalArea += area
-                xiArray[:] = 0.0
-                dx[:]=self.domain.bathy[pN,:2]
-                for m in interpolationSpace.referenceElement.range_dim:
-                    dx[m]-=mesh.nodeArray[J,m]
-                for m in interpolationSpace.referenceElement.range_dim:
-                    for n in interpolationSpace.referenceElement.range_dim:
-                        xiArray[m] += inverseJacobian[m,n]*dx[n]
-                #barycentric coordinates are non-negative so we're in this element
-                if xiArray[0] >=0.0 and xiArray[1] >= 0.0 and 1.0 - xiArray[0] - xiArray[1] >= 0.0:
-                    self.pointElementsArray[pN] = eN
-                    self.pointNodeWeightsArray[pN,0] = interpolationSpace.basis[0](xiArray)
-                    self.pointNodeWeightsArray[pN,1] = interpolationSpace.basis[1](xiArray)
-                    self.pointNodeWeightsArray[pN,2] = interpolationSpace.basis[2](xiArray)
-        #count the number of points inside each element
-        for pN in range(self.nPoints_global):
-            if self.pointElementsArray[pN] >= 0:
-                mesh.nPoints_element[self.pointElementsArray[pN]] += 1
-        #add up the support area for each node
-        for eN in range(mesh.nElements_global):
-            if mesh.nPoints_element[eN] > 0:
-                mesh.nodeSupportArray[mesh.elementNodesArray[eN,0]] += mesh.area_element[eN]
-                mesh.nodeSupportArray[mesh.elementNodesArray[eN,1]] += mesh.area_element[eN]
-                mesh.nodeSupportArray[mesh.elementNodesArray[eN,2]] += mesh.area_element[eN]
+        pointNumbers = np.where(self.pointElementsArray_old >= 0)[0]
+        self.testPointsInStars(pointNumbers,
+                               self.elementChildrenOffsetsList[-1],
+                               self.elementChildrenArrayList[-1],
+                               self.pointElementsArray_old[pointNumbers],
+                               x0,inverseJacobian)
+        self.countPoints(mesh,area_element)
+        #the children of a point's parent element are counted once per point
+        childrenArea_parent = np.bincount(self.elementParentsArrayList[-1],
+                                          weights=area_element,
+                                          minlength=len(self.elementChildrenOffsetsList[-1])-1)
+        self.totalArea = childrenArea_parent[self.pointElementsArray_old[pointNumbers]].sum()
     def locatePoints_initial(self,mesh):
         """
         locate the element containing each point
 
-        first find the nearest node, then loop over that node's  elements
+        first find the nearest node, then search that node's  elements
         """
         from scipy.spatial import cKDTree
-        from .FemTools import AffineMaps,ReferenceSimplex,LinearOnSimplexWithNodalBasis
-        interpolationSpace = LinearOnSimplexWithNodalBasis(nd=2)
-        #find the elements that contain bathymetry points and calculate:
-        # - for each element, the number of bathmetry points in that element
-        # - for each node, the total area of the nodes elements that contain bathmetry points
-        # - the area of each element
-        # - the total area covered by elements containing bathmetry points
-        mesh.nPoints_element = np.zeros((mesh.nElements_global,),'i')
-        mesh.nodeSupportArray = np.zeros((mesh.nNodes_global,),'d')
-        mesh.area_element =  np.zeros((mesh.nElements_global,),'d')
-        self.totalArea = 0.0
+        x0,inverseJacobian,area_element = self.elementAffineMaps(mesh)
         self.pointElementsArray[:] = -1
         tree = cKDTree(mesh.nodeArray[:,:2])
-        xiArray = np.zeros((2,),'d')
-        grad_psi = np.zeros((interpolationSpace.dim,
-                                interpolationSpace.referenceElement.dim),
-                               'd')
-        dx = np.zeros((interpolationSpace.referenceElement.dim),
-                         'd')
-        jacobian = np.zeros((interpolationSpace.referenceElement.dim,
-                                interpolationSpace.referenceElement.dim),
-                               'd')
-        inverseJacobian = np.zeros((interpolationSpace.referenceElement.dim,
-                                       interpolationSpace.referenceElement.dim),
-                                      'd')
-        for pN in range(self.nPoints_global):
-            (distance,nN) = tree.query(self.domain.bathy[pN,:2])
-            for eN in mesh.nodeElementsArray[mesh.nodeElementOffsets[nN]:mesh.nodeElementOffsets[nN+1]]:
-                xiArray[:] = 0.0
-                for j in interpolationSpace.range_dim:
-                    grad_psi[j,:] = interpolationSpace.basisGradients[j](xiArray[0])#evalute at zero because we can (psi is linear)
-                jacobian.flat[:]=0.0
-                inverseJacobian.flat[:]=0.0
-                for j in interpolationSpace.range_dim:
-                    J = mesh.elementNodesArray[eN,j]
-                    for m in interpolationSpace.referenceElement.range_dim:
-                        for n in interpolationSpace.referenceElement.range_dim:
-                            jacobian[m,n] += mesh.nodeArray[J,m]*grad_psi[j,n]
-                J = mesh.elementNodesArray[eN,0]
-                inverseJacobian = inv(jacobian)
-                area = 0.5*det(jacobian)
-                mesh.area_element[eN] = area
-                xiArray[:] = 0.0
-                dx[:]=self.domain.bathy[pN,:2]
-                for m in interpolationSpace.referenceElement.range_dim:
-                    dx[m]-=mesh.nodeArray[J,m]
-                for m in interpolationSpace.referenceElement.range_dim:
-                    for n in interpolationSpace.referenceElement.range_dim:
-                        xiArray[m] += inverseJacobian[m,n]*dx[n]
-                #if the barycentric coordinates are non-negative we're in this element
-                if xiArray[0] >=0.0 and xiArray[1] >= 0.0 and 1.0 - xiArray[0] - xiArray[1] >= 0.0:
-                    self.pointElementsArray[pN] = eN
-                    self.pointNodeWeightsArray[pN,0] = interpolationSpace.basis[0](xiArray)
-                    self.pointNodeWeightsArray[pN,1] = interpolationSpace.basis[1](xiArray)
-                    self.pointNodeWeightsArray[pN,2] = interpolationSpace.basis[2](xiArray)
-        self.totalArea += mesh.area_element.sum()
-        #count the number of points inside each element
-        for pN in range(self.nPoints_global):
-            if self.pointElementsArray[pN] >= 0:
-                mesh.nPoints_element[self.pointElementsArray[pN]] += 1
-        #add up the support area for each node
-        for eN in range(mesh.nElements_global):
-            if mesh.nPoints_element[eN] > 0:
-                mesh.nodeSupportArray[mesh.elementNodesArray[eN,0]] += mesh.area_element[eN]
-                mesh.nodeSupportArray[mesh.elementNodesArray[eN,1]] += mesh.area_element[eN]
-                mesh.nodeSupportArray[mesh.elementNodesArray[eN,2]] += mesh.area_element[eN]
+        (distance,nearestNodes) = tree.query(self.domain.bathy[:,:2])
+        self.testPointsInStars(np.arange(self.nPoints_global),
+                               mesh.nodeElementOffsets,
+                               mesh.nodeElementsArray,
+                               nearestNodes,
+                               x0,inverseJacobian)
+        self.countPoints(mesh,area_element)
+        #area of the elements searched, those around a nearest node
+        isNearest = np.zeros((mesh.nNodes_global,),'bool')
+        isNearest[nearestNodes] = True
+        self.totalArea = area_element[np.any(isNearest[mesh.elementNodesArray],axis=1)].sum()
     def interpolateBathymetry(self):
         """
         interpolate bathymetry for the refinement from the parent  mesh
@@ -5572,34 +5739,24 @@ class InterpolatedBathymetryMesh(MultilevelTriangularMesh):
         mesh.errorAverage_element =  np.zeros((mesh.nElements_global,),'d')
         errorInfty = 0.0
         mesh.elementTags[mesh.elementDiametersArray > self.maxElementDiameter ] = 1
-        for pN in range(self.nPoints_global):
-            eN = self.pointElementsArray[pN]
-            if eN >= 0:
-                zInterp = self.pointNodeWeightsArray[pN,0]*mesh.nodeArray[mesh.elementNodesArray[eN,0],2] +  \
-                          self.pointNodeWeightsArray[pN,1]*mesh.nodeArray[mesh.elementNodesArray[eN,1],2] +  \
-                          self.pointNodeWeightsArray[pN,2]*mesh.nodeArray[mesh.elementNodesArray[eN,2],2]
-                errorPointwise = fabs(zInterp - self.domain.bathy[pN,2])/(fabs(self.domain.bathy[pN,2])*self.rtol + self.atol)
-                errorInfty = max(errorPointwise,errorInfty)
-                mesh.errorAverage_element[eN] += (errorPointwise/float(mesh.nPoints_element[eN]))
-                #print "error average",mesh.errorAverage_element[eN]
-                if errorPointwise >= 1.0:
-                    mesh.elementTags[eN] = 1
+        pointNumbers = np.where(self.pointElementsArray >= 0)[0]
+        elements = self.pointElementsArray[pointNumbers]
+        zInterp = np.sum(self.pointNodeWeightsArray[pointNumbers]*mesh.nodeArray[mesh.elementNodesArray[elements],2],axis=1)
+        z = self.domain.bathy[pointNumbers,2]
+        errorPointwise = np.abs(zInterp - z)/(np.abs(z)*self.rtol + self.atol)
+        errorInfty = np.max(errorPointwise,initial=0.0)
+        hasPoints = mesh.nPoints_element > 0
+        mesh.errorAverage_element[:] = np.bincount(elements,weights=errorPointwise,minlength=mesh.nElements_global)
+        mesh.errorAverage_element[hasPoints] /= mesh.nPoints_element[hasPoints]
+        mesh.elementTags[elements[errorPointwise >= 1.0]] = 1
         if self.errorNormType == "L1":
-            mesh.elementTags[:] = 0
-            errorL1 = 0.0
-            for eN in range(mesh.nElements_global):
-                errorL1 += mesh.errorAverage_element[eN]*mesh.area_element[eN]
-                if mesh.errorAverage_element[eN] >= 1.0:
-                    mesh.elementTags[eN] = 1
+            mesh.elementTags[:] = mesh.errorAverage_element >= 1.0
+            errorL1 = np.dot(mesh.errorAverage_element,mesh.area_element)
             errorL1 /= self.totalArea#normalize by domain error to make error have units of length
             return errorL1
         if self.errorNormType == "L2":
-            mesh.elementTags[:] = 0
-            errorL2 = 0.0
-            for eN in range(mesh.nElements_global):
-                errorL2 += (mesh.errorAverage_element[eN])**2 * mesh.area_element[eN]
-                if mesh.errorAverage_element[eN] >= 1.0:
-                    mesh.elementTags[eN] = 1
+            mesh.elementTags[:] = mesh.errorAverage_element >= 1.0
+            errorL2 = np.dot(mesh.errorAverage_element**2,mesh.area_element)
             errorL2 = old_div(sqrt(errorL2),self.totalArea)#normalize by domain error to make error have units of length
             return errorL2
         else:
@@ -165,7 +165,8 @@ class NonlinearSolver(object):
 
     def computeResidual(self,u,r,b):
         if self.fullResidual:
-            self.F.getResidual(u,r)
+            with timer("getResidual"):
+                self.F.getResidual(u,r)
             if b is not None:
                 r-=b
         else:
@@ -471,6 +472,7 @@ class Newton(NonlinearSolver):
         self.etaLast = eta
         self.norm_r_last = self.norm_r
         self.linearSolver.setResTol(rtol=eta,atol=self.linearSolver.atol_r)
+    @timer("Newton.solve")
     def solve(self,u,r=None,b=None,par_u=None,par_r=None,linear=False):
         r""" Solves the non-linear system :math:`F(u) = b`.
 
@@ -515,7 +517,8 @@ class Newton(NonlinearSolver):
                 % (self.its-1,self.norm_r,(old_div(self.norm_r,(self.rtol_r*self.norm_r0+self.atol_r))),self.convergenceTest),level=1)
             if self.updateJacobian or self.fullNewton:
                 self.updateJacobian = False
-                self.F.getJacobian(self.J)
+                with timer("getJacobian"):
+                    self.F.getJacobian(self.J)
                 if self.linearSolver.computeEigenvalues:
                     logEvent("Calculating eigenvalues of J^t J")
                     self.JLast[:]=self.J
@@ -13,82 +13,69 @@ from . import  cfemIntegrals
 
 useC = True
 
+def analyticalFunctionValues(analyticalFunction,quadraturePointArray,T=None):
+    """
+    Evaluate analyticalFunction at all the points of quadraturePointArray
+
+    Uses analyticalFunction.uOfXT_array(X,t,materialFlags=None) when
+    available, called with the (nPoints,3) array of points as for the
+    initial and Dirichlet conditions, otherwise uOfXT is called point by
+    point. Returns the values with the shape of quadraturePointArray
+    without its last axis (plus the value dimension for vectors).
+    """
+    points = quadraturePointArray.reshape((-1,quadraturePointArray.shape[-1]))
+    if hasattr(analyticalFunction,'uOfXT_array'):
+        values = numpy.asarray(analyticalFunction.uOfXT_array(points,T),'d')
+    else:
+        values = numpy.array([analyticalFunction.uOfXT(x,T) for x in points],'d')
+    return values.reshape(quadraturePointArray.shape[:-1]+values.shape[1:])
+
 """
 """
 def L2errorSFEMvsAF(analyticalFunction,quadraturePointArray,quadratureWeightArray,functionValueArray,T=None):
-    error=0.0
-    range_nQuadraturePoints_element = list(range(quadraturePointArray.shape[1]))
-    for eN in range(quadraturePointArray.shape[0]):
-        for k in range_nQuadraturePoints_element:
-            AF = analyticalFunction.uOfXT(quadraturePointArray[eN,k],T)
-            error += ((functionValueArray[eN,k] - AF)**2)*quadratureWeightArray[eN,k]
+    AF = analyticalFunctionValues(analyticalFunction,quadraturePointArray,T)
+    error = numpy.sum(((functionValueArray - AF)**2)*quadratureWeightArray)
     error = sqrt(abs(globalSum(error)))
     return error
 
 def L1errorSFEMvsAF(analyticalFunction,quadraturePointArray,quadratureWeightArray,functionValueArray,T=None):
-    error=0.0
-    range_nQuadraturePoints_element = list(range(quadraturePointArray.shape[1]))
-    for eN in range(quadraturePointArray.shape[0]):
-        for k in range_nQuadraturePoints_element:
-            AF = analyticalFunction.uOfXT(quadraturePointArray[eN,k],T)
-            error += abs(functionValueArray[eN,k] - AF)*quadratureWeightArray[eN,k]
+    AF = analyticalFunctionValues(analyticalFunction,quadraturePointArray,T)
+    error = numpy.sum(numpy.absolute(functionValueArray - AF)*quadratureWeightArray)
     return globalSum(error)
 
 def L2errorVFEMvsAF(analyticalFunction,quadraturePointArray,quadratureWeightArray,functionValueArray,T=None):
-    error=0.0
-    range_nQuadraturePoints_element = list(range(quadraturePointArray.shape[1]))
-    for eN in range(quadraturePointArray.shape[0]):
-        for k in range_nQuadraturePoints_element:
-            AF = analyticalFunction.uOfXT(quadraturePointArray[eN,k],T)
-            e2 = numpy.inner(functionValueArray[eN,k,:] - AF,
-                             functionValueArray[eN,k,:] - AF)
-            error += e2*quadratureWeightArray[eN,k]
+    AF = analyticalFunctionValues(analyticalFunction,quadraturePointArray,T)
+    e2 = numpy.sum((functionValueArray - AF)**2,axis=-1)
+    error = numpy.sum(e2*quadratureWeightArray)
     error = sqrt(abs(globalSum(error)))
     return error
 
 def L1errorVFEMvsAF(analyticalFunction,quadraturePointArray,quadratureWeightArray,functionValueArray,T=None):
-    error=0.0
-    range_nQuadraturePoints_element = list(range(quadraturePointArray.shape[1]))
-    for eN in range(quadraturePointArray.shape[0]):
-        for k in range_nQuadraturePoints_element:
-            AF = analyticalFunction.uOfXT(quadraturePointArray[eN,k],T)
-            e1 = numpy.sum(numpy.absolute(functionValueArray[eN,k,:] - AF))
-            error += e1*quadratureWeightArray[eN,k]
+    AF = analyticalFunctionValues(analyticalFunction,quadraturePointArray,T)
+    e1 = numpy.sum(numpy.absolute(functionValueArray - AF),axis=-1)
+    error = numpy.sum(e1*quadratureWeightArray)
     return globalSum(error)
 
 
 
 def L2errorSFEMvsAF2(analyticalFunction,quadraturePointArray,abs_det_J,
                      quadratureWeightArray,functionValueArray,T=None):
-    error=0.0
-    range_nQuadraturePoints_element = list(range(quadraturePointArray.shape[1]))
-    for eN in range(quadraturePointArray.shape[0]):
-        for k in range_nQuadraturePoints_element:
-            AF = analyticalFunction.uOfXT(quadraturePointArray[eN,k],T)
-            error += ((functionValueArray[eN,k] - AF)**2)*quadratureWeightArray[k]*abs_det_J[eN,k]
+    AF = analyticalFunctionValues(analyticalFunction,quadraturePointArray,T)
+    error = numpy.sum(((functionValueArray - AF)**2)*quadratureWeightArray*abs_det_J)
     error = sqrt(abs(globalSum(error)))
     return error
 
 def L1errorSFEMvsAF2(analyticalFunction,quadraturePointArray,abs_det_J,
                      quadratureWeightArray,functionValueArray,T=None):
-    error=0.0
-    range_nQuadraturePoints_element = list(range(quadraturePointArray.shape[1]))
-    for eN in range(quadraturePointArray.shape[0]):
-        for k in range_nQuadraturePoints_element:
-            AF = analyticalFunction.uOfXT(quadraturePointArray[eN,k],T)
-            error += abs(functionValueArray[eN,k] - AF)*quadratureWeightArray[k]*abs_det_J[eN,k]
+    AF = analyticalFunctionValues(analyticalFunction,quadraturePointArray,T)
+    error = numpy.sum(numpy.absolute(functionValueArray - AF)*quadratureWeightArray*abs_det_J)
     return globalSum(error)
 
 def L2errorVFEMvsAF2(analyticalFunction,quadraturePointArray,abs_det_J,
                      quadratureWeightArray,functionValueArray,T=None):
-    error=0.0
-    range_nQuadraturePoints_element = list(range(quadraturePointArray.shape[1]))
-    for eN in range(quadraturePointArray.shape[0]):
-        for k in range_nQuadraturePoints_element:
-            AF = analyticalFunction.uOfXT(quadraturePointArray[eN,k],T)
-            e2 = numpy.inner(functionValueArray[eN,k,:] - AF,
-                             functionValueArray[eN,k,:] - AF)
-            error += e2*quadratureWeightArray[k]*abs_det_J[eN,k]
+    AF = analyticalFunctionValues(analyticalFunction,quadraturePointArray,T)
+    e2 = numpy.sum((functionValueArray - AF)**2,axis=-1)
+    error = numpy.sum(e2*quadratureWeightArray*abs_det_J)
     error = sqrt(abs(globalSum(error)))
     return error
 def L1errorVFEMvsAF2(analyticalFunction,quadraturePointArray,quadratureWeightArray,functionValueArray,T=None):
@@ -255,23 +242,13 @@ def fluxDomainBoundaryIntegralFromVector(dS,nValueArray,normal,mesh):
     return globalSum(partialSum)
 
 def LIerrorSFEMvsAF(analyticalFunction,quadraturePointArray,functionValueArray,T=None):
-    error=0.0
-    range_nQuadraturePoints_element = list(range(quadraturePointArray.shape[1]))
-    for eN in range(quadraturePointArray.shape[0]):
-        for k in range_nQuadraturePoints_element:
-            AF = analyticalFunction.uOfXT(quadraturePointArray[eN,k],T)
-            error = max(error,abs(functionValueArray[eN,k] - AF))
+    AF = analyticalFunctionValues(analyticalFunction,quadraturePointArray,T)
+    error = numpy.max(numpy.absolute(functionValueArray - AF),initial=0.0)
     return globalMax(error)
 
 def LIerrorVFEMvsAF(analyticalFunction,quadraturePointArray,quadratureWeightArray,functionValueArray,T=None):
-    error=0.0
-    range_nQuadraturePoints_element = list(range(quadraturePointArray.shape[1]))
-    for eN in range(quadraturePointArray.shape[0]):
-        for k in range_nQuadraturePoints_element:
-            AF = analyticalFunction.uOfXT(quadraturePointArray[eN,k],T)
-            e = numpy.absolute(functionValueArray[eN,k,:] - AF)
-
-            error = max(error,max(e.flat))
+    AF = analyticalFunctionValues(analyticalFunction,quadraturePointArray,T)
+    error = numpy.max(numpy.absolute(functionValueArray - AF),initial=0.0)
     return globalMax(error)
 
 def LIerrorSFEM(quadratureWeightArray,aSolutionValueArray,nSolutionValueArray,T=None):
@@ -99,10 +99,13 @@ class NS_base(object):  # (HasTraits):
 
         if so.useOneArchive:
             self.femSpaceWritten={}
+            incrementalXMF = hasattr(opts,"incrementalXMF") and opts.incrementalXMF
             tmp  = Archiver.XdmfArchive(opts.dataDir,so.name,useTextArchive=opts.useTextArchive,
                                         gatherAtClose=opts.gatherArchive,hotStart=opts.hotStart,
                                         useGlobalXMF=(not opts.subdomainArchives),
-                                        global_sync=opts.global_sync)
+                                        global_sync=opts.global_sync,
+                                        incrementalXMF=incrementalXMF,
+                                        storeXMLinHDF5=not incrementalXMF)
             if self.fastArchive==True:
                 self.ar = dict([(0,tmp)])
             else:
@@ -780,6 +783,7 @@ class NS_base(object):  # (HasTraits):
 
     ## compute the solution
 
+    @Profiling.timer("calculateSolution")
     def calculateSolution(self,runName):
         """ Cacluate the PDEs numerical solution.
 
@@ -793,19 +797,26 @@ class NS_base(object):  # (HasTraits):
         for index,p,n,m,simOutput in zip(list(range(len(self.modelList))),self.pList,self.nList,self.modelList,self.simOutputList):
             if self.opts.hotStart:
                 logEvent("Setting initial conditions from hot start file for "+p.name)
-                tCount = int(self.ar[index].tree.getroot()[-1][-1][-1][0].attrib['Name'])
-                offset=0
-                while tCount > 0:
-                    time = float(self.ar[index].tree.getroot()[-1][-1][-1-offset][0].attrib['Value'])
-                    if time <= self.opts.hotStartTime:
-                        break
+                hotStartStep = self.ar[index].hotStartStep(self.opts.hotStartTime)
+                if hotStartStep is not None:
+                    tCount, time, dt = hotStartStep
+                else:
+                    logEvent("No time index in hot start file, searching the XMF file")
+                    tCount = int(self.ar[index].tree.getroot()[-1][-1][-1][0].attrib['Name'])
+                    offset=0
+                    while tCount > 0:
+                        time = float(self.ar[index].tree.getroot()[-1][-1][-1-offset][0].attrib['Value'])
+                        if time <= self.opts.hotStartTime:
+                            break
+                        else:
+                            tCount -=1
+                            offset +=1
+                    if len(self.ar[index].tree.getroot()[-1][-1]) - offset - 1 > 0:
+                        dt = time - float(self.ar[index].tree.getroot()[-1][-1][-1-offset-1][0].attrib['Value'])
                     else:
-                        tCount -=1
-                        offset +=1
+                        dt = None
                 self.ar[index].n_datasets = tCount + 1
-                if len(self.ar[index].tree.getroot()[-1][-1]) - offset - 1 > 0:
-                    dt = time - float(self.ar[index].tree.getroot()[-1][-1][-1-offset-1][0].attrib['Value'])
-                else:
+                if dt is None:
                     logEvent("Not enough steps in hot start file set set dt, setting dt to 1.0")
                     dt = 1.0
                 logEvent("Hot starting from time step t = "+repr(time))
@@ -813,15 +824,22 @@ class NS_base(object):  # (HasTraits):
                 #if not isinstance(p.domain,Domain.PUMIDomain):
 
                 for lm,lu,lr in zip(m.levelModelList,m.uList,m.rList):
+                    if not isinstance(self.pList[0].domain,Domain.PUMIDomain):
+                        #read the components in the same space together
+                        spaces = {}
+                        for cj in range(lm.coefficients.nc):
+                            spaces.setdefault(id(lm.u[cj].femSpace),[]).append(lm.u[cj])
+                        for uList in spaces.values():
+                            uList[0].femSpace.readFunctionsXdmf(self.ar[index],uList,tCount)
                     for cj in range(lm.coefficients.nc):
-
-                        if not isinstance(self.pList[0].domain,Domain.PUMIDomain):
-                          lm.u[cj].femSpace.readFunctionXdmf(self.ar[index],lm.u[cj],tCount)
                         lm.setFreeDOF(lu)
                         lm.timeIntegration.tLast = time
                         lm.timeIntegration.t = time
                         lm.timeIntegration.dt = dt
                 self.tCount = tCount
+                for av in self.auxiliaryVariables[m.name]:
+                    if hasattr(av,'restartOutput'):
+                        av.restartOutput(time)
             elif p.initialConditions is not None:
                 logEvent("Setting initial conditions for "+p.name)
                 m.setInitialConditions(p.initialConditions,self.tnList[0])
@@ -903,10 +921,11 @@ class NS_base(object):  # (HasTraits):
                 m.stepController.initializeTimeHistory()
                 m.stepController.setInitialGuess(m.uList,m.rList)
 
-                solverFailed = m.solver.solveMultilevel(uList=m.uList,
-                                                        rList=m.rList,
-                                                        par_uList=m.par_uList,
-                                                        par_rList=m.par_rList)
+                with Profiling.timer("spinup", m.name):
+                    solverFailed = m.solver.solveMultilevel(uList=m.uList,
+                                                            rList=m.rList,
+                                                            par_uList=m.par_uList,
+                                                            par_rList=m.par_rList)
                 Profiling.memory("solver.solveMultilevel")
                 if solverFailed:
                     logEvent("Spin-Up Step Failed t=%12.5e, dt=%12.5e for model %s, CONTINUING ANYWAY!" %  (m.stepController.t_model,
@@ -926,7 +945,8 @@ class NS_base(object):  # (HasTraits):
         for p,n,m,simOutput,index in zip(self.pList,self.nList,self.modelList,self.simOutputList,list(range(len(self.pList)))):
             if not self.opts.hotStart:
                 logEvent("Archiving initial conditions")
-                self.archiveInitialSolution(m,index)
+                with Profiling.timer("archive", m.name):
+                    self.archiveInitialSolution(m,index)
             else:
                 self.ar[index].domain = self.ar[index].tree.find("Domain")
             #if(not hasattr(self.pList[0].domain,'PUMIMesh') and not self.opts.hotStart):
@@ -1110,6 +1130,7 @@ class NS_base(object):  # (HasTraits):
                         for m in model.levelModelList:
                             if m.movingDomain and m.tLast_mesh != self.systemStepController.t_system_last:
                                 m.t_mesh = self.systemStepController.t_system_last
+                                m.mesh.invalidateSpatialIndex()
                                 m.updateAfterMeshMotion()
                                 m.tLast_mesh = m.t_mesh
 
@@ -1135,10 +1156,11 @@ class NS_base(object):  # (HasTraits):
 
 
                                 model.stepController.setInitialGuess(model.uList,model.rList)
-                                solverFailed = model.solver.solveMultilevel(uList=model.uList,
-                                                                            rList=model.rList,
-                                                                            par_uList=model.par_uList,
-                                                                            par_rList=model.par_rList)
+                                with Profiling.timer("solve", model.name):
+                                    solverFailed = model.solver.solveMultilevel(uList=model.uList,
+                                                                                rList=model.rList,
+                                                                                par_uList=model.par_uList,
+                                                                                par_rList=model.par_rList)
 
                                 Profiling.memory("solver.solveMultilevel")
                                 if self.opts.wait:
@@ -1197,7 +1219,8 @@ class NS_base(object):  # (HasTraits):
                         if self.archiveFlag == ArchiveFlags.EVERY_MODEL_STEP:
                             self.tCount+=1
                             for index,model in enumerate(self.modelList):
-                                self.archiveSolution(model,index,self.systemStepController.t_system)
+                                with Profiling.timer("archive", model.name):
+                                    self.archiveSolution(model,index,self.systemStepController.t_system)
                 #end system split operator sequence
                 if systemStepFailed:
                     logEvent("System Step Failed")
@@ -1227,7 +1250,8 @@ class NS_base(object):  # (HasTraits):
                 if self.archiveFlag == ArchiveFlags.EVERY_SEQUENCE_STEP:
                     self.tCount+=1
                     for index,model in enumerate(self.modelList):
-                        self.archiveSolution(model,index,self.systemStepController.t_system_last)
+                        with Profiling.timer("archive", model.name):
+                            self.archiveSolution(model,index,self.systemStepController.t_system_last)
 
                 #can only handle PUMIDomain's for now
                 #if(self.tn < 0.05):
@@ -1309,7 +1333,8 @@ class NS_base(object):  # (HasTraits):
                 nSequenceStepsLast = self.nSequenceSteps
                 self.tCount+=1
                 for index,model in enumerate(self.modelList):
-                    self.archiveSolution(model,index,self.systemStepController.t_system_last)
+                    with Profiling.timer("archive", model.name):
+                        self.archiveSolution(model,index,self.systemStepController.t_system_last)
 
             if systemStepFailed:
                 break
@@ -1377,6 +1402,9 @@ class NS_base(object):  # (HasTraits):
         for index,model in enumerate(self.modelList):
             self.finalizeViewSolution(model)
             self.closeArchive(model,index)
+            for av in self.auxiliaryVariables[model.name]:
+                if hasattr(av,'flush'):
+                    av.flush()
 
         return systemStepFailed
     #
@@ -1405,6 +1433,8 @@ class NS_base(object):  # (HasTraits):
                 for u_ci_lhs,u_ci_rhs in zip(list(self.modelList[postCopy['uList_model']].levelModelList[level].u.values()),list(model.levelModelList[level].u.values())):
                     u_ci_lhs.dof[:] = u_ci_rhs.dof
                 self.modelList[postCopy['uList_model']].levelModelList[level].setFreeDOF(self.modelList[postCopy['uList_model']].uList[level])
+            if postCopy is not None and 'model_postStep' in postCopy and level == len(model.levelModelList)-1:
+                postCopy['model_postStep'](model)
 
     def setWeakDirichletConditions(self,model):
         if model.weakDirichletConditions is not None:
@@ -1693,6 +1723,10 @@ class NS_base(object):  # (HasTraits):
                 else:
                     if index == len(self.ar) - 1:
                         self.ar[index].sync()
+            #write buffered time series so they are consistent with the archive on hot start
+            for av in self.auxiliaryVariables[model.name]:
+                if hasattr(av,'flush'):
+                    av.flush()
 
     ## clean up archive
     def closeArchive(self,model,index):
@@ -15,7 +15,8 @@ from past.utils import old_div
 import gc
 import inspect
 import pstats
-from time import time
+import functools
+from time import time, perf_counter
 import atexit
 
 try:
@@ -38,6 +39,9 @@ procID=None
 flushBuffer=False
 preInitBuffer=[]
 logDir = '.'
+timersEnabled=False
+timerStack=[]
+timerTotals={}
 
 startTime = time()
 
@@ -174,6 +178,268 @@ def memorySummary():
                 logEvent(repr(pair[0])+"  %"+repr(100.0*pair[1]/memMax))
 
 
+def timersOn():
+    global timersEnabled
+    timersEnabled = True
+
+class timer(object):
+    """
+    Nested wall clock timer for a stage of the computation. Must be
+    enabled with timersOn(), otherwise it does nothing.
+
+    Use as a context manager
+
+    with timer("getResidual", model.name):
+        model.getResidual(u, r)
+
+    or as a decorator
+
+    @timer("solve")
+    def solve(self, u, r):
+
+    The wall time and number of calls are accumulated for the path of
+    stages of the enclosing timers, so a stage is reported separately for
+    each model and caller. See writeTimerReport.
+    """
+
+    __slots__ = ('stage', 'start')
+
+    def __init__(self, stage, model=None):
+        if model is not None:
+            stage = model + ":" + stage
+        self.stage = stage
+        self.start = None
+
+    def __enter__(self):
+        if timersEnabled:
+            timerStack.append(self.stage)
+            self.start = perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.start is not None:
+            elapsed = perf_counter() - self.start
+            self.start = None
+            path = tuple(timerStack)
+            timerStack.pop()
+            totals = timerTotals.get(path)
+            if totals is None:
+                timerTotals[path] = [1, elapsed]
+            else:
+                totals[0] += 1
+                totals[1] += elapsed
+        return False
+
+    def __call__(self, func):
+        stage = self.stage
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            with timer(stage):
+                return func(*args, **kwargs)
+        return timed
+
+def timerSummary():
+    """
+    Collect the timers of all ranks
+
+    Returns a list of dicts with the stage path ('/' separated), the
+    number of calls and the min, max and mean wall time across ranks
+    (ranks that never entered a stage count as 0), sorted by path.
+    """
+    from . import Comm
+    allTotals = Comm.get().comm.tompi4py().allgather(timerTotals)
+    paths = set()
+    for totals in allTotals:
+        paths.update(totals)
+    summary = []
+    for path in sorted(paths):
+        calls = [totals.get(path, (0, 0.0))[0] for totals in allTotals]
+        walls = [totals.get(path, (0, 0.0))[1] for totals in allTotals]
+        summary.append({'stage': "/".join(path),
+                        'calls': max(calls),
+                        'min': min(walls),
+                        'max': max(walls),
+                        'mean': sum(walls)/len(walls)})
+    return summary
+
+def writeTimerReport(filename, formats=('csv', 'json')):
+    """
+    Write the timers of all ranks to filename.csv and/or filename.json
+
+    Must be called on all ranks, only rank 0 writes.
+    """
+    import os
+    summary = timerSummary()
+    if procID not in (None, 0):
+        return
+    if 'csv' in formats:
+        with open(os.path.join(logDir, filename+".csv"), 'w') as f:
+            f.write("stage,calls,min,max,mean\n")
+            for row in summary:
+                f.write("{stage:s},{calls:d},{min:.6e},{max:.6e},{mean:.6e}\n".format(**row))
+    if 'json' in formats:
+        import json
+        with open(os.path.join(logDir, filename+".json"), 'w') as f:
+            json.dump(summary, f, indent=1)
+    logEvent("Wrote timer report "+os.path.join(logDir, filename))
+
+startupProfiling=False
+startupStack=[]
+startupTotals={}
+
+class _TimedLoader(object):
+    """
+    Wraps the loader of a module spec to time creating and executing
+    the module the first time it is imported
+    """
+
+    def __init__(self, loader, name):
+        self.loader = loader
+        self.name = name
+
+    def __getattr__(self, attr):
+        return getattr(self.loader, attr)
+
+    def create_module(self, spec):
+        with startupStage("import "+self.name):
+            return self.loader.create_module(spec)
+
+    def exec_module(self, module):
+        module.__loader__ = self.loader
+        if module.__spec__ is not None:
+            module.__spec__.loader = self.loader
+        with startupStage("import "+self.name):
+            self.loader.exec_module(module)
+
+class _TimedFinder(object):
+    """
+    Meta path finder that wraps the loaders found by the other finders
+    in a _TimedLoader
+    """
+
+    def find_spec(self, fullname, path=None, target=None):
+        import sys
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, 'find_spec'):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                if hasattr(spec.loader, 'exec_module'):
+                    spec.loader = _TimedLoader(spec.loader, fullname)
+                return spec
+        return None
+
+_timedFinder = _TimedFinder()
+
+def startupProfileOn():
+    """
+    Time module imports and the stages wrapped in startupStage
+    """
+    global startupProfiling
+    import sys
+    startupProfiling = True
+    if _timedFinder not in sys.meta_path:
+        sys.meta_path.insert(0, _timedFinder)
+
+def startupProfileOff():
+    global startupProfiling
+    import sys
+    startupProfiling = False
+    if _timedFinder in sys.meta_path:
+        sys.meta_path.remove(_timedFinder)
+
+class startupStage(object):
+    """
+    Wall clock timer for a stage of the startup. Does nothing unless
+    startupProfileOn() has been called.
+
+    with startupStage("Comm.init"):
+        comm = Comm.init()
+
+    The inclusive time and the exclusive time (without nested stages and
+    imports) are accumulated per stage. Imports are recorded as the
+    stages 'import <module>' while the startup profile is on.
+    """
+
+    __slots__ = ('stage', 'start')
+
+    def __init__(self, stage):
+        self.stage = stage
+        self.start = None
+
+    def __enter__(self):
+        if startupProfiling:
+            startupStack.append([self.stage, 0.0])
+            self.start = perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.start is not None:
+            elapsed = perf_counter() - self.start
+            self.start = None
+            stage, nested = startupStack.pop()
+            if startupStack:
+                startupStack[-1][1] += elapsed
+            totals = startupTotals.get(stage)
+            if totals is None:
+                startupTotals[stage] = [elapsed, elapsed - nested]
+            else:
+                totals[0] += elapsed
+                totals[1] += elapsed - nested
+        return False
+
+def startupSummary():
+    """
+    Collect the startup stages of all ranks
+
+    Returns a list of dicts with the stage and the min, max and mean
+    across ranks of the inclusive and exclusive wall time, sorted by
+    decreasing maximum exclusive time.
+    """
+    from . import Comm
+    allTotals = Comm.get().comm.tompi4py().allgather(startupTotals)
+    stages = set()
+    for totals in allTotals:
+        stages.update(totals)
+    summary = []
+    for stage in stages:
+        inclusive = [totals.get(stage, (0.0, 0.0))[0] for totals in allTotals]
+        exclusive = [totals.get(stage, (0.0, 0.0))[1] for totals in allTotals]
+        summary.append({'stage': stage,
+                        'min': min(inclusive),
+                        'max': max(inclusive),
+                        'mean': sum(inclusive)/len(inclusive),
+                        'self_min': min(exclusive),
+                        'self_max': max(exclusive),
+                        'self_mean': sum(exclusive)/len(exclusive)})
+    summary.sort(key=lambda row: (-row['self_max'], row['stage']))
+    return summary
+
+def writeStartupReport(filename, nLog=30):
+    """
+    Write the startup stages and imports of all ranks to filename.csv
+    and log the nLog most expensive ones
+
+    Must be called on all ranks, only rank 0 writes.
+    """
+    import os
+    summary = startupSummary()
+    if procID not in (None, 0):
+        return
+    with open(os.path.join(logDir, filename+".csv"), 'w') as f:
+        f.write("stage,min,max,mean,self_min,self_max,self_mean\n")
+        for row in summary:
+            f.write("{stage:s},{min:.6e},{max:.6e},{mean:.6e},{self_min:.6e},{self_max:.6e},{self_mean:.6e}\n".format(**row))
+    imports = [row for row in summary if row['stage'].startswith("import ")]
+    msg = "Startup profile, wall time (max over ranks) excluding nested stages\n"
+    msg += "{0:>11s} {1:>11s}  {2:s}\n".format("self", "total", "stage")
+    for row in summary[:nLog]:
+        msg += "{self_max:11.4f} {max:11.4f}  {stage:s}\n".format(**row)
+    msg += "{0:d} modules imported in {1:.4f}s (max over ranks)\n".format(
+        len(imports), sum(row['self_max'] for row in imports))
+    logEvent(msg, level=0)
+    logEvent("Wrote startup report "+os.path.join(logDir, filename+".csv"))
+
 class Dispatcher(object):
     """
     Profiles function calls.  Must be enabled like so:
@@ -21,6 +21,7 @@ class SWFlowProblem:
                  AdH_file=None,
                  # BATHYMETRY #
                  bathymetry=None,
+                 bathymetryCacheDir=None,
                  triangleFlag=1,
                  # INITIAL CONDITIONS #
                  initialConditions=None,
@@ -47,7 +48,7 @@ class SWFlowProblem:
         if domain is None:
             assert AdH_file is not None, "If domain is None then provide an AdH File"
         else:
-            assert callable(bathymetry), "Bathymetry must be a function"
+            assert callable(bathymetry) or hasattr(bathymetry, 'shape'), "Bathymetry must be a function or an array of (x,y,z) points"
         assert triangleFlag in [0, 1, 2], "triangleFlag must be 1, 2 or 3"
         assert type(
             initialConditions) == dict, "Provide dict of initial conditions"
@@ -66,6 +67,11 @@ class SWFlowProblem:
         self.nnz = 1
         self.domain = domain
         self.AdH_file = AdH_file
+        if bathymetry is not None and not callable(bathymetry):
+            # point cloud: interpolate linearly on its triangulation, which
+            # is kept in bathymetryCacheDir for later runs on the same data
+            bathymetry = mt.TriangulatedBathymetry(bathymetry,
+                                                   cacheDir=bathymetryCacheDir)
         self.bathymetry = bathymetry
         self.triangleFlag = triangleFlag
         self.initialConditions = initialConditions
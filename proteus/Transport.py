@@ -1630,23 +1630,73 @@ class OneLevelTransport(NonlinearEquation):
         #set the initial conditions for the DOF based on the generalized interpolation conditions
         #
         for cj in range(self.nc):
-            interpolationValues = numpy.zeros((self.mesh.nElements_global,
-                                                 self.u[cj].femSpace.referenceFiniteElement.interpolationConditions.nQuadraturePoints),
-                                                'd')
-            try:
-                for eN in range(self.mesh.nElements_global):
-                    materialFlag = self.mesh.elementMaterialTypes[eN]
-                    for k in range(self.u[cj].femSpace.referenceFiniteElement.interpolationConditions.nQuadraturePoints):
-                        interpolationValues[eN,k] = getInitialConditionsDict[cj].uOfXT(self.u[cj].femSpace.interpolationPoints[eN,k],T,materialFlag)
-            except TypeError:
-                for eN in range(self.mesh.nElements_global):
-                    for k in range(self.u[cj].femSpace.referenceFiniteElement.interpolationConditions.nQuadraturePoints):
-                        interpolationValues[eN,k] = getInitialConditionsDict[cj].uOfXT(self.u[cj].femSpace.interpolationPoints[eN,k],T)
+            interpolationValues = self.getInterpolationValues(cj,getInitialConditionsDict[cj],T)
             self.u[cj].projectFromInterpolationConditions(interpolationValues)
         #Load the Dirichlet conditions
         for cj in range(self.nc):
-            for dofN,g in self.dirichletConditions[cj].DOFBoundaryConditionsDict.items():
-                self.u[cj].dof[dofN] = g(self.dirichletConditions[cj].DOFBoundaryPointDict[dofN],self.timeIntegration.t)
+            dofs,values = self.getDirichletValues(self.dirichletConditions[cj],self.timeIntegration.t)
+            self.u[cj].dof[dofs] = values
+    def getInterpolationValues(self,cj,sol,T):
+        """
+        Evaluate sol at the interpolation points of component cj
+
+        If sol has a method uOfXT_array(X,t,materialFlags=None) it is
+        called once with the (nPoints,3) array of all the interpolation
+        points and the material flag of each point and must return the
+        (nPoints,) values, otherwise sol.uOfXT is called point by point.
+        """
+        nInterpolationPoints = self.u[cj].femSpace.referenceFiniteElement.interpolationConditions.nQuadraturePoints
+        interpolationPoints = self.u[cj].femSpace.interpolationPoints
+        if hasattr(sol,'uOfXT_array'):
+            materialFlags = numpy.repeat(self.mesh.elementMaterialTypes,nInterpolationPoints)
+            values = sol.uOfXT_array(interpolationPoints.reshape((-1,3)),T,materialFlags=materialFlags)
+            return numpy.ascontiguousarray(numpy.reshape(values,(self.mesh.nElements_global,
+                                                                 nInterpolationPoints)),'d')
+        interpolationValues = numpy.zeros((self.mesh.nElements_global,
+                                           nInterpolationPoints),
+                                          'd')
+        try:
+            for eN in range(self.mesh.nElements_global):
+                materialFlag = self.mesh.elementMaterialTypes[eN]
+                for k in range(nInterpolationPoints):
+                    interpolationValues[eN,k] = sol.uOfXT(interpolationPoints[eN,k],T,materialFlag)
+        except TypeError:
+            for eN in range(self.mesh.nElements_global):
+                for k in range(nInterpolationPoints):
+                    interpolationValues[eN,k] = sol.uOfXT(interpolationPoints[eN,k],T)
+        return interpolationValues
+    def getDirichletValues(self,dirichletConditions,t):
+        """
+        Evaluate the strong Dirichlet conditions, returns the DOF and their values
+
+        The DOF are grouped by boundary condition function (see
+        FemTools.DOFBoundaryConditions.getValues). If a function
+        has a uOfXT_array(X,t,materialFlags=None) attribute it is called once with the
+        (nDOF,3) array of points of its group, otherwise it is called
+        point by point.
+        """
+        if hasattr(dirichletConditions,'getValues'):
+            return dirichletConditions.DOFBoundaryDOFs,dirichletConditions.getValues(t)
+        groups = {}
+        for dofN,g in dirichletConditions.DOFBoundaryConditionsDict.items():
+            if g in groups:
+                groups[g].append(dofN)
+            else:
+                groups[g] = [dofN]
+        dofs = numpy.zeros((len(dirichletConditions.DOFBoundaryConditionsDict),),'i')
+        values = numpy.zeros((len(dirichletConditions.DOFBoundaryConditionsDict),),'d')
+        start = 0
+        for g,groupDOFs in groups.items():
+            end = start+len(groupDOFs)
+            dofs[start:end] = groupDOFs
+            if hasattr(g,'uOfXT_array'):
+                X = numpy.array([dirichletConditions.DOFBoundaryPointDict[dofN] for dofN in groupDOFs],'d')
+                values[start:end] = g.uOfXT_array(X,t)
+            else:
+                for i,dofN in enumerate(groupDOFs):
+                    values[start+i] = g(dirichletConditions.DOFBoundaryPointDict[dofN],t)
+            start = end
+        return dofs,values
     #what about setting initial conditions directly from dofs calculated elsewhere?
     def archiveAnalyticalSolutions(self,archive,analyticalSolutionsDict,T=0.0,tCount=0):
         import copy
@@ -1662,18 +1712,7 @@ class OneLevelTransport(NonlinearEquation):
                 self.u_save[cj] = (self.u[cj].dof.copy(), self.u[cj].name)
             else:
                 self.u_save[cj][0][:] = self.u[cj].dof
-            interpolationValues = numpy.zeros((self.mesh.nElements_global,
-                                               self.u[cj].femSpace.referenceFiniteElement.interpolationConditions.nQuadraturePoints),
-                                              'd')
-            try:
-                for eN in range(self.mesh.nElements_global):
-                    materialFlag = self.mesh.elementMaterialTypes[eN]
-                    for k in range(self.u[cj].femSpace.referenceFiniteElement.interpolationConditions.nQuadraturePoints):
-                        interpolationValues[eN,k] = sol.uOfXT(self.u[cj].femSpace.interpolationPoints[eN,k],T,materialFlag)
-            except TypeError:
-                for eN in range(self.mesh.nElements_global):
-                    for k in range(self.u[cj].femSpace.referenceFiniteElement.interpolationConditions.nQuadraturePoints):
-                        interpolationValues[eN,k] = sol.uOfXT(self.u[cj].femSpace.interpolationPoints[eN,k],T)
+            interpolationValues = self.getInterpolationValues(cj,sol,T)
             self.u[cj].projectFromInterpolationConditions(interpolationValues)
             self.u[cj].name += '_analytical'
             self.u[cj].femSpace.writeFunctionXdmf(archive,self.u[cj],tCount)
@@ -1759,12 +1798,12 @@ class OneLevelTransport(NonlinearEquation):
         #u.tofile("u"+`self.nonlinear_function_evaluations`,sep="\n")
         r.fill(0.0)
         for cj in range(self.nc):
-            for dofN,g in self.dirichletConditions[cj].DOFBoundaryConditionsDict.items():
-                self.u[cj].dof[dofN] = g(self.dirichletConditions[cj].DOFBoundaryPointDict[dofN],self.timeIntegration.t)
+            dofs,values = self.getDirichletValues(self.dirichletConditions[cj],self.timeIntegration.t)
+            self.u[cj].dof[dofs] = values
         if self.forceStrongConditions:
             for cj in range(len(self.dirichletConditionsForceDOF)):
-                for dofN,g in self.dirichletConditionsForceDOF[cj].DOFBoundaryConditionsDict.items():
-                    u[self.offset[cj]+self.stride[cj]*dofN] = g(self.dirichletConditionsForceDOF[cj].DOFBoundaryPointDict[dofN],self.timeIntegration.t)#load the BC value directly into the global array
+                dofs,values = self.getDirichletValues(self.dirichletConditionsForceDOF[cj],self.timeIntegration.t)
+                u[self.offset[cj]+self.stride[cj]*dofs] = values#load the BC value directly into the global array
         #Load the unknowns into the finite element dof
         self.timeIntegration.calculateU(u)
         self.setUnknowns(self.timeIntegration.u)
@@ -1790,8 +1829,8 @@ class OneLevelTransport(NonlinearEquation):
         logEvent("Global residual",level=9,data=r)
         if self.forceStrongConditions:#
             for cj in range(len(self.dirichletConditionsForceDOF)):#
-                for dofN,g in self.dirichletConditionsForceDOF[cj].DOFBoundaryConditionsDict.items():
-                    r[self.offset[cj]+self.stride[cj]*dofN] = self.u[cj].dof[dofN] - g(self.dirichletConditionsForceDOF[cj].DOFBoundaryPointDict[dofN],self.timeIntegration.t)
+                dofs,values = self.getDirichletValues(self.dirichletConditionsForceDOF[cj],self.timeIntegration.t)
+                r[self.offset[cj]+self.stride[cj]*dofs] = self.u[cj].dof[dofs] - values
         #for keeping solver statistics
         self.nonlinear_function_evaluations += 1
         #cek debug
@@ -5909,12 +5948,12 @@ class OneLevelTransport(NonlinearEquation):
         r.fill(0.0)
         #Load the Dirichlet conditions
         for cj in range(self.nc):
-            for dofN,g in self.dirichletConditions[cj].DOFBoundaryConditionsDict.items():
-                self.u[cj].dof[dofN] = g(self.dirichletConditions[cj].DOFBoundaryPointDict[dofN],self.timeIntegration.t)
+            dofs,values = self.getDirichletValues(self.dirichletConditions[cj],self.timeIntegration.t)
+            self.u[cj].dof[dofs] = values
         if self.forceStrongConditions:
             for cj in range(len(self.dirichletConditionsForceDOF)):
-                for dofN,g in self.dirichletConditionsForceDOF[cj].DOFBoundaryConditionsDict.items():
-                    self.u[cj].dof[dofN] = g(self.dirichletConditionsForceDOF[cj].DOFBoundaryPointDict[dofN],self.timeIntegration.t)
+                dofs,values = self.getDirichletValues(self.dirichletConditionsForceDOF[cj],self.timeIntegration.t)
+                self.u[cj].dof[dofs] = values
         #Load the unknowns into the finite element dof
         self.timeIntegration.calculateU(u)
         self.setUnknowns(self.timeIntegration.u)
@@ -5950,12 +5989,12 @@ class OneLevelTransport(NonlinearEquation):
         r.fill(0.0)
         #Load the Dirichlet conditions
         for cj in range(self.nc):
-            for dofN,g in self.dirichletConditions[cj].DOFBoundaryConditionsDict.items():
-                self.u[cj].dof[dofN] = g(self.dirichletConditions[cj].DOFBoundaryPointDict[dofN],self.timeIntegration.t)
+            dofs,values = self.getDirichletValues(self.dirichletConditions[cj],self.timeIntegration.t)
+            self.u[cj].dof[dofs] = values
         if self.forceStrongConditions:
             for cj in range(len(self.dirichletConditionsForceDOF)):
-                for dofN,g in self.dirichletConditionsForceDOF[cj].DOFBoundaryConditionsDict.items():
-                    self.u[cj].dof[dofN] = g(self.dirichletConditionsForceDOF[cj].DOFBoundaryPointDict[dofN],self.timeIntegration.t)
+                dofs,values = self.getDirichletValues(self.dirichletConditionsForceDOF[cj],self.timeIntegration.t)
+                self.u[cj].dof[dofs] = values
         #Load the unknowns into the finite element dof
         self.timeIntegration.calculateU(u)
         self.setUnknowns(self.timeIntegration.u)
@@ -6087,7 +6126,7 @@ class OneLevelTransport(NonlinearEquation):
                                                                           LaplaceJacobian[ci][cj],
                                                                           self.LaplaceOperator)
 
-        self.LaplaceOperatorpetsc = superlu_2_petsc4py(self.LaplaceOperator)
+        self.LaplaceOperatorpetsc = superlu_2_petsc4py(self.LaplaceOperator,self.par_info)
         
         var_range = []
         isp_list = []
@@ -6387,6 +6426,13 @@ class MultilevelTransport(object):
             jacobian = transport.initializeJacobian()
             self.jacobianList.append(jacobian)
             par_bs = transport.coefficients.nc
+            if (par_bs > 1 and
+                getattr(options,'linearSystemBlockStorage',False) and
+                transport.stride == [par_bs]*par_bs):
+                #interlaced components can be stored by blocks (BAIJ)
+                par_blockVecType = "block"
+            else:
+                par_blockVecType = "simple"
             logEvent("Allocating parallel storage",level=2)
             comm = Comm.get()
             self.comm=comm
@@ -6534,48 +6580,18 @@ class MultilevelTransport(object):
                                              proteus2petsc_subdomain=proteus2petsc_subdomain,
                                              petsc2proteus_subdomain=petsc2proteus_subdomain)
                     rowptr, colind, nzval = jacobian.getCSRrepresentation()
-                    rowptr_petsc = rowptr.copy()
-                    colind_petsc = colind.copy()
-                    nzval[:] = np.arange(nzval.shape[0])
-                    nzval_petsc = nzval.copy()
-                    nzval_proteus2petsc=colind.copy()
-                    nzval_petsc2proteus=colind.copy()
-                    rowptr_petsc[0] = 0
-                    comm.beginSequential()
-                    for i in range(par_n+par_nghost):
-                        start_proteus = rowptr[petsc2proteus_subdomain[i]]
-                        end_proteus = rowptr[petsc2proteus_subdomain[i]+1]
-                        nzrow =  end_proteus - start_proteus
-                        rowptr_petsc[i+1] = rowptr_petsc[i] + nzrow
-                        start_petsc = rowptr_petsc[i]
-                        end_petsc = rowptr_petsc[i+1]
-                        #print "proteus_colind", colind[start_proteus:end_proteus]
-                        petsc_cols_i = proteus2petsc_subdomain[colind[start_proteus:end_proteus]]
-                        j_sorted = petsc_cols_i.argsort()
-                        colind_petsc[start_petsc:end_petsc] = petsc_cols_i[j_sorted]
-                        nzval_petsc[start_petsc:end_petsc] = nzval[start_proteus:end_proteus][j_sorted]
-                        for j_petsc, j_proteus in zip(np.arange(start_petsc,end_petsc),
-                                                      np.arange(start_proteus,end_proteus)[j_sorted]):
-                            nzval_petsc2proteus[j_petsc] = j_proteus
-                            nzval_proteus2petsc[j_proteus] = j_petsc
-                    assert((nzval_petsc[nzval_proteus2petsc] == nzval).all())
-                    assert((nzval[nzval_petsc2proteus] == nzval_petsc).all())
-                    comm.endSequential()
-                    assert(nzval_petsc.shape[0] == colind_petsc.shape[0] == rowptr_petsc[-1] - rowptr_petsc[0])
-                    petsc_a = {}
-                    proteus_a = {}
-                    for i in range(transport.dim):
-                        for j,k in zip(colind[rowptr[i]:rowptr[i+1]],list(range(rowptr[i],rowptr[i+1]))):
-                            nzval[k] = i*transport.dim+j
-                            proteus_a[i,j] = nzval[k]
-                            petsc_a[proteus2petsc_subdomain[i],proteus2petsc_subdomain[j]] = nzval[k]
-                    for i in range(transport.dim):
-                        for j,k in zip(colind_petsc[rowptr_petsc[i]:rowptr_petsc[i+1]],list(range(rowptr_petsc[i],rowptr_petsc[i+1]))):
-                            nzval_petsc[k] = petsc_a[i,j]
+                    (rowptr_petsc,
+                     colind_petsc,
+                     nzval_proteus2petsc,
+                     nzval_petsc2proteus) = petscNonzeroOrdering(rowptr,
+                                                                 colind,
+                                                                 proteus2petsc_subdomain,
+                                                                 petsc2proteus_subdomain)
+                    assert(nzval_petsc2proteus.shape[0] == colind_petsc.shape[0] == rowptr_petsc[-1] - rowptr_petsc[0])
+                    #tag each nonzero with its proteus (row, column)
+                    nzval[:] = numpy.repeat(numpy.arange(rowptr.shape[0]-1),numpy.diff(rowptr))*transport.dim + colind
+                    nzval_petsc = nzval[nzval_petsc2proteus]
                     assert((nzval_petsc[nzval_proteus2petsc] == nzval).all())
-                    assert((nzval[nzval_petsc2proteus] == nzval_petsc).all())
-                    assert (all(proteus_a[(petsc2proteus_subdomain[k[0]],petsc2proteus_subdomain[k[1]])] == v for k,v in list(petsc_a.items())))
-                    assert (all(petsc_a[(proteus2petsc_subdomain[k[0]],proteus2petsc_subdomain[k[1]])] == v for k,v in list(proteus_a.items())))
                     transport.nzval_petsc = nzval_petsc
                     transport.colind_petsc = colind_petsc
                     transport.rowptr_petsc = rowptr_petsc
@@ -6601,6 +6617,12 @@ class MultilevelTransport(object):
                         transport.par_info.dim = transport.dim
                         transport.par_info.nzval_proteus2petsc = nzval_proteus2petsc
                         transport.par_info.mixed = mixed
+                        transport.par_info.petscOrderings = [(rowptr,
+                                                              colind,
+                                                              (rowptr_petsc,
+                                                               colind_petsc,
+                                                               nzval_proteus2petsc,
+                                                               nzval_petsc2proteus))]
                     except AttributeError:
                         logEvent("Transport class has no ParInfo_petsc4py class to store parallel data.",level=4)
                     par_jacobian = ParMat_petsc4py(petsc_jacobian,1,par_n,par_N,par_nghost,
@@ -6611,10 +6633,10 @@ class MultilevelTransport(object):
                     par_nghost = trialSpaceDict[0].dofMap.nDOF_subdomain - par_n
                     subdomain2global = trialSpaceDict[0].dofMap.subdomain2global
                     logEvent("Allocating ghosted parallel vectors on rank %i" % comm.rank(),level=2)
-                    par_u = ParVec_petsc4py(u,par_bs,par_n,par_N,par_nghost,subdomain2global)
-                    par_r = ParVec_petsc4py(r,par_bs,par_n,par_N,par_nghost,subdomain2global)
+                    par_u = ParVec_petsc4py(u,par_bs,par_n,par_N,par_nghost,subdomain2global,blockVecType=par_blockVecType)
+                    par_r = ParVec_petsc4py(r,par_bs,par_n,par_N,par_nghost,subdomain2global,blockVecType=par_blockVecType)
                     logEvent("Allocating un-ghosted parallel vectors on rank %i" % comm.rank(),level=2)
-                    par_du = ParVec_petsc4py(du,par_bs,par_n,par_N)
+                    par_du = ParVec_petsc4py(du,par_bs,par_n,par_N,blockVecType=par_blockVecType)
                     logEvent("Allocating matrix on rank %i" % comm.rank(),level=2)
                     try:
                         transport.par_info.par_bs = par_bs
@@ -6626,7 +6648,7 @@ class MultilevelTransport(object):
                         transport.par_info.mixed = mixed
                     except AttributeError:
                         logEvent("Transport class has no ParInfo_petsc4py class to store parallel data.",level=4)
-                    par_jacobian = ParMat_petsc4py(jacobian,par_bs,par_n,par_N,par_nghost,subdomain2global,pde=transport)
+                    par_jacobian = ParMat_petsc4py(jacobian,par_bs,par_n,par_N,par_nghost,subdomain2global,blockVecType=par_blockVecType,pde=transport)
             elif  (options.multilevelLinearSolver == KSP_petsc4py or
                    options.levelLinearSolver == KSP_petsc4py):
                 assert trialSpaceDict[0].dofMap.subdomain2global is not None, "need trivial subdomain2global in dofMap for running PETSc"
@@ -6665,12 +6687,12 @@ class MultilevelTransport(object):
                     transport.owned_local = numpy.arange(par_n*par_bs)
                     subdomain2global = trialSpaceDict[0].dofMap.subdomain2global
                     max_dof_neighbors= trialSpaceDict[0].dofMap.max_dof_neighbors
-                    par_u = ParVec_petsc4py(u,par_bs,par_n,par_N,par_nghost,subdomain2global[:par_n])
-                    par_r = ParVec_petsc4py(r,par_bs,par_n,par_N,par_nghost,subdomain2global[:par_n])
+                    par_u = ParVec_petsc4py(u,par_bs,par_n,par_N,par_nghost,subdomain2global[:par_n],blockVecType=par_blockVecType)
+                    par_r = ParVec_petsc4py(r,par_bs,par_n,par_N,par_nghost,subdomain2global[:par_n],blockVecType=par_blockVecType)
                     logEvent("Allocating un-ghosted parallel vectors on rank %i" % comm.rank(),level=2)
-                    par_du = ParVec_petsc4py(du,par_bs,par_n,par_N)
+                    par_du = ParVec_petsc4py(du,par_bs,par_n,par_N,blockVecType=par_blockVecType)
                     logEvent("Allocating matrix on rank %i" % comm.rank(),level=2)
-                    par_jacobian = ParMat_petsc4py(jacobian,par_bs,par_n,par_N,par_nghost,subdomain2global,pde=transport)
+                    par_jacobian = ParMat_petsc4py(jacobian,par_bs,par_n,par_N,par_nghost,subdomain2global,blockVecType=par_blockVecType,pde=transport)
                     try:
                         transport.par_info.par_bs = par_bs
                         transport.par_info.mixed = mixed
@@ -15,22 +15,24 @@ if comm.size() > 1:
 else:
     parallel=False
 
-# models
-from proteus.mprans import (RANS2P,
-                            RANS3PF,
-                            VOF,
-                            RDLS,
-                            NCLS,
-                            MCorr,
-                            CLSVOF,
-                            AddedMass,
-                            MoveMesh,
-                            MoveMeshMonitor,
-                            Pres,
-                            PresInit,
-                            PresInc,
-                            Kappa,
-                            Dissipation)
+# models, loaded on first use so that only the models of the problem
+# (and their compiled extensions) are imported
+from proteus import lazyImport
+RANS2P = lazyImport('proteus.mprans.RANS2P')
+RANS3PF = lazyImport('proteus.mprans.RANS3PF')
+VOF = lazyImport('proteus.mprans.VOF')
+RDLS = lazyImport('proteus.mprans.RDLS')
+NCLS = lazyImport('proteus.mprans.NCLS')
+MCorr = lazyImport('proteus.mprans.MCorr')
+CLSVOF = lazyImport('proteus.mprans.CLSVOF')
+AddedMass = lazyImport('proteus.mprans.AddedMass')
+MoveMesh = lazyImport('proteus.mprans.MoveMesh')
+MoveMeshMonitor = lazyImport('proteus.mprans.MoveMeshMonitor')
+Pres = lazyImport('proteus.mprans.Pres')
+PresInit = lazyImport('proteus.mprans.PresInit')
+PresInc = lazyImport('proteus.mprans.PresInc')
+Kappa = lazyImport('proteus.mprans.Kappa')
+Dissipation = lazyImport('proteus.mprans.Dissipation')
 # numerical options
 from proteus import (StepControl,
                      TimeIntegration,
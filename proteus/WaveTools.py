@@ -19,7 +19,7 @@ import cython
 import numpy as np
 import cmath as cmat
 from .Profiling import logEvent, logFile
-from proteus import Comm
+from proteus import Comm, Profiling
 import time as tt
 import sys as sys
 
@@ -61,7 +61,13 @@ __all__ = ['SteadyCurrent',
            'dispersion',
            'tophat',
            'costap',
-           'decompose_tseries']
+           'decompose_tseries',
+           'fastcos_batch',
+           'fastcosh_batch',
+           'eta_modes_batch',
+           'vel_modes_batch',
+           'eta_batch_times',
+           'u_batch_times']
 
 
 def fastcos_test(phase,sinus=False):
@@ -702,6 +708,274 @@ def decompose_tseries(time,eta,dt):
     results.append(setup)
     return results
 
+# Number of points processed at once by the batched kernels. Bounds the size
+# of the (points x components) work arrays.
+_BATCH_CHUNK = 4096
+
+def _batchPoints(X):
+    """Returns an array of points as a (Np,3) float array
+
+    Parameters
+    ----------
+    X : numpy.ndarray
+        Array of position vectors, any shape ending with 3
+
+    Returns
+    --------
+    numpy.ndarray
+        2D numpy array Npx3
+    """
+    X = np.asarray(X,dtype='d')
+    return X.reshape(-1,3)
+
+def _batchBuffer(out,shape):
+    """Returns a zeroed output buffer, reusing out if it is given
+
+    Parameters
+    ----------
+    out : numpy.ndarray
+        Preallocated buffer or None
+    shape : tuple
+        Required shape of the buffer
+
+    Returns
+    --------
+    numpy.ndarray
+        Buffer of the required shape filled with zeros
+    """
+    if out is None:
+        return np.zeros(shape,'d')
+    if out.size != int(np.prod(shape)):
+        logEvent("ERROR! Wavetools.py: Output buffer has %s entries, expected %s" %(out.size,int(np.prod(shape))),level=0)
+        sys.exit(1)
+    if out.shape != shape:
+        out = out.reshape(shape)
+    out.fill(0.)
+    return out
+
+def fastcos_batch(phase):
+    """Array counterpart of the fastcos approximation of WaveTools.h
+
+    Parameters
+    ----------
+    phase : numpy.ndarray
+            Phases
+
+    Returns
+    --------
+    numpy.ndarray
+        Approximation of cos(phase), accurate to 0.4%
+
+    """
+    Pi2 = 2.*np.pi
+    phase = phase - Pi2*np.trunc(phase*(1./Pi2))
+    phase[phase < 0.] += Pi2
+    phase[phase > 1.7*np.pi] -= Pi2
+    negative = phase > 0.7*np.pi
+    phase[negative] -= np.pi
+    phase2 = phase*phase*0.5
+    fastc = 1. - phase2 + phase2*phase2*0.16666666666666666667
+    quadrant = phase >= 0.3*np.pi
+    phase1 = phase[quadrant] - 0.5*np.pi
+    fastc[quadrant] = -phase1 + phase1*phase1*phase1*0.166666666666667
+    fastc[negative] *= -1.
+    return fastc
+
+def fastcosh_batch(kZ):
+    """Array counterpart of the fastcosh approximation of WaveTools.h
+
+    Parameters
+    ----------
+    kZ : numpy.ndarray
+         Products of wavenumber and Z coordinate
+
+    Returns
+    --------
+    tuple
+        Taylor approximations of cosh(kZ) and sinh(kZ)
+
+    """
+    Kd2 = kZ*kZ*0.5
+    Kd3 = Kd2*kZ*3.3333333333E-01
+    Kd4 = Kd3*kZ*2.5000000000E-01
+    Kd5 = Kd4*kZ*2.0000000000E-01
+    Kd6 = Kd5*kZ*1.6666666667E-01
+    Kd7 = Kd6*kZ*1.4285714286E-01
+    Kd8 = Kd7*kZ*1.2500000000E-01
+    Kd9 = Kd8*kZ*1.1111111111E-01
+    Kd10 = Kd9*kZ*0.1
+    return (1. + Kd2 + Kd4 + Kd6 + Kd8 + Kd10,
+            kZ + Kd3 + Kd5 + Kd7 + Kd9)
+
+def eta_modes_batch(X, t, kDir, omega, phi, amplitude, out, fast=False):
+    """Adds the free surface elevation of a set of linear modes at an array of points
+
+    The modes are summed with array operations, processing the points in
+    chunks. With fast=True the cosine is approximated as in the point by
+    point evaluation of the waves (see fastcos_batch).
+
+    Parameters
+    ----------
+    X : numpy.ndarray
+        2D numpy array Npx3 of position vectors
+    t : float
+        Time variable
+    kDir : numpy.ndarray
+        2D numpy array Nx3 of wave number vectors
+    omega : numpy.ndarray
+        Angular frequencies
+    phi : numpy.ndarray
+        Wave phases
+    amplitude : numpy.ndarray
+        Wave amplitudes
+    out : numpy.ndarray
+        1D numpy array of length Np where the elevation is accumulated
+    fast : Optional[bool]
+        Switch for the approximated cosine
+
+    Returns
+    --------
+    numpy.ndarray
+        The out array
+    """
+    phase0 = phi - omega*t
+    for i0 in range(0,X.shape[0],_BATCH_CHUNK):
+        i1 = min(i0+_BATCH_CHUNK,X.shape[0])
+        phase = np.dot(X[i0:i1],kDir.T)
+        phase += phase0
+        if fast:
+            phase = fastcos_batch(phase)
+        else:
+            np.cos(phase,out=phase)
+        out[i0:i1] += np.dot(phase,amplitude)
+    return out
+
+def vel_modes_batch(X, t, kDir, kAbs, omega, phi, amplitude, mwl, depth, waveDir, vDir, tanhKd, gAbs, out, fast=False):
+    """Adds the velocity of a set of linear modes at an array of points
+
+    Batched counterpart of vel_mode, including the Stokes drift
+    correction. With fast=True the hyperbolic and trigonometric functions
+    are approximated and the hyperbolic terms are cut off below
+    kAbs*Z = -pi, as in the point by point evaluation of the waves.
+
+    Parameters
+    ----------
+    X : numpy.ndarray
+        2D numpy array Npx3 of position vectors
+    t : float
+        Time variable
+    kDir : numpy.ndarray
+        2D numpy array Nx3 of wave number vectors
+    kAbs : numpy.ndarray
+        Wave number magnitudes
+    omega : numpy.ndarray
+        Angular frequencies
+    phi : numpy.ndarray
+        Wave phases
+    amplitude : numpy.ndarray
+        Wave amplitudes
+    mwl : float
+        Mean water level
+    depth : float
+        Water depth
+    waveDir : numpy.ndarray
+        Wave direction, either a single vector or a 2D numpy array Nx3 with
+        one direction per mode
+    vDir : numpy.ndarray
+        Unit vector aligned with vertical direction
+    tanhKd : numpy.ndarray
+        tanh(kAbs*depth) for each mode
+    gAbs : float
+        Magnitude of gravitational acceleration
+    out : numpy.ndarray
+        2D numpy array Npx3 where the velocity is accumulated
+    fast : Optional[bool]
+        Switch for the approximated functions
+
+    Returns
+    --------
+    numpy.ndarray
+        The out array
+    """
+    phase0 = phi - omega*t
+    aw = amplitude*omega
+    drift = 0.5*gAbs*amplitude*amplitude*kAbs/(omega*depth)
+    for i0 in range(0,X.shape[0],_BATCH_CHUNK):
+        i1 = min(i0+_BATCH_CHUNK,X.shape[0])
+        phase = np.dot(X[i0:i1],kDir.T)
+        phase += phase0
+        kZ = np.outer(np.dot(X[i0:i1],vDir) - mwl,kAbs)
+        if fast:
+            ch, sh = fastcosh_batch(kZ)
+            deep = kZ <= -np.pi
+            ch[deep] = 0.
+            sh[deep] = 0.
+            fcos = fastcos_batch(phase)
+            fsin = fastcos_batch(0.5*np.pi - phase)
+        else:
+            ch = np.cosh(kZ)
+            sh = np.sinh(kZ)
+            fcos = np.cos(phase)
+            fsin = np.sin(phase)
+        UH = aw*(ch/tanhKd + sh)*fcos - drift
+        UV = aw*(sh/tanhKd + ch)*fsin
+        if waveDir.ndim == 1:
+            out[i0:i1] += np.outer(UH.sum(axis=1),waveDir)
+        else:
+            out[i0:i1] += np.dot(UH,waveDir)
+        out[i0:i1] += np.outer(UV.sum(axis=1),vDir)
+    return out
+
+def eta_batch_times(wave, X, times, out=None):
+    """Calculates the free surface elevation at an array of points for several times
+
+    Parameters
+    ----------
+    wave : object
+        WaveTools class instance providing eta_batch
+    X : numpy.ndarray
+        2D numpy array Npx3 of position vectors
+    times : numpy.ndarray
+        Time instants
+    out : Optional[numpy.ndarray]
+        Preallocated Nt x Np output buffer
+
+    Returns
+    --------
+    numpy.ndarray
+        2D numpy array Nt x Np of free-surface elevations
+    """
+    X = _batchPoints(X)
+    out = _batchBuffer(out,(len(times),X.shape[0]))
+    for it,t in enumerate(times):
+        wave.eta_batch(X,t,out[it])
+    return out
+
+def u_batch_times(wave, X, times, out=None):
+    """Calculates the velocity vector at an array of points for several times
+
+    Parameters
+    ----------
+    wave : object
+        WaveTools class instance providing u_batch
+    X : numpy.ndarray
+        2D numpy array Npx3 of position vectors
+    times : numpy.ndarray
+        Time instants
+    out : Optional[numpy.ndarray]
+        Preallocated Nt x Np x 3 output buffer
+
+    Returns
+    --------
+    numpy.ndarray
+        3D numpy array Nt x Np x 3 of velocity vectors
+    """
+    X = _batchPoints(X)
+    out = _batchBuffer(out,(len(times),X.shape[0],3))
+    for it,t in enumerate(times):
+        wave.u_batch(X,t,out[it])
+    return out
+
 class  SteadyCurrent(object):
     """
     This class is used for generating a steady current
@@ -770,6 +1044,48 @@ class  SteadyCurrent(object):
             U=self.U
         return U
 
+    def eta_batch(self,X,t,out=None):
+        """Calculates free surface elevation at an array of points (SteadyCurrent class)
+        Parameters
+        ----------
+        X : numpy.ndarray
+            2D numpy array Npx3 of position vectors
+        t : float
+            Time variable
+        out : Optional[numpy.ndarray]
+            Preallocated output buffer of length Np
+
+        Returns
+        --------
+        numpy.ndarray
+            Free-surface elevations as 1D array
+
+        """
+        X = _batchPoints(X)
+        return _batchBuffer(out,(X.shape[0],))
+
+    def u_batch(self,X,t,out=None):
+        """Calculates velocity vectors at an array of points (SteadyCurrent class)
+        Parameters
+        ----------
+        X : numpy.ndarray
+            2D numpy array Npx3 of position vectors
+        t : float
+            Time variable
+        out : Optional[numpy.ndarray]
+            Preallocated Npx3 output buffer
+
+        Returns
+        --------
+        numpy.ndarray
+            Velocity vectors as 2D array Npx3
+
+        """
+        X = _batchPoints(X)
+        out = _batchBuffer(out,(X.shape[0],3))
+        out += self.u(np.zeros(3,),t)
+        return out
+
 
 
 class  SolitaryWave(object):
@@ -881,6 +1197,64 @@ class  SolitaryWave(object):
         """
         return self.waveDir*Uhorz + self.vDir*Uvert
 
+    def eta_batch(self,X,t,out=None):
+        """Calculates free surface elevation at an array of points (SolitaryWave class)
+        Parameters
+        ----------
+        X : numpy.ndarray
+            2D numpy array Npx3 of position vectors
+        t : float
+            Time variable
+        out : Optional[numpy.ndarray]
+            Preallocated output buffer of length Np
+
+        Returns
+        --------
+        numpy.ndarray
+            Free-surface elevations as 1D array
+
+        """
+        X = _batchPoints(X)
+        out = _batchBuffer(out,(X.shape[0],))
+        phase = np.dot(X-self.trans,self.waveDir) - self.c*t
+        out += self.H/np.cosh(self.K*phase)**2
+        return out
+
+    def u_batch(self,X,t,out=None):
+        """Calculates velocity vectors at an array of points (SolitaryWave class)
+        Parameters
+        ----------
+        X : numpy.ndarray
+            2D numpy array Npx3 of position vectors
+        t : float
+            Time variable
+        out : Optional[numpy.ndarray]
+            Preallocated Npx3 output buffer
+
+        Returns
+        --------
+        numpy.ndarray
+            Velocity vectors as 2D array Npx3
+
+        """
+        X = _batchPoints(X)
+        out = _batchBuffer(out,(X.shape[0],3))
+        phase = np.dot(X-self.trans,self.waveDir) - self.c*t
+        a1 = np.cosh(self.K*phase*2.)
+        a2 = np.cosh(self.K*phase)
+        Z = np.dot(X,self.vDir) - self.mwl
+        H = self.H
+        d = self.depth
+        Uhorz = 1.0/(4.0*d**4)*np.sqrt(self.gAbs*d)*H*(
+            2.0*self.d3 + self.d2*H + 12.0*d*H*Z + 6.0*H*Z**2 +
+            (2.0*self.d3 - self.d2*H - 6.0*d*H*Z - 3.0*H*Z**2)*a1)/a2**4
+        Uvert = 1.0/(4.0*np.sqrt(self.gAbs*d))*np.sqrt(3.0)*self.gAbs*(H/d**3)**1.5*(d + Z)*(
+            2.0*d**3 - 7.0*d**2*H + 10.0*d*H*Z + 5.0*H*Z**2 +
+            (2.0*d**3 + d**2*H - 2.0*d*H*Z - H*Z**2)*np.cosh(np.sqrt(3.0*H/d**3)*phase))/(
+            np.cosh(np.sqrt(3.0*H/(4.0*d**3))*phase))**4*np.tanh(np.sqrt(3.0*H/(4.0*d**3))*phase)
+        out += np.outer(Uhorz,self.waveDir) + np.outer(Uvert,self.vDir)
+        return out
+
 
 
 
@@ -923,6 +1297,9 @@ class  MonochromaticWaves(object):
                                'points_freesurface': 50,
                                'points_velocity': 16,
                                'points_vertical': 20}
+             and optionally 'cacheDir', a directory where solutions are
+             saved and reused for the same parameters (see
+             proteus.fenton.Fenton.solve)
     Ycoeff : numpy.ndarray
              Fenton Fourier coefficients for free-surface elevation             
     Bcoeff : numpy.ndarray
@@ -1009,25 +1386,26 @@ class  MonochromaticWaves(object):
                                           'points_freesurface': 50,
                                           'points_velocity': 16,
                                           'points_vertical': 20}
-                    Fenton.writeInput(waveheight=waveHeight,
-                                      depth=depth,
-                                      period=period,
-                                      mode=autoFentonOpts['mode'],
-                                      current_criterion=autoFentonOpts['current_criterion'],
-                                      current_magnitude=0,
-                                      ncoeffs=Nf,
-                                      height_steps=autoFentonOpts['height_steps'],
-                                      g=np.linalg.norm(g),
-                                      niter=autoFentonOpts['niter'],
-                                      conv_crit=autoFentonOpts['conv_crit'],
-                                      points_freesurface=autoFentonOpts['points_freesurface'],
-                                      points_velocity=autoFentonOpts['points_velocity'],
-                                      points_vertical=autoFentonOpts['points_vertical'])
-                    Fenton.runFourier()
-                    Fenton.copyFiles()
-                comm.barrier()
-                self.Bcoeff, self.Ycoeff = Fenton.getBYCoeffs()
-                self.wavelength = Fenton.getWavelength()*depth
+                    solution = Fenton.solve(waveheight=waveHeight,
+                                            depth=depth,
+                                            period=period,
+                                            mode=autoFentonOpts['mode'],
+                                            current_criterion=autoFentonOpts['current_criterion'],
+                                            current_magnitude=0,
+                                            ncoeffs=Nf,
+                                            height_steps=autoFentonOpts['height_steps'],
+                                            g=np.linalg.norm(g),
+                                            niter=autoFentonOpts['niter'],
+                                            conv_crit=autoFentonOpts['conv_crit'],
+                                            points_freesurface=autoFentonOpts['points_freesurface'],
+                                            points_velocity=autoFentonOpts['points_velocity'],
+                                            points_vertical=autoFentonOpts['points_vertical'],
+                                            cacheDir=autoFentonOpts.get('cacheDir'),
+                                            outputDir=Profiling.logDir)
+                else:
+                    solution = None
+                self.Bcoeff, self.Ycoeff, wavelength = comm.comm.tompi4py().bcast(solution, root=0)
+                self.wavelength = wavelength*depth
                 self.k = 2.0*M_PI/self.wavelength
                 for ii in range(len(self.tanhF)):
                     kk = (ii+1)*self.k
@@ -1158,6 +1536,74 @@ class  MonochromaticWaves(object):
             U[2] = cppU[2]
         return U
 
+    def _batchModes(self):
+        """Returns the wave components as arrays (MonochromaticWaves class)
+
+        Returns
+        --------
+        tuple
+            kDir, kAbs, omega, phi, eta amplitude, velocity amplitude and
+            tanh(k*depth) arrays of the components
+        """
+        if self.waveType == "Linear":
+            ones = np.ones(1,)
+            return (self.kDir.reshape(1,3), self.k*ones, self.omega*ones,
+                    self.phi0*ones, self.amplitude*ones, self.amplitude*ones,
+                    self.tanhL*ones)
+        nn = np.arange(1,self.Nf+1,dtype='d')
+        tanhF = np.asarray(self.tanhF[:self.Nf],dtype='d')
+        ampU = tanhF*sqrt(old_div(self.gAbs,self.k))*np.asarray(self.Bcoeff[:self.Nf],dtype='d')/self.omega
+        ampEta = np.asarray(self.Ycoeff[:self.Nf],dtype='d')/self.k
+        return (np.outer(nn,self.kDir), nn*self.k, nn*self.omega,
+                nn*self.phi0, ampEta, ampU, tanhF)
+
+    def eta_batch(self,X,t,out=None):
+        """Calculates free surface elevation at an array of points (MonochromaticWaves class)
+        Parameters
+        ----------
+        X : numpy.ndarray
+            2D numpy array Npx3 of position vectors
+        t : float
+            Time variable
+        out : Optional[numpy.ndarray]
+            Preallocated output buffer of length Np
+
+        Returns
+        --------
+        numpy.ndarray
+            Free-surface elevations as 1D array
+
+        """
+        X = _batchPoints(X)
+        out = _batchBuffer(out,(X.shape[0],))
+        kDir, kAbs, omega, phi, ampEta, ampU, tanhKd = self._batchModes()
+        return eta_modes_batch(X,t,kDir,omega,phi,ampEta,out,self.fast)
+
+    def u_batch(self,X,t,out=None):
+        """Calculates velocity vectors at an array of points (MonochromaticWaves class)
+        Parameters
+        ----------
+        X : numpy.ndarray
+            2D numpy array Npx3 of position vectors
+        t : float
+            Time variable
+        out : Optional[numpy.ndarray]
+            Preallocated Npx3 output buffer
+
+        Returns
+        --------
+        numpy.ndarray
+            Velocity vectors as 2D array Npx3
+
+        """
+        X = _batchPoints(X)
+        out = _batchBuffer(out,(X.shape[0],3))
+        kDir, kAbs, omega, phi, ampEta, ampU, tanhKd = self._batchModes()
+        vel_modes_batch(X,t,kDir,kAbs,omega,phi,ampU,self.mwl,self.depth,self.waveDir,self.vDir,tanhKd,self.gAbs,out,self.fast)
+        if self.waveType != "Linear":
+            out += self.mV
+        return out
+
 class NewWave(object):
     """
     This class is used for generating the NewWave theory (see Tromans et al. 1991)
@@ -1344,6 +1790,48 @@ class NewWave(object):
         U[2] = cppU[2]
 
         return U
+    def eta_batch(self, X, t, out=None):
+        """Calculates free surface elevation at an array of points (NewWave class)
+        Parameters
+        ----------
+        X : numpy.ndarray
+            2D numpy array Npx3 of position vectors
+        t : float
+            Time variable
+        out : Optional[numpy.ndarray]
+            Preallocated output buffer of length Np
+
+        Returns
+        --------
+        numpy.ndarray
+            Free-surface elevations as 1D array
+
+        """
+        X = _batchPoints(X)
+        out = _batchBuffer(out,(X.shape[0],))
+        return eta_modes_batch(X,t,self.kDir,self.omega,self.phi,self.ai,out,self.fast)
+
+    def u_batch(self, X, t, out=None):
+        """Calculates velocity vectors at an array of points (NewWave class)
+        Parameters
+        ----------
+        X : numpy.ndarray
+            2D numpy array Npx3 of position vectors
+        t : float
+            Time variable
+        out : Optional[numpy.ndarray]
+            Preallocated Npx3 output buffer
+
+        Returns
+        --------
+        numpy.ndarray
+            Velocity vectors as 2D array Npx3
+
+        """
+        X = _batchPoints(X)
+        out = _batchBuffer(out,(X.shape[0],3))
+        return vel_modes_batch(X,t,self.kDir,self.ki,self.omega,self.phi,self.ai,self.mwl,self.depth,self.waveDir,self.vDir,self.tanhF,self.gAbs,out,self.fast)
+
     def writeEtaSeries(self,Tstart,Tend,x0,fname,Lgen= np.array([0.,0,0])):
         """Writes a timeseries of the free-surface elevation
 
@@ -1581,6 +2069,48 @@ class RandomWaves(object):
         U[2] = cppU[2]
 
         return U
+    def eta_batch(self, X, t, out=None):
+        """Calculates free surface elevation at an array of points (RandomWaves class)
+        Parameters
+        ----------
+        X : numpy.ndarray
+            2D numpy array Npx3 of position vectors
+        t : float
+            Time variable
+        out : Optional[numpy.ndarray]
+            Preallocated output buffer of length Np
+
+        Returns
+        --------
+        numpy.ndarray
+            Free-surface elevations as 1D array
+
+        """
+        X = _batchPoints(X)
+        out = _batchBuffer(out,(X.shape[0],))
+        return eta_modes_batch(X,t,self.kDir,self.omega,self.phi,self.ai,out,self.fast)
+
+    def u_batch(self, X, t, out=None):
+        """Calculates velocity vectors at an array of points (RandomWaves class)
+        Parameters
+        ----------
+        X : numpy.ndarray
+            2D numpy array Npx3 of position vectors
+        t : float
+            Time variable
+        out : Optional[numpy.ndarray]
+            Preallocated Npx3 output buffer
+
+        Returns
+        --------
+        numpy.ndarray
+            Velocity vectors as 2D array Npx3
+
+        """
+        X = _batchPoints(X)
+        out = _batchBuffer(out,(X.shape[0],3))
+        return vel_modes_batch(X,t,self.kDir,self.ki,self.omega,self.phi,self.ai,self.mwl,self.depth,self.waveDir,self.vDir,self.tanhF,self.gAbs,out,self.fast)
+
     def writeEtaSeries(self,Tstart,Tend,x0,fname,Lgen= np.array([0.,0,0])):
         """Writes a timeseries of the free-surface elevation
 
@@ -1825,6 +2355,50 @@ class MultiSpectraRandomWaves(object):
         return U
 
 
+    def eta_batch(self, X, t, out=None):
+        """Calculates free surface elevation at an array of points (MultiSpectraRandomWaves class)
+        Parameters
+        ----------
+        X : numpy.ndarray
+            2D numpy array Npx3 of position vectors
+        t : float
+            Time variable
+        out : Optional[numpy.ndarray]
+            Preallocated output buffer of length Np
+
+        Returns
+        --------
+        numpy.ndarray
+            Free-surface elevations as 1D array
+
+        """
+        X = _batchPoints(X)
+        out = _batchBuffer(out,(X.shape[0],))
+        return eta_modes_batch(X,t,self.kDirM,self.omegaM,self.phiM,self.aiM,out,self.fast)
+
+    def u_batch(self, X, t, out=None):
+        """Calculates velocity vectors at an array of points (MultiSpectraRandomWaves class)
+        Parameters
+        ----------
+        X : numpy.ndarray
+            2D numpy array Npx3 of position vectors
+        t : float
+            Time variable
+        out : Optional[numpy.ndarray]
+            Preallocated Npx3 output buffer
+
+        Returns
+        --------
+        numpy.ndarray
+            Velocity vectors as 2D array Npx3
+
+        """
+        X = _batchPoints(X)
+        out = _batchBuffer(out,(X.shape[0],3))
+        waveDirM = self.kDirM/self.kiM[:,np.newaxis]
+        return vel_modes_batch(X,t,self.kDirM,self.kiM,self.omegaM,self.phiM,self.aiM,self.mwl,self.depth,waveDirM,self.vDir,self.tanhFM,self.gAbs,out,self.fast)
+
+
 class DirectionalWaves(object):
     """
     This class is used for generating directional random waves using linear reconstruction of components from a
@@ -1974,6 +2548,9 @@ class DirectionalWaves(object):
         self.aiDirs[:] = np.sqrt(2.*returnRectangles3D(Si_Sp,theta_m,RW.fim))
         self.mwl = mwl
         self.depth = depth
+        self.omega = RW.omega
+        self.ki = RW.ki
+        self.tanhF = RW.tanhF
         self.kDirs = np.zeros((self.N, self.Mtot, 3),"d")
         for nn in range(self.N):
             for mm in range(self.Mtot):
@@ -2068,6 +2645,66 @@ class DirectionalWaves(object):
 
 
 
+    def _batchModes(self):
+        """Returns the directional components as arrays, ordered as in the C++ arrays
+
+        Returns
+        --------
+        tuple
+            kDir, kAbs, omega, tanh(k*depth) and wave direction arrays of the components
+        """
+        kDir = np.transpose(self.kDirs,(1,0,2)).reshape(-1,3)
+        ki = np.tile(self.ki,self.Mtot)
+        omega = np.tile(self.omega,self.Mtot)
+        tanhF = np.tile(self.tanhF,self.Mtot)
+        waveDir = np.repeat(self.waveDirs,self.N,axis=0)
+        return kDir, ki, omega, tanhF, waveDir
+
+    def eta_batch(self, X, t, out=None):
+        """Calculates free surface elevation at an array of points (DirectionalWaves class)
+        Parameters
+        ----------
+        X : numpy.ndarray
+            2D numpy array Npx3 of position vectors
+        t : float
+            Time variable
+        out : Optional[numpy.ndarray]
+            Preallocated output buffer of length Np
+
+        Returns
+        --------
+        numpy.ndarray
+            Free-surface elevations as 1D array
+
+        """
+        X = _batchPoints(X)
+        out = _batchBuffer(out,(X.shape[0],))
+        kDir, ki, omega, tanhF, waveDir = self._batchModes()
+        return eta_modes_batch(X,t,kDir,omega,self.phiDirs.ravel(),self.aiDirs.ravel(),out,self.fast)
+
+    def u_batch(self, X, t, out=None):
+        """Calculates velocity vectors at an array of points (DirectionalWaves class)
+        Parameters
+        ----------
+        X : numpy.ndarray
+            2D numpy array Npx3 of position vectors
+        t : float
+            Time variable
+        out : Optional[numpy.ndarray]
+            Preallocated Npx3 output buffer
+
+        Returns
+        --------
+        numpy.ndarray
+            Velocity vectors as 2D array Npx3
+
+        """
+        X = _batchPoints(X)
+        out = _batchBuffer(out,(X.shape[0],3))
+        kDir, ki, omega, tanhF, waveDir = self._batchModes()
+        return vel_modes_batch(X,t,kDir,ki,omega,self.phiDirs.ravel(),self.aiDirs.ravel(),self.mwl,self.depth,waveDir,self.vDir,tanhF,self.gAbs,out,self.fast)
+
+
 class TimeSeries(object):
     """This class is used for generating waves from an arbirtrary free-surface elevation time series
 
@@ -2567,6 +3204,74 @@ class TimeSeries(object):
         return U
 
 
+    def _batchModes(self, t):
+        """Returns the components active at time t as arrays (TimeSeries class)
+
+        Parameters
+        ----------
+        t : float
+            Time variable
+
+        Returns
+        --------
+        tuple
+            Local time, kDir, kAbs, omega, phi, amplitude and tanh(k*depth)
+            arrays of the components
+        """
+        if self.rec_direct:
+            return (t, self.kDir, self.ki, self.omega, self.phi, self.ai,
+                    np.tanh(self.ki*self.depth))
+        Nw = self.findWindow(t)
+        decomp = self.decompose_window[Nw]
+        ki = decomp[5][:self.Nf]
+        return (t - self.windows_rec[Nw][0,0], decomp[4][:self.Nf], ki,
+                decomp[0][:self.Nf], decomp[2][:self.Nf], decomp[1][:self.Nf],
+                np.tanh(ki*self.depth))
+
+    def eta_batch(self, X, t, out=None):
+        """Calculates free surface elevation at an array of points (Timeseries class)
+        Parameters
+        ----------
+        X : numpy.ndarray
+            2D numpy array Npx3 of position vectors
+        t : float
+            Time variable
+        out : Optional[numpy.ndarray]
+            Preallocated output buffer of length Np
+
+        Returns
+        --------
+        numpy.ndarray
+            Free-surface elevations as 1D array
+
+        """
+        X = _batchPoints(X)
+        out = _batchBuffer(out,(X.shape[0],))
+        tt, kDir, ki, omega, phi, ai, tanhKd = self._batchModes(t)
+        return eta_modes_batch(X-self.x0,tt,kDir,omega,phi,ai,out,self.fast)
+
+    def u_batch(self, X, t, out=None):
+        """Calculates velocity vectors at an array of points (Timeseries class)
+        Parameters
+        ----------
+        X : numpy.ndarray
+            2D numpy array Npx3 of position vectors
+        t : float
+            Time variable
+        out : Optional[numpy.ndarray]
+            Preallocated Npx3 output buffer
+
+        Returns
+        --------
+        numpy.ndarray
+            Velocity vectors as 2D array Npx3
+
+        """
+        X = _batchPoints(X)
+        out = _batchBuffer(out,(X.shape[0],3))
+        tt, kDir, ki, omega, phi, ai, tanhKd = self._batchModes(t)
+        return vel_modes_batch(X-self.x0,tt,kDir,ki,omega,phi,ai,self.mwl,self.depth,self.waveDir,self.vDir,tanhKd,self.gAbs,out,self.fast)
+
 
 class RandomWavesFast(object):
     """
@@ -2720,6 +3425,8 @@ class RandomWavesFast(object):
 
         self.eta = TS.eta
         self.u = TS.u
+        self.eta_batch = TS.eta_batch
+        self.u_batch = TS.u_batch
         self.windOut = TS.windOut
 
     def printOut(self):
@@ -3006,6 +3713,80 @@ class RandomNLWaves(object):
 
 
 
+    def _nlModes(self, mode):
+        """Returns the 2nd order correction components as arrays
+
+        Parameters
+        ----------
+        mode : string
+            Correction type ("2ndOrder", "short" or "long")
+
+        Returns
+        --------
+        tuple
+            kDir, omega, phi and amplitude arrays of the components
+        """
+        gAbs = self.gAbs
+        if mode == "2ndOrder":
+            ai = self.ai**2*self.ki*(2.+3./self.sinhKd**2)/(4.*self.tanhKd)
+            return 2.*self.kDir, 2.*self.omega, 2.*self.phi, ai
+        i,j = np.triu_indices(self.N,1)
+        wi = self.omega[i]
+        wj = self.omega[j]
+        ti = self.tanhKd[i]
+        tj = self.tanhKd[j]
+        ci = wi**3/self.sinhKd[i]**2
+        cj = wj**3/self.sinhKd[j]**2
+        if mode == "short":
+            tanhSum = (ti+tj)/(1.+ti*tj)
+            kSum = self.ki[i]+self.ki[j]
+            Dp = (wi+wj)**2 - gAbs*kSum*tanhSum
+            Bp = (wi**2+wj**2)/(2*gAbs)
+            Bp -= ((wi*wj)/(2*gAbs))*(1.-1./(ti*tj))*(((wi+wj)**2 + gAbs*kSum*tanhSum)/Dp)
+            Bp += ((wi+wj)/(2*gAbs*Dp))*(ci+cj)
+            return (self.kDir[i]+self.kDir[j], wi+wj, self.phi[i]+self.phi[j],
+                    self.ai[i]*self.ai[j]*Bp)
+        tanhSum = (ti-tj)/(1.-ti*tj)
+        kDiff = self.ki[i]-self.ki[j]
+        Dp = (wi-wj)**2 - gAbs*kDiff*tanhSum
+        Bp = (wi**2+wj**2)/(2*gAbs)
+        Bp += ((wi*wj)/(2*gAbs))*(1.+1./(ti*tj))*(((wi-wj)**2 + gAbs*kDiff*tanhSum)/Dp)
+        Bp += ((wi-wj)/(2*gAbs*Dp))*(ci-cj)
+        return (self.kDir[i]-self.kDir[j], wi-wj, self.phi[i]-self.phi[j],
+                self.ai[i]*self.ai[j]*Bp)
+
+    def eta_overall_batch(self,X,t,setUp=False,out=None):
+        """Calculates the free surface elevation with 2nd order corrections at an array of points
+
+        Uses 2nd order random wave theory
+
+        Parameters
+        ----------
+        X : numpy.ndarray
+            2D numpy array Npx3 of position vectors
+        t : float
+            Time variable
+        setUp : Optional[bool]
+            Switch for activating setup calculation
+        out : Optional[numpy.ndarray]
+            Preallocated output buffer of length Np
+
+        Returns
+        --------
+        numpy.ndarray
+            Free-surface elevations as 1D array
+
+        """
+        X = _batchPoints(X)
+        out = _batchBuffer(out,(X.shape[0],))
+        eta_modes_batch(X,t,self.kDir,self.omega,self.phi,self.ai,out,self.fast)
+        for mode in ["2ndOrder","short","long"]:
+            kDir, omega, phi, ai = self._nlModes(mode)
+            eta_modes_batch(X,t,kDir,omega,phi,ai,out,self.fast)
+        if setUp:
+            out -= self.eta_setUp(X[0],t)
+        return out
+
     def writeEtaSeries(self,Tstart,Tend,dt,x0,fname, mode="all",setUp=False, Lgen=np.zeros(3,)):
         """Writes a timeseries of the free-surface elevation
 
@@ -3255,6 +4036,52 @@ class RandomNLWavesFast(object):
         uR = self.TS[0].u(x,t)+ self.TS[1].u(x,t)+self.TS[2].u(x,t)
         return uR
     
+    def eta_batch(self,X,t,out=None):
+        """Calculates free surface elevation at an array of points (RandomNLWavesFast class)
+        Parameters
+        ----------
+        X : numpy.ndarray
+            2D numpy array Npx3 of position vectors
+        t : float
+            Time variable
+        out : Optional[numpy.ndarray]
+            Preallocated output buffer of length Np
+
+        Returns
+        --------
+        numpy.ndarray
+            Free-surface elevations as 1D array
+
+        """
+        X = _batchPoints(X)
+        out = _batchBuffer(out,(X.shape[0],))
+        for TS in self.TS:
+            out += TS.eta_batch(X,t)
+        return out
+
+    def u_batch(self,X,t,out=None):
+        """Calculates velocity vectors at an array of points (RandomNLWavesFast class)
+        Parameters
+        ----------
+        X : numpy.ndarray
+            2D numpy array Npx3 of position vectors
+        t : float
+            Time variable
+        out : Optional[numpy.ndarray]
+            Preallocated Npx3 output buffer
+
+        Returns
+        --------
+        numpy.ndarray
+            Velocity vectors as 2D array Npx3
+
+        """
+        X = _batchPoints(X)
+        out = _batchBuffer(out,(X.shape[0],3))
+        for TS in self.TS:
+            out += TS.u_batch(X,t)
+        return out
+
 class CombineWaves(object):
     """
     This class is used for combining multiple waveTools classes, thus allowing for the generation of complex wave conditions
@@ -3321,3 +4148,51 @@ class CombineWaves(object):
             u += cond.u(x,t)
         return u
    
+
+    def eta_batch(self,X,t,out=None):
+        """
+        Calculates free surface elevation at an array of points (combineWaves class)
+        Parameters
+        ----------
+        X : numpy.ndarray
+            2D numpy array Npx3 of position vectors
+        t : float
+            Time variable
+        out : Optional[numpy.ndarray]
+            Preallocated output buffer of length Np
+
+        Returns
+        --------
+        numpy.ndarray
+            Free-surface elevations as 1D array
+
+        """
+        X = _batchPoints(X)
+        out = _batchBuffer(out,(X.shape[0],))
+        for cond in self.waveList:
+            out += cond.eta_batch(X,t)
+        return out
+
+    def u_batch(self,X,t,out=None):
+        """
+        Calculates wave particle velocity at an array of points (combineWaves class)
+        Parameters
+        ----------
+        X : numpy.ndarray
+            2D numpy array Npx3 of position vectors
+        t : float
+            Time variable
+        out : Optional[numpy.ndarray]
+            Preallocated Npx3 output buffer
+
+        Returns
+        --------
+        numpy.ndarray
+            Velocity vectors as 2D array Npx3
+
+        """
+        X = _batchPoints(X)
+        out = _batchBuffer(out,(X.shape[0],3))
+        for cond in self.waveList:
+            out += cond.u_batch(X,t)
+        return out
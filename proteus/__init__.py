@@ -70,6 +70,34 @@ __all__ = ["Archiver",
            "SpatialTools",
            "defaults"]
 
+def lazyImport(name):
+    """Return a module that is only loaded on first attribute access
+
+    Parameters
+    ----------
+    name : str
+           Absolute name of the module, e.g. 'proteus.mprans.RANS2P'
+
+    A module that has already been imported is returned as is.
+    """
+    import sys
+    import importlib.util
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ImportError("No module named "+repr(name), name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    parent, _, child = name.rpartition('.')
+    if parent:
+        setattr(sys.modules[parent], child, module)
+    return module
+
 def test(verbose=False, cleanup=True):
     """Run all proteus tests
 
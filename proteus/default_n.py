@@ -237,6 +237,9 @@ nLayersOfOverlapForParallel = 1
 
 parallelPeriodic=False#set this to true and use element,0 overlap to use periodic BC's in parallel
 
+linearSystemBlockStorage = False
+"""Store interlaced multicomponent PETSc systems as BAIJ matrices with block size nc"""
+
 nonlinearSolverConvergenceTest = 'r'
 levelNonlinearSolverConvergenceTest = 'r'
 
@@ -6,7 +6,6 @@ from past.utils import old_div
 import proteus
 from proteus import FemTools, Archiver
 from .cElastoPlastic import *
-from math import atan, tan
 import numpy as np
 from proteus.Transport import OneLevelTransport, sqrt, TC_base
 from proteus.Transport import NonlinearEquation, logEvent, memory
@@ -21,7 +20,9 @@ class Coefficients(proteus.TransportCoefficients.TC_base):
                  rhow=998.2,#kg/m^3 water density (used if pore pressures specified)
                  pa=101325.0,#N/m^2 atmospheric pressure
                  nd=3,
-                 meIndex=0,seepageIndex=-1,SRF=1.0,pore_pressure_file_base=None,pore_pressure_field_path=None):
+                 meIndex=0,seepageIndex=-1,SRF=1.0,pore_pressure_file_base=None,pore_pressure_field_path=None,
+                 fixedStrengthMaterialTypes=(7,),
+                 strengthReductionSearch=None):
         import copy
         self.modelType_block = modelType_block
         self.modelParams_block = modelParams_block
@@ -29,6 +30,12 @@ class Coefficients(proteus.TransportCoefficients.TC_base):
         self.materialProperties_default = copy.deepcopy(self.modelParams_block)
         self.nMaterialProperties = len(self.materialProperties[-1])
         self.SRF=SRF
+        #material types whose strength is not reduced by SRF (vegetation on levees)
+        self.fixedStrengthMaterialTypes = fixedStrengthMaterialTypes
+        #arguments of StrengthReductionSearch, if given the factor of safety is
+        #searched after the gravity steps instead of increasing SRF by 0.05 every step
+        self.strengthReductionSearch = strengthReductionSearch
+        self.factorOfSafety = None
         self.g = np.array(g)
         self.gmag = sqrt(sum([gi**2 for gi in g]))
         self.rhow=rhow
@@ -124,6 +131,7 @@ class Coefficients(proteus.TransportCoefficients.TC_base):
     def initializeMesh(self,mesh):
         self.mesh = mesh
     def postStep(self,t,firstStep=False):
+        postCopy = None
         if self.gravityStep:
             if self.gravityStep == 1:
                 self.cq['strain0'][:]=self.cq['strain']
@@ -131,6 +139,8 @@ class Coefficients(proteus.TransportCoefficients.TC_base):
                 self.gravityStep = 2
             else:
                 self.gravityStep = 0
+                if self.strengthReductionSearch is not None:
+                    postCopy = {'model_postStep':self.searchFactorOfSafety}
             self.cq['strain_last'][:] = self.cq['strain']
             self.cq['plasticStrain_last'][:] = 0.0#self.cq['plasticStrain']
             self.cebqe['strain_last'][:] = self.cebqe['strain']
@@ -140,25 +150,39 @@ class Coefficients(proteus.TransportCoefficients.TC_base):
             #self.model.u[0].dof[:]=0.0
             #self.model.u[1].dof[:]=0.0
             #self.model.u[2].dof[:]=0.0
-            for it in range(self.materialProperties.shape[0]):
-                #cek hack for veg on levees
-                if it != 7:
-                    self.materialProperties[it,5] = atan(old_div(tan(self.materialProperties_default[it,5]),self.SRF))#phi_mc
-                    self.materialProperties[it,6] = old_div(self.materialProperties_default[it,6],self.SRF)#c_mc
+            self.setStrengthReduction(self.SRF)
             self.copyInstructions = {'reset_uList':True}
         else:
             print("Completed========================SRF = "+repr(self.SRF)+"===============================")
             self.lastStepWasGravityStep = False
-            self.SRF += 0.05
-            for it in range(self.materialProperties.shape[0]):
-                if it != 7:
-                    self.materialProperties[it,5] = atan(old_div(tan(self.materialProperties_default[it,5]),self.SRF))#phi_mc
-                    self.materialProperties[it,6] = old_div(self.materialProperties_default[it,6],self.SRF)#c_mc
+            if self.strengthReductionSearch is None:
+                self.setStrengthReduction(self.SRF + 0.05)
             self.copyInstructions = None
         print("=========Not Updating Mesh=================")
         #self.mesh.nodeArray[:,0]+=self.model.u[0].dof
         #self.mesh.nodeArray[:,1]+=self.model.u[1].dof
         #self.mesh.nodeArray[:,2]+=self.model.u[2].dof
+        return postCopy
+    def searchFactorOfSafety(self,model):
+        """
+        Run the strength reduction search on the multilevel model after the
+        gravity steps, the following steps keep the SRF found
+        """
+        search = StrengthReductionSearch(model,**self.strengthReductionSearch)
+        self.factorOfSafety = search.solve()
+        #continue from the state of the search instead of the gravity steps
+        self.lastStepWasGravityStep = False
+        self.copyInstructions = None
+    def setStrengthReduction(self,SRF):
+        """
+        Divide tan(phi_mc) and c_mc of the materials by SRF, except for the
+        fixedStrengthMaterialTypes
+        """
+        self.SRF = SRF
+        reduced = np.ones((self.materialProperties.shape[0],),bool)
+        reduced[[it for it in self.fixedStrengthMaterialTypes if it < reduced.shape[0]]] = False
+        self.materialProperties[reduced,5] = np.arctan(np.tan(self.materialProperties_default[reduced,5])/SRF)#phi_mc
+        self.materialProperties[reduced,6] = self.materialProperties_default[reduced,6]/SRF#c_mc
     def preStep(self,t,firstStep=False):
         print("Starting========================SRF = "+repr(self.SRF)+"===============================")
         if self.lastStepWasGravityStep:
@@ -169,6 +193,114 @@ class Coefficients(proteus.TransportCoefficients.TC_base):
     def evaluate(self,t,c):
         pass
 
+class StrengthReductionSearch(object):
+    """
+    Find the factor of safety by strength reduction
+
+    After the gravity steps, trial solves are run with the strengths
+    reduced by a strength reduction factor (SRF). The SRF is increased by
+    SRF_step, doubling the step after each converged trial, until the
+    nonlinear solver fails, and the failure SRF is then bracketed by
+    bisection down to tol. Each trial starts from the displacement and
+    strain state of the converged trial with the largest SRF below it.
+    The search is run in a simulation by passing its arguments as the
+    strengthReductionSearch argument of Coefficients.
+
+    Parameters
+    ----------
+    model: proteus.Transport.MultilevelTransport
+        The elastoplastic model, after the gravity steps.
+    SRF_min: float
+        SRF of the first trial, which must converge.
+    SRF_step: float
+        Initial increment of the SRF while bracketing the failure.
+    tol: float
+        Width of the final bracket.
+    maxTrials: int
+        Maximum number of nonlinear solves.
+    """
+    def __init__(self,model,SRF_min=1.0,SRF_step=0.25,tol=0.01,maxTrials=30):
+        self.model = model
+        self.coefficients = model.levelModelList[-1].coefficients
+        self.SRF_min = SRF_min
+        self.SRF_step = SRF_step
+        self.tol = tol
+        self.maxTrials = maxTrials
+        self.trials = []
+        self.factorOfSafety = None
+    stateKeys = ('strain','plasticStrain','strain_last','plasticStrain_last')
+    def saveState(self):
+        state = []
+        for lm in self.model.levelModelList:
+            state.append(([lm.u[ci].dof.copy() for ci in range(lm.nc)],
+                          dict([(key,lm.coefficients.cq[key].copy()) for key in self.stateKeys]),
+                          dict([(key,lm.coefficients.cebqe[key].copy()) for key in self.stateKeys])))
+        return state
+    def restoreState(self,state):
+        for l,(lm,(dofs,cq,cebqe)) in enumerate(zip(self.model.levelModelList,state)):
+            for ci in range(lm.nc):
+                lm.u[ci].dof[:] = dofs[ci]
+            for key in cq:
+                lm.coefficients.cq[key][:] = cq[key]
+                lm.coefficients.cebqe[key][:] = cebqe[key]
+            lm.setFreeDOF(self.model.uList[l])
+    def trial(self,SRF,state):
+        """
+        Solve with the strengths reduced by SRF starting from state, return
+        True if the nonlinear solver converged
+        """
+        for lm in self.model.levelModelList:
+            lm.coefficients.setStrengthReduction(SRF)
+        self.restoreState(state)
+        failed = self.model.solver.solveMultilevel(uList=self.model.uList,
+                                                   rList=self.model.rList,
+                                                   par_uList=self.model.par_uList,
+                                                   par_rList=self.model.par_rList)
+        self.trials.append((SRF,not failed))
+        logEvent("Strength reduction trial SRF = %12.5e %s" % (SRF,"converged" if not failed else "failed"))
+        return not failed
+    def solve(self):
+        """
+        Return the factor of safety, the largest SRF for which the solver
+        converged, leaving the model in the state of that trial
+        """
+        assert self.coefficients.gravityStep == 0, "The gravity steps must be completed before the strength reduction"
+        state = self.saveState()
+        for dofs,cq,cebqe in state:
+            for u in dofs:
+                u[:] = 0.0
+        SRF_lower,SRF_upper = None,None
+        SRF,step = self.SRF_min,self.SRF_step
+        #bracket the failure SRF
+        while len(self.trials) < self.maxTrials:
+            if self.trial(SRF,state):
+                SRF_lower,state = SRF,self.saveState()
+                SRF += step
+                step *= 2.0
+            else:
+                SRF_upper = SRF
+                break
+        if SRF_lower is None:
+            logEvent("Strength reduction failed at SRF_min = %12.5e" % (self.SRF_min,))
+            return None
+        #bisect
+        while SRF_upper is not None and SRF_upper - SRF_lower > self.tol and len(self.trials) < self.maxTrials:
+            SRF = 0.5*(SRF_lower + SRF_upper)
+            if self.trial(SRF,state):
+                SRF_lower,state = SRF,self.saveState()
+            else:
+                SRF_upper = SRF
+        self.restoreState(state)
+        for lm in self.model.levelModelList:
+            lm.coefficients.setStrengthReduction(SRF_lower)
+        self.factorOfSafety = SRF_lower
+        if SRF_upper is None:
+            logEvent("No failure found up to SRF = %12.5e in %d trials" % (SRF_lower,len(self.trials)))
+        else:
+            logEvent("Factor of safety = %12.5e, failure bracketed in [%12.5e, %12.5e] after %d trials" %
+                     (SRF_lower,SRF_lower,SRF_upper,len(self.trials)))
+        return self.factorOfSafety
+
 class LevelModel(proteus.Transport.OneLevelTransport):
     nCalls=0
     def __init__(self,
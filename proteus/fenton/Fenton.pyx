@@ -4,8 +4,10 @@ Modified from johndfenton.com/Steady-waves/Fourier.html to work with python and
 Used in proteus.WaveTools
 """
 import os
+import hashlib
+import tempfile
 from subprocess import check_call
-from shutil import copy
+from shutil import copy, rmtree
 import numpy as np
 cimport numpy as np
 from proteus import Profiling
@@ -109,11 +111,16 @@ def runFourier():
     '''
     runfourier()
 
-def getBYCoeffs():
+def getBYCoeffs(filename='Solution.res'):
     '''
     Get B and Y coeffs of solution
     (!) must be called after runFourier()
 
+    Parameters
+    ----------
+    filename: string
+        Solution file written by runFourier()
+
     Returns
     -------
     BCoeffs: array_like
@@ -121,20 +128,20 @@ def getBYCoeffs():
     YCoeffs: array_like
         Y coeffs of solution
     '''
-    FFT = np.genfromtxt('Solution.res', delimiter=None, comments='#')
+    FFT = np.genfromtxt(filename, delimiter=None, comments='#')
     BCoeffs = FFT[:,1]
     YCoeffs = FFT[:,2]
     return BCoeffs, YCoeffs
 
-def getWavelength():
+def getWavelength(filename='Solution.res'):
     '''
     Get wavelength/depth (dimensionless)
     (!) must be called after runFourier()
 
     Parameters
     ----------
-    depth: double
-        water depth used to compute solution
+    filename: string
+        Solution file written by runFourier()
 
     Returns
     -------
@@ -142,7 +149,7 @@ def getWavelength():
         wavelength
     '''
     wavelength = None
-    with open('Solution.res', 'r') as f:
+    with open(filename, 'r') as f:
         for line in f:
             l = line.split()
             if 'Wave' in l and 'length' in l:
@@ -150,17 +157,132 @@ def getWavelength():
     return float(wavelength)
 
 
-def copyFiles():
+def copyFiles(outputDir=None, cwd=None):
+    '''
+    Copy the files to log directory (or outputDir)
+
+    Nothing is copied if outputDir is the working directory of the caller
+    (cwd, by default the current directory).
+    '''
+    if outputDir is None:
+        outputDir = Profiling.logDir
+    if cwd is None:
+        cwd = os.getcwd()
+    if os.path.abspath(outputDir) != os.path.abspath(cwd):
+        for filename in solverFiles:
+            copy(filename, outputDir)
+
+solverFiles = ['Data.dat',
+               'Convergence.dat',
+               'Points.dat',
+               'Solution.res',
+               'Surface.res',
+               'Flowfield.res']
+
+def cacheKey(**options):
+    '''
+    Key of a solution in the cache: a hash of the solver options
+    '''
+    text = repr(sorted((name, repr(value)) for name, value in options.items()))
+    return hashlib.sha1(text.encode('utf-8')).hexdigest(), text
+
+def solve(waveheight,
+          depth,
+          period=None,
+          wavelength=None,
+          mode='Period',
+          current_criterion=1,
+          current_magnitude=0,
+          ncoeffs=8,
+          height_steps=1,
+          g=9.81,
+          niter=40,
+          conv_crit=1.e-05,
+          points_freesurface=50,
+          points_velocity=16,
+          points_vertical=20,
+          cacheDir=None,
+          outputDir=None):
     '''
-    Copy the files to log directory
+    Computes the Fenton wave solution and returns its coefficients
+
+    The solver runs in a private temporary directory, so several
+    processes (e.g. all MPI ranks) can call this at the same time without
+    sharing input or output files.
+
+    Parameters
+    ----------
+    waveheight, depth, period, ... points_vertical:
+        See writeInput
+    cacheDir: string
+        Directory of solutions saved by earlier calls. A solution computed
+        with the same parameters is returned without running the solver,
+        and new solutions are saved there.
+    outputDir: string
+        Directory the solver input and output files are copied to
+
+    Returns
+    -------
+    BCoeffs: array_like
+        B coeffs of solution
+    YCoeffs: array_like
+        Y coeffs of solution
+    wavelength: double
+        wavelength/depth (dimensionless)
     '''
-    if Profiling.logDir != '.':
-        copy('Data.dat',Profiling.logDir)
-        copy('Convergence.dat',Profiling.logDir)
-        copy('Points.dat',Profiling.logDir)
-        copy('Solution.res',Profiling.logDir)
-        copy('Surface.res',Profiling.logDir)
-        copy('Flowfield.res',Profiling.logDir)
+    options = dict(waveheight=waveheight,
+                   depth=depth,
+                   period=period,
+                   wavelength=wavelength,
+                   mode=mode,
+                   current_criterion=current_criterion,
+                   current_magnitude=current_magnitude,
+                   ncoeffs=ncoeffs,
+                   height_steps=height_steps,
+                   g=g,
+                   niter=niter,
+                   conv_crit=conv_crit,
+                   points_freesurface=points_freesurface,
+                   points_velocity=points_velocity,
+                   points_vertical=points_vertical)
+    if cacheDir is not None:
+        key, keyText = cacheKey(**options)
+        cacheFile = os.path.join(cacheDir, 'fenton_'+key+'.npz')
+        if os.path.exists(cacheFile):
+            with np.load(cacheFile) as cached:
+                if str(cached['key']) == keyText:
+                    Profiling.logEvent("Fenton: using cached solution "+cacheFile)
+                    return cached['BCoeffs'], cached['YCoeffs'], float(cached['wavelength'])
+    if outputDir is not None:
+        outputDir = os.path.abspath(outputDir)
+    cwd = os.getcwd()
+    workDir = tempfile.mkdtemp(prefix='fenton')
+    try:
+        os.chdir(workDir)
+        writeInput(**options)
+        runFourier()
+        BCoeffs, YCoeffs = getBYCoeffs()
+        wavelength_dimless = getWavelength()
+        if outputDir is not None:
+            copyFiles(outputDir, cwd=cwd)
+    finally:
+        os.chdir(cwd)
+        rmtree(workDir, ignore_errors=True)
+    if cacheDir is not None:
+        if not os.path.exists(cacheDir):
+            try:
+                os.makedirs(cacheDir)
+            except OSError:
+                pass
+        # write to a temporary file first so readers never see a partial file
+        with tempfile.NamedTemporaryFile(dir=cacheDir, suffix='.npz', delete=False) as f:
+            np.savez(f,
+                     key=keyText,
+                     BCoeffs=BCoeffs,
+                     YCoeffs=YCoeffs,
+                     wavelength=wavelength_dimless)
+        os.replace(f.name, cacheFile)
+    return BCoeffs, YCoeffs, wavelength_dimless
 
 def __get_dir():
     return os.path.dirname(__file__)
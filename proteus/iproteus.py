@@ -176,6 +176,16 @@ parser.add_option("-n","--no_global_sync",
                   dest="global_sync",
                   action="store_false",
                   help="""don't use a single hdf5 archive""")
+parser.add_option("--timers",
+                  default=False,
+                  dest="timers",
+                  action="store_true",
+                  help="""time the stages of each model and write the min/max/mean across processors to <runName>_timers.csv and .json""")
+parser.add_option("--incrementalXMF",
+                  default=False,
+                  dest="incrementalXMF",
+                  action="store_true",
+                  help="""append each step to the global xmf file instead of rewriting it, and don't store the xml of each step in the hdf5 archive""")
 parser.add_option("-H","--hotStart",
                   default=False,
                   dest="hotStart",
@@ -261,6 +271,8 @@ if opts.logLevel > 0:
         Profiling.openLog(args[0][-3:]+".log",opts.logLevel)
 if opts.logAllProcesses:
     Profiling.logAllProcesses = True
+if opts.timers:
+    Profiling.timersOn()
 
 #blanket import statements can go below here now that petsc4py should be initialized
 from proteus import *
@@ -482,6 +494,8 @@ if __name__ == '__main__':
             else:
                 ns = NumericalSolution.NS_base(so,pList,nList,sList,opts,simFlagsList)
                 ns.calculateSolution(runName)
+            if opts.timers:
+                Profiling.writeTimerReport(runName+'_timers')
             log("Completed %s run number %i" %(so.name,runNumber))
             import gc
             log("Collecting garbage")
@@ -33,7 +33,6 @@ import copy
 cimport numpy as np
 import numpy as np
 from mpi4py import MPI
-from scipy import spatial
 from proteus import AuxiliaryVariables, Archiver, Comm, Profiling
 from proteus import SpatialTools as st
 from libcpp.string cimport string
@@ -1547,8 +1546,8 @@ cdef class ProtChSystem:
             sys.exit('ProtChSystem: no time step set in calculate()')
         if self.model is not None:
             if self.build_kdtree is True:
-                Profiling.logEvent("Building k-d tree for mooring nodes lookup")
-                self.nodes_kdtree = spatial.cKDTree(self.model.levelModelList[-1].mesh.nodeArray)
+                Profiling.logEvent("Getting k-d tree for mooring nodes lookup")
+                self.nodes_kdtree = self.model.levelModelList[-1].mesh.getNodeTree()
         if t >= self.next_sample:
             self.record_values = True
             self.next_sample += self.sampleRate
@@ -1603,7 +1602,7 @@ cdef class ProtChSystem:
                 # finite element space (! linear for p, quadratic for velocity)
                 self.femSpace_velocity = self.u[1].femSpace
                 self.femSpace_pressure = self.u[0].femSpace
-                self.nodes_kdtree = spatial.cKDTree(self.model.levelModelList[-1].mesh.nodeArray)
+                self.nodes_kdtree = self.model.levelModelList[-1].mesh.getNodeTree()
         if not self.initialized:
             self.nBodiesIBM = 0  # will be incremented by bodies calculate_init()
             for s in self.subcomponents:
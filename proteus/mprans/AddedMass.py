@@ -663,9 +663,8 @@ class LevelModel(proteus.Transport.OneLevelTransport):
         """
         r.fill(0.0)
         # Load the unknowns into the finite element dof
-        for dofN, g in list(self.dirichletConditionsForceDOF[0].DOFBoundaryConditionsDict.items()):
-            # load the BC valu        # Load the unknowns into the finite element dof
-            u[self.offset[0] + self.stride[0] * dofN] = g(self.dirichletConditionsForceDOF[0].DOFBoundaryPointDict[dofN], self.timeIntegration.t)
+        dofs, values = self.getDirichletValues(self.dirichletConditionsForceDOF[0], self.timeIntegration.t)
+        u[self.offset[0] + self.stride[0] * dofs] = values
         self.setUnknowns(u)
         self.Aij[:,:,self.added_mass_i]=0.0
         self.addedMass.calculateResidual(  # element
@@ -726,9 +725,8 @@ class LevelModel(proteus.Transport.OneLevelTransport):
                 np.set_printoptions(precision=2, linewidth=160)
                 logEvent("Added Mass Tensor for rigid body i" + repr(i))
                 logEvent("Aij = \n"+str(self.Aij[i]))
-        for dofN, g in list(self.dirichletConditionsForceDOF[0].DOFBoundaryConditionsDict.items()):
-            r[self.offset[0] + self.stride[0] * dofN] = self.u[0].dof[dofN] - \
-                g(self.dirichletConditionsForceDOF[0].DOFBoundaryPointDict[dofN], self.timeIntegration.t)
+        dofs, values = self.getDirichletValues(self.dirichletConditionsForceDOF[0], self.timeIntegration.t)
+        r[self.offset[0] + self.stride[0] * dofs] = self.u[0].dof[dofs] - values
         logEvent("Global residual", level=9, data=r)
         self.nonlinear_function_evaluations += 1
 
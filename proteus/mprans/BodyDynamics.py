@@ -2,7 +2,6 @@ from __future__ import division
 from builtins import range
 from past.utils import old_div
 from math import cos, sin, sqrt, atan2, acos, asin, pi
-import csv
 import os
 import numpy as np
 from proteus import AuxiliaryVariables, Archiver, Comm, Profiling
@@ -42,6 +41,7 @@ class RigidBody(AuxiliaryVariables.AV_base, object):
         self.i_end = None  # will be retrieved from setValues() of Domain
         self.It = self.Shape.It
         self.record_dict = OrderedDict()
+        self.recorder = None
 
         # variables
         self.position = np.zeros(3)
@@ -585,7 +585,8 @@ class RigidBody(AuxiliaryVariables.AV_base, object):
 
     def setRecordValues(self, filename=None, all_values=False, pos=False,
                         rot=False, ang_disp=False, F=False, M=False,
-                        inertia=False, vel=False, acc=False, ang_vel=False, ang_acc=False):
+                        inertia=False, vel=False, acc=False, ang_vel=False, ang_acc=False,
+                        bufferSize=100, fileFormat='csv'):
         """
         Sets the rigid body attributes that are to be recorded in a csv file
         during the simulation.
@@ -593,7 +594,7 @@ class RigidBody(AuxiliaryVariables.AV_base, object):
         ----------
         filename: Optional[string]
             Name of file, if not set, the file will be named as follows:
-            'record_[shape.name].csv'
+            'record_[shape.name].csv' ('.h5' for hdf5 files)
         all_values: bool
             Set to True to record all values listed below.
         time: bool
@@ -619,6 +620,12 @@ class RigidBody(AuxiliaryVariables.AV_base, object):
             Angular velocity of body (default: False. Set to True to record).
         ang_acc: bool
             Angular acceleration of body (default: False. Set to True to record).
+        bufferSize: int
+            Number of time steps recorded in memory before they are written
+            to the file (default: 100). The rows are also written when the
+            solution is archived and at the end of the simulation.
+        fileFormat: string
+            'csv' or 'hdf5' (default: 'csv').
         Notes
         -----
         To add another value manually, add to dictionary self.record_dict:
@@ -665,37 +672,49 @@ class RigidBody(AuxiliaryVariables.AV_base, object):
         if inertia is True:
             self.record_dict['inertia'] = ['inertia', None]
 
+        ext = '.csv' if fileFormat == 'csv' else '.h5'
         if filename is None:
-            self.record_filename = 'record_' + self.name + '.csv'
+            self.record_filename = 'record_' + self.name + ext
         else:
-            self.record_filename = filename + '.csv'
+            self.record_filename = filename + ext
         self.record_file = os.path.join(Profiling.logDir, self.record_filename)
+        self.record_bufferSize = bufferSize
+        self.record_fileFormat = fileFormat
+        self.recorder = None
 
     def _recordValues(self):
         """
-        Records values of rigid body attributes at each time step in a csv file.
+        Records values of rigid body attributes at each time step in a csv
+        or hdf5 file. The rows are buffered and written every bufferSize
+        steps (see setRecordValues).
         """
         comm = Comm.get()
         if comm.isMaster():
             t_last = self.model.stepController.t_model_last
             dt_last = self.model.levelModelList[-1].dt_last
             t = t_last - dt_last
-            values_towrite = [t]
-            if t == 0:
-                headers = ['t']
-                for key in self.record_dict:
-                    headers += [key]
-                with open(self.record_file, 'w') as csvfile:
-                    writer = csv.writer(csvfile, delimiter=',')
-                    writer.writerow(headers)
+            if self.recorder is None:
+                self.recorder = AuxiliaryVariables.TimeSeriesRecorder(self.record_file,
+                                                                      list(self.record_dict.keys()),
+                                                                      bufferSize=self.record_bufferSize,
+                                                                      fileFormat=self.record_fileFormat)
+                # a hot started run continues the existing file
+                self.recorder.start(None if t == 0 else t)
+            values_towrite = []
             for key, val in list(self.record_dict.items()):
                 if val[1] is not None:
                     values_towrite += [getattr(self, val[0])[val[1]]]
                 else:
                     values_towrite += [getattr(self, val[0])]
-            with open(self.record_file, 'a') as csvfile:
-                writer = csv.writer(csvfile, delimiter=',')
-                writer.writerow(values_towrite)
+            values_towrite = [np.nan if v is None else v for v in values_towrite]
+            self.recorder.record(t, values_towrite)
+
+    def flush(self):
+        """
+        Writes the recorded values that are still buffered to the file.
+        """
+        if self.recorder is not None:
+            self.recorder.flush()
 
     def _logTrace(self):
         # log values
@@ -1254,7 +1273,8 @@ class CaissonBody(RigidBody):
 
     def setRecordValues(self, filename=None, all_values=False, pos=False,
                         rot=False, ang_disp=False, F=False, M=False,
-                        inertia=False, vel=False, acc=False, ang_vel=False, ang_acc=False, elasticPlastic=False):
+                        inertia=False, vel=False, acc=False, ang_vel=False, ang_acc=False, elasticPlastic=False,
+                        bufferSize=100, fileFormat='csv'):
         """
         Sets the rigid body attributes that are to be recorded in a csv file
         during the simulation.
@@ -1262,7 +1282,7 @@ class CaissonBody(RigidBody):
         ----------
         filename: Optional[string]
             Name of file, if not set, the file will be named as follows:
-            'record_[shape.name].csv'
+            'record_[shape.name].csv' ('.h5' for hdf5 files)
         all_values: bool
             Set to True to record all values listed below.
         time: bool
@@ -1288,6 +1308,12 @@ class CaissonBody(RigidBody):
             Angular velocity of body (default: False. Set to True to record).
         ang_acc: bool
             Angular acceleration of body (default: False. Set to True to record).
+        bufferSize: int
+            Number of time steps recorded in memory before they are written
+            to the file (default: 100). The rows are also written when the
+            solution is archived and at the end of the simulation.
+        fileFormat: string
+            'csv' or 'hdf5' (default: 'csv').
         Notes
         -----
         To add another value manually, add to dictionary self.record_dict:
@@ -1338,11 +1364,15 @@ class CaissonBody(RigidBody):
             self.record_dict['uxPlastic'] = ['uxPl', None]
             self.record_dict['uy'] = ['uy', None]
 
+        ext = '.csv' if fileFormat == 'csv' else '.h5'
         if filename is None:
-            self.record_filename = 'record_' + self.name + '.csv'
+            self.record_filename = 'record_' + self.name + ext
         else:
-            self.record_filename = filename + '.csv'
+            self.record_filename = filename + ext
         self.record_file = os.path.join(Profiling.logDir, self.record_filename)
+        self.record_bufferSize = bufferSize
+        self.record_fileFormat = fileFormat
+        self.recorder = None
 
 
 class PaddleBody(RigidBody):
@@ -22,6 +22,7 @@ cdef class BC_RANS(BC_Base):
     cdef double[:, :] body_python_rot_matrix
     cdef double[:] body_python_last_pos
     cdef double[:] body_python_h
+    cdef object rigid_body_displacement
     cdef public:
         # dirichlet
         cdef BoundaryCondition p_dirichlet
@@ -152,6 +153,8 @@ cdef class RelaxationZoneWaveGenerator:
     cdef int nd  # dimension
     cdef int max_flag  # maximum region flag of relaxation zones (initialised in calculate_init)
     cdef np.ndarray zones_array  # zones array for fast access
+    cdef bint vectorized  # batched evaluation of the zones
+    cdef list zone_points  # per level: (zone, quadrature point indices)
     cdef public:
         dict zones  # zones dictionary
         object model  # model attached to zone
@@ -180,6 +183,9 @@ cdef class __cppClass_WavesCharacteristics:
     cdef double vof_air
     cdef double vof_water
     cdef double smoothing
+    # last (t, X, values) of the cached batch evaluations
+    cdef object velocity_cache
+    cdef object phi_cache
     cdef public:
         # wave class from WaveTools
         object WT
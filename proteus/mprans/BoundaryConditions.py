@@ -25,9 +25,9 @@ from proteus import WaveTools as wt
 from proteus.Profiling import logEvent
 from math import cos, sin, sqrt, atan2, acos, asin
 from mpi4py import MPI
-from scipy import spatial
 
 __all__ = ['BC_RANS',
+           'RigidBodyDisplacement',
            'RelaxationZone',
            'RelaxationZoneWaveGenerator',
            '_cppClass_WavesCharacteristics',
@@ -391,17 +391,12 @@ class BC_RANS(BoundaryConditions.BC_Base):
         (!) if set manually, the input arrays should be updated externally
             without loosing their memory address
         """
-        def get_DBC_h(i):
-            def DBC_h(x, t):
-                x_0 = x - body.last_position
-                new_x_0 = np.dot(x_0, body.rotation_matrix)
-                hx = new_x_0 - x_0 + body.h
-                return hx[i]
-            return DBC_h
-        self.hx_dirichlet.uOfXT = get_DBC_h(0)
-        self.hy_dirichlet.uOfXT = get_DBC_h(1)
+        self.rigid_body_displacement = RigidBodyDisplacement(
+            lambda: (body.last_position, body.h, body.rotation_matrix))
+        self.hx_dirichlet.uOfXT = self.rigid_body_displacement.get_DBC_h(0)
+        self.hy_dirichlet.uOfXT = self.rigid_body_displacement.get_DBC_h(1)
         if body.nd > 2:
-            self.hz_dirichlet.uOfXT = get_DBC_h(2)
+            self.hz_dirichlet.uOfXT = self.rigid_body_displacement.get_DBC_h(2)
 
     def setChMoveMesh(self, body):
         self.hx_dirichlet.uOfXT = lambda x, t, n=np.zeros(3,): body.hx(x, t)
@@ -512,9 +507,16 @@ class BC_RANS(BoundaryConditions.BC_Base):
         self.body_python_rot_matrix = rot_matrix
         self.body_python_last_pos = last_pos
         self.body_python_h = h
+        self.rigid_body_displacement = RigidBodyDisplacement(
+            lambda: (self.body_python_last_pos,
+                     self.body_python_h,
+                     self.body_python_rot_matrix))
         self.hx_dirichlet.uOfXT = lambda x, t, n=np.zeros(3,): self.__cpp_MoveMesh_hx(x, t)
         self.hy_dirichlet.uOfXT = lambda x, t, n=np.zeros(3,): self.__cpp_MoveMesh_hy(x, t)
         self.hz_dirichlet.uOfXT = lambda x, t, n=np.zeros(3,): self.__cpp_MoveMesh_hz(x, t)
+        self.hx_dirichlet.uOfXT.uOfXT_array = lambda X, t, materialFlags=None: self.rigid_body_displacement(X, t)[:, 0]
+        self.hy_dirichlet.uOfXT.uOfXT_array = lambda X, t, materialFlags=None: self.rigid_body_displacement(X, t)[:, 1]
+        self.hz_dirichlet.uOfXT.uOfXT_array = lambda X, t, materialFlags=None: self.rigid_body_displacement(X, t)[:, 2]
 
     def __cpp_MoveMesh_h(self, x, t):
         cython.declare(x_0=cython.double[3])
@@ -582,6 +584,14 @@ class BC_RANS(BoundaryConditions.BC_Base):
         self.w_dirichlet.uOfXT = lambda x, t, n=np.zeros(3,): self.__cpp_UnsteadyTwoPhaseVelocityInlet_w_dirichlet(x, t)
         self.phi_dirichlet.uOfXT = lambda x, t, n=np.zeros(3,): self.__cpp_UnsteadyTwoPhaseVelocityInlet_phi_dirichlet(x, t)
         self.vof_dirichlet.uOfXT = lambda x, t, n=np.zeros(3,): self.__cpp_UnsteadyTwoPhaseVelocityInlet_vof_dirichlet(x, t)
+        # array versions used when the Dirichlet values of all the DOFs
+        # of this boundary are evaluated at once, the velocity and phi of
+        # the last points are reused by the other components
+        self.u_dirichlet.uOfXT.uOfXT_array = lambda X, t, materialFlags=None: self.waves.cached_velocity_batch(X, t)[:, 0]
+        self.v_dirichlet.uOfXT.uOfXT_array = lambda X, t, materialFlags=None: self.waves.cached_velocity_batch(X, t)[:, 1]
+        self.w_dirichlet.uOfXT.uOfXT_array = lambda X, t, materialFlags=None: self.waves.cached_velocity_batch(X, t)[:, 2]
+        self.phi_dirichlet.uOfXT.uOfXT_array = lambda X, t, materialFlags=None: self.waves.cached_phi_batch(X, t)
+        self.vof_dirichlet.uOfXT.uOfXT_array = lambda X, t, materialFlags=None: self.waves.calculate_vof_batch(X, t)
         self.p_advective.uOfXT = lambda x, t, n=np.zeros(3,): self.__cpp_UnsteadyTwoPhaseVelocityInlet_p_advective(x, t)
         self.pInc_advective.uOfXT = lambda x, t, n=np.zeros(3,): self.__cpp_UnsteadyTwoPhaseVelocityInlet_p_advective(x, t)
 
@@ -904,6 +914,64 @@ class BC_RANS(BoundaryConditions.BC_Base):
 
 # for regions
 
+class RigidBodyDisplacement(object):
+    """
+    Mesh displacement of boundary points moving with a rigid body
+
+    The displacement of the points x is (x-last_pos).rot_matrix-(x-last_pos)+h
+    and is computed for all the points of a boundary with one matrix
+    product. The last result is kept with its time, points and body state,
+    so the hx, hy and hz conditions of the same boundary DOF share one
+    evaluation per step.
+
+    Parameters
+    ----------
+    get_state: callable
+        returns the current (last_pos, h, rot_matrix) of the body
+    """
+
+    def __init__(self, get_state):
+        self.get_state = get_state
+        self.cached_t = None
+        self.cached_X = None
+        self.cached_state = None
+        self.cached_h = None
+
+    def __call__(self, X, t):
+        """
+        Displacements of an (N,3) array of points at time t (N,3 array)
+        """
+        X = np.asarray(X).reshape(-1, 3)
+        state = [np.asarray(a) for a in self.get_state()]
+        if (self.cached_h is not None and
+                t == self.cached_t and
+                X.shape == self.cached_X.shape and
+                all(np.array_equal(a, b) for a, b in zip(state, self.cached_state)) and
+                np.array_equal(X, self.cached_X)):
+            return self.cached_h
+        last_pos, h, rot_matrix = state
+        X_0 = X - last_pos
+        self.cached_h = np.dot(X_0, rot_matrix) - X_0 + h
+        self.cached_t = t
+        self.cached_X = X.copy()
+        self.cached_state = [a.copy() for a in state]
+        return self.cached_h
+
+    def get_DBC_h(self, i):
+        """
+        Dirichlet condition for component i of the displacement, with a
+        uOfXT_array attribute for batched evaluation
+        """
+        def DBC_h(x, t):
+            last_pos, h, rot_matrix = self.get_state()
+            x_0 = x - np.asarray(last_pos)
+            new_x_0 = np.dot(x_0, rot_matrix)
+            hx = new_x_0 - x_0 + h
+            return hx[i]
+        DBC_h.uOfXT_array = lambda X, t, materialFlags=None: self(X, t)[:, i]
+        return DBC_h
+
+
 class RelaxationZone:
     """
     Holds information about a relaxation zone (wave generation/absorption
@@ -1028,6 +1096,30 @@ class RelaxationZone:
     def __cpp_calculate_vel_wave(self, x, t):
         return self.waves.__cpp_calculate_velocity(x, t)
 
+    def calculate_phi_batch(self, X):
+        """
+        Batched counterpart of calculate_phi for an (N,3) array of points
+        """
+        X = np.asarray(X).reshape(-1, 3)
+        if self.zone_type == 'porous':
+            return np.full(X.shape[0], self.epsFact_solid)
+        nd = self.nd
+        center = np.asarray(self.center)[:nd]
+        orientation = np.asarray(self.orientation)[:nd]
+        return np.dot(center-X[:, :nd], orientation)
+
+    def calculate_vel_batch(self, X, t, out=None):
+        """
+        Batched counterpart of calculate_vel for an (N,3) array of points
+        """
+        X = np.asarray(X).reshape(-1, 3)
+        if self.zone_type == 'generation':
+            return self.waves.calculate_velocity_batch(X, t, out)
+        if out is None:
+            return np.zeros((X.shape[0], 3))
+        out[:] = 0.
+        return out
+
 
 class RelaxationZoneWaveGenerator:
     """
@@ -1041,11 +1133,17 @@ class RelaxationZoneWaveGenerator:
         class
     nd: int
         number of dimensions of domain
+    vectorized: Optional[bool]
+        if True, the quadrature points of each zone are gathered once in
+        calculate_init and each zone is evaluated with one batched call
+        per time step. The eta_batch/u_batch methods of the waves apply
+        the same fast approximations as the point by point evaluation.
     """
 
-    def __init__(self, zones, nd):
+    def __init__(self, zones, nd, vectorized=False):
         self.zones = zones
         self.nd = nd
+        self.vectorized = vectorized
 
     def attachModel(self, model, ar):
         self.model = model
@@ -1065,9 +1163,56 @@ class RelaxationZoneWaveGenerator:
         self.zones_array = np.empty(self.max_flag + 1, dtype=RelaxationZone)
         for key, zone in list(self.zones.items()):
             self.zones_array[key] = zone
+        if self.vectorized:
+            self.zone_points = [self._zonePoints(m)
+                                for m in self.model.levelModelList]
 
     def calculate(self):
-        self.__cpp_iterate()
+        if self.vectorized:
+            self._iterate_batch()
+        else:
+            self.__cpp_iterate()
+
+    def _zonePoints(self, m):
+        """
+        Gathers the flat quadrature point indices of each zone from the
+        element material types and sets the initial phi_solid values
+        """
+        nk = m.coefficients.q_phi_solid.shape[1]
+        mTypes = np.asarray(m.mesh.elementMaterialTypes)
+        qx = m.q['x'].reshape(-1, 3)
+        q_phi_solid = m.coefficients.q_phi_solid.reshape(-1)
+        zone_points = []
+        for key, zone in list(self.zones.items()):
+            elements = np.where(mTypes == key)[0]
+            if len(elements) == 0:
+                continue
+            ind = (elements[:, np.newaxis]*nk+np.arange(nk)).ravel()
+            q_phi_solid[ind] = zone.calculate_phi_batch(qx[ind])
+            zone_points.append((zone, ind))
+        return zone_points
+
+    def _iterate_batch(self):
+        """
+        Vectorized counterpart of __cpp_iterate, evaluating all the
+        quadrature points of a zone at once
+        """
+        nd = self.nd
+        for l, m in enumerate(self.model.levelModelList):
+            t = m.timeIntegration.t
+            qx = m.q['x'].reshape(-1, 3)
+            q_phi_solid = m.coefficients.q_phi_solid.reshape(-1)
+            q_velocity_solid = m.coefficients.q_velocity_solid
+            q_velocity_solid = q_velocity_solid.reshape(-1, q_velocity_solid.shape[-1])
+            for zone, ind in self.zone_points[l]:
+                X = qx[ind]
+                # recomputed every step as in __cpp_iterate: the zone or
+                # the quadrature points may move
+                q_phi_solid[ind] = zone.calculate_phi_batch(X)
+                u = zone.calculate_vel_batch(X, t)
+                q_velocity_solid[ind, :nd] = u[:, :nd]
+            m.q['phi_solid'] = m.coefficients.q_phi_solid
+            m.q['velocity_solid'] = m.coefficients.q_velocity_solid
 
     def __cpp_iterate(self):
         nl = len(self.model.levelModelList)
@@ -1142,6 +1287,8 @@ class __cppClass_WavesCharacteristics:
             self.wind_speed = self.zero_vel
         else:
             self.wind_speed = wind_speed
+        self.velocity_cache = None
+        self.phi_cache = None
 
     def __cpp_calculate_velocity(self, x, t):
         cython.declare(u=cython.double[3])
@@ -1172,6 +1319,47 @@ class __cppClass_WavesCharacteristics:
         u[2] = H * self.wind_speed[2] + (1 - H) * waterSpeed[2]
         return u
 
+    def calculate_velocity_batch(self, X, t, out=None):
+        """
+        Batched counterpart of __cpp_calculate_velocity for an (N,3) array
+        of points. Falls back to point by point evaluation if the wave class
+        does not provide eta_batch/u_batch.
+        """
+        cython.declare(xx=cython.double[3])
+        X = np.asarray(X).reshape(-1, 3)
+        if out is None:
+            out = np.zeros((X.shape[0], 3))
+        WT = self.WT
+        if not (hasattr(WT, 'eta_batch') and hasattr(WT, 'u_batch')):
+            for i in range(X.shape[0]):
+                xx[0] = X[i, 0]
+                xx[1] = X[i, 1]
+                xx[2] = X[i, 2]
+                u = self.__cpp_calculate_velocity(xx, t)
+                out[i, 0] = u[0]
+                out[i, 1] = u[1]
+                out[i, 2] = u[2]
+            return out
+        phi = X[:, self.vert_axis]-(WT.mwl+WT.eta_batch(X, t))
+        water = phi <= 0.
+        smooth = (phi > 0.) & (phi <= self.smoothing)
+        H = np.ones(X.shape[0])
+        H[water] = 0.
+        waterSpeed = np.zeros((X.shape[0], 3))
+        if water.any():
+            waterSpeed[water] = WT.u_batch(X[water], t)
+        if smooth.any():
+            # smoothing on half the range of VOF (above wave crest)
+            eps = old_div(self.smoothing, 2.)
+            p = phi[smooth]-eps
+            H[smooth] = 0.5*(1.+p/eps+np.sin(np.pi*p/eps)/np.pi)
+            # use max velocity of wave for water
+            x_max = X[smooth]
+            x_max[:, self.vert_axis] -= phi[smooth]
+            waterSpeed[smooth] = WT.u_batch(x_max, t)
+        out[:] = np.outer(H, np.asarray(self.wind_speed))+(1.-H)[:, np.newaxis]*waterSpeed
+        return out
+
     def __cpp_calculate_pressure(self, x, t):
         # This is the normal velocity, based on the outwards boundary
         # orientation b_or
@@ -1203,6 +1391,66 @@ class __cppClass_WavesCharacteristics:
             H = 0.
         return H
 
+    def calculate_phi_batch(self, X, t):
+        """
+        Batched counterpart of __cpp_calculate_phi for an (N,3) array of
+        points. Falls back to point by point evaluation if the wave class
+        does not provide eta_batch.
+        """
+        cython.declare(xx=cython.double[3])
+        X = np.asarray(X).reshape(-1, 3)
+        WT = self.WT
+        if not hasattr(WT, 'eta_batch'):
+            phi = np.zeros(X.shape[0])
+            for i in range(X.shape[0]):
+                xx[0] = X[i, 0]
+                xx[1] = X[i, 1]
+                xx[2] = X[i, 2]
+                phi[i] = self.__cpp_calculate_phi(xx, t)
+            return phi
+        return X[:, self.vert_axis]-(WT.mwl+WT.eta_batch(X, t))
+
+    def cached_velocity_batch(self, X, t):
+        """
+        calculate_velocity_batch keeping the last result with its time and
+        points, so that the u, v and w conditions of the same boundary DOF
+        share one evaluation per step
+        """
+        X = np.asarray(X).reshape(-1, 3)
+        cache = self.velocity_cache
+        if cache is None or cache[0] != t or not np.array_equal(cache[1], X):
+            cache = (t, X.copy(), self.calculate_velocity_batch(X, t))
+            self.velocity_cache = cache
+        return cache[2]
+
+    def cached_phi_batch(self, X, t):
+        """
+        calculate_phi_batch keeping the last result with its time and
+        points, so that the phi and vof conditions of the same boundary DOF
+        share one evaluation per step
+        """
+        X = np.asarray(X).reshape(-1, 3)
+        cache = self.phi_cache
+        if cache is None or cache[0] != t or not np.array_equal(cache[1], X):
+            cache = (t, X.copy(), self.calculate_phi_batch(X, t))
+            self.phi_cache = cache
+        return cache[2]
+
+    def calculate_vof_batch(self, X, t):
+        """
+        Batched counterpart of __cpp_calculate_vof for an (N,3) array of
+        points.
+        """
+        phi = self.cached_phi_batch(X, t)
+        eps = self.smoothing
+        H = np.zeros(phi.shape[0])
+        H[phi >= eps] = 1.
+        if eps > 0:
+            smooth = (phi > -eps) & (phi < eps)
+            p = phi[smooth]
+            H[smooth] = 0.5*(1.+p/eps+np.sin(np.pi*p/eps)/np.pi)
+        return H
+
 
 def __x_to_cpp(x):
     cython.declare(xx=double[3])
@@ -1381,7 +1629,7 @@ class WallFunctions(AuxiliaryVariables.AV_base):
         # comm.barrier()
         self.u = self.model.levelModelList[0].u
         self.femSpace_velocity = self.u[1].femSpace
-        nodes_kdtree = spatial.cKDTree(self.model.levelModelList[0].mesh.nodeArray)
+        nodes_kdtree = self.model.levelModelList[0].mesh.getNodeTree()
         nearest_node, nearest_node_distance = self.getLocalNearestNode(coords, nodes_kdtree)
         # look for element containing coords on each processor (if it exists)
         local_element = self.getLocalElement(self.femSpace_velocity, coords, nearest_node)
@@ -1109,8 +1109,8 @@ class LevelModel(proteus.Transport.OneLevelTransport):
             self.ebqe[('advectiveFlux_bc_flag',0)][t[0],t[1]] = 1
 
         if self.forceStrongConditions:
-              for dofN,g in list(self.dirichletConditionsForceDOF.DOFBoundaryConditionsDict.items()):
-                  self.u[0].dof[dofN] = g(self.dirichletConditionsForceDOF.DOFBoundaryPointDict[dofN],self.timeIntegration.t)
+              dofs, values = self.getDirichletValues(self.dirichletConditionsForceDOF, self.timeIntegration.t)
+              self.u[0].dof[dofs] = values
 
         min_distance = np.zeros(1)
         max_distance = np.zeros(1)
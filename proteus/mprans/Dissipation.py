@@ -4,6 +4,7 @@ from past.utils import old_div
 import proteus
 from proteus.mprans.cDissipation import *
 from proteus.mprans.cDissipation2D import *
+from proteus.FemTools import getElementGeometryCache
 """
 NOTES:
 
@@ -768,7 +769,9 @@ class LevelModel(proteus.Transport.OneLevelTransport):
         self.phi_ip = {}
         # mesh
         #self.q['x'] = numpy.zeros((self.mesh.nElements_global,self.nQuadraturePoints_element,3),'d')
-        self.ebqe['x'] = numpy.zeros((self.mesh.nExteriorElementBoundaries_global, self.nElementBoundaryQuadraturePoints_elementBoundary, 3), 'd')
+        # the quadrature point geometry is shared by the models on the mesh
+        self.elementGeometryCache = getElementGeometryCache(self.mesh)
+        self.ebqe['x'] = self.elementGeometryCache.getExteriorElementBoundaryQuadrature(self.u[0].femSpace.elementMaps, self.elementBoundaryQuadraturePoints)['x']
         self.q[('u', 0)] = numpy.zeros((self.mesh.nElements_global, self.nQuadraturePoints_element), 'd')
         self.q[('grad(u)', 0)] = numpy.zeros((self.mesh.nElements_global, self.nQuadraturePoints_element, self.nSpace_global), 'd')
         #diffusion, isotropic
@@ -1015,8 +1018,8 @@ class LevelModel(proteus.Transport.OneLevelTransport):
         # self.shockCapturing.lag=True
 
         if self.forceStrongConditions:
-            for dofN, g in list(self.dirichletConditionsForceDOF.DOFBoundaryConditionsDict.items()):
-                self.u[0].dof[dofN] = g(self.dirichletConditionsForceDOF.DOFBoundaryPointDict[dofN], self.timeIntegration.t)
+            dofs, values = self.getDirichletValues(self.dirichletConditionsForceDOF, self.timeIntegration.t)
+            self.u[0].dof[dofs] = values
         #
         # mwf debug
         #import pdb
@@ -1274,8 +1277,7 @@ class LevelModel(proteus.Transport.OneLevelTransport):
         self.u[0].femSpace.elementMaps.getBasisGradientValuesTraceRef(self.elementBoundaryQuadraturePoints)
         self.u[0].femSpace.getBasisValuesTraceRef(self.elementBoundaryQuadraturePoints)
         self.u[0].femSpace.getBasisGradientValuesTraceRef(self.elementBoundaryQuadraturePoints)
-        self.u[0].femSpace.elementMaps.getValuesGlobalExteriorTrace(self.elementBoundaryQuadraturePoints,
-                                                                    self.ebqe['x'])
+        self.ebqe['x'] = self.elementGeometryCache.getExteriorElementBoundaryQuadrature(self.u[0].femSpace.elementMaps, self.elementBoundaryQuadraturePoints)['x']
         self.fluxBoundaryConditionsObjectsDict = dict([(cj, FluxBoundaryConditions(self.mesh,
                                                                                    self.nElementBoundaryQuadraturePoints_elementBoundary,
                                                                                    self.ebqe[('x')],
@@ -402,11 +402,8 @@ class Coefficients(proteus.TransportCoefficients.TC_base):
             # Init boundaryIndex
             assert self.model.boundaryIndex is None and self.model.normalx is not None , \
                     "Check boundaryIndex, normalx and normaly"
-            self.model.boundaryIndex = []
-            for i in range(self.model.normalx.size):
-                if self.model.normalx[i] != 0 or self.model.normaly[i] != 0:
-                    self.model.boundaryIndex.append(i)
-            self.model.boundaryIndex = np.array(self.model.boundaryIndex)
+            self.model.boundaryIndex = np.where(np.logical_or(self.model.normalx != 0,
+                                                              self.model.normaly != 0))[0]
         #
         self.model.h_dof_old[:] = self.model.u[0].dof
         self.model.hu_dof_old[:] = self.model.u[1].dof
@@ -1066,27 +1063,15 @@ class LevelModel(proteus.Transport.OneLevelTransport):
         ###########################################
         # construct nnz_cMatrix, czval_cMatrix, rowptr_cMatrix, colind_cMatrix C matrix
         nnz_cMatrix = nnz // 5 // 5  # This is always true for the modified Green-Naghdi in 2D
-        nzval_cMatrix = np.zeros(nnz_cMatrix)
-        rowptr_cMatrix = np.zeros(self.u[0].dof.size + 1, 'i')
-        colind_cMatrix = np.zeros(nnz_cMatrix, 'i')
-        # fill vector rowptr_cMatrix
-        for i in range(1, rowptr_cMatrix.size):
-            rowptr_cMatrix[i] = rowptr_cMatrix[i - 1] + \
-                old_div((rowptr[5 * (i - 1) + 1] - rowptr[5 * (i - 1)]), 5)
-            # = rowptr_cMatrix[i-1] + 1/3*(Number of columns of Jacobian's row 3*(i-1)=0, 3, 6, 9, 12, ... 3*(i-1), ..., 3*n-3)
-
-        # fill vector colind_cMatrix
-        i_cMatrix = 0  # ith row of cMatrix
-        # 0 to total num of DOFs (i.e. num of rows of jacobian)
-        for i in range(rowptr.size - 1):
-            if (i % 5 == 0):  # Just consider the rows related to the h variable
-                for j, offset in enumerate(range(rowptr[i], rowptr[i + 1])):
-                    offset_cMatrix = list(
-                        range(rowptr_cMatrix[i_cMatrix], rowptr_cMatrix[i_cMatrix + 1]))
-                    if (j % 5 == 0):
-                        colind_cMatrix[offset_cMatrix[old_div(j, 5)]] = old_div(
-                            colind[offset], 5)
-                i_cMatrix += 1
+        nzval_cMatrix = np.zeros(nnz_cMatrix)  # This is enough since the values are filled later
+        # the pattern of the h rows and columns of the Jacobian, cached on the
+        # mesh by block size and signature of the Jacobian pattern
+        if not hasattr(self.mesh, 'cMatrixSparsity'):
+            self.mesh.cMatrixSparsity = {}
+        key = (5,) + LinearAlgebraTools.sparsitySignature(rowptr, colind)
+        if key not in self.mesh.cMatrixSparsity:
+            self.mesh.cMatrixSparsity[key] = LinearAlgebraTools.blockComponentSparsity(rowptr, colind, 5)
+        rowptr_cMatrix, colind_cMatrix = self.mesh.cMatrixSparsity[key]
         # END OF SPARSITY PATTERN FOR C MATRICES
 
         di = np.zeros((self.mesh.nElements_global,
@@ -1176,9 +1161,8 @@ class LevelModel(proteus.Transport.OneLevelTransport):
                            * self.elementQuadratureWeights[('u', 0)])
         self.ML = np.zeros((self.nFreeDOF_global[0],), 'd')
         self.hReg = np.zeros((self.nFreeDOF_global[0],), 'd')
-        for i in range(self.nFreeDOF_global[0]):
-            self.ML[i] = self.MC_a[rowptr_cMatrix[i]:rowptr_cMatrix[i + 1]].sum()
-            self.hReg[i] = self.ML[i] / diamD2 * self.u[0].dof.max()
+        self.ML[:] = np.add.reduceat(self.MC_a, rowptr_cMatrix[:-1])
+        self.hReg[:] = self.ML / diamD2 * self.u[0].dof.max()
         # np.testing.assert_almost_equal(self.ML.sum(), self.mesh.volume, err_msg="Trace of lumped mass matrix should be the domain volume",verbose=True)
         # np.testing.assert_almost_equal(self.ML.sum(), diamD2, err_msg="Trace of lumped mass matrix should be the domain volume",verbose=True)
 
@@ -1259,11 +1243,33 @@ class LevelModel(proteus.Transport.OneLevelTransport):
     #
 
     def updateConstrainedDOFs(self):
+        """
+        Set the constrained DOFs from constrainedDOFs[1](x, y, t, h, hu, hv, heta, hw)
+
+        If constrainedDOFs[1] has a values_array attribute it is called
+        once with arrays of the coordinates and unknowns at all the
+        constrained DOFs, see SW2DCV.LevelModel.updateConstrainedDOFs.
+        """
         # get indices for constrained DOFs
         if self.constrainedDOFsIndices is None:
             self.constrainedDOFsIndices = []
             self.constrainedDOFsIndices = self.coefficients.constrainedDOFs[0](self.dofsXCoord,
                                                                                self.dofsYCoord)
+        if hasattr(self.coefficients.constrainedDOFs[1], 'values_array'):
+            index = np.asarray(self.constrainedDOFsIndices, dtype='i')
+            values = self.coefficients.constrainedDOFs[1].values_array(self.dofsXCoord[index],
+                                                                       self.dofsYCoord[index],
+                                                                       self.timeIntegration.t,
+                                                                       self.u[0].dof[index],
+                                                                       self.u[1].dof[index],
+                                                                       self.u[2].dof[index],
+                                                                       self.u[3].dof[index],
+                                                                       self.u[4].dof[index])
+            for cj, value in enumerate(values):
+                if value is not None:
+                    isSet = ~np.broadcast_to(np.ma.getmaskarray(value), index.shape)
+                    self.u[cj].dof[index[isSet]] = np.broadcast_to(np.ma.getdata(value), index.shape)[isSet]
+            return
         for i in self.constrainedDOFsIndices:
             x = self.dofsXCoord[i]
             y = self.dofsYCoord[i]
@@ -1287,12 +1293,11 @@ class LevelModel(proteus.Transport.OneLevelTransport):
 
     def updateReflectingBoundaryConditions(self):
         self.forceStrongConditions = False
-        for dummy, index in enumerate(self.boundaryIndex):
-            vx = self.u[1].dof[index]
-            vy = self.u[2].dof[index]
-            vt = vx * self.normaly[index] - vy * self.normalx[index]
-            self.u[1].dof[index] = vt * self.normaly[index]
-            self.u[2].dof[index] = -vt * self.normalx[index]
+        # keep only the tangential component of the velocity at the boundary DOFs
+        index = self.boundaryIndex
+        vt = self.u[1].dof[index] * self.normaly[index] - self.u[2].dof[index] * self.normalx[index]
+        self.u[1].dof[index] = vt * self.normaly[index]
+        self.u[2].dof[index] = -vt * self.normalx[index]
     #
 
     def initDataStructures(self):
@@ -1370,9 +1375,8 @@ class LevelModel(proteus.Transport.OneLevelTransport):
         # DIRICHLET BOUNDARY CONDITIONS #
         if self.forceStrongConditions:
             for cj in range(len(self.dirichletConditionsForceDOF)):
-                for dofN, g in list(self.dirichletConditionsForceDOF[cj].DOFBoundaryConditionsDict.items()):
-                    self.u[cj].dof[dofN] = g(
-                        self.dirichletConditionsForceDOF[cj].DOFBoundaryPointDict[dofN], self.timeIntegration.t)
+                dofs, values = self.getDirichletValues(self.dirichletConditionsForceDOF[cj], self.timeIntegration.t)
+                self.u[cj].dof[dofs] = values
         #
         # CHECK POSITIVITY OF WATER HEIGHT # changed to 1E-4 -EJT
         if (self.check_positivity_water_height == True):
@@ -1539,10 +1543,9 @@ class LevelModel(proteus.Transport.OneLevelTransport):
                     r[self.offset[cj] + self.stride[cj] * dofN] = 0.
         #
         if self.constrainedDOFsIndices is not None:
-            for index in self.constrainedDOFsIndices:
-                for cj in range(self.nc):
-                    global_dofN = self.offset[cj] + self.stride[cj] * index
-                    r[global_dofN] = 0.
+            index = np.asarray(self.constrainedDOFsIndices, dtype='i')
+            for cj in range(self.nc):
+                r[self.offset[cj] + self.stride[cj] * index] = 0.
         #
         logEvent("Global residual", level=9, data=r)
         # mwf decide if this is reasonable for keeping solver statistics
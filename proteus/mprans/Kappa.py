@@ -7,6 +7,7 @@ from proteus.mprans.cKappa import *
 from proteus.mprans.cKappa2D import *
 import numpy as np
 from proteus.Transport import OneLevelTransport
+from proteus.FemTools import getElementGeometryCache
 
 """
 NOTES:
@@ -762,7 +763,9 @@ class LevelModel(proteus.Transport.OneLevelTransport):
         self.phi_ip = {}
         # mesh
         #self.q['x'] = np.zeros((self.mesh.nElements_global,self.nQuadraturePoints_element,3),'d')
-        self.ebqe['x'] = np.zeros((self.mesh.nExteriorElementBoundaries_global, self.nElementBoundaryQuadraturePoints_elementBoundary, 3), 'd')
+        # the quadrature point geometry is shared by the models on the mesh
+        self.elementGeometryCache = getElementGeometryCache(self.mesh)
+        self.ebqe['x'] = self.elementGeometryCache.getExteriorElementBoundaryQuadrature(self.u[0].femSpace.elementMaps, self.elementBoundaryQuadraturePoints)['x']
         self.q[('u', 0)] = np.zeros((self.mesh.nElements_global, self.nQuadraturePoints_element), 'd')
         self.q[('grad(u)', 0)] = np.zeros((self.mesh.nElements_global, self.nQuadraturePoints_element, self.nSpace_global), 'd')
         #diffusion, isotropic
@@ -1010,8 +1013,8 @@ class LevelModel(proteus.Transport.OneLevelTransport):
         # self.shockCapturing.lag=True
 
         if self.forceStrongConditions:
-            for dofN, g in list(self.dirichletConditionsForceDOF.DOFBoundaryConditionsDict.items()):
-                self.u[0].dof[dofN] = g(self.dirichletConditionsForceDOF.DOFBoundaryPointDict[dofN], self.timeIntegration.t)
+            dofs, values = self.getDirichletValues(self.dirichletConditionsForceDOF, self.timeIntegration.t)
+            self.u[0].dof[dofs] = values
         #
         # mwf debug
         #import pdb
@@ -1261,8 +1264,7 @@ class LevelModel(proteus.Transport.OneLevelTransport):
         self.u[0].femSpace.elementMaps.getBasisGradientValuesTraceRef(self.elementBoundaryQuadraturePoints)
         self.u[0].femSpace.getBasisValuesTraceRef(self.elementBoundaryQuadraturePoints)
         self.u[0].femSpace.getBasisGradientValuesTraceRef(self.elementBoundaryQuadraturePoints)
-        self.u[0].femSpace.elementMaps.getValuesGlobalExteriorTrace(self.elementBoundaryQuadraturePoints,
-                                                                    self.ebqe['x'])
+        self.ebqe['x'] = self.elementGeometryCache.getExteriorElementBoundaryQuadrature(self.u[0].femSpace.elementMaps, self.elementBoundaryQuadraturePoints)['x']
         self.fluxBoundaryConditionsObjectsDict = dict([(cj, FluxBoundaryConditions(self.mesh,
                                                                                    self.nElementBoundaryQuadraturePoints_elementBoundary,
                                                                                    self.ebqe[('x')],
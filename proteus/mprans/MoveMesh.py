@@ -131,6 +131,7 @@ class Coefficients(proteus.TransportCoefficients.TC_base):
             self.mesh.nodeArray[:, 2] += self.model.u[2].dof
             self.mesh.nodeVelocityArray[:, 2] = self.model.u[2].dof
             self.model.u[2].dof[:] = 0.0
+        self.mesh.invalidateSpatialIndex()
         if self.dt_last is None:
             dt = self.model.timeIntegration.dt
         else:
@@ -359,7 +360,9 @@ class LevelModel(proteus.Transport.OneLevelTransport):
         self.ebqe = {}
         self.phi_ip = {}
         # mesh
-        self.ebqe['x'] = np.zeros((self.mesh.nExteriorElementBoundaries_global, self.nElementBoundaryQuadraturePoints_elementBoundary, 3), 'd')
+        # the quadrature point geometry is shared by the models on the mesh
+        self.elementGeometryCache = FemTools.getElementGeometryCache(self.mesh)
+        self.ebqe['x'] = self.elementGeometryCache.getExteriorElementBoundaryQuadrature(self.u[0].femSpace.elementMaps, self.elementBoundaryQuadraturePoints)['x']
         self.q['bodyForce'] = np.zeros((self.mesh.nElements_global, self.nQuadraturePoints_element, self.nSpace_global), 'd')
         self.ebqe[('u', 0)] = np.zeros((self.mesh.nExteriorElementBoundaries_global, self.nElementBoundaryQuadraturePoints_elementBoundary), 'd')
         self.ebqe[('u', 1)] = np.zeros((self.mesh.nExteriorElementBoundaries_global, self.nElementBoundaryQuadraturePoints_elementBoundary), 'd')
@@ -570,8 +573,8 @@ class LevelModel(proteus.Transport.OneLevelTransport):
             self.elementResidual[2].fill(0.0)
         if self.forceStrongConditions:
             for cj in range(self.nc):
-                for dofN, g in list(self.dirichletConditionsForceDOF[cj].DOFBoundaryConditionsDict.items()):
-                    self.u[cj].dof[dofN] = g(self.dirichletConditionsForceDOF[cj].DOFBoundaryPointDict[dofN], self.timeIntegration.t)
+                dofs, values = self.getDirichletValues(self.dirichletConditionsForceDOF[cj], self.timeIntegration.t)
+                self.u[cj].dof[dofs] = values
         self.moveMesh.calculateResidual(  # element
             self.u[0].femSpace.elementMaps.psi,
             self.u[0].femSpace.elementMaps.grad_psi,
@@ -623,9 +626,8 @@ class LevelModel(proteus.Transport.OneLevelTransport):
             self.ebqe[('stressFlux_bc', 2)])
         if self.forceStrongConditions:
             for cj in range(self.nc):
-                for dofN, g in list(self.dirichletConditionsForceDOF[cj].DOFBoundaryConditionsDict.items()):
-                    r[self.offset[cj] + self.stride[cj] * dofN] = self.u[cj].dof[dofN] - \
-                        g(self.dirichletConditionsForceDOF[cj].DOFBoundaryPointDict[dofN], self.timeIntegration.t)
+                dofs, values = self.getDirichletValues(self.dirichletConditionsForceDOF[cj], self.timeIntegration.t)
+                r[self.offset[cj] + self.stride[cj] * dofs] = self.u[cj].dof[dofs] - values
         logEvent("Global residual", level=9, data=r)
         self.nonlinear_function_evaluations += 1
 
@@ -761,8 +763,7 @@ class LevelModel(proteus.Transport.OneLevelTransport):
         self.u[0].femSpace.elementMaps.getBasisGradientValuesTraceRef(self.elementBoundaryQuadraturePoints)
         self.u[0].femSpace.getBasisValuesTraceRef(self.elementBoundaryQuadraturePoints)
         self.u[0].femSpace.getBasisGradientValuesTraceRef(self.elementBoundaryQuadraturePoints)
-        self.u[0].femSpace.elementMaps.getValuesGlobalExteriorTrace(self.elementBoundaryQuadraturePoints,
-                                                                    self.ebqe['x'])
+        self.ebqe['x'] = self.elementGeometryCache.getExteriorElementBoundaryQuadrature(self.u[0].femSpace.elementMaps, self.elementBoundaryQuadraturePoints)['x']
         self.stressFluxBoundaryConditionsObjectsDict = dict([(cj, FemTools.FluxBoundaryConditions(self.mesh,
                                                                                                   self.nElementBoundaryQuadraturePoints_elementBoundary,
                                                                                                   self.ebqe[('x')],
@@ -793,6 +794,6 @@ class LevelModel(proteus.Transport.OneLevelTransport):
         self.ebqe_old_x = self.ebqe['x'].copy()
         self.calculateExteriorElementBoundaryQuadrature()  # pass
         for cj in range(self.nc):
+            # the Dirichlet points are views of the interpolation points, so
+            # they are moved with them
             self.u[cj].femSpace.updateInterpolationPoints()
-            for dofN, g in list(self.dirichletConditionsForceDOF[cj].DOFBoundaryConditionsDict.items()):
-                self.dirichletConditionsForceDOF[cj].DOFBoundaryPointDict[dofN] = self.mesh.nodeArray[dofN]
@@ -305,6 +305,7 @@ class Coefficients(TransportCoefficients.PoissonEquationCoefficients):
         self.mesh.nodeVelocityArray[:] += (self.PHI[:]-self.mesh.nodeArray[:])/dt
         # self.model.mesh.nodeVelocityArray[:] = self.model.mesh.nodeDisplacementArray[:]/dt
         self.mesh.nodeArray[:] = self.PHI[:]
+        self.mesh.invalidateSpatialIndex()
         self.nearest_nodes[:] = self.nearest_nodes0[:]
         self.eN_phi[:] = None
         # # tri hack: remove mesh velocity when dirichlet imposed on boundaries
@@ -9,6 +9,7 @@ from proteus.Transport import OneLevelTransport, cfemIntegrals, SparseMat
 from proteus.Transport import TC_base, logEvent, NonlinearEquation, Quadrature, Comm
 from proteus.Transport import memory, FluxBoundaryConditions, ExplicitLumpedMassMatrix
 from proteus.Transport import globalMax, SSP, ExplicitConsistentMassMatrixWithRedistancing
+from proteus.FemTools import getElementGeometryCache
 
 class SubgridError(proteus.SubgridError.SGE_base):
     def __init__(self, coefficients, nd):
@@ -663,8 +664,10 @@ class LevelModel(OneLevelTransport):
         self.phi_ip = {}
         self.edge_based_cfl = np.zeros(self.u[0].dof.shape)
         # mesh
-        self.q['x'] = np.zeros((self.mesh.nElements_global, self.nQuadraturePoints_element, 3), 'd')
-        self.ebqe['x'] = np.zeros((self.mesh.nExteriorElementBoundaries_global, self.nElementBoundaryQuadraturePoints_elementBoundary, 3), 'd')
+        # the quadrature point geometry is shared by the models on the mesh
+        self.elementGeometryCache = getElementGeometryCache(self.mesh)
+        self.q['x'] = self.elementGeometryCache.getElementQuadrature(self.u[0].femSpace.elementMaps, self.elementQuadraturePoints)['x']
+        self.ebqe['x'] = self.elementGeometryCache.getExteriorElementBoundaryQuadrature(self.u[0].femSpace.elementMaps, self.elementBoundaryQuadraturePoints)['x']
         self.q[('dV_u', 0)] = (old_div(1.0, self.mesh.nElements_global)) * np.ones((self.mesh.nElements_global, self.nQuadraturePoints_element), 'd')
         self.q[('u', 0)] = np.zeros((self.mesh.nElements_global, self.nQuadraturePoints_element), 'd')
         self.q[('grad(u)', 0)] = np.zeros((self.mesh.nElements_global, self.nQuadraturePoints_element, self.nSpace_global), 'd')
@@ -1042,24 +1045,13 @@ class LevelModel(OneLevelTransport):
             nnz = nzval.shape[-1]  # number of non-zero entries in sparse matrix
             di = self.q[('grad(u)', 0)].copy()  # direction of derivative
             # JACOBIANS (FOR ELEMENT TRANSFORMATION)
-            self.q[('J')] = np.zeros((self.mesh.nElements_global,
-                                      self.nQuadraturePoints_element,
-                                      self.nSpace_global,
-                                      self.nSpace_global),
-                                     'd')
-            self.q[('inverse(J)')] = np.zeros((self.mesh.nElements_global,
-                                               self.nQuadraturePoints_element,
-                                               self.nSpace_global,
-                                               self.nSpace_global),
-                                              'd')
-            self.q[('det(J)')] = np.zeros((self.mesh.nElements_global,
-                                           self.nQuadraturePoints_element),
-                                          'd')
-            self.u[0].femSpace.elementMaps.getJacobianValues(self.elementQuadraturePoints,
-                                                             self.q['J'],
-                                                             self.q['inverse(J)'],
-                                                             self.q['det(J)'])
-            self.q['abs(det(J))'] = np.abs(self.q['det(J)'])
+            geometry = self.elementGeometryCache.getElementQuadrature(self.u[0].femSpace.elementMaps,
+                                                                      self.elementQuadraturePoints,
+                                                                      jacobians=True)
+            self.q['J'] = geometry['J']
+            self.q['inverse(J)'] = geometry['inverse(J)']
+            self.q['det(J)'] = geometry['det(J)']
+            self.q['abs(det(J))'] = geometry['abs(det(J))']
             # SHAPE FUNCTIONS
             self.q[('w', 0)] = np.zeros((self.mesh.nElements_global,
                                          self.nQuadraturePoints_element,
@@ -1172,8 +1164,8 @@ class LevelModel(OneLevelTransport):
         # flux boundary conditions, SHOULDN'T HAVE
 
         if self.forceStrongConditions:
-            for dofN, g in list(self.dirichletConditionsForceDOF.DOFBoundaryConditionsDict.items()):
-                self.u[0].dof[dofN] = g(self.dirichletConditionsForceDOF.DOFBoundaryPointDict[dofN], self.timeIntegration.t)
+            dofs, values = self.getDirichletValues(self.dirichletConditionsForceDOF, self.timeIntegration.t)
+            self.u[0].dof[dofs] = values
 
         degree_polynomial = 1
         try:
@@ -1465,8 +1457,7 @@ class LevelModel(OneLevelTransport):
 
         This function should be called only when the mesh changes.
         """
-        self.u[0].femSpace.elementMaps.getValues(self.elementQuadraturePoints,
-                                                 self.q['x'])
+        self.q['x'] = self.elementGeometryCache.getElementQuadrature(self.u[0].femSpace.elementMaps, self.elementQuadraturePoints)['x']
         self.u[0].femSpace.elementMaps.getBasisValuesRef(self.elementQuadraturePoints)
         self.u[0].femSpace.elementMaps.getBasisGradientValuesRef(self.elementQuadraturePoints)
         self.u[0].femSpace.getBasisValuesRef(self.elementQuadraturePoints)
@@ -1496,8 +1487,7 @@ class LevelModel(OneLevelTransport):
         self.u[0].femSpace.elementMaps.getBasisGradientValuesTraceRef(self.elementBoundaryQuadraturePoints)
         self.u[0].femSpace.getBasisValuesTraceRef(self.elementBoundaryQuadraturePoints)
         self.u[0].femSpace.getBasisGradientValuesTraceRef(self.elementBoundaryQuadraturePoints)
-        self.u[0].femSpace.elementMaps.getValuesGlobalExteriorTrace(self.elementBoundaryQuadraturePoints,
-                                                                    self.ebqe['x'])
+        self.ebqe['x'] = self.elementGeometryCache.getExteriorElementBoundaryQuadrature(self.u[0].femSpace.elementMaps, self.elementBoundaryQuadraturePoints)['x']
         self.fluxBoundaryConditionsObjectsDict = dict([(cj, FluxBoundaryConditions(self.mesh,
                                                                                    self.nElementBoundaryQuadraturePoints_elementBoundary,
                                                                                    self.ebqe[('x')],
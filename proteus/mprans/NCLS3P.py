@@ -832,10 +832,8 @@ class LevelModel(OneLevelTransport):
         # try to use 1d,2d,3d specific modules
 
         if self.forceStrongConditions:
-            for dofN, g in list(self.dirichletConditionsForceDOF.DOFBoundaryConditionsDict.items()):
-                self.u[0].dof[dofN] = g(
-                    self.dirichletConditionsForceDOF.DOFBoundaryPointDict[dofN],
-                    self.timeIntegration.t)
+            dofs, values = self.getDirichletValues(self.dirichletConditionsForceDOF, self.timeIntegration.t)
+            self.u[0].dof[dofs] = values
         
         if (self.stage==2 and self.auxTaylorGalerkinFlag==1):
             self.uTilde_dof[:] = self.u[0].dof
@@ -0,0 +1,168 @@
+"""
+Particle signed distance and velocity callbacks evaluated on arrays of points.
+
+Particle callbacks passed to the RANS2P coefficients in particle_sdfList and
+particle_velocityList are called as sdf(t, x) -> (phi, normal) and
+velocity(t, x) -> velocity at one point at a time. A callback may also
+provide
+
+- sdf_array(t, X) -> (phi, normals), for X of shape (nPoints, 3), returning
+  arrays of shape (nPoints,) and (nPoints, 3)
+- velocity_array(t, X) -> velocities of shape (nPoints, 3)
+- bbox(t) -> (lower, upper), the corners of an axis-aligned box containing
+  the particle, so that points far from it are not evaluated, or None if
+  the particle is unbounded and every point must be evaluated
+
+The classes in this module implement this contract for common shapes.
+
+.. inheritance-diagram:: proteus.mprans.ParticleShapes
+   :parts: 1
+"""
+from __future__ import division
+import numpy as np
+
+__all__ = ['ParticleSDF',
+           'SphereSDF',
+           'CylinderSDF',
+           'BoxSDF',
+           'RigidBodyVelocity']
+
+
+class ParticleSDF(object):
+    """
+    Base class for signed distance callbacks of particles.
+
+    Subclasses implement sdf_array and may implement bbox, the scalar call
+    is evaluated through sdf_array. The center may be updated between steps
+    to move the particle.
+    """
+
+    def __init__(self, center):
+        self.center = np.array(center, 'd')
+
+    def __call__(self, t, x):
+        phi, normals = self.sdf_array(t, np.reshape(np.asarray(x, 'd'), (1, 3)))
+        return phi[0], normals[0]
+
+    def sdf_array(self, t, X):
+        raise NotImplementedError
+
+    def bbox(self, t):
+        return None
+
+
+class SphereSDF(ParticleSDF):
+    """
+    Signed distance to a sphere (a circle on 2D meshes)
+
+    Parameters
+    ----------
+    center: array_like
+        Center of the sphere.
+    radius: float
+        Radius of the sphere.
+    """
+
+    def __init__(self, center, radius):
+        super(SphereSDF, self).__init__(center)
+        self.radius = radius
+
+    def sdf_array(self, t, X):
+        d = X - self.center
+        r = np.sqrt(np.sum(d**2, axis=1))
+        normals = np.zeros_like(d)
+        np.divide(d, r[:, None], out=normals, where=r[:, None] > 0.)
+        return r - self.radius, normals
+
+    def bbox(self, t):
+        return self.center - self.radius, self.center + self.radius
+
+
+class CylinderSDF(ParticleSDF):
+    """
+    Signed distance to an infinite cylinder
+
+    Parameters
+    ----------
+    center: array_like
+        Point on the axis of the cylinder.
+    radius: float
+        Radius of the cylinder.
+    axis: array_like
+        Direction of the axis (normalized internally), the default z
+        axis gives a circle on 2D meshes.
+    """
+
+    def __init__(self, center, radius, axis=(0., 0., 1.)):
+        super(CylinderSDF, self).__init__(center)
+        self.radius = radius
+        self.axis = np.array(axis, 'd')/np.linalg.norm(axis)
+
+    def sdf_array(self, t, X):
+        d = X - self.center
+        d -= np.outer(np.dot(d, self.axis), self.axis)
+        r = np.sqrt(np.sum(d**2, axis=1))
+        normals = np.zeros_like(d)
+        np.divide(d, r[:, None], out=normals, where=r[:, None] > 0.)
+        return r - self.radius, normals
+
+    def bbox(self, t):
+        # unbounded along every direction the axis has a component in
+        extent = np.where(self.axis == 0., self.radius, np.inf)
+        return self.center - extent, self.center + extent
+
+
+class BoxSDF(ParticleSDF):
+    """
+    Signed distance to an axis-aligned box
+
+    Parameters
+    ----------
+    center: array_like
+        Center of the box.
+    half_lengths: array_like
+        Half of the length of the box along x, y and z, use numpy.inf
+        along z on 2D meshes.
+    """
+
+    def __init__(self, center, half_lengths):
+        super(BoxSDF, self).__init__(center)
+        self.half_lengths = np.array(half_lengths, 'd')
+
+    def sdf_array(self, t, X):
+        d = X - self.center
+        q = np.abs(d) - self.half_lengths
+        q_out = np.maximum(q, 0.)
+        outside = np.sqrt(np.sum(q_out**2, axis=1))
+        inside = np.minimum(np.max(q, axis=1), 0.)
+        sign = np.where(d < 0., -1., 1.)
+        normals = np.zeros_like(d)
+        np.divide(sign*q_out, outside[:, None], out=normals, where=outside[:, None] > 0.)
+        # inside (or on) the box the normal is along the nearest face
+        face = np.argmax(q, axis=1)
+        isInside = outside == 0.
+        normals[isInside, face[isInside]] = sign[isInside, face[isInside]]
+        return outside + inside, normals
+
+    def bbox(self, t):
+        return self.center - self.half_lengths, self.center + self.half_lengths
+
+
+class RigidBodyVelocity(object):
+    """
+    Velocity callback of a particle moving as a rigid body
+
+    The velocity at x is velocity + angular_velocity x (x - center), the
+    attributes may be updated between steps.
+    """
+
+    def __init__(self, center, velocity=(0., 0., 0.), angular_velocity=(0., 0., 0.)):
+        self.center = np.array(center, 'd')
+        self.velocity = np.array(velocity, 'd')
+        self.angular_velocity = np.array(angular_velocity, 'd')
+
+    def __call__(self, t, x):
+        return self.velocity_array(t, np.reshape(np.asarray(x, 'd'), (1, 3)))[0]
+
+    def velocity_array(self, t, X):
+        return self.velocity + np.cross(self.angular_velocity, X - self.center)
@@ -624,9 +624,8 @@ class LevelModel(proteus.Transport.OneLevelTransport):
         """
         r.fill(0.0)
         # set strong Dirichlet conditions
-        for dofN, g in list(self.dirichletConditionsForceDOF[0].DOFBoundaryConditionsDict.items()):
-            # load the BC valu        # Load the unknowns into the finite element dof
-            u[self.offset[0] + self.stride[0] * dofN] = g(self.dirichletConditionsForceDOF[0].DOFBoundaryPointDict[dofN], self.timeIntegration.t)
+        dofs, values = self.getDirichletValues(self.dirichletConditionsForceDOF[0], self.timeIntegration.t)
+        u[self.offset[0] + self.stride[0] * dofs] = values
         self.setUnknowns(u)
 
         if self.coefficients.pressureIncrementModelIndex is not None:
@@ -672,9 +671,8 @@ class LevelModel(proteus.Transport.OneLevelTransport):
             self.mesh.exteriorElementBoundariesArray,
             self.mesh.elementBoundaryElementsArray,
             self.mesh.elementBoundaryLocalElementBoundariesArray)
-        for dofN, g in list(self.dirichletConditionsForceDOF[0].DOFBoundaryConditionsDict.items()):
-            r[self.offset[0] + self.stride[0] * dofN] = self.u[0].dof[dofN] - \
-                g(self.dirichletConditionsForceDOF[0].DOFBoundaryPointDict[dofN], self.timeIntegration.t)
+        dofs, values = self.getDirichletValues(self.dirichletConditionsForceDOF[0], self.timeIntegration.t)
+        r[self.offset[0] + self.stride[0] * dofs] = self.u[0].dof[dofs] - values
         log("Global residual", level=9, data=r)
         self.nonlinear_function_evaluations += 1
 
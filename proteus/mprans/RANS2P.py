@@ -18,6 +18,7 @@ import numpy
 from proteus import *
 from proteus.Transport import *
 from proteus.Transport import OneLevelTransport
+from proteus.FemTools import getElementGeometryCache
 
 class SubgridError(proteus.SubgridError.SGE_base):
     """
@@ -158,6 +159,12 @@ class Coefficients(proteus.TransportCoefficients.TC_base):
     Equation.  This option should be turned off for most problems,
     but in some instances it may produced better preconditioning
     results than the full SGE approach.
+
+    Particle callbacks in particle_sdfList and particle_velocityList
+    providing sdf_array, velocity_array and bbox (see
+    proteus.mprans.ParticleShapes) are evaluated on all points at once,
+    and only at points within particle_bboxPadding of their bounding
+    box (2*particle_epsFact*mesh.hMax by default).
     """
     from proteus.ctransportCoefficients import TwophaseNavierStokes_ST_LS_SO_2D_Evaluate
     from proteus.ctransportCoefficients import TwophaseNavierStokes_ST_LS_SO_3D_Evaluate
@@ -225,6 +232,7 @@ class Coefficients(proteus.TransportCoefficients.TC_base):
                  particle_beta=1000.0,
                  particle_penalty_constant=1000.0,
                  particle_nitsche=1.0,
+                 particle_bboxPadding=None,
                  nullSpace='NoNullSpace',
                  useExact=False,
                  initialize=True):
@@ -239,6 +247,7 @@ class Coefficients(proteus.TransportCoefficients.TC_base):
         self.particle_penalty_constant = particle_penalty_constant
         self.particle_sdfList = particle_sdfList
         self.particle_velocityList = particle_velocityList
+        self.particle_bboxPadding = particle_bboxPadding
         self.ball_center = ball_center
         self.ball_radius = ball_radius
         self.ball_velocity = ball_velocity
@@ -742,26 +751,21 @@ class Coefficients(proteus.TransportCoefficients.TC_base):
             self.ebq_particle_velocity_s[:] = 1e10
 
             for i in range(self.nParticles):
-                vel = lambda x: self.particle_velocityList[i](t, x)
-                sdf = lambda x: self.particle_sdfList[i](t, x)
-
-                for j in range(self.mesh.nodeArray.shape[0]):
-                    sdf_at_node, sdNormals = sdf(self.mesh.nodeArray[j, :])
-                    if (sdf_at_node < self.phi_s[j]):
-                        self.phi_s[j] = sdf_at_node
-                for eN in range(self.model.q['x'].shape[0]):
-                    for k in range(self.model.q['x'].shape[1]):
-                        self.particle_signed_distances[i, eN, k], self.particle_signed_distance_normals[i, eN, k] = sdf(self.model.q['x'][eN, k])
-                        self.particle_velocities[i, eN, k] = vel(self.model.q['x'][eN, k])
-                        if (abs(self.particle_signed_distances[i, eN, k]) < abs(self.phisField[eN, k])):
-                            self.phisField[eN, k] = self.particle_signed_distances[i, eN, k]
-                for ebN in range(self.model.ebq_global['x'].shape[0]):
-                    for kb in range(self.model.ebq_global['x'].shape[1]):
-                        sdf_ebN_kb,sdNormals = sdf(self.model.ebq_global['x'][ebN,kb])
-                        if ( sdf_ebN_kb < self.ebq_global_phi_s[ebN,kb]):
-                            self.ebq_global_phi_s[ebN,kb]=sdf_ebN_kb
-                            self.ebq_global_grad_phi_s[ebN,kb,:]=sdNormals
-                            self.ebq_particle_velocity_s[ebN,kb,:] = vel(self.model.ebq_global['x'][ebN,kb])
+                phi, normals = self.particleSignedDistances(i, t, self.mesh.nodeArray)
+                numpy.minimum(self.phi_s, phi, out=self.phi_s)
+                x = self.model.q['x'].reshape(-1, 3)
+                phi, normals = self.particleSignedDistances(i, t, x)
+                self.particle_signed_distances[i] = phi.reshape(self.particle_signed_distances.shape[1:])
+                self.particle_signed_distance_normals[i] = normals.reshape(self.particle_signed_distance_normals.shape[1:])
+                self.particle_velocities[i] = self.particleVelocities(i, t, x).reshape(self.particle_velocities.shape[1:])
+                update = numpy.abs(self.particle_signed_distances[i]) < numpy.abs(self.phisField)
+                self.phisField[update] = self.particle_signed_distances[i][update]
+                x = self.model.ebq_global['x'].reshape(-1, 3)
+                phi, normals = self.particleSignedDistances(i, t, x)
+                update = phi < self.ebq_global_phi_s.reshape(-1)
+                self.ebq_global_phi_s.reshape(-1)[update] = phi[update]
+                self.ebq_global_grad_phi_s.reshape(-1, 3)[update] = normals[update]
+                self.ebq_particle_velocity_s.reshape(-1, 3)[update] = self.particleVelocities(i, t, x[update])
 
         # if self.comm.isMaster():
         # print "wettedAreas"
@@ -771,6 +775,55 @@ class Coefficients(proteus.TransportCoefficients.TC_base):
         # print "Forces_v"
         # print self.netForces_v[:,:]
 
+    def particleNearPoints(self, i, t, x):
+        """
+        Mask of the points x within particle_bboxPadding of the bounding box of particle i
+
+        All the points are near a particle without bbox or whose bbox is None
+        """
+        sdf = self.particle_sdfList[i]
+        bbox = sdf.bbox(t) if hasattr(sdf, 'bbox') else None
+        if bbox is None:
+            return numpy.ones((x.shape[0],), 'bool')
+        if self.particle_bboxPadding is None:
+            padding = 2.0*self.particle_epsFact*self.mesh.hMax
+        else:
+            padding = self.particle_bboxPadding
+        lower, upper = bbox
+        return numpy.logical_and((x >= numpy.asarray(lower) - padding).all(axis=1),
+                                 (x <= numpy.asarray(upper) + padding).all(axis=1))
+
+    def particleSignedDistances(self, i, t, x):
+        """
+        Signed distances and normals of particle i at the points x
+
+        Points away from the particle keep the far field value 1e10
+        """
+        sdf = self.particle_sdfList[i]
+        phi = 1e10*numpy.ones((x.shape[0],), 'd')
+        normals = numpy.zeros((x.shape[0], 3), 'd')
+        near = numpy.where(self.particleNearPoints(i, t, x))[0]
+        if hasattr(sdf, 'sdf_array'):
+            phi[near], normals[near] = sdf.sdf_array(t, x[near])
+        else:
+            for j in near:
+                phi[j], normals[j] = sdf(t, x[j])
+        return phi, normals
+
+    def particleVelocities(self, i, t, x):
+        """
+        Velocities of particle i at the points x, zero away from the particle
+        """
+        vel = self.particle_velocityList[i]
+        velocities = numpy.zeros((x.shape[0], 3), 'd')
+        near = numpy.where(self.particleNearPoints(i, t, x))[0]
+        if hasattr(vel, 'velocity_array'):
+            velocities[near] = vel.velocity_array(t, x[near])
+        else:
+            for j in near:
+                velocities[j] = vel(t, x[j])
+        return velocities
+
     def postStep(self, t, firstStep=False):
         self.model.dt_last = self.model.timeIntegration.dt
         self.model.q['dV_last'][:] = self.model.q['dV']
@@ -1021,7 +1074,9 @@ class LevelModel(proteus.Transport.OneLevelTransport):
         self.ebqe = {}
         self.phi_ip = {}
         # mesh
-        self.ebqe['x'] = numpy.zeros((self.mesh.nExteriorElementBoundaries_global, self.nElementBoundaryQuadraturePoints_elementBoundary, 3), 'd')
+        # the quadrature point geometry is shared by the models on the mesh
+        self.elementGeometryCache = getElementGeometryCache(self.mesh)
+        self.ebqe['x'] = self.elementGeometryCache.getExteriorElementBoundaryQuadrature(self.u[0].femSpace.elementMaps, self.elementBoundaryQuadraturePoints)['x']
         self.ebq_global[('totalFlux', 0)] = numpy.zeros((self.mesh.nElementBoundaries_global, self.nElementBoundaryQuadraturePoints_elementBoundary), 'd')
         self.ebq_global[('velocityAverage', 0)] = numpy.zeros((self.mesh.nElementBoundaries_global,
                                                                self.nElementBoundaryQuadraturePoints_elementBoundary, self.nSpace_global), 'd')
@@ -1053,7 +1108,7 @@ class LevelModel(proteus.Transport.OneLevelTransport):
         self.q[('velocity', 0)] = numpy.zeros((self.mesh.nElements_global, self.nQuadraturePoints_element, self.nSpace_global), 'd')
         self.q['velocity_solid'] = numpy.zeros((self.mesh.nElements_global, self.nQuadraturePoints_element, self.nSpace_global), 'd')
         self.q['phi_solid'] = numpy.zeros((self.mesh.nElements_global, self.nQuadraturePoints_element), 'd')
-        self.q['x'] = numpy.zeros((self.mesh.nElements_global, self.nQuadraturePoints_element, 3), 'd')
+        self.q['x'] = self.elementGeometryCache.getElementQuadrature(self.u[0].femSpace.elementMaps, self.elementQuadraturePoints)['x']
         self.q[('cfl', 0)] = numpy.zeros((self.mesh.nElements_global, self.nQuadraturePoints_element), 'd')
         self.q[('numDiff', 1, 1)] = numpy.zeros((self.mesh.nElements_global, self.nQuadraturePoints_element), 'd')
         self.q[('numDiff', 2, 2)] = numpy.zeros((self.mesh.nElements_global, self.nQuadraturePoints_element), 'd')
@@ -1125,22 +1180,12 @@ class LevelModel(proteus.Transport.OneLevelTransport):
                  self.nQuadraturePoints_element,
                  self.nDOF_trial_element[0]),
                 'd')
-            self.q['J'] = numpy.zeros(
-                (self.mesh.nElements_global,
-                 self.nQuadraturePoints_element,
-                 self.nSpace_global,
-                 self.nSpace_global),
-                'd')
-            self.q['det(J)'] = numpy.zeros(
-                (self.mesh.nElements_global,
-                 self.nQuadraturePoints_element),
-                'd')
-            self.q['inverse(J)'] = numpy.zeros(
-                (self.mesh.nElements_global,
-                 self.nQuadraturePoints_element,
-                 self.nSpace_global,
-                 self.nSpace_global),
-                'd')
+            geometry = self.elementGeometryCache.getElementQuadrature(self.u[0].femSpace.elementMaps,
+                                                                      self.elementQuadraturePoints,
+                                                                      jacobians=True)
+            self.q['J'] = geometry['J']
+            self.q['det(J)'] = geometry['det(J)']
+            self.q['inverse(J)'] = geometry['inverse(J)']
             self.ebq[('v', 0)] = numpy.zeros(
                 (self.mesh.nElements_global,
                  self.mesh.nElementBoundaries_element,
@@ -1200,27 +1245,13 @@ class LevelModel(proteus.Transport.OneLevelTransport):
                  self.nElementBoundaryQuadraturePoints_elementBoundary),
                 'd')
             self.ebqe[('dS_u', 0)] = self.ebqe['dS']
-            self.ebqe['n'] = numpy.zeros(
-                (self.mesh.nExteriorElementBoundaries_global,
-                 self.nElementBoundaryQuadraturePoints_elementBoundary,
-                 self.nSpace_global),
-                'd')
-            self.ebqe['inverse(J)'] = numpy.zeros(
-                (self.mesh.nExteriorElementBoundaries_global,
-                 self.nElementBoundaryQuadraturePoints_elementBoundary,
-                 self.nSpace_global,
-                 self.nSpace_global),
-                'd')
-            self.ebqe['g'] = numpy.zeros(
-                (self.mesh.nExteriorElementBoundaries_global,
-                 self.nElementBoundaryQuadraturePoints_elementBoundary,
-                 self.nSpace_global - 1,
-                 self.nSpace_global - 1),
-                'd')
-            self.ebqe['sqrt(det(g))'] = numpy.zeros(
-                (self.mesh.nExteriorElementBoundaries_global,
-                 self.nElementBoundaryQuadraturePoints_elementBoundary),
-                'd')
+            geometry = self.elementGeometryCache.getExteriorElementBoundaryQuadrature(self.u[0].femSpace.elementMaps,
+                                                                                      self.elementBoundaryQuadraturePoints,
+                                                                                      jacobians=True)
+            self.ebqe['n'] = geometry['n']
+            self.ebqe['inverse(J)'] = geometry['inverse(J)']
+            self.ebqe['g'] = geometry['g']
+            self.ebqe['sqrt(det(g))'] = geometry['sqrt(det(g))']
             self.ebq_global['n'] = numpy.zeros(
                 (self.mesh.nElementBoundaries_global,
                  self.nElementBoundaryQuadraturePoints_elementBoundary,
@@ -1490,14 +1521,10 @@ class LevelModel(proteus.Transport.OneLevelTransport):
         self.coefficients.particle_surfaceArea[:] = 0.0
         if self.forceStrongConditions:
             for cj in range(len(self.dirichletConditionsForceDOF)):
-                for dofN, g in list(self.dirichletConditionsForceDOF[cj].DOFBoundaryConditionsDict.items()):
-                    if cj == 0:
-                        self.u[cj].dof[dofN] = g(self.dirichletConditionsForceDOF[cj].DOFBoundaryPointDict[dofN], self.timeIntegration.t)
-                    else:
-                        self.u[cj].dof[dofN] = g(self.dirichletConditionsForceDOF[cj].DOFBoundaryPointDict[dofN],
-                                                 self.timeIntegration.t)
-                        if self.MOVING_DOMAIN == 1.0:
-                            self.u[cj].dof[dofN] += self.mesh.nodeVelocityArray[dofN, cj - 1]
+                dofs, values = self.getDirichletValues(self.dirichletConditionsForceDOF[cj], self.timeIntegration.t)
+                self.u[cj].dof[dofs] = values
+                if cj > 0 and self.MOVING_DOMAIN == 1.0:
+                    self.u[cj].dof[dofs] += self.mesh.nodeVelocityArray[dofs, cj - 1]
         self.rans2p.calculateResidual(self.coefficients.NONCONSERVATIVE_FORM,
                                       self.coefficients.MOMENTUM_SGE,
                                       self.coefficients.PRESSURE_SGE,
@@ -1729,15 +1756,10 @@ class LevelModel(proteus.Transport.OneLevelTransport):
 
         if self.forceStrongConditions:
             for cj in range(len(self.dirichletConditionsForceDOF)):
-                for dofN, g in list(self.dirichletConditionsForceDOF[cj].DOFBoundaryConditionsDict.items()):
-                    if cj == 0:
-                        r[self.offset[cj] + self.stride[cj] * dofN] = self.u[cj].dof[dofN] - \
-                            g(self.dirichletConditionsForceDOF[cj].DOFBoundaryPointDict[dofN], self.timeIntegration.t)
-                    else:
-                        r[self.offset[cj] + self.stride[cj] * dofN] = self.u[cj].dof[dofN] - \
-                            g(self.dirichletConditionsForceDOF[cj].DOFBoundaryPointDict[dofN], self.timeIntegration.t) 
-                        if self.MOVING_DOMAIN == 1.0:
-                            r[self.offset[cj] + self.stride[cj] * dofN] -= self.mesh.nodeVelocityArray[dofN, cj - 1]
+                dofs, values = self.getDirichletValues(self.dirichletConditionsForceDOF[cj], self.timeIntegration.t)
+                r[self.offset[cj] + self.stride[cj] * dofs] = self.u[cj].dof[dofs] - values
+                if cj > 0 and self.MOVING_DOMAIN == 1.0:
+                    r[self.offset[cj] + self.stride[cj] * dofs] -= self.mesh.nodeVelocityArray[dofs, cj - 1]
 
         cflMax = globalMax(self.q[('cfl', 0)].max()) * self.timeIntegration.dt
         logEvent("Maximum CFL = " + str(cflMax), level=2)
@@ -2009,12 +2031,13 @@ class LevelModel(proteus.Transport.OneLevelTransport):
         This function should be called only when the mesh changes.
         """
         if self.postProcessing:
-            self.u[0].femSpace.elementMaps.getValues(self.elementQuadraturePoints,
-                                                     self.q['x'])
-            self.u[0].femSpace.elementMaps.getJacobianValues(self.elementQuadraturePoints,
-                                                             self.q['J'],
-                                                             self.q['inverse(J)'],
-                                                             self.q['det(J)'])
+            geometry = self.elementGeometryCache.getElementQuadrature(self.u[0].femSpace.elementMaps,
+                                                                      self.elementQuadraturePoints,
+                                                                      jacobians=True)
+            self.q['x'] = geometry['x']
+            self.q['J'] = geometry['J']
+            self.q['inverse(J)'] = geometry['inverse(J)']
+            self.q['det(J)'] = geometry['det(J)']
             self.u[0].femSpace.getBasisValues(self.elementQuadraturePoints, self.q[('v', 0)])
         self.u[0].femSpace.elementMaps.getBasisValuesRef(self.elementQuadraturePoints)
         self.u[0].femSpace.elementMaps.getBasisGradientValuesRef(self.elementQuadraturePoints)
@@ -2073,13 +2096,14 @@ class LevelModel(proteus.Transport.OneLevelTransport):
         """
         logEvent("initalizing ebqe vectors for post-procesing velocity")
         if self.postProcessing:
-            self.u[0].femSpace.elementMaps.getValuesGlobalExteriorTrace(self.elementBoundaryQuadraturePoints,
-                                                                        self.ebqe['x'])
-            self.u[0].femSpace.elementMaps.getJacobianValuesGlobalExteriorTrace(self.elementBoundaryQuadraturePoints,
-                                                                                self.ebqe['inverse(J)'],
-                                                                                self.ebqe['g'],
-                                                                                self.ebqe['sqrt(det(g))'],
-                                                                                self.ebqe['n'])
+            geometry = self.elementGeometryCache.getExteriorElementBoundaryQuadrature(self.u[0].femSpace.elementMaps,
+                                                                                      self.elementBoundaryQuadraturePoints,
+                                                                                      jacobians=True)
+            self.ebqe['x'] = geometry['x']
+            self.ebqe['inverse(J)'] = geometry['inverse(J)']
+            self.ebqe['g'] = geometry['g']
+            self.ebqe['sqrt(det(g))'] = geometry['sqrt(det(g))']
+            self.ebqe['n'] = geometry['n']
             cfemIntegrals.calculateIntegrationWeights(self.ebqe['sqrt(det(g))'],
                                                       self.elementBoundaryQuadratureWeights[('u', 0)],
                                                       self.ebqe[('dS_u', 0)])
@@ -2094,8 +2118,7 @@ class LevelModel(proteus.Transport.OneLevelTransport):
         self.u[0].femSpace.getBasisGradientValuesTraceRef(self.elementBoundaryQuadraturePoints)
         self.u[1].femSpace.getBasisValuesTraceRef(self.elementBoundaryQuadraturePoints)
         self.u[1].femSpace.getBasisGradientValuesTraceRef(self.elementBoundaryQuadraturePoints)
-        self.u[0].femSpace.elementMaps.getValuesGlobalExteriorTrace(self.elementBoundaryQuadraturePoints,
-                                                                    self.ebqe['x'])
+        self.ebqe['x'] = self.elementGeometryCache.getExteriorElementBoundaryQuadrature(self.u[0].femSpace.elementMaps, self.elementBoundaryQuadraturePoints)['x']
         logEvent("setting flux boundary conditions")
         if not domainMoved:
             self.fluxBoundaryConditionsObjectsDict = dict([(cj, FluxBoundaryConditions(self.mesh,
@@ -1093,8 +1093,8 @@ class LevelModel(proteus.mprans.RANS2P.LevelModel):
 
         if self.forceStrongConditions:
             for cj in range(len(self.dirichletConditionsForceDOF)):
-                for dofN, g in list(self.dirichletConditionsForceDOF[cj].DOFBoundaryConditionsDict.items()):
-                    self.u[cj].dof[dofN] = g(self.dirichletConditionsForceDOF[cj].DOFBoundaryPointDict[dofN], self.timeIntegration.t)
+                dofs, values = self.getDirichletValues(self.dirichletConditionsForceDOF[cj], self.timeIntegration.t)
+                self.u[cj].dof[dofs] = values
         self.r = r
         # self.beamStep()
         # self.coefficients.beamDrag=np.array([0.0,0.0,0.0])
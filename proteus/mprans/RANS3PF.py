@@ -2230,10 +2230,8 @@ class LevelModel(proteus.Transport.OneLevelTransport):
 
         if self.forceStrongConditions and self.firstStep == False:
             for cj in range(len(self.dirichletConditionsForceDOF)):
-                for dofN, g in list(self.dirichletConditionsForceDOF[
-                        cj].DOFBoundaryConditionsDict.items()):
-                    self.u[cj].dof[dofN] = g(self.dirichletConditionsForceDOF[cj].DOFBoundaryPointDict[
-                        dofN], self.timeIntegration.t)  # + self.MOVING_DOMAIN * self.mesh.nodeVelocityArray[dofN, cj - 1]
+                dofs, values = self.getDirichletValues(self.dirichletConditionsForceDOF[cj], self.timeIntegration.t)
+                self.u[cj].dof[dofs] = values  # + self.MOVING_DOMAIN * self.mesh.nodeVelocityArray[dofs, cj - 1]
 
         if self.coefficients.set_vos:
             self.coefficients.set_vos(self.q['x'], self.coefficients.q_vos)
@@ -2577,9 +2575,8 @@ class LevelModel(proteus.Transport.OneLevelTransport):
 
         if self.forceStrongConditions:
             for cj in range(len(self.dirichletConditionsForceDOF)):
-                for dofN, g in list(self.dirichletConditionsForceDOF[cj].DOFBoundaryConditionsDict.items()):
-                    r[self.offset[cj] + self.stride[cj] * dofN] = self.u[cj].dof[dofN] - g(self.dirichletConditionsForceDOF[cj].DOFBoundaryPointDict[
-                        dofN], self.timeIntegration.t)  # - self.MOVING_DOMAIN * self.mesh.nodeVelocityArray[dofN, cj - 1]
+                dofs, values = self.getDirichletValues(self.dirichletConditionsForceDOF[cj], self.timeIntegration.t)
+                r[self.offset[cj] + self.stride[cj] * dofs] = self.u[cj].dof[dofs] - values  # - self.MOVING_DOMAIN * self.mesh.nodeVelocityArray[dofs, cj - 1]
 
         cflMax = globalMax(self.q[('cfl', 0)].max()) * self.timeIntegration.dt
         log("Maximum CFL = " + str(cflMax), level=2)
@@ -2035,7 +2035,7 @@ class TankWithObstacles2D(Tank2D):
                                                            smoothing=smoothing)
 
 
-def assembleDomain(domain):
+def assembleDomain(domain, vectorizedRelaxationZones=False):
     """
     This function sets up everything needed for the domain, meshing, and
     AuxiliaryVariables calculations (if any).
@@ -2047,15 +2047,18 @@ def assembleDomain(domain):
     domain: proteus.Domain.D_base
         Domain class instance that hold all the geometrical informations and
         boundary conditions of the shape.
+    vectorizedRelaxationZones: Optional[bool]
+        evaluate relaxation zones with batched wave kinematics
     """
     _assembleGeometry(domain, BC_class=bc.BC_RANS)
     domain.BCbyFlag[0].setNonMaterial()  # set BC for boundary between processors
-    assembleAuxiliaryVariables(domain)
+    assembleAuxiliaryVariables(domain,
+                               vectorizedRelaxationZones=vectorizedRelaxationZones)
     if(domain.name != "PUMIDomain"):
         _generateMesh(domain)
 
 
-def assembleAuxiliaryVariables(domain):
+def assembleAuxiliaryVariables(domain, vectorizedRelaxationZones=False):
     """
     Adds the auxiliary variables to the domain.
 
@@ -2064,6 +2067,8 @@ def assembleAuxiliaryVariables(domain):
     domain: proteus.Domain.D_base
         Domain class instance that hold all the geometrical informations and
         boundary conditions of the shape.
+    vectorizedRelaxationZones: Optional[bool]
+        evaluate relaxation zones with batched wave kinematics
 
     Notes
     -----
@@ -2125,7 +2130,8 @@ def assembleAuxiliaryVariables(domain):
         if 'RelaxZones' in list(shape.auxiliaryVariables.keys()):
             if not zones_global:
                 aux['twp'] += [bc.RelaxationZoneWaveGenerator(zones_global,
-                                                              domain.nd)]
+                                                              domain.nd,
+                                                              vectorized=vectorizedRelaxationZones)]
             if not hasattr(domain, 'porosityTypes'):
                 # create arrays of default values
                 domain.porosityTypes = np.ones(len(domain.regionFlags) + 1)
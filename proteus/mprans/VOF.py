@@ -13,7 +13,8 @@ from proteus import cfemIntegrals, Quadrature, Norms, Comm
 from proteus.NonlinearSolvers import NonlinearEquation
 from proteus.FemTools import (DOFBoundaryConditions,
                               FluxBoundaryConditions,
-                              C0_AffineLinearOnSimplexWithNodalBasis)
+                              C0_AffineLinearOnSimplexWithNodalBasis,
+                              getElementGeometryCache)
 from proteus.Comm import globalMax
 from proteus.Profiling import memory
 from proteus.Profiling import logEvent
@@ -759,8 +760,10 @@ class LevelModel(proteus.Transport.OneLevelTransport):
         self.phi_ip = {}
         self.edge_based_cfl = np.zeros(self.u[0].dof.shape)
         # mesh
-        self.q['x'] = np.zeros((self.mesh.nElements_global, self.nQuadraturePoints_element, 3), 'd')
-        self.ebqe['x'] = np.zeros((self.mesh.nExteriorElementBoundaries_global, self.nElementBoundaryQuadraturePoints_elementBoundary, 3), 'd')
+        # the quadrature point geometry is shared by the models on the mesh
+        self.elementGeometryCache = getElementGeometryCache(self.mesh)
+        self.q['x'] = self.elementGeometryCache.getElementQuadrature(self.u[0].femSpace.elementMaps, self.elementQuadraturePoints)['x']
+        self.ebqe['x'] = self.elementGeometryCache.getExteriorElementBoundaryQuadrature(self.u[0].femSpace.elementMaps, self.elementBoundaryQuadraturePoints)['x']
         self.q[('u', 0)] = np.zeros((self.mesh.nElements_global, self.nQuadraturePoints_element), 'd')
         self.q[('dV_u', 0)] = (old_div(1.0, self.mesh.nElements_global)) * np.ones((self.mesh.nElements_global, self.nQuadraturePoints_element), 'd')
         self.q[('grad(u)', 0)] = np.zeros((self.mesh.nElements_global, self.nQuadraturePoints_element, self.nSpace_global), 'd')
@@ -1025,24 +1028,13 @@ class LevelModel(proteus.Transport.OneLevelTransport):
 
     def getMassMatrix(self):
         # JACOBIANS (FOR ELEMENT TRANSFORMATION)
-        self.q[('J')] = np.zeros((self.mesh.nElements_global,
-                                  self.nQuadraturePoints_element,
-                                  self.nSpace_global,
-                                  self.nSpace_global),
-                                 'd')
-        self.q[('inverse(J)')] = np.zeros((self.mesh.nElements_global,
-                                           self.nQuadraturePoints_element,
-                                           self.nSpace_global,
-                                           self.nSpace_global),
-                                          'd')
-        self.q[('det(J)')] = np.zeros((self.mesh.nElements_global,
-                                       self.nQuadraturePoints_element),
-                                      'd')
-        self.u[0].femSpace.elementMaps.getJacobianValues(self.elementQuadraturePoints,
-                                                         self.q['J'],
-                                                         self.q['inverse(J)'],
-                                                         self.q['det(J)'])
-        self.q['abs(det(J))'] = np.abs(self.q['det(J)'])
+        geometry = self.elementGeometryCache.getElementQuadrature(self.u[0].femSpace.elementMaps,
+                                                                  self.elementQuadraturePoints,
+                                                                  jacobians=True)
+        self.q['J'] = geometry['J']
+        self.q['inverse(J)'] = geometry['inverse(J)']
+        self.q['det(J)'] = geometry['det(J)']
+        self.q['abs(det(J))'] = geometry['abs(det(J))']
         # SHAPE FUNCTIONS
         self.q[('w',0)] = np.zeros((self.mesh.nElements_global,
                                     self.nQuadraturePoints_element,
@@ -1138,8 +1130,8 @@ class LevelModel(proteus.Transport.OneLevelTransport):
             self.ebqe[('advectiveFlux_bc_flag', 0)][t[0], t[1]] = 1
 
         if self.forceStrongConditions:
-            for dofN, g in list(self.dirichletConditionsForceDOF.DOFBoundaryConditionsDict.items()):
-                self.u[0].dof[dofN] = g(self.dirichletConditionsForceDOF.DOFBoundaryPointDict[dofN], self.timeIntegration.t)
+            dofs, values = self.getDirichletValues(self.dirichletConditionsForceDOF, self.timeIntegration.t)
+            self.u[0].dof[dofs] = values
 
         if (self.stage==2 and self.auxTaylorGalerkinFlag==1):
             self.uTilde_dof[:] = self.u[0].dof
@@ -1351,8 +1343,7 @@ class LevelModel(proteus.Transport.OneLevelTransport):
 
         This function should be called only when the mesh changes.
         """
-        self.u[0].femSpace.elementMaps.getValues(self.elementQuadraturePoints,
-                                                 self.q['x'])
+        self.q['x'] = self.elementGeometryCache.getElementQuadrature(self.u[0].femSpace.elementMaps, self.elementQuadraturePoints)['x']
         self.u[0].femSpace.elementMaps.getBasisValuesRef(
             self.elementQuadraturePoints)
         self.u[0].femSpace.elementMaps.getBasisGradientValuesRef(
@@ -1391,8 +1382,7 @@ class LevelModel(proteus.Transport.OneLevelTransport):
             self.elementBoundaryQuadraturePoints)
         self.u[0].femSpace.getBasisGradientValuesTraceRef(
             self.elementBoundaryQuadraturePoints)
-        self.u[0].femSpace.elementMaps.getValuesGlobalExteriorTrace(
-            self.elementBoundaryQuadraturePoints, self.ebqe['x'])
+        self.ebqe['x'] = self.elementGeometryCache.getExteriorElementBoundaryQuadrature(self.u[0].femSpace.elementMaps, self.elementBoundaryQuadraturePoints)['x']
         self.fluxBoundaryConditionsObjectsDict = dict([(cj, FluxBoundaryConditions(self.mesh,
                                           self.nElementBoundaryQuadraturePoints_elementBoundary,
                                           self.ebqe[('x')],
@@ -41,4 +41,5 @@ __all__ = ["RANS2PV2",
            "PresInc",
            "AddedMass",
            "BoundaryConditions",
-           "SpatialTools"]
+           "SpatialTools",
+           "ParticleShapes"]
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+"""
+Test module for the constrained DOFs and reflecting walls of the SWFlow models
+"""
+from types import SimpleNamespace
+import pytest
+import numpy as np
+import numpy.testing as npt
+from proteus import Comm, Profiling
+from proteus.mprans import SW2DCV, GN_SW2DCV
+
+comm = Comm.init()
+Profiling.procID = comm.rank()
+
+Profiling.logEvent("Testing SWFlow constrained DOFs")
+
+# DOFs of a 3x3 grid on [0,1]x[0,1], ordered row by row
+dofsXCoord = np.tile([0.0, 0.5, 1.0], 3)
+dofsYCoord = np.repeat([0.0, 0.5, 1.0], 3)
+
+def constrainedIndices(x, y):
+    # the DOFs on the left wall and the bottom right corner
+    return [i for i in range(x.size) if x[i] == 0.0 or (x[i] == 1.0 and y[i] == 0.0)]
+
+def constrainedValues(x, y, t, h, hu, *other):
+    # h is set below the top row, hu everywhere and the rest is left unchanged
+    hNew = None if y > 0.75 else 1.0 + x + t
+    return (hNew, hu + y) + (None,)*len(other)
+
+class ArrayConstrainedValues(object):
+    def __call__(self, x, y, t, h, hu, *other):
+        raise AssertionError("values_array should be used instead")
+
+    def values_array(self, x, y, t, h, hu, *other):
+        hNew = np.ma.masked_where(y > 0.75, 1.0 + x + t*np.ones_like(x))
+        return (hNew, hu + y) + (None,)*len(other)
+
+def makeModel(nc, constrainedDOFs):
+    return SimpleNamespace(constrainedDOFsIndices=None,
+                           coefficients=SimpleNamespace(constrainedDOFs=[constrainedIndices,
+                                                                         constrainedDOFs]),
+                           dofsXCoord=dofsXCoord,
+                           dofsYCoord=dofsYCoord,
+                           timeIntegration=SimpleNamespace(t=0.25),
+                           u=[SimpleNamespace(dof=np.linspace(cj, cj + 1.0, dofsXCoord.size))
+                              for cj in range(nc)])
+
+def referenceReflectingBoundaryConditions(model):
+    # the per DOF loop the array operations replaced
+    for index in model.boundaryIndex:
+        vx = model.u[1].dof[index]
+        vy = model.u[2].dof[index]
+        vt = vx * model.normaly[index] - vy * model.normalx[index]
+        model.u[1].dof[index] = vt * model.normaly[index]
+        model.u[2].dof[index] = -vt * model.normalx[index]
+
+@pytest.mark.parametrize("LevelModel, nc", [(SW2DCV.LevelModel, 3),
+                                            (GN_SW2DCV.LevelModel, 5)])
+def test_constrained_dofs(LevelModel, nc):
+    reference = makeModel(nc, constrainedValues)
+    LevelModel.updateConstrainedDOFs(reference)
+    model = makeModel(nc, ArrayConstrainedValues())
+    LevelModel.updateConstrainedDOFs(model)
+    npt.assert_equal(model.constrainedDOFsIndices, [0, 2, 3, 6])
+    for cj in range(nc):
+        npt.assert_allclose(model.u[cj].dof, reference.u[cj].dof, rtol=1e-15)
+    unchanged = makeModel(nc, constrainedValues)
+    # the masked entry at the top left keeps its depth
+    assert model.u[0].dof[6] == unchanged.u[0].dof[6]
+    npt.assert_allclose(model.u[0].dof[[0, 2, 3]], [1.25, 2.25, 1.25])
+    npt.assert_allclose(model.u[1].dof[[0, 2, 3, 6]] - unchanged.u[1].dof[[0, 2, 3, 6]],
+                        [0.0, 0.0, 0.5, 1.0])
+    for cj in range(2, nc):
+        npt.assert_equal(model.u[cj].dof, unchanged.u[cj].dof)
+    # the free DOFs are not touched
+    free = [1, 4, 5, 7, 8]
+    for cj in range(nc):
+        npt.assert_equal(model.u[cj].dof[free], unchanged.u[cj].dof[free])
+
+@pytest.mark.parametrize("LevelModel, nc", [(SW2DCV.LevelModel, 3),
+                                            (GN_SW2DCV.LevelModel, 5)])
+def test_reflecting_boundary_conditions(LevelModel, nc):
+    def makeWallModel():
+        model = makeModel(nc, None)
+        model.normalx = np.zeros(dofsXCoord.size)
+        model.normaly = np.zeros(dofsXCoord.size)
+        # the left and bottom walls, with the averaged normal at their corner
+        model.normalx[dofsXCoord == 0.0] = -1.0
+        model.normaly[dofsYCoord == 0.0] = -1.0
+        model.normalx[0] = model.normaly[0] = -np.sqrt(0.5)
+        model.boundaryIndex = np.where(np.logical_or(model.normalx != 0,
+                                                     model.normaly != 0))[0]
+        return model
+    reference = makeWallModel()
+    referenceReflectingBoundaryConditions(reference)
+    model = makeWallModel()
+    LevelModel.updateReflectingBoundaryConditions(model)
+    assert model.forceStrongConditions == False
+    for cj in range(nc):
+        npt.assert_allclose(model.u[cj].dof, reference.u[cj].dof, rtol=1e-15)
+    # the normal component is removed at the walls only
+    index = model.boundaryIndex
+    npt.assert_allclose(model.u[1].dof[index]*model.normalx[index] +
+                        model.u[2].dof[index]*model.normaly[index], 0.0, atol=1e-14)
+    interior = [4, 5, 7, 8]
+    unchanged = makeWallModel()
+    for cj in range(nc):
+        npt.assert_equal(model.u[cj].dof[interior], unchanged.u[cj].dof[interior])
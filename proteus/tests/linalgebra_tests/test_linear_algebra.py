@@ -350,6 +350,180 @@ def test_petsc_load_vec(tmpdir):
     A_test = LAT.petsc_load_vector('dne.txt')
     assert A_test is None
 
+@pytest.mark.LinearAlgebraTools
+def test_block_component_sparsity():
+    """test_block_component_sparsity
+
+    Verifies that the component pattern of a blocked pattern is that of
+    the scalar matrix the blocks were built from.
+    """
+    from proteus.LinearAlgebraTools import blockComponentSparsity
+    rowptr = np.array([0, 2, 5, 7], 'i')
+    colind = np.array([0, 1, 0, 1, 2, 1, 2], 'i')
+    blockSize = 3
+    rowptr_b = [0]
+    colind_b = []
+    for i in range(3):
+        for k in range(blockSize):
+            for j in colind[rowptr[i]:rowptr[i+1]]:
+                colind_b.extend(blockSize*j + np.arange(blockSize))
+            rowptr_b.append(len(colind_b))
+    rowptr_c, colind_c = blockComponentSparsity(np.array(rowptr_b, 'i'),
+                                                np.array(colind_b, 'i'),
+                                                blockSize)
+    npt.assert_equal(rowptr_c, rowptr)
+    npt.assert_equal(colind_c, colind)
+
+@pytest.mark.LinearAlgebraTools
+def test_sparsity_signature():
+    """test_sparsity_signature
+
+    Verifies that the signature of a CSR pattern does not depend on the
+    arrays holding it and changes with the sizes and sampled entries.
+    """
+    from proteus.LinearAlgebraTools import sparsitySignature
+    rowptr = np.arange(0, 3001, 3, dtype='i')
+    colind = (np.arange(3000, dtype='i')*7) % 1000
+    signature = sparsitySignature(rowptr, colind, nSamples=100)
+    assert sparsitySignature(rowptr.copy(), colind.copy(), nSamples=100) == signature
+    assert sparsitySignature(rowptr[:-1], colind[:-3], nSamples=100) != signature
+    changed = colind.copy()
+    changed[30] += 1
+    assert sparsitySignature(rowptr, changed, nSamples=100) != signature
+
+@pytest.mark.LinearAlgebraTools
+def test_petsc_nonzero_ordering():
+    """test_petsc_nonzero_ordering
+
+    Verifies the PETSc ordering of a CSR pattern against the permuted
+    dense matrix and checks the nonzero permutations.
+    """
+    from proteus.LinearAlgebraTools import petscNonzeroOrdering
+    rowptr = np.array([0, 2, 5, 8, 10], 'i')
+    colind = np.array([0, 1, 0, 1, 3, 1, 2, 3, 0, 3], 'i')
+    nzval = np.arange(1., colind.shape[0]+1)
+    proteus2petsc = np.array([2, 0, 3, 1], 'i')
+    petsc2proteus = proteus2petsc.argsort().astype('i')
+    (rowptr_petsc, colind_petsc,
+     nzval_proteus2petsc, nzval_petsc2proteus) = petscNonzeroOrdering(rowptr, colind, proteus2petsc, petsc2proteus)
+    A = np.zeros((4, 4))
+    for i in range(4):
+        A[i, colind[rowptr[i]:rowptr[i+1]]] = nzval[rowptr[i]:rowptr[i+1]]
+    A_petsc = np.zeros((4, 4))
+    nzval_petsc = nzval[nzval_petsc2proteus]
+    for i in range(4):
+        cols = colind_petsc[rowptr_petsc[i]:rowptr_petsc[i+1]]
+        assert (np.diff(cols) > 0).all()
+        A_petsc[i, cols] = nzval_petsc[rowptr_petsc[i]:rowptr_petsc[i+1]]
+    npt.assert_equal(A_petsc, A[np.ix_(petsc2proteus, petsc2proteus)])
+    npt.assert_equal(nzval_petsc[nzval_proteus2petsc], nzval)
+
+@pytest.mark.LinearAlgebraTools
+def test_petsc_ordering_cache():
+    """test_petsc_ordering_cache
+
+    Verifies that the PETSc orderings are cached on the CSR arrays of the
+    matrix without copying them and found again for an equal pattern.
+    """
+    from proteus.LinearAlgebraTools import ParInfo_petsc4py
+    rowptr = np.array([0, 2, 5, 8, 10], 'i')
+    colind = np.array([0, 1, 0, 1, 3, 1, 2, 3, 0, 3], 'i')
+    par_info = ParInfo_petsc4py()
+    par_info.proteus2petsc_subdomain = np.array([2, 0, 3, 1], 'i')
+    par_info.petsc2proteus_subdomain = par_info.proteus2petsc_subdomain.argsort().astype('i')
+    ordering = par_info.getPetscOrdering(rowptr, colind)
+    assert par_info.petscOrderings[0][0] is rowptr
+    assert par_info.petscOrderings[0][1] is colind
+    assert par_info.getPetscOrdering(rowptr, colind) is ordering
+    assert par_info.getPetscOrdering(rowptr.copy(), colind.copy()) is ordering
+    colind_other = colind.copy()
+    colind_other[1] = 2
+    other = par_info.getPetscOrdering(rowptr, colind_other)
+    assert other is not ordering
+    assert len(par_info.petscOrderings) == 2
+
+def test_block_sparsity_pattern():
+    """test_block_sparsity_pattern
+
+    Verifies the block CSR pattern of an interlaced two component
+    pattern with partially filled blocks.
+    """
+    from proteus.LinearAlgebraTools import blockSparsityPattern
+    rowptr = np.array([0, 2, 3, 5, 7, 8, 9], 'i')
+    colind = np.array([0, 5, 1, 2, 3, 0, 3, 4, 5], 'i')
+    rowptr_block, colind_block = blockSparsityPattern(rowptr, colind, 2)
+    npt.assert_equal(rowptr_block, [0, 2, 4, 5])
+    npt.assert_equal(colind_block, [0, 2, 0, 1, 2])
+
+class InterlacedCSRMat(object):
+    """ CSR matrix standing in for a serial proteus Jacobian """
+
+    def __init__(self, A):
+        rows, cols = np.nonzero(A)
+        self.rowptr = np.zeros((A.shape[0]+1,), 'i')
+        self.rowptr[1:] = np.cumsum(np.bincount(rows, minlength=A.shape[0]))
+        self.colind = cols.astype('i')
+        self.nzval = A[rows, cols].astype('d')
+
+    def getCSRrepresentation(self):
+        return self.rowptr, self.colind, self.nzval
+
+    def getSubMatCSRrepresentation(self, start, end):
+        begin = self.rowptr[start]
+        return (self.rowptr[start:end+1] - begin,
+                self.colind[begin:self.rowptr[end]],
+                self.nzval[begin:self.rowptr[end]])
+
+def interlacedSystem():
+    """ Two component system on a path of 4 nodes with partially filled blocks """
+    np.random.seed(0)
+    nodeGraph = np.eye(4) + np.eye(4, k=1) + np.eye(4, k=-1)
+    A = np.kron(nodeGraph, np.ones((2, 2)))*np.random.random((8, 8))
+    A[0, 3] = A[5, 2] = 0.0
+    A += 10.0*np.eye(8)
+    return A
+
+def test_block_storage():
+    """test_block_storage
+
+    Verifies that an interlaced two component system assembled with
+    blockVecType='block' (BAIJ) equals the 'simple' (AIJ) assembly, and
+    that the field split of the blocked operator by components selects
+    the same velocity and pressure rows as the index sets.
+    """
+    from types import SimpleNamespace
+    from petsc4py import PETSc
+    from proteus.LinearAlgebraTools import ParMat_petsc4py
+    from proteus.LinearSolvers import ModelInfo, SchurPrecon
+    A = interlacedSystem()
+    csr = InterlacedCSRMat(A)
+    rowptr, colind, nzval = csr.getCSRrepresentation()
+    dense = {}
+    subMatrices = {}
+    for blockVecType in ['block', 'simple']:
+        M = ParMat_petsc4py(csr, 2, 4, 4, 0, np.arange(4, dtype='i'),
+                            blockVecType=blockVecType)
+        M.setValuesLocalCSR(rowptr, colind, nzval, PETSc.InsertMode.INSERT_VALUES)
+        M.assemblyBegin()
+        M.assemblyEnd()
+        eq(M.getBlockSize(), 2 if blockVecType == 'block' else 1)
+        dense[blockVecType] = M.getValues(list(range(8)), list(range(8)))
+        precon = SimpleNamespace(L=M, model_info=ModelInfo('interlaced', 2),
+                                 pc=PETSc.PC().create())
+        precon.pc.setType('fieldsplit')
+        precon.pc.setOperators(M, M)
+        SchurPrecon._initializeIS(precon)
+        npt.assert_equal(precon.isv.getIndices(), [1, 3, 5, 7])
+        npt.assert_equal(precon.isp.getIndices(), [0, 2, 4, 6])
+        precon.pc.setUp()
+        subMatrices[blockVecType] = [ksp.getOperators()[0].getValues(list(range(4)), list(range(4)))
+                                     for ksp in precon.pc.getFieldSplitSubKSP()]
+    npt.assert_almost_equal(dense['block'], A)
+    npt.assert_almost_equal(dense['simple'], A)
+    for velocity, pressure in subMatrices.values():
+        npt.assert_almost_equal(velocity, A[1::2, 1::2])
+        npt.assert_almost_equal(pressure, A[0::2, 0::2])
+
 if __name__ == '__main__':
     import nose
     nose.main()
@@ -307,6 +307,116 @@ class TestInterpolatedBathy(object):
         mesh.meshList[-1].writeMeshADH("interpolatedBathySimpleTest_grid_Linfty_interp_")
         self.aux_names.append(outfile)
 
+    def checkLocatedPoints(self,bathyMesh,mesh):
+        import numpy as np
+        bathy = bathyMesh.domain.bathy
+        #reference loop over the points and all the elements
+        nContaining = np.zeros((bathy.shape[0],),'i')
+        nPoints_element = np.zeros((mesh.nElements_global,),'i')
+        nodeSupport = np.zeros((mesh.nNodes_global,),'d')
+        for pN in range(bathy.shape[0]):
+            containing = {}
+            for eN in range(mesh.nElements_global):
+                nodes = mesh.nodeArray[mesh.elementNodesArray[eN],:2]
+                jacobian = np.column_stack((nodes[1]-nodes[0],nodes[2]-nodes[0]))
+                xi = np.linalg.solve(jacobian,bathy[pN,:2]-nodes[0])
+                weights = np.array([1.0-xi[0]-xi[1],xi[0],xi[1]])
+                if weights.min() >= -1.0e-12:
+                    containing[eN] = weights
+            nContaining[pN] = len(containing)
+            eN = bathyMesh.pointElementsArray[pN]
+            if containing:
+                assert eN in containing
+                np.testing.assert_allclose(bathyMesh.pointNodeWeightsArray[pN],containing[eN],atol=1.0e-12)
+                nPoints_element[eN] += 1
+            else:
+                assert eN == -1
+        #there are points on edges, inside single elements and outside the domain
+        assert (nContaining > 1).any() and (nContaining == 1).any() and (nContaining == 0).any()
+        np.testing.assert_equal(mesh.nPoints_element,nPoints_element)
+        for eN in range(mesh.nElements_global):
+            nodes = mesh.nodeArray[mesh.elementNodesArray[eN],:2]
+            area = 0.5*np.linalg.det(np.column_stack((nodes[1]-nodes[0],nodes[2]-nodes[0])))
+            assert abs(mesh.area_element[eN] - area) < 1.0e-12
+            if nPoints_element[eN] > 0:
+                nodeSupport[mesh.elementNodesArray[eN]] += area
+        np.testing.assert_allclose(mesh.nodeSupportArray,nodeSupport,atol=1.0e-12)
+
+    def test_locate_points(self):
+        import numpy as np
+        from types import SimpleNamespace
+        from proteus.MeshTools import MultilevelTriangularMesh
+        mlMesh = MultilevelTriangularMesh(3,3,1,refinementLevels=2)
+        #a point grid finer than the meshes that extends past the unit square
+        x = np.arange(-0.25,1.3,0.125)
+        X,Y = np.meshgrid(x,x)
+        bathy = np.column_stack((X.flat,Y.flat,(X + 2.0*Y).flat))
+        bathyMesh = InterpolatedBathymetryMesh.__new__(InterpolatedBathymetryMesh)
+        bathyMesh.domain = SimpleNamespace(bathy=bathy)
+        bathyMesh.nPoints_global = bathy.shape[0]
+        bathyMesh.pointElementsArray_old = -np.ones((bathyMesh.nPoints_global,),'i')
+        bathyMesh.pointElementsArray = -np.ones((bathyMesh.nPoints_global,),'i')
+        bathyMesh.pointNodeWeightsArray = np.zeros((bathyMesh.nPoints_global,3),'d')
+        bathyMesh.elementChildrenArrayList = mlMesh.elementChildrenArrayList
+        bathyMesh.elementChildrenOffsetsList = mlMesh.elementChildrenOffsetsList
+        bathyMesh.elementParentsArrayList = mlMesh.elementParentsArrayList
+        coarse,fine = mlMesh.meshList
+        bathyMesh.locatePoints(coarse)
+        self.checkLocatedPoints(bathyMesh,coarse)
+        bathyMesh.locatePoints_initial(coarse)
+        self.checkLocatedPoints(bathyMesh,coarse)
+        located = bathyMesh.pointElementsArray >= 0
+        #the points are searched for among the children of their elements
+        bathyMesh.locatePoints_refined(fine)
+        self.checkLocatedPoints(bathyMesh,fine)
+        np.testing.assert_equal(bathyMesh.pointElementsArray >= 0,located)
+        parents = mlMesh.elementParentsArrayList[-1][bathyMesh.pointElementsArray[located]]
+        np.testing.assert_equal(parents,bathyMesh.pointElementsArray_old[located])
+
+    def test_triangulated_bathymetry_cache(self):
+        import numpy as np
+        import shutil
+        import tempfile
+        from proteus.MeshTools import TriangulatedBathymetry
+        np.random.seed(0)
+        bathy = np.random.random((200,3))
+        bathy[:,2] = 1.0 + 2.0*bathy[:,0] - 3.0*bathy[:,1]
+        x = np.linspace(0.2,0.8,25)
+        y = np.linspace(0.8,0.2,25)
+        cacheDir = tempfile.mkdtemp()
+        try:
+            interpolant = TriangulatedBathymetry(bathy,cacheDir=cacheDir)
+            assert os.path.isdir(interpolant.cacheFile)
+            np.testing.assert_allclose(interpolant([x,y]),1.0 + 2.0*x - 3.0*y)
+            cached = TriangulatedBathymetry(bathy,cacheDir=cacheDir)
+            assert cached.cacheFile == interpolant.cacheFile
+            np.testing.assert_allclose(cached([x,y]),interpolant([x,y]))
+            #points outside the triangulation take the nearest value
+            nearest = np.argmin(((bathy[:,:2]-[2.0,2.0])**2).sum(axis=1))
+            assert cached([2.0,2.0]) == bathy[nearest,2]
+        finally:
+            shutil.rmtree(cacheDir)
+
+    def test_triangulated_bathymetry_walk(self):
+        import numpy as np
+        from scipy.spatial import Delaunay
+        from proteus.MeshTools import TriangulatedBathymetry
+        np.random.seed(1)
+        #a dense cluster of survey points next to large triangles
+        bathy = np.vstack((np.random.random((300,3))*[0.1,0.1,0.0] + [0.9,0.45,0.0],
+                           [[0.0,0.0,0.0],[1.0,0.0,0.0],[0.0,1.0,0.0],[1.0,1.0,0.0]]))
+        bathy[:,2] = 1.0 + 2.0*bathy[:,0] - 3.0*bathy[:,1]
+        xy = np.random.random((500,2))*1.2 - 0.1
+        inside = Delaunay(bathy[:,:2]).find_simplex(xy) >= 0
+        interpolant = TriangulatedBathymetry(bathy)
+        for searchNeighbors in [(1,4),(1,),()]:
+            #points missed by the search are found by the walk
+            interpolant.searchNeighbors = searchNeighbors
+            z = interpolant([xy[:,0],xy[:,1]])
+            np.testing.assert_allclose(z[inside],1.0 + 2.0*xy[inside,0] - 3.0*xy[inside,1])
+            nearest = np.argmin(((bathy[:,:2][np.newaxis,:,:]-xy[~inside][:,np.newaxis,:])**2).sum(axis=2),axis=1)
+            np.testing.assert_equal(z[~inside],bathy[nearest,2])
+
 
 if __name__ == '__main__':
     pass
@@ -495,6 +495,78 @@ class TestMeshTools(object):
            mesh3d.writeEdgesGnuplot('mesh3d')
            mesh3d.viewMeshGnuplotPipe('mesh3d')
 
+    def test_locatePoints(self):
+        mesh2d = TriangularMesh()
+        mesh2d.generateTriangularMeshFromRectangularGrid(5,5,1.0,1.0)
+        X = np.array([[0.1,0.2,0.0],
+                      [0.55,0.9,0.0],
+                      [1.0,1.0,0.0],
+                      [1.5,0.5,0.0]])
+        elements,xi = mesh2d.locatePoints(X)
+        npt.assert_equal(elements[-1],-1)
+        for x,eN,xi_eN in zip(X[:-1],elements[:-1],xi[:-1]):
+            ok_(eN >= 0)
+            vertices = mesh2d.nodeArray[mesh2d.elementNodesArray[eN]]
+            npt.assert_almost_equal(vertices[0]+(vertices[1]-vertices[0])*xi_eN[0]+(vertices[2]-vertices[0])*xi_eN[1],x)
+        tree = mesh2d.getNodeTree()
+        ok_(mesh2d.getNodeTree() is tree)
+        mesh2d.nodeArray[:,0] += 1.0
+        mesh2d.invalidateSpatialIndex()
+        elements,xi = mesh2d.locatePoints(X)
+        npt.assert_equal(elements[:2],-1)
+        ok_((elements[2:] >= 0).all())
+
+    def test_locatePoints_graded(self):
+        mesh2d = TriangularMesh()
+        mesh2d.generateTriangularMeshFromRectangularGrid(9,9,1.0,1.0)
+        #elements shrink by orders of magnitude towards the origin
+        mesh2d.nodeArray[:,:2] **= 4
+        trees = mesh2d.getElementBoxTrees()
+        ok_(len(trees) > 1)
+        npt.assert_equal(np.sort(np.concatenate([elements for tree,elements,radius in trees])),
+                         np.arange(mesh2d.nElements_global))
+        halfDiagonals = 0.5*(mesh2d.elementBoxes[:,1,:] - mesh2d.elementBoxes[:,0,:])
+        radii = np.sqrt((halfDiagonals**2).sum(axis=1))
+        for tree,elements,radius in trees[:-1]:
+            ok_((radii[elements] > 0.5*radius).all())
+        #with empty node stars all the points are found by the bounding box search
+        mesh2d.nodeElementOffsets = np.zeros_like(mesh2d.nodeElementOffsets)
+        np.random.seed(0)
+        X = np.zeros((200,3))
+        X[:,:2] = np.random.random((200,2))**4
+        X[-1,:2] = [1.5,0.5]
+        elements,xi = mesh2d.locatePoints(X)
+        npt.assert_equal(elements[-1],-1)
+        for x,eN,xi_eN in zip(X[:-1],elements[:-1],xi[:-1]):
+            ok_(eN >= 0)
+            vertices = mesh2d.nodeArray[mesh2d.elementNodesArray[eN]]
+            npt.assert_almost_equal(vertices[0]+(vertices[1]-vertices[0])*xi_eN[0]+(vertices[2]-vertices[0])*xi_eN[1],x)
+
+    def test_elementGeometryCache(self):
+        from proteus import FemTools, Quadrature
+        mesh2d = TriangularMesh()
+        mesh2d.generateTriangularMeshFromRectangularGrid(3,3,1.0,1.0)
+        points = Quadrature.SimplexGaussQuadrature(2,3).points
+        boundaryPoints = Quadrature.SimplexGaussQuadrature(1,3).points
+        space1 = FemTools.C0_AffineLinearOnSimplexWithNodalBasis(mesh2d,2)
+        space2 = FemTools.C0_AffineLinearOnSimplexWithNodalBasis(mesh2d,2)
+        cache = FemTools.getElementGeometryCache(mesh2d)
+        ok_(FemTools.getElementGeometryCache(mesh2d) is cache)
+        q = cache.getElementQuadrature(space1.elementMaps,points,jacobians=True)
+        ok_(cache.getElementQuadrature(space2.elementMaps,points)['x'] is q['x'])
+        x = np.zeros(q['x'].shape)
+        space2.elementMaps.getValues(points,x)
+        npt.assert_almost_equal(q['x'],x)
+        npt.assert_almost_equal(q['abs(det(J))'],np.abs(q['det(J)']))
+        ebqe = cache.getExteriorElementBoundaryQuadrature(space1.elementMaps,boundaryPoints,jacobians=True)
+        npt.assert_almost_equal((ebqe['n']**2).sum(axis=-1),1.0)
+        absDetJ = q['abs(det(J))'].copy()
+        mesh2d.nodeArray[:,0] *= 2.0
+        ok_(cache.getElementQuadrature(space2.elementMaps,points,jacobians=True) is q)
+        space2.elementMaps.getValues(points,x)
+        npt.assert_almost_equal(q['x'],x)
+        npt.assert_almost_equal(q['abs(det(J))'],2.0*absDetJ)
+
     def test_Refine_1D(self):
         grid1d = RectangularGrid(3,1,1,1.0,1.0,1.0)
         grid1dFine = RectangularGrid()
@@ -0,0 +1,233 @@
+from __future__ import division
+from proteus import Comm, Profiling
+from proteus import Archiver
+from xml.etree.ElementTree import Element, SubElement, ElementTree, fromstring
+import io
+from types import SimpleNamespace
+import os
+import shutil
+import tempfile
+import numpy as np
+import numpy.testing as npt
+import unittest
+
+comm = Comm.init()
+Profiling.procID = comm.rank()
+
+Profiling.logEvent("Testing Archiver")
+
+def stepGrids(t):
+    """
+    The [Time, Grid, Grid] list of a step as built by allGatherIncremental
+    """
+    time = Element("Time", {"Value": "%g" % (t,)})
+    mesh = Element("Grid", {"GridType": "Uniform", "Name": "Mesh"})
+    SubElement(mesh, "Attribute", {"Name": "u"})
+    ebmesh = Element("Grid", {"GridType": "Uniform", "Name": "EBMesh"})
+    return [time, mesh, ebmesh]
+
+class TestXMFAppendWriter(unittest.TestCase):
+    def test_append(self):
+        xmlFile = io.BytesIO()
+        writer = Archiver.XMFAppendWriter(xmlFile, '<?xml version="1.0" ?>\n')
+        writer.open("Mesh")
+        times = [0.0, 0.1, 0.2, 0.3]
+        sizes = [len(xmlFile.getvalue())]
+        for n, t in enumerate(times):
+            writer.append(stepGrids(t))
+            sizes.append(len(xmlFile.getvalue()))
+            # the file is a complete document after every step
+            root = fromstring(xmlFile.getvalue())
+            self.assertEqual(root.tag, "Xdmf")
+            Domain = root[0]
+            self.assertEqual(len(Domain), 1)
+            TemporalCollection = Domain[0]
+            self.assertEqual(TemporalCollection.attrib['CollectionType'], "Temporal")
+            self.assertEqual(TemporalCollection.attrib['Name'], "Mesh")
+            self.assertEqual(len(TemporalCollection), n+1)
+            for SpatialCollection, tn in zip(TemporalCollection, times):
+                self.assertEqual(SpatialCollection.attrib['CollectionType'], "Spatial")
+                self.assertEqual(SpatialCollection[0].tag, "Time")
+                self.assertEqual(float(SpatialCollection[0].attrib['Value']), tn)
+                self.assertEqual([Grid.attrib['Name'] for Grid in SpatialCollection[1:]],
+                                 ["Mesh", "EBMesh"])
+        # each step overwrites the tail, so the steps have the same size
+        steps = np.diff(sizes[1:])
+        self.assertTrue((steps == steps[0]).all())
+        self.assertTrue(xmlFile.getvalue().endswith(writer.tail))
+        self.assertEqual(xmlFile.getvalue().count(b"</Xdmf>"), 1)
+        self.assertTrue(writer.isIncremental())
+
+    def test_isIncremental(self):
+        tree = ElementTree(Element("Xdmf", {"Version": "2.0"}))
+        SubElement(tree.getroot(), "Domain")
+        xmlFile = io.BytesIO()
+        tree.write(xmlFile)
+        writer = Archiver.XMFAppendWriter(xmlFile, "")
+        self.assertFalse(writer.isIncremental())
+        self.assertFalse(Archiver.XMFAppendWriter(io.BytesIO(), "").isIncremental())
+
+    def test_reopen(self):
+        xmlFile = io.BytesIO()
+        writer = Archiver.XMFAppendWriter(xmlFile, '<?xml version="1.0" ?>\n')
+        writer.open("Mesh")
+        for t in [0.0, 0.1, 0.2, 0.3]:
+            writer.append(stepGrids(t))
+        complete = xmlFile.getvalue()
+        # an interrupted write leaves part of a step over the tail
+        xmlFile.seek(writer.tailOffset)
+        xmlFile.write(b'      <Grid GridType="Collection" CollectionType="Spatial">\n'
+                      b'        <Time Value="0.4"')
+        writer = Archiver.XMFAppendWriter(xmlFile, '<?xml version="1.0" ?>\n')
+        steps = writer.reopen()
+        self.assertEqual([float(step[0].attrib['Value']) for step in steps],
+                         [0.0, 0.1, 0.2, 0.3])
+        self.assertEqual(xmlFile.getvalue(), complete)
+        # continue after the second step
+        writer.truncate(2)
+        writer.append(stepGrids(0.15))
+        TemporalCollection = fromstring(xmlFile.getvalue())[0][0]
+        self.assertEqual([float(SpatialCollection[0].attrib['Value'])
+                          for SpatialCollection in TemporalCollection],
+                         [0.0, 0.1, 0.15])
+        self.assertTrue(xmlFile.getvalue().endswith(writer.tail))
+        self.assertTrue(writer.isIncremental())
+        self.assertEqual(len(Archiver.XMFAppendWriter(xmlFile, "").readSteps()), 3)
+
+    def test_temporalTree(self):
+        steps = [stepGrids(t) for t in [0.0, 0.1]]
+        for step in steps:
+            step[2].attrib['Name'] = "EBMesh"
+        Domain = Archiver.XMFAppendWriter.temporalTree(steps).getroot()[0]
+        self.assertEqual([TemporalCollection.attrib['Name'] for TemporalCollection in Domain],
+                         ["Mesh", "EBMesh"])
+        for TemporalCollection in Domain:
+            self.assertEqual(TemporalCollection.attrib['CollectionType'], "Temporal")
+            self.assertEqual([float(SpatialCollection[0].attrib['Value'])
+                              for SpatialCollection in TemporalCollection],
+                             [0.0, 0.1])
+            for SpatialCollection in TemporalCollection:
+                self.assertEqual([Grid.attrib['Name'] for Grid in SpatialCollection[1:]],
+                                 [TemporalCollection.attrib['Name']])
+
+class TestIncrementalArchive(unittest.TestCase):
+    def setUp(self):
+        # text archives create their data directory in the working directory
+        self.cwd = os.getcwd()
+        self.dataDir = tempfile.mkdtemp()
+        os.chdir(self.dataDir)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.dataDir)
+
+    def test_options(self):
+        ar = Archiver.XdmfArchive(self.dataDir, "incremental",
+                                  useTextArchive=True,
+                                  incrementalXMF=True,
+                                  storeXMLinHDF5=False)
+        self.assertTrue(ar.incrementalXMF)
+        self.assertFalse(ar.storeXMLinHDF5)
+        self.assertTrue(isinstance(ar.xmfWriter, Archiver.XMFAppendWriter))
+        ar.xmlFileGlobal.close()
+        # the XML is always stored without the incremental writer
+        ar = Archiver.XdmfArchive(self.dataDir, "full",
+                                  useTextArchive=True,
+                                  incrementalXMF=False,
+                                  storeXMLinHDF5=False)
+        self.assertFalse(ar.incrementalXMF)
+        self.assertTrue(ar.storeXMLinHDF5)
+        self.assertTrue(ar.xmfWriter is None)
+        ar.xmlFileGlobal.close()
+
+    def archiveStep(self, ar, t, tCount, run):
+        for TemporalCollection in ar.domain:
+            Grid = SubElement(TemporalCollection, "Grid", {"GridType": "Uniform"})
+            SubElement(Grid, "Time", {"Value": "%e" % (t,), "Name": "%i" % (tCount,)})
+            SubElement(Grid, "Information", {"Name": "run", "Value": run})
+        ar.sync()
+
+    def test_hotStart(self):
+        ar = Archiver.XdmfArchive(self.dataDir, "incremental",
+                                  incrementalXMF=True)
+        ar.domain = SubElement(ar.tree.getroot(), "Domain")
+        for name in ["Mesh", "EBMesh"]:
+            SubElement(ar.domain, "Grid", {"Name": name,
+                                           "GridType": "Collection",
+                                           "CollectionType": "Temporal"})
+        for tCount, t in enumerate([0.0, 0.1, 0.2, 0.3]):
+            self.archiveStep(ar, t, tCount, "first")
+        ar.close()
+        # restart after the second step, as NumericalSolution does
+        ar = Archiver.XdmfArchive(self.dataDir, "incremental",
+                                  hotStart=True,
+                                  incrementalXMF=True)
+        self.assertTrue(ar.incrementalXMF)
+        Domain = ar.tree.find("Domain")
+        self.assertEqual([TemporalCollection.attrib['Name'] for TemporalCollection in Domain],
+                         ["Mesh", "EBMesh"])
+        for TemporalCollection in Domain:
+            self.assertEqual([float(SpatialCollection[0].attrib['Value'])
+                              for SpatialCollection in TemporalCollection],
+                             [0.0, 0.1, 0.2, 0.3])
+        tCount, time, dt = ar.hotStartStep(0.15)
+        self.assertEqual(tCount, 1)
+        self.assertAlmostEqual(time, 0.1)
+        ar.n_datasets = tCount + 1
+        ar.domain = Domain
+        self.archiveStep(ar, 0.2, 2, "second")
+        ar.close()
+        # the archive holds the steps up to the restart and the new step
+        TemporalCollection = ElementTree(file=os.path.join(self.dataDir, "incremental.xmf")).getroot()[0][0]
+        self.assertEqual([float(SpatialCollection[0].attrib['Value'])
+                          for SpatialCollection in TemporalCollection],
+                         [0.0, 0.1, 0.2])
+        for SpatialCollection, run in zip(TemporalCollection, ["first", "first", "second"]):
+            self.assertEqual([Grid.attrib['Name'] for Grid in SpatialCollection[1:]],
+                             ["Mesh", "EBMesh"])
+            self.assertEqual([Grid[0].attrib['Value'] for Grid in SpatialCollection[1:]],
+                             [run, run])
+        ar = Archiver.XdmfArchive(self.dataDir, "incremental",
+                                  hotStart=True,
+                                  incrementalXMF=True)
+        self.assertEqual(len(ar.tree.find("Domain")[0]), 3)
+        npt.assert_almost_equal(ar.hdfFile["time_index"][:], [0.0, 0.1, 0.2])
+        ar.close()
+
+class TestReadDataset(unittest.TestCase):
+    def setUp(self):
+        import h5py
+        self.dataDir = tempfile.mkdtemp()
+        self.hdfFile = h5py.File(os.path.join(self.dataDir, "read.h5"), "w")
+        self.hdfFile.create_dataset("u_t0", data=np.arange(1000, dtype='d')*2.0)
+        self.hdfFile.create_dataset("v_t0", data=np.arange(1000, dtype='d')*3.0)
+        self.hdfFile.create_dataset("x_t0", data=np.arange(3000, dtype='d').reshape(1000, 3))
+
+    def tearDown(self):
+        self.hdfFile.close()
+        shutil.rmtree(self.dataDir)
+
+    def test_hyperslabBlocks(self):
+        starts, stops = Archiver.hyperslabBlocks(np.array([0, 1, 2, 3, 10, 11, 200, 999]), maxGap=8)
+        npt.assert_equal(starts, [0, 200, 999])
+        npt.assert_equal(stops, [12, 201, 1000])
+        starts, stops = Archiver.hyperslabBlocks(np.array([], 'i'))
+        self.assertEqual(len(starts), 0)
+        self.assertEqual(len(stops), 0)
+
+    def test_readDatasets(self):
+        ar = SimpleNamespace(hdfFile=self.hdfFile)
+        ar.readDatasets = lambda names, globalIndices: Archiver.AR_base.readDatasets(ar, names, globalIndices)
+        # owned nodes plus ghosts spanning the whole global array
+        globalIndices = np.array([500, 501, 502, 503, 0, 999, 502, 560])
+        u, v, x = Archiver.AR_base.readDatasets(ar, ["/u_t0", "/v_t0", "/x_t0"], globalIndices)
+        npt.assert_equal(u, globalIndices*2.0)
+        npt.assert_equal(v, globalIndices*3.0)
+        npt.assert_equal(x, np.arange(3000, dtype='d').reshape(1000, 3)[globalIndices])
+        npt.assert_equal(Archiver.AR_base.readDataset(ar, "/u_t0", globalIndices), u)
+        u, x = Archiver.AR_base.readDatasets(ar, ["/u_t0", "/x_t0"], np.array([], 'i'))
+        self.assertEqual(u.shape, (0,))
+        self.assertEqual(x.shape, (0, 3))
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
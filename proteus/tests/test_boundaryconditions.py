@@ -82,6 +82,16 @@ class TestBC(unittest.TestCase):
             x = get_random_x()
             b = BC.uOfXT(x,t)
             npt.assert_equal(b, a0+sum(a*x))
+    def test_uOfXT_array(self):
+        X = np.array([get_random_x() for i in range(10)])
+        BC = BoundaryCondition()
+        BC.setConstantBC(4.)
+        npt.assert_equal(BC.uOfXT.uOfXT_array(X, 0.), [BC.uOfXT(x, 0.) for x in X])
+        assert BC.uOfXT.constantInTime
+        a0 = 1.
+        a = np.array([1., 2., 3.])
+        BC.setLinearBC(a0, a)
+        npt.assert_almost_equal(BC.uOfXT.uOfXT_array(X, 0.), [BC.uOfXT(x, 0.) for x in X])
     def test_linearRampBC(self):
         t_list = get_time_array()
         t1 = 3.
@@ -612,6 +622,27 @@ class TestBC(unittest.TestCase):
         npt.assert_equal(hy_dir, displacement[:, 1])
         npt.assert_equal(hz_dir, displacement[:, 2])
 
+    def test_move_mesh_batch(self):
+        BC = create_BC(folder='mprans')
+        last_pos = np.array([1., 1., 1.])
+        h = np.array([0., 0., 0.])
+        rot_matrix = np.eye(3)
+        BC.setMoveMesh(last_pos=last_pos, h=h, rot_matrix=rot_matrix)
+        from proteus.SpatialTools import rotation3D
+        X = np.array([get_random_x() for i in range(10)])
+        for t in get_time_array(steps=5):
+            h[:] = get_random_x()-last_pos
+            rot_matrix[:] = rotation3D(rot_matrix, rot=get_random_x()[0], axis=get_random_x())
+            X0 = X-last_pos
+            displacement = np.dot(X0, rot_matrix)-X0+h
+            for i, hi_dirichlet in enumerate([BC.hx_dirichlet, BC.hy_dirichlet, BC.hz_dirichlet]):
+                npt.assert_almost_equal(hi_dirichlet.uOfXT.uOfXT_array(X, t), displacement[:, i])
+                npt.assert_almost_equal([hi_dirichlet.uOfXT(x, t) for x in X], displacement[:, i])
+            # body state changed at the same time
+            h[:] = h+1.
+            npt.assert_almost_equal(BC.hx_dirichlet.uOfXT.uOfXT_array(X, t), displacement[:, 0]+1.)
+            last_pos[:] = X[0]
+
     def test_unsteady_two_phase_velocity_inlet(self):
         from proteus.WaveTools import MonochromaticWaves
         b_or = np.array([[0., -1., 0.]])
@@ -724,6 +755,91 @@ class TestBC(unittest.TestCase):
         npt.assert_equal(k_dif, zeros)
         npt.assert_equal(d_dif, zeros)
 
+    def test_waves_characteristics_velocity_batch(self):
+        from proteus.WaveTools import MonochromaticWaves
+        from proteus.mprans import BoundaryConditions as mbc
+        b_or = np.array([[0., -1., 0.]])
+        BC = create_BC(folder='mprans', b_or=b_or, b_i=0)
+        period = 0.8
+        height = 0.029
+        mwl = depth = 0.9
+        waves = MonochromaticWaves(period, height, mwl, depth,
+                                   np.array([0., -9.81, 0.]),
+                                   np.array([1., 0., 0.]), fast=False)
+        wind_speed = np.array([1., 2., 3.4])
+        smoothing = 0.05
+        BC.setUnsteadyTwoPhaseVelocityInlet(waves, smoothing, vert_axis=1,
+                                            wind_speed=wind_speed)
+        WC = getattr(mbc, '__cppClass_WavesCharacteristics')(
+            waves=waves, vert_axis=1, wind_speed=wind_speed,
+            smoothing=smoothing)
+        X = np.array([get_random_x(0., 1.) for i in range(50)])
+        for t in get_time_array(steps=5):
+            U = WC.calculate_velocity_batch(X, t)
+            for x, u in zip(X, U):
+                npt.assert_allclose(u, [BC.u_dirichlet.uOfXT(x, t),
+                                        BC.v_dirichlet.uOfXT(x, t),
+                                        BC.w_dirichlet.uOfXT(x, t)],
+                                    rtol=1e-10, atol=1e-12)
+            npt.assert_allclose(BC.phi_dirichlet.uOfXT.uOfXT_array(X, t),
+                                [BC.phi_dirichlet.uOfXT(x, t) for x in X],
+                                rtol=1e-10, atol=1e-12)
+            npt.assert_allclose(BC.vof_dirichlet.uOfXT.uOfXT_array(X, t),
+                                [BC.vof_dirichlet.uOfXT(x, t) for x in X],
+                                rtol=1e-10, atol=1e-12)
+
+    def test_waves_characteristics_velocity_batch_fast(self):
+        # fast=True waves use the same approximations in the batched
+        # kernels as point by point, so the values agree up to rounding
+        from proteus.WaveTools import MonochromaticWaves
+        from proteus.mprans import BoundaryConditions as mbc
+        waves = MonochromaticWaves(0.8, 0.029, 0.9, 0.9,
+                                   np.array([0., -9.81, 0.]),
+                                   np.array([1., 0., 0.]), fast=True)
+        WC = getattr(mbc, '__cppClass_WavesCharacteristics')(
+            waves=waves, vert_axis=1, wind_speed=np.array([1., 2., 3.4]),
+            smoothing=0.05)
+        BC = create_BC(folder='mprans', b_or=np.array([[0., -1., 0.]]), b_i=0)
+        BC.setUnsteadyTwoPhaseVelocityInlet(waves, 0.05, vert_axis=1,
+                                            wind_speed=np.array([1., 2., 3.4]))
+        X = np.array([get_random_x(0., 1.) for i in range(50)])
+        for t in get_time_array(steps=5):
+            U = WC.calculate_velocity_batch(X, t)
+            npt.assert_allclose(U, [[BC.u_dirichlet.uOfXT(x, t),
+                                     BC.v_dirichlet.uOfXT(x, t),
+                                     BC.w_dirichlet.uOfXT(x, t)] for x in X],
+                                rtol=1e-8, atol=1e-10)
+            npt.assert_allclose(WC.calculate_phi_batch(X, t),
+                                [BC.phi_dirichlet.uOfXT(x, t) for x in X],
+                                rtol=1e-8, atol=1e-10)
+            npt.assert_allclose(BC.vof_dirichlet.uOfXT.uOfXT_array(X, t),
+                                [BC.vof_dirichlet.uOfXT(x, t) for x in X],
+                                rtol=1e-8, atol=1e-10)
+
+    def test_waves_characteristics_cached_batch(self):
+        # the u, v and w (phi and vof) conditions of the same points share
+        # one evaluation, which is redone when the time or points change
+        from proteus.WaveTools import MonochromaticWaves
+        from proteus.mprans import BoundaryConditions as mbc
+        waves = MonochromaticWaves(0.8, 0.029, 0.9, 0.9,
+                                   np.array([0., -9.81, 0.]),
+                                   np.array([1., 0., 0.]))
+        WC = getattr(mbc, '__cppClass_WavesCharacteristics')(
+            waves=waves, vert_axis=1, smoothing=0.05)
+        X = np.array([get_random_x(0., 1.) for i in range(20)])
+        U = WC.cached_velocity_batch(X, 0.3)
+        self.assertTrue(WC.cached_velocity_batch(X.copy(), 0.3) is U)
+        npt.assert_equal(U, WC.calculate_velocity_batch(X, 0.3))
+        npt.assert_equal(WC.cached_velocity_batch(X, 0.4),
+                         WC.calculate_velocity_batch(X, 0.4))
+        npt.assert_equal(WC.cached_velocity_batch(X[:10], 0.4),
+                         WC.calculate_velocity_batch(X[:10], 0.4))
+        phi = WC.cached_phi_batch(X, 0.3)
+        self.assertTrue(WC.cached_phi_batch(X, 0.3) is phi)
+        npt.assert_equal(phi, WC.calculate_phi_batch(X, 0.3))
+        npt.assert_equal(WC.cached_phi_batch(X, 0.4),
+                         WC.calculate_phi_batch(X, 0.4))
+
     def test_two_phase_velocity_inlet(self):
         from proteus.ctransportCoefficients import smoothedHeaviside
         # input 
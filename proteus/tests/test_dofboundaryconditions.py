@@ -0,0 +1,202 @@
+from __future__ import division
+from proteus import Comm, Profiling
+from proteus import FemTools, MeshTools
+import numpy as np
+import numpy.testing as npt
+
+comm = Comm.init()
+Profiling.procID = comm.rank()
+
+Profiling.logEvent("Testing DOFBoundaryConditions")
+
+class ArrayCondition(object):
+    """
+    u = x + 10 flag + t, recording the calls of the array version
+    """
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, x, t):
+        raise AssertionError("the array version should be used")
+
+    def uOfXT_array(self, X, t, materialFlags=None):
+        self.calls.append((X.copy(), materialFlags.copy()))
+        return X[:, 0] + 10.0*materialFlags + t
+
+class PointwiseCondition(object):
+    def __init__(self):
+        self.nCalls = 0
+
+    def __call__(self, x, t):
+        self.nCalls += 1
+        return x[1]*t
+
+def constantCondition(x, t):
+    constantCondition.nCalls += 1
+    return 5.0
+constantCondition.constantInTime = True
+
+def buildConditions():
+    """
+    Dirichlet conditions on 4 DOF with points in a (2,4,3) interpolation point array
+    """
+    np.random.seed(0)
+    dc = FemTools.DOFBoundaryConditions.__new__(FemTools.DOFBoundaryConditions)
+    f, g = ArrayCondition(), PointwiseCondition()
+    constantCondition.nCalls = 0
+    dc.interpolationPoints = np.random.random((2, 4, 3))
+    dc.DOFBoundaryDOFs = np.array([1, 3, 4, 6], 'i')
+    dc.DOFBoundaryPointIndices = np.array([0, 2, 5, 7], 'i')
+    dc.DOFBoundaryMaterialFlags = np.array([1, 2, 1, 3], 'i')
+    dc.DOFBoundaryConditionsDict = {1: f, 3: g, 4: f, 6: constantCondition}
+    dc.groupBoundaryConditions()
+    return dc, f, g
+
+def expectedValues(dc, t):
+    X = dc.interpolationPoints.reshape(-1, 3)[dc.DOFBoundaryPointIndices]
+    return np.array([X[0, 0] + 10.0 + t,
+                     X[1, 1]*t,
+                     X[2, 0] + 10.0 + t,
+                     5.0])
+
+def test_groups():
+    dc, f, g = buildConditions()
+    groups = dict([(id(c), indices) for c, indices, cached in dc.DOFBoundaryGroups])
+    assert len(groups) == 3
+    npt.assert_equal(groups[id(f)], [0, 2])
+    npt.assert_equal(groups[id(g)], [1])
+    npt.assert_equal(groups[id(constantCondition)], [3])
+
+def test_getValues():
+    dc, f, g = buildConditions()
+    npt.assert_almost_equal(dc.getValues(0.5), expectedValues(dc, 0.5))
+    # one call per group with the points and material flags of the group
+    assert len(f.calls) == 1
+    X, materialFlags = f.calls[0]
+    npt.assert_equal(X, dc.interpolationPoints.reshape(-1, 3)[[0, 5]])
+    npt.assert_equal(materialFlags, [1, 1])
+    assert g.nCalls == 1
+
+def test_constantInTime():
+    dc, f, g = buildConditions()
+    dc.getValues(0.5)
+    values = dc.getValues(1.0)
+    npt.assert_almost_equal(values, expectedValues(dc, 1.0))
+    assert constantCondition.nCalls == 1
+    assert len(f.calls) == 2
+    assert g.nCalls == 2
+
+def test_moving_points():
+    # the conditions follow the interpolation points updated in place
+    dc, f, g = buildConditions()
+    dc.getValues(0.5)
+    dc.interpolationPoints += 1.0
+    npt.assert_equal(dc.DOFBoundaryPoints,
+                     dc.interpolationPoints.reshape(-1, 3)[dc.DOFBoundaryPointIndices])
+    npt.assert_almost_equal(dc.getValues(0.5), expectedValues(dc, 0.5))
+
+def unitSquareSpace():
+    """
+    P1 space on a 4x4 node grid of the unit square with boundary flags
+
+    Element boundaries are flagged 1 at y=0, 2 at y=1, 4 at x=0, 5 at x=1
+    and 6 on the interior line x=2/3, and the node at (1/3,0) is flagged 3.
+    """
+    mesh = MeshTools.TriangularMesh()
+    mesh.generateTriangularMeshFromRectangularGrid(4, 4, 1.0, 1.0)
+    b = mesh.elementBoundaryBarycentersArray
+    flags = np.zeros((mesh.nElementBoundaries_global,), 'i')
+    flags[np.isclose(b[:, 1], 0.0)] = 1
+    flags[np.isclose(b[:, 1], 1.0)] = 2
+    flags[np.isclose(b[:, 0], 0.0)] = 4
+    flags[np.isclose(b[:, 0], 1.0)] = 5
+    flags[np.isclose(b[:, 0], 2.0/3.0)] = 6
+    mesh.elementBoundaryMaterialTypes[:] = flags
+    mesh.nodeMaterialTypes[:] = 0
+    mesh.nodeMaterialTypes[np.argmin(np.sum((mesh.nodeArray - [1.0/3.0, 0.0, 0.0])**2, axis=1))] = 3
+    return FemTools.C0_AffineLinearOnSimplexWithNodalBasis(mesh, 2)
+
+dirichletConditions = dict([(flag, lambda x, t, flag=flag: float(flag)) for flag in (1, 2, 3, 6)])
+
+def getDBC(x, flag):
+    return dirichletConditions.get(flag)
+
+def getPBC(x, flag):
+    if flag in (4, 5):
+        return np.array([0.0, x[1], 0.0])
+
+def referenceConditions(femSpace, getDBC, getPBC):
+    """
+    The conditions of each DOF found by traversing the elements one by one
+    """
+    mesh = femSpace.elementMaps.mesh
+    interpolationConditions = femSpace.referenceFiniteElement.interpolationConditions
+    dirichlet, flags, periodic, free = {}, {}, {}, set()
+    for eN in range(mesh.nElements_global):
+        for k in range(interpolationConditions.nQuadraturePoints):
+            dofN = femSpace.dofMap.l2g[eN, interpolationConditions.quadrature2DOF_element(k)]
+            x = femSpace.interpolationPoints[eN, k]
+            tests = []
+            for ebN_element in range(mesh.nElementBoundaries_element):
+                if interpolationConditions.definedOnLocalElementBoundary(k, ebN_element):
+                    tests.append((mesh.elementBoundaryMaterialTypes[mesh.elementBoundariesArray[eN, ebN_element]], False))
+            tests.append((mesh.nodeMaterialTypes[mesh.elementNodesArray[eN, interpolationConditions.quadrature2Node_element(k)]], True))
+            for flag, nodal in tests:
+                g, p = getDBC(x, flag), getPBC(x, flag)
+                if p is not None:
+                    if not nodal:
+                        periodic.setdefault(tuple(p), set()).add(dofN)
+                elif g is not None:
+                    dirichlet[dofN] = g
+                    flags[dofN] = flag
+                elif dofN not in dirichlet:
+                    free.add(dofN)
+    return dirichlet, flags, periodic, free - set(dirichlet)
+
+def test_pointwise_conditions():
+    femSpace = unitSquareSpace()
+    mesh = femSpace.elementMaps.mesh
+    dc = FemTools.DOFBoundaryConditions(femSpace, getDBC, getPeriodicBoundaryConditions=getPBC)
+    dirichlet, flags, periodic, free = referenceConditions(femSpace, getDBC, getPBC)
+    assert dc.DOFBoundaryConditionsDict == dirichlet
+    assert dc.DOFBoundaryMaterialFlag == flags
+    npt.assert_equal(dc.DOFBoundaryDOFs, sorted(dirichlet))
+    npt.assert_equal(dc.DOFBoundaryMaterialFlags, [flags[dofN] for dofN in sorted(dirichlet)])
+    for dofN, x in dc.DOFBoundaryPointDict.items():
+        npt.assert_almost_equal(x, mesh.nodeArray[dofN])
+    assert (sorted([sorted(dofs) for dofs in dc.periodicDOFDict.values()]) ==
+            sorted([sorted(dofs) for dofs in periodic.values()]))
+    # the first DOF of each periodic set is free, the others are not
+    for dofs in periodic.values():
+        free.add(min(dofs))
+        free.difference_update(sorted(dofs)[1:])
+    assert dc.freeDOFSet == free
+    x = mesh.nodeArray
+    bottom = set(np.nonzero(np.isclose(x[:, 1], 0.0))[0].tolist())
+    top = set(np.nonzero(np.isclose(x[:, 1], 1.0))[0].tolist())
+    line = set(np.nonzero(np.isclose(x[:, 0], 2.0/3.0))[0].tolist())
+    # the nodal flag overrides the element boundary flag
+    nodal = np.nonzero(mesh.nodeMaterialTypes == 3)[0][0]
+    assert dc.DOFBoundaryConditionsDict[nodal] is dirichletConditions[3]
+    # DOF with several conditions get one of them
+    corner = (bottom & line).pop()
+    assert dc.DOFBoundaryConditionsDict[corner] in (dirichletConditions[1], dirichletConditions[6])
+    assert set(dirichlet) == bottom | top | line
+    # the periodic left and right sides are paired by height
+    assert len(dc.periodicDOFDict) == 4
+    for dofs in dc.periodicDOFDict.values():
+        assert len(dofs) == 2
+
+def test_pointwise_conditions_without_flag():
+    femSpace = unitSquareSpace()
+    mesh = femSpace.elementMaps.mesh
+    g = lambda x, t: 1.0
+    def getDBC(x):
+        if np.isclose(x[1], 0.0):
+            return g
+    dc = FemTools.DOFBoundaryConditions(femSpace, getDBC)
+    bottom = np.nonzero(np.isclose(mesh.nodeArray[:, 1], 0.0))[0].tolist()
+    assert dc.DOFBoundaryConditionsDict == dict([(dofN, g) for dofN in bottom])
+    assert dc.freeDOFSet == set(range(femSpace.dim)) - set(bottom)
+    assert dc.DOFBoundaryMaterialFlag == {}
+    assert dc.periodicDOFDict == {}
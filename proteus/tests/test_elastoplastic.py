@@ -0,0 +1,89 @@
+from __future__ import division
+from types import SimpleNamespace
+from proteus import Comm, Profiling
+from proteus.elastoplastic.ElastoPlastic import StrengthReductionSearch
+import numpy as np
+import numpy.testing as npt
+
+comm = Comm.init()
+Profiling.procID = comm.rank()
+
+Profiling.logEvent("Testing ElastoPlastic")
+
+SRF_failure = 1.37
+
+class FakeCoefficients(object):
+    def __init__(self):
+        self.gravityStep = 0
+        self.SRF = 1.0
+        self.cq = dict([(key, np.zeros((2, 3))) for key in StrengthReductionSearch.stateKeys])
+        self.cebqe = dict([(key, np.zeros((2, 3))) for key in StrengthReductionSearch.stateKeys])
+
+    def setStrengthReduction(self, SRF):
+        self.SRF = SRF
+
+class FakeSolver(object):
+    """
+    Converges for SRF below SRF_failure, and sets the state to the SRF
+    """
+    def __init__(self, levelModel):
+        self.levelModel = levelModel
+        self.initialStates = []
+
+    def solveMultilevel(self, uList, rList, par_uList=None, par_rList=None):
+        lm = self.levelModel
+        c = lm.coefficients
+        self.initialStates.append((c.SRF, lm.u[0].dof[0], c.cq['strain_last'][0, 0],
+                                   c.cebqe['plasticStrain_last'][0, 0]))
+        failed = c.SRF >= SRF_failure
+        lm.u[0].dof[:] = np.nan if failed else c.SRF
+        for key in StrengthReductionSearch.stateKeys:
+            c.cq[key][:] = np.nan if failed else c.SRF
+            c.cebqe[key][:] = np.nan if failed else c.SRF
+        return failed
+
+def fakeModel():
+    lm = SimpleNamespace(nc=1,
+                         u={0: SimpleNamespace(dof=np.full(4, 0.5))},
+                         coefficients=FakeCoefficients(),
+                         setFreeDOF=lambda u: None)
+    return SimpleNamespace(levelModelList=[lm],
+                           uList=[None], rList=[None],
+                           par_uList=[None], par_rList=[None],
+                           solver=FakeSolver(lm))
+
+def test_bracket_and_bisect():
+    model = fakeModel()
+    search = StrengthReductionSearch(model, SRF_min=1.0, SRF_step=0.25, tol=0.01)
+    factorOfSafety = search.solve()
+    SRFs = [SRF for SRF, converged in search.trials]
+    # the step doubles until the solver fails, then the bracket is bisected
+    npt.assert_almost_equal(SRFs, [1.0, 1.25, 1.75, 1.5, 1.375, 1.3125,
+                                   1.34375, 1.359375, 1.3671875])
+    assert [converged for SRF, converged in search.trials] == [SRF < SRF_failure for SRF in SRFs]
+    npt.assert_almost_equal(factorOfSafety, 1.3671875)
+    assert SRF_failure - factorOfSafety < search.tol
+    # each trial starts from the largest converged trial below it
+    for i, (SRF, dof, strain_last, plasticStrain_last) in enumerate(model.solver.initialStates):
+        converged = [s for s, c in search.trials[:i] if c]
+        start = max(converged) if converged else 0.0
+        assert dof == start
+        if converged:
+            assert strain_last == start and plasticStrain_last == start
+    # the model is left in the state of the factor of safety
+    lm = model.levelModelList[0]
+    npt.assert_equal(lm.u[0].dof, factorOfSafety)
+    npt.assert_equal(lm.coefficients.cq['strain_last'], factorOfSafety)
+    assert lm.coefficients.SRF == factorOfSafety
+
+def test_failure_at_SRF_min():
+    model = fakeModel()
+    search = StrengthReductionSearch(model, SRF_min=1.5)
+    assert search.solve() is None
+    assert search.trials == [(1.5, False)]
+
+def test_maxTrials():
+    model = fakeModel()
+    search = StrengthReductionSearch(model, SRF_min=0.1, SRF_step=0.01, maxTrials=3)
+    npt.assert_almost_equal(search.solve(), 0.13)
+    assert len(search.trials) == 3
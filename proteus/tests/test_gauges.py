@@ -192,6 +192,29 @@ def test_point_gauge_output_2():
     npt.assert_allclose(correct_data, data)
     delete_file(filename)
 
+def test_buffered_point_gauge_output():
+    filename = 'test_buffered_gauge_output.csv'
+    silent_rm(filename)
+
+    p = PointGauges(gauges=((('u0',), ((0, 0, 0), (0.5, 0.5, 0.5), (1, 1, 1))),),
+                    fileName=filename, bufferSize=2)
+    time_list=[0.0, 1.0, 2.0]
+    run_gauge(p, time_list)
+    # the last sample is still buffered
+    p.flush()
+
+    correct_data = np.asarray([[   0.,    0.,  55.5, 111.],
+                               [   1.,    0.,  111., 222.],
+                               [   2.,    0.,  166.5, 333.]])
+
+    # synchronize processes before attempting to read file
+    Comm.get().barrier()
+
+    gauge_names, data = parse_gauge_output(filename)
+
+    npt.assert_allclose(correct_data, data)
+    delete_file(filename)
+
 def test_line_integral_gauge_output():
     filename = 'test_line_integral_gauge_output.csv'
     silent_rm(filename)
@@ -297,6 +320,110 @@ def test_line_gauge_output():
     npt.assert_allclose(correct_data, data)
     delete_file(filename)
 
+def test_time_series_recorder_hot_start():
+    from proteus.AuxiliaryVariables import TimeSeriesRecorder
+    filename = 'test_time_series_recorder.csv'
+    silent_rm(filename)
+
+    r = TimeSeriesRecorder(filename, ['a', 'b'], bufferSize=2)
+    r.start()
+    for t in [0.0, 1.0, 2.0]:
+        r.record(t, [t, 2*t])
+    r.flush()
+    # a hot start at t=1 drops the rows recorded at and after t=1
+    r = TimeSeriesRecorder(filename, ['a', 'b'], bufferSize=2)
+    r.start(1.0)
+    r.record(1.0, [10., 20.])
+    r.flush()
+
+    with open(filename) as f:
+        eq_(f.readline().strip(), 't,a,b')
+    data = np.genfromtxt(filename, delimiter=",", skip_header=1)
+    npt.assert_allclose(data, [[0., 0., 0.],
+                               [1., 10., 20.]])
+    delete_file(filename)
+
+def test_time_series_recorder_hot_start_hdf5():
+    import h5py
+    from proteus.AuxiliaryVariables import TimeSeriesRecorder
+    filename = 'test_time_series_recorder.h5'
+    silent_rm(filename)
+
+    r = TimeSeriesRecorder(filename, ['a', 'b'], bufferSize=2, fileFormat='hdf5')
+    r.start()
+    for t in [0.0, 1.0, 2.0]:
+        r.record(t, [t, 2*t])
+    r.flush()
+    # a hot start at t=1 drops the rows recorded at and after t=1
+    r = TimeSeriesRecorder(filename, ['a', 'b'], bufferSize=2, fileFormat='hdf5')
+    r.start(1.0)
+    r.record(1.0, [10., 20.])
+    r.flush()
+
+    with h5py.File(filename, 'r') as f:
+        npt.assert_equal(f['values'].attrs['columns'], np.array(['a', 'b'], dtype='S'))
+        npt.assert_allclose(f['time'][:], [0., 1.])
+        npt.assert_allclose(f['values'][:], [[0., 0.],
+                                             [10., 20.]])
+    delete_file(filename)
+
+def test_point_gauge_hot_start():
+    from types import SimpleNamespace
+    filename = 'test_gauge_hot_start.csv'
+    silent_rm(filename)
+
+    g = PointGauges(gauges=((('u0',), ((1, 1, 1),)),),
+                    fileName=filename)
+    run_gauge(g, [0.0, 1.0, 2.0])
+
+    # hot start at t=1 with a solution that differs from the first run
+    class ScaledSolution(object):
+        def uOfXT(self, x, t):
+            return 2*(x[0]+10*x[1]+100*x[2])*(t+1.0)
+
+    g = PointGauges(gauges=((('u0',), ((1, 1, 1),)),),
+                    fileName=filename)
+    model, initialConditions = gauge_setup(3)
+    g.attachModel(model, SimpleNamespace(hotStart=True))
+    m = model.levelModelList[-1]
+    # calculate_init runs before the hot start solution is read
+    g.calculate()
+    for t in [1.0, 2.0]:
+        m.setInitialConditions({0: ScaledSolution()}, t)
+        m.timeIntegration.tLast = t
+        if t == 1.0:
+            g.restartOutput(t)
+        else:
+            g.calculate()
+
+    Comm.get().barrier()
+
+    gauge_names, data = parse_gauge_output(filename)
+    npt.assert_allclose(data, [[0., 111.],
+                               [1., 444.],
+                               [2., 666.]])
+    delete_file(filename)
+
+def test_time_series_recorder_resume():
+    # a recorder created after adaptation appends to the existing file
+    from proteus.AuxiliaryVariables import TimeSeriesRecorder
+    filename = 'test_time_series_recorder_resume.csv'
+    silent_rm(filename)
+
+    r = TimeSeriesRecorder(filename, ['a'], bufferSize=10)
+    r.start()
+    r.record(0.0, [1.])
+    r.flush()
+    r = TimeSeriesRecorder(filename, ['a'], bufferSize=10)
+    r.started = True
+    r.record(1.0, [2.])
+    r.flush()
+
+    data = np.genfromtxt(filename, delimiter=",", skip_header=1)
+    npt.assert_allclose(data, [[0., 1.],
+                               [1., 2.]])
+    delete_file(filename)
+
 def delete_file(filename):
     if os.path.exists(filename):
         try:
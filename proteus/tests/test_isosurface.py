@@ -0,0 +1,81 @@
+from __future__ import division
+from types import SimpleNamespace
+from proteus import Comm, Profiling
+from proteus import MeshTools
+from proteus.Isosurface import Isosurface
+import numpy as np
+import numpy.testing as npt
+import unittest
+
+comm = Comm.init()
+Profiling.procID = comm.rank()
+
+Profiling.logEvent("Testing Isosurface")
+
+class TestTriangulateIsosurface(unittest.TestCase):
+    def setUp(self):
+        # nodes at 0, 0.5 and 1 in each direction, 6 tetrahedra per hexahedron
+        grid = MeshTools.RectangularGrid(3, 3, 3, 1.0, 1.0, 1.0)
+        self.mesh = MeshTools.TetrahedralMesh()
+        self.mesh.rectangularToTetrahedral6T(grid)
+
+    def triangulate(self, normal, c):
+        """
+        Extract the zero isosurface of the planar level set normal.x - c
+        """
+        mesh = self.mesh
+        phi = np.dot(mesh.nodeArray, normal) - c
+        iso = Isosurface((('phi', (0.0,)),), None, format=None)
+        iso.fieldNames = ['phi']
+        iso.u = {0: SimpleNamespace(dof=phi)}
+        iso.nodeArray = mesh.nodeArray
+        iso.elementNodesArray = mesh.elementNodesArray
+        iso.num_owned_elements = mesh.nElements_global
+        iso.triangulateIsosurface('phi', 0.0)
+        return (phi,
+                iso.nodes[('phi', 0.0)],
+                iso.elements[('phi', 0.0)],
+                iso.normals[('phi', 0.0)])
+
+    def checkPlane(self, normal, nodes, elements, normals):
+        unitNormal = np.asarray(normal)/np.linalg.norm(normal)
+        x0 = nodes[elements[:, 0]]
+        triangleNormals = np.cross(nodes[elements[:, 1]] - x0, nodes[elements[:, 2]] - x0)
+        area = 0.5*np.sqrt(np.sum(triangleNormals**2, axis=1))
+        self.assertTrue((area > 0.0).all())
+        # triangles point to the positive side of the level set
+        npt.assert_almost_equal(triangleNormals/(2.0*area[:, None]),
+                                np.tile(unitNormal, (len(elements), 1)))
+        npt.assert_almost_equal(normals, np.tile(unitNormal, (len(nodes), 1)))
+        # every vertex is used
+        self.assertEqual(len(np.unique(elements)), len(nodes))
+        return area.sum()
+
+    def test_cut_edges(self):
+        normal = np.array([1.0, 2.0, 3.0])
+        c = 2.1
+        phi, nodes, elements, normals = self.triangulate(normal, c)
+        npt.assert_almost_equal(np.dot(nodes, normal) - c, 0.0)
+        # one vertex per cut mesh edge
+        edges = set()
+        for element in self.mesh.elementNodesArray:
+            for i in range(4):
+                for j in range(i+1, 4):
+                    I, J = element[i], element[j]
+                    if phi[I]*phi[J] < 0.0:
+                        edges.add((min(I, J), max(I, J)))
+        self.assertEqual(len(nodes), len(edges))
+        self.checkPlane(normal, nodes, elements, normals)
+
+    def test_plane_through_vertices(self):
+        # the isosurface lies on mesh faces shared by two elements
+        normal = np.array([0.0, 0.0, 1.0])
+        phi, nodes, elements, normals = self.triangulate(normal, 0.5)
+        npt.assert_almost_equal(nodes[:, 2], 0.5)
+        self.assertEqual(len(nodes), np.count_nonzero(np.abs(phi) < 1.0e-8))
+        area = self.checkPlane(normal, nodes, elements, normals)
+        # each face is kept once, so the triangles cover the section once
+        npt.assert_almost_equal(area, 1.0)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,103 @@
+from __future__ import division
+from types import SimpleNamespace
+from proteus import Comm, Profiling
+from proteus import Norms
+from proteus.Transport import OneLevelTransport
+import numpy as np
+import numpy.testing as npt
+
+comm = Comm.init()
+Profiling.procID = comm.rank()
+
+class LinearSolution(object):
+    """
+    u = 1 + x + 2y + 3z + t, with the array protocol
+    """
+    def __init__(self):
+        self.shapes = []
+        self.materialFlags = None
+
+    def uOfXT(self, x, t):
+        return 1.0 + x[0] + 2.0*x[1] + 3.0*x[2] + t
+
+    def uOfXT_array(self, X, t, materialFlags=None):
+        self.shapes.append(X.shape)
+        self.materialFlags = materialFlags
+        return 1.0 + X[:, 0] + 2.0*X[:, 1] + 3.0*X[:, 2] + t
+
+class PointwiseSolution(object):
+    def uOfXT(self, x, t):
+        return 1.0 + x[0] + 2.0*x[1] + 3.0*x[2] + t
+
+class VectorSolution(object):
+    def uOfXT(self, x, t):
+        return np.array([x[0], x[1]*t])
+
+    def uOfXT_array(self, X, t, materialFlags=None):
+        return np.column_stack((X[:, 0], X[:, 1]*t))
+
+def quadraturePoints(nE=4, nQ=3):
+    np.random.seed(0)
+    return np.random.random((nE, nQ, 3))
+
+def test_analyticalFunctionValues_array():
+    q = quadraturePoints()
+    sol = LinearSolution()
+    values = Norms.analyticalFunctionValues(sol, q, 0.5)
+    assert sol.shapes == [(12, 3)]
+    assert values.shape == (4, 3)
+    npt.assert_almost_equal(values, [[sol.uOfXT(x, 0.5) for x in qe] for qe in q])
+
+def test_analyticalFunctionValues_pointwise():
+    q = quadraturePoints()
+    values = Norms.analyticalFunctionValues(PointwiseSolution(), q, 0.5)
+    assert values.shape == (4, 3)
+    npt.assert_almost_equal(values,
+                            Norms.analyticalFunctionValues(LinearSolution(), q, 0.5))
+
+def test_analyticalFunctionValues_vector():
+    q = quadraturePoints()
+    sol = VectorSolution()
+    values = Norms.analyticalFunctionValues(sol, q, 2.0)
+    assert values.shape == (4, 3, 2)
+    npt.assert_almost_equal(values[..., 1], 2.0*q[..., 1])
+
+def test_analyticalFunctionValues_not_cached():
+    # a function whose values change at the same time is evaluated again
+    class Counter(object):
+        n = 0.0
+        def uOfXT(self, x, t):
+            return self.n
+    q = quadraturePoints()
+    sol = Counter()
+    npt.assert_equal(Norms.analyticalFunctionValues(sol, q, 0.0), 0.0)
+    sol.n = 1.0
+    npt.assert_equal(Norms.analyticalFunctionValues(sol, q, 0.0), 1.0)
+
+def test_error_norms():
+    q = quadraturePoints()
+    w = np.full(q.shape[:-1], 0.25)
+    sol = LinearSolution()
+    exact = Norms.analyticalFunctionValues(sol, q, 0.0)
+    npt.assert_almost_equal(Norms.L2errorSFEMvsAF(sol, q, w, exact + 1.0), np.sqrt(3.0))
+    npt.assert_almost_equal(Norms.L1errorSFEMvsAF(sol, q, w, exact - 1.0), 3.0)
+    npt.assert_almost_equal(Norms.LIerrorSFEMvsAF(sol, q, exact + 2.0), 2.0)
+
+def test_initial_condition_and_exact_solution():
+    # the same object is used for the initial conditions and the norms
+    nE, nI = 4, 3
+    points = quadraturePoints(nE, nI)
+    referenceFiniteElement = SimpleNamespace(
+        interpolationConditions=SimpleNamespace(nQuadraturePoints=nI))
+    femSpace = SimpleNamespace(referenceFiniteElement=referenceFiniteElement,
+                               interpolationPoints=points)
+    model = SimpleNamespace(u={0: SimpleNamespace(femSpace=femSpace)},
+                            mesh=SimpleNamespace(nElements_global=nE,
+                                                 elementMaterialTypes=np.arange(nE)))
+    sol = LinearSolution()
+    values = OneLevelTransport.getInterpolationValues(model, 0, sol, 0.5)
+    assert sol.shapes == [(nE*nI, 3)]
+    npt.assert_equal(sol.materialFlags, np.repeat(np.arange(nE), nI))
+    npt.assert_almost_equal(values, Norms.analyticalFunctionValues(sol, points, 0.5))
+    npt.assert_almost_equal(values,
+                            OneLevelTransport.getInterpolationValues(model, 0, PointwiseSolution(), 0.5))
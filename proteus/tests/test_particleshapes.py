@@ -0,0 +1,83 @@
+from __future__ import division
+from proteus import Comm, Profiling
+import numpy as np
+import numpy.testing as npt
+import unittest
+
+comm = Comm.init()
+Profiling.procID = comm.rank()
+
+Profiling.logEvent("Testing ParticleShapes")
+
+class TestParticleShapes(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(0)
+        self.X = np.random.uniform(-2., 2., (50, 3))
+
+    def test_sphere(self):
+        from proteus.mprans.ParticleShapes import SphereSDF
+        sdf = SphereSDF(center=(0.1, 0.2, 0.3), radius=0.5)
+        phi, normals = sdf.sdf_array(0., self.X)
+        for x, phi_x, n_x in zip(self.X, phi, normals):
+            d = x - np.array([0.1, 0.2, 0.3])
+            npt.assert_almost_equal(phi_x, np.linalg.norm(d) - 0.5)
+            npt.assert_almost_equal(n_x, d/np.linalg.norm(d))
+            phi_s, n_s = sdf(0., x)
+            npt.assert_almost_equal(phi_s, phi_x)
+            npt.assert_almost_equal(n_s, n_x)
+
+    def test_cylinder(self):
+        from proteus.mprans.ParticleShapes import CylinderSDF
+        sdf = CylinderSDF(center=(0.1, 0.2, 0.), radius=0.5)
+        phi, normals = sdf.sdf_array(0., self.X)
+        d = self.X[:, :2] - np.array([0.1, 0.2])
+        npt.assert_almost_equal(phi, np.linalg.norm(d, axis=1) - 0.5)
+        npt.assert_almost_equal(normals[:, 2], 0.)
+        lower, upper = sdf.bbox(0.)
+        npt.assert_almost_equal(lower[:2], [-0.4, -0.3])
+        self.assertEqual(upper[2], np.inf)
+
+    def test_box(self):
+        from proteus.mprans.ParticleShapes import BoxSDF
+        sdf = BoxSDF(center=(0., 0., 0.), half_lengths=(1., 0.5, np.inf))
+        phi, normals = sdf.sdf_array(0., np.array([[2., 0., 0.],
+                                                   [0.5, 0., 0.],
+                                                   [2., 1.5, 0.]]))
+        npt.assert_almost_equal(phi, [1., -0.5, np.sqrt(2.)])
+        npt.assert_almost_equal(normals, [[1., 0., 0.],
+                                          [1., 0., 0.],
+                                          [np.sqrt(0.5), np.sqrt(0.5), 0.]])
+
+    def test_rigid_body_velocity(self):
+        from proteus.mprans.ParticleShapes import RigidBodyVelocity
+        vel = RigidBodyVelocity(center=(0., 0., 0.), velocity=(1., 0., 0.), angular_velocity=(0., 0., 2.))
+        npt.assert_almost_equal(vel.velocity_array(0., np.array([[1., 0., 0.], [0., 1., 0.]])),
+                                [[1., 2., 0.], [-1., 0., 0.]])
+        npt.assert_almost_equal(vel(0., (1., 0., 0.)), [1., 2., 0.])
+
+    def test_unbounded_sdf(self):
+        # a subclass that only implements sdf_array is evaluated everywhere
+        from types import SimpleNamespace
+        from proteus.mprans.ParticleShapes import ParticleSDF
+        from proteus.mprans.RANS2P import Coefficients
+        class PlaneSDF(ParticleSDF):
+            def sdf_array(self, t, X):
+                normals = np.zeros_like(X)
+                normals[:, 1] = 1.
+                return X[:, 1] - self.center[1], normals
+        sdf = PlaneSDF(center=(0., 0.5, 0.))
+        self.assertTrue(sdf.bbox(0.) is None)
+        coefficients = SimpleNamespace(particle_sdfList=[sdf],
+                                       particle_bboxPadding=0.1)
+        self.assertTrue(Coefficients.particleNearPoints(coefficients, 0, 0., self.X).all())
+        phi, normals = Coefficients.particleSignedDistances(
+            SimpleNamespace(particle_sdfList=[sdf],
+                            particle_bboxPadding=0.1,
+                            particleNearPoints=lambda i, t, x: Coefficients.particleNearPoints(coefficients, i, t, x)),
+            0, 0., self.X)
+        npt.assert_almost_equal(phi, self.X[:, 1] - 0.5)
+        phi_s, n_s = sdf(0., self.X[0])
+        npt.assert_almost_equal(phi_s, self.X[0, 1] - 0.5)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,138 @@
+from __future__ import division
+from proteus import Comm, Profiling
+import proteus
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+comm = Comm.init()
+Profiling.procID = comm.rank()
+
+Profiling.logEvent("Testing Profiling")
+
+class FakeClock(object):
+    """
+    perf_counter standing in for the wall clock, advanced by hand
+    """
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class TestLazyImport(unittest.TestCase):
+    def setUp(self):
+        # a package whose module records that it has been executed
+        self.path = tempfile.mkdtemp()
+        os.mkdir(os.path.join(self.path, "lazypkg"))
+        open(os.path.join(self.path, "lazypkg", "__init__.py"), "w").close()
+        with open(os.path.join(self.path, "lazypkg", "lazymod.py"), "w") as f:
+            f.write("import lazypkg\n"
+                    "lazypkg.executed = True\n"
+                    "value = 42\n")
+        sys.path.insert(0, self.path)
+
+    def tearDown(self):
+        sys.path.remove(self.path)
+        for name in ("lazypkg.lazymod", "lazypkg"):
+            sys.modules.pop(name, None)
+        shutil.rmtree(self.path)
+
+    def test_deferred(self):
+        import lazypkg
+        module = proteus.lazyImport("lazypkg.lazymod")
+        self.assertFalse(hasattr(lazypkg, "executed"))
+        self.assertTrue(sys.modules["lazypkg.lazymod"] is module)
+        self.assertTrue(lazypkg.lazymod is module)
+        self.assertEqual(module.value, 42)
+        self.assertTrue(lazypkg.executed)
+        # an imported module is returned as is
+        self.assertTrue(proteus.lazyImport("lazypkg.lazymod") is module)
+
+    def test_missing(self):
+        with self.assertRaises(ImportError):
+            proteus.lazyImport("lazypkg.missing")
+
+class TestStartupStage(unittest.TestCase):
+    def setUp(self):
+        self.perf_counter = Profiling.perf_counter
+        self.clock = Profiling.perf_counter = FakeClock()
+        Profiling.startupTotals.clear()
+        Profiling.startupProfileOn()
+
+    def tearDown(self):
+        Profiling.startupProfileOff()
+        Profiling.perf_counter = self.perf_counter
+        Profiling.startupTotals.clear()
+
+    def test_nested(self):
+        clock = self.clock
+        with Profiling.startupStage("outer"):
+            clock.now += 1.0
+            with Profiling.startupStage("inner"):
+                clock.now += 2.0
+                with Profiling.startupStage("innermost"):
+                    clock.now += 4.0
+            clock.now += 8.0
+            with Profiling.startupStage("inner"):
+                clock.now += 16.0
+        totals = Profiling.startupTotals
+        self.assertEqual(totals["innermost"], [4.0, 4.0])
+        # repeated stages accumulate
+        self.assertEqual(totals["inner"], [22.0, 18.0])
+        # only the direct children are subtracted from the exclusive time
+        self.assertEqual(totals["outer"], [31.0, 9.0])
+        self.assertEqual(Profiling.startupStack, [])
+
+    def test_exception(self):
+        clock = self.clock
+        with self.assertRaises(RuntimeError):
+            with Profiling.startupStage("outer"):
+                with Profiling.startupStage("inner"):
+                    clock.now += 1.0
+                    raise RuntimeError("failed stage")
+        self.assertEqual(Profiling.startupTotals["inner"], [1.0, 1.0])
+        self.assertEqual(Profiling.startupTotals["outer"], [1.0, 0.0])
+        self.assertEqual(Profiling.startupStack, [])
+
+    def test_off(self):
+        Profiling.startupProfileOff()
+        with Profiling.startupStage("outer"):
+            self.clock.now += 1.0
+        self.assertEqual(Profiling.startupTotals, {})
+        self.assertEqual(Profiling.startupStack, [])
+
+class TestTimerSummary(unittest.TestCase):
+    def setUp(self):
+        self.perf_counter = Profiling.perf_counter
+        self.clock = Profiling.perf_counter = FakeClock()
+        self.timersEnabled = Profiling.timersEnabled
+        Profiling.timerTotals.clear()
+        Profiling.timersOn()
+
+    def tearDown(self):
+        Profiling.timersEnabled = self.timersEnabled
+        Profiling.perf_counter = self.perf_counter
+        Profiling.timerTotals.clear()
+
+    def test_summary(self):
+        # every rank times the same stages, so the statistics agree
+        clock = self.clock
+        for i in range(2):
+            with Profiling.timer("solve", "model"):
+                clock.now += 1.0
+                with Profiling.timer("getResidual"):
+                    clock.now += 0.5
+        summary = Profiling.timerSummary()
+        self.assertEqual([row['stage'] for row in summary],
+                         ["model:solve", "model:solve/getResidual"])
+        self.assertEqual([row['calls'] for row in summary], [2, 2])
+        for row, wall in zip(summary, [3.0, 1.0]):
+            self.assertEqual(row['min'], wall)
+            self.assertEqual(row['max'], wall)
+            self.assertEqual(row['mean'], wall)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
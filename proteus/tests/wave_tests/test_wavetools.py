@@ -670,9 +670,30 @@ class VerifyMonoChromaticFentonWaves(unittest.TestCase):
         self.assertTrue((err <= 1e-3))
         self.assertEqual(np.round(Bc_test,7).all(), np.round(Bc,7).all())
         self.assertEqual(np.round(Yc_test,7).all(), np.round(Yc,7).all())
-        
-        
-        
+
+    def testAutoFentonSolveCache(self):
+        import tempfile
+        import shutil
+        from proteus.fenton import Fenton
+        cacheDir = tempfile.mkdtemp()
+        try:
+            Bc, Yc, wl = Fenton.solve(waveheight=0.05, depth=0.45, period=2.5,
+                                      ncoeffs=8, cacheDir=cacheDir)
+            self.assertEqual(len(os.listdir(cacheDir)), 1)
+            Bc_cached, Yc_cached, wl_cached = Fenton.solve(waveheight=0.05, depth=0.45, period=2.5,
+                                                           ncoeffs=8, cacheDir=cacheDir)
+            npt.assert_equal(Bc_cached, Bc)
+            npt.assert_equal(Yc_cached, Yc)
+            self.assertEqual(wl_cached, wl)
+            self.assertTrue(abs(wl*0.45/5.032 - 1.) <= 1e-3)
+            Fenton.solve(waveheight=0.06, depth=0.45, period=2.5,
+                         ncoeffs=8, cacheDir=cacheDir)
+            self.assertEqual(len(os.listdir(cacheDir)), 2)
+        finally:
+            shutil.rmtree(cacheDir)
+
+
+
 #========================================= RANDOM WAVES ======================================
 
 
@@ -2356,6 +2377,72 @@ class VerifyCombinedWaves(unittest.TestCase):
         npt.assert_equal(CW.u(x,t),CW_test)        
         
 
+class VerifyBatchEvaluation(unittest.TestCase):
+    def setUp(self):
+        self.mwl = 4.5
+        self.depth = 0.9
+        self.g = np.array([0,0,-9.81])
+        self.waveDir = np.array([0.6,0.5,0.])
+        np.random.seed(0)
+        self.X = np.zeros((20,3),"d")
+        self.X[:,0] = np.random.uniform(0.,10.,20)
+        self.X[:,1] = np.random.uniform(0.,10.,20)
+        self.X[:,2] = np.random.uniform(self.mwl-self.depth,self.mwl,20)
+    def compare(self,wave,t,rtol=1e-8):
+        eta = wave.eta_batch(self.X,t)
+        U = wave.u_batch(self.X,t)
+        self.assertEqual(eta.shape,(20,))
+        self.assertEqual(U.shape,(20,3))
+        for ii,x in enumerate(self.X):
+            npt.assert_allclose(eta[ii],wave.eta(x,t),rtol=rtol,atol=1e-12)
+            npt.assert_allclose(U[ii],wave.u(x,t),rtol=rtol,atol=1e-12)
+    def testMonochromatic(self):
+        from proteus.WaveTools import MonochromaticWaves
+        a = MonochromaticWaves(2.,1.,self.mwl,self.depth,self.g,self.waveDir,fast=False)
+        self.compare(a,12.3)
+        b = MonochromaticWaves(2.,1.,self.mwl,self.depth,self.g,self.waveDir,wavelength=5.,waveType="Fenton",autoFenton=False,Ycoeff = np.array([0.1,0.02,0.001]), Bcoeff =np.array([0.1,0.01,0.001]), Nf = 3, meanVelocity =np.array([0.1,0.,0.]),fast=False)
+        self.compare(b,12.3)
+    def testRandom(self):
+        from proteus.WaveTools import RandomWaves, DirectionalWaves
+        a = RandomWaves(2.,0.15,self.mwl,self.depth,self.waveDir,self.g,50,2.,"JONSWAP",fast=False)
+        self.compare(a,12.3)
+        b = DirectionalWaves(3,2.,0.15,self.mwl,self.depth,self.waveDir,self.g,10,2.,"JONSWAP","cos2s",fast=False)
+        self.compare(b,12.3)
+    def testFast(self):
+        # the fast approximations are evaluated with the same formulas as
+        # point by point, so only rounding differs
+        from proteus.WaveTools import MonochromaticWaves, RandomWaves, DirectionalWaves
+        from proteus.WaveTools import fastcos_batch, fastcos_test
+        phases = np.linspace(-20.,20.,401)
+        npt.assert_allclose(fastcos_batch(phases),[fastcos_test(p) for p in phases],rtol=1e-10,atol=1e-12)
+        self.assertLess(abs(fastcos_batch(phases)-np.cos(phases)).max(),5e-3)
+        # points below kAbs*Z = -pi, where the hyperbolic terms are cut off
+        self.X[:,2] = np.random.uniform(self.mwl-4.,self.mwl,20)
+        a = MonochromaticWaves(2.,1.,self.mwl,4.,self.g,self.waveDir,fast=True)
+        self.compare(a,12.3,rtol=1e-6)
+        b = MonochromaticWaves(2.,1.,self.mwl,4.,self.g,self.waveDir,wavelength=5.,waveType="Fenton",autoFenton=False,Ycoeff = np.array([0.1,0.02,0.001]), Bcoeff =np.array([0.1,0.01,0.001]), Nf = 3, meanVelocity =np.array([0.1,0.,0.]),fast=True)
+        self.compare(b,12.3,rtol=1e-6)
+        c = RandomWaves(2.,0.15,self.mwl,4.,self.waveDir,self.g,50,2.,"JONSWAP",fast=True)
+        self.compare(c,12.3,rtol=1e-6)
+        d = DirectionalWaves(3,2.,0.15,self.mwl,4.,self.waveDir,self.g,10,2.,"JONSWAP","cos2s",fast=True)
+        self.compare(d,12.3,rtol=1e-6)
+    def testCombinedAndTimes(self):
+        from proteus.WaveTools import MonochromaticWaves, RandomWaves, CombineWaves
+        from proteus.WaveTools import eta_batch_times, u_batch_times
+        a = MonochromaticWaves(2.,1.,self.mwl,self.depth,self.g,self.waveDir,fast=False)
+        b = RandomWaves(2.,0.15,self.mwl,self.depth,self.waveDir,self.g,50,2.,"JONSWAP",fast=False)
+        c = CombineWaves([a,b])
+        self.compare(c,3.1)
+        times = np.array([0.,0.5,1.])
+        etas = eta_batch_times(c,self.X,times)
+        U = u_batch_times(c,self.X,times)
+        for it,t in enumerate(times):
+            npt.assert_allclose(etas[it],c.eta_batch(self.X,t))
+            npt.assert_allclose(U[it],c.u_batch(self.X,t))
+        # preallocated buffers are reused
+        out = np.ones(20,)
+        self.assertTrue(c.eta_batch(self.X,1.,out) is out)
+
 if __name__ == '__main__':
     unittest.main(verbosity=2)
 